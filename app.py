@@ -1,15 +1,18 @@
 """Module providing basic configuration."""
 
 import os
+from pathlib import Path
 
-from dotenv import load_dotenv
+# Load .env file, before the config reads the environment. The import is deferred, as
+# deployed containers have no .env file.
+if (Path(__file__).parent / ".env").exists():
+    from dotenv import load_dotenv
+
+    load_dotenv()
 
 from eq_cir_management_ui import create_app
 from eq_cir_management_ui.config.config import DefaultConfig
 
-# Load .env file
-load_dotenv()
-
 app = create_app(DefaultConfig)
 
 if __name__ == "__main__":
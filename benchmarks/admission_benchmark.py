@@ -0,0 +1,95 @@
+"""Benchmark admission control under overload: latency of the admitted requests and of the
+health probes, with and without shedding.
+
+A single gunicorn worker is loaded by more clients than it has threads, while a prober
+requests ``/status`` every 50ms. Without admission control every request queues in the
+worker; with it, requests over the limit are answered at once with a 503, and the client
+waits for the Retry-After period before trying again, as browsers and well-behaved clients do.
+
+Run with ``python -m benchmarks.admission_benchmark``.
+"""
+
+import http.client
+import statistics
+import threading
+import time
+
+from benchmarks.server_profiles_benchmark import PORT, start_server
+
+CLIENTS = 64
+DURATION = 10.0
+PROBE_INTERVAL = 0.05
+SERVER = {"WEB_SERVER_WORKERS": "1", "WEB_SERVER_THREADS": "4"}
+CASES = (
+    ("no admission control", {"ADMISSION_CONTROL_ENABLED": "false"}),
+    ("admission control", {"ADMISSION_CONTROL_ENABLED": "true", "ADMISSION_RETRY_AFTER": "1"}),
+)
+
+
+def timed_get(connection: http.client.HTTPConnection, path: str) -> tuple[http.client.HTTPResponse, float]:
+    """Request a path, returning the response and seconds taken."""
+    start = time.perf_counter()
+    connection.request("GET", path)
+    response = connection.getresponse()
+    response.read()
+    return response, time.perf_counter() - start
+
+
+def load(deadline: float, results: list[tuple[int, float]]) -> None:
+    """Request the index page until the deadline, reconnecting when the connection is closed."""
+    connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+    while time.monotonic() < deadline:
+        try:
+            response, latency = timed_get(connection, "/")
+        except (http.client.HTTPException, ConnectionError):
+            connection.close()
+            continue
+        results.append((response.status, latency))
+        if retry_after := response.getheader("Retry-After"):
+            time.sleep(float(retry_after))
+
+
+def probe(deadline: float, latencies: list[float]) -> None:
+    """Request the liveness probe at a fixed interval until the deadline."""
+    while time.monotonic() < deadline:
+        connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+        latencies.append(timed_get(connection, "/status")[1])
+        connection.close()
+        time.sleep(PROBE_INTERVAL)
+
+
+def p99(latencies: list[float]) -> float:
+    """The 99th percentile in milliseconds."""
+    return statistics.quantiles(latencies, n=100)[98] * 1000 if len(latencies) > 1 else float("nan")
+
+
+def main() -> None:
+    """Overload the server with and without admission control."""
+    print(f"{CLIENTS} clients for {DURATION:.0f}s against 1 worker with {SERVER['WEB_SERVER_THREADS']} threads")
+    print(f"{'case':<22} {'200/s':>8} {'503/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'probe p99 ms':>13}")
+    for name, environ in CASES:
+        server = start_server("io", {**SERVER, **environ})
+        try:
+            results: list[tuple[int, float]] = []
+            probes: list[float] = []
+            deadline = time.monotonic() + DURATION
+            threads = [threading.Thread(target=load, args=(deadline, results)) for _ in range(CLIENTS)]
+            threads.append(threading.Thread(target=probe, args=(deadline, probes)))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+        admitted = [latency for status, latency in results if status == 200]
+        shed = sum(1 for status, _ in results if status == 503)
+        print(
+            f"{name:<22} {len(admitted) / DURATION:8.0f} {shed / DURATION:8.0f} "
+            f"{statistics.median(admitted) * 1000:8.1f} {p99(admitted):8.1f} {p99(probes):13.1f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
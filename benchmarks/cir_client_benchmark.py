@@ -0,0 +1,60 @@
+"""Benchmark CIR API calls with a new connection per call, pooled connections, and concurrent
+independent calls, against the stub CIR API server.
+
+Run with ``python -m benchmarks.cir_client_benchmark``.
+"""
+
+import http.client
+import logging
+import time
+from urllib.parse import urlsplit
+
+import structlog
+
+from eq_cir_management_ui.cir_api.client import CirApiClient
+from eq_cir_management_ui.cir_api.stub_server import StubCirServer
+
+ITERATIONS = 200
+LATENCY = 0.005
+
+
+def unpooled_call(url: str, path: str) -> None:
+    """Make a call on a new connection, as the application did before the pooled client."""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname or "localhost", parts.port, timeout=5)
+    connection.request("GET", path)
+    connection.getresponse().read()
+    connection.close()
+
+
+def main() -> None:
+    """Compare the per-call and per-page cost of each way of calling the API."""
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.INFO))
+
+    with StubCirServer(instruments=100, latency=LATENCY) as server:
+        client = CirApiClient(server.url)
+
+        cases = {
+            "new connection per call (before)": lambda: unpooled_call(server.url, "/v2/ci_metadata"),
+            "pooled keep-alive connection (after)": client.get_ci_metadata,
+            "overview, sequential calls (before)": lambda: (
+                client.get_ci_metadata(survey_id="1000", form_type="0001", language="en"),
+                client.get_ci_versions("1000", "0001", "en"),
+            ),
+            "overview, concurrent calls (after)": lambda: client.get_ci_overview("1000", "0001", "en"),
+        }
+
+        print(f"Stub CIR API latency {LATENCY * 1000:.0f}ms, {ITERATIONS} iterations")
+        for name, case in cases.items():
+            connections = server.connections
+            start = time.perf_counter()
+            for _ in range(ITERATIONS):
+                case()
+            duration = (time.perf_counter() - start) / ITERATIONS
+            print(f"{name:<40} {duration * 1000:7.2f} ms/iteration {server.connections - connections:5d} connections")
+
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Measure bytes on the wire and CPU cost per response for each encoding and level.
+
+Run with ``python -m benchmarks.compression_benchmark``.
+"""
+
+import time
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.compression import STREAM_ENCODERS
+from eq_cir_management_ui.config.config import DefaultConfig
+
+LEVELS = {"gzip": (1, 6, 9), "br": (1, 4, 6, 11)}
+# Seconds spent timing each encoding and level.
+TIME_BUDGET = 0.2
+SURVEYS = ("Monthly Business Survey", "Quarterly Stocks Survey", "Annual Business Survey", "Retail Sales Inquiry")
+
+
+def pages() -> dict[str, bytes]:
+    """Render the application's pages, plus a synthetic listing of collection instruments."""
+
+    class UncompressedConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration without response compression."""
+
+        COMPRESSION_ENABLED = False
+
+    client = create_app(UncompressedConfig).test_client()
+    rows = "".join(
+        f'<tr class="ons-table__row"><td class="ons-table__cell">{number * 7919 % 1000003:07d}</td>'
+        f'<td class="ons-table__cell">{SURVEYS[number % len(SURVEYS)]} {number // 12}</td>'
+        f'<td class="ons-table__cell">{"en" if number % 3 else "cy"}</td>'
+        f'<td class="ons-table__cell">2025-{number % 12 + 1:02d}-{number % 28 + 1:02d}</td></tr>\n'
+        for number in range(1000)
+    )
+    return {
+        "index": client.get("/").data,
+        "404": client.get("/page-not-found").data,
+        "listing": client.get("/").data.replace(b"</main>", f"<table>{rows}</table></main>".encode()),
+    }
+
+
+def main() -> None:
+    """Print the compressed size and time per response of each page."""
+    print(f"{'page':<8} {'encoding':<10} {'bytes':>8} {'ratio':>7} {'µs/response':>12}")
+    for page, body in pages().items():
+        print(f"{page:<8} {'identity':<10} {len(body):>8} {1:>7.2f} {0:>12.1f}")
+        for encoding, levels in LEVELS.items():
+            if encoding not in STREAM_ENCODERS:
+                continue
+            for level in levels:
+                start = time.perf_counter()
+                iterations = 0
+                while not iterations or time.perf_counter() - start < TIME_BUDGET:
+                    encoder = STREAM_ENCODERS[encoding](level)
+                    compressed = encoder.compress(body) + encoder.finish()
+                    iterations += 1
+                microseconds = (time.perf_counter() - start) / iterations * 1_000_000
+                name, ratio = f"{encoding}-{level}", len(body) / len(compressed)
+                print(f"{page:<8} {name:<10} {len(compressed):>8} {ratio:>7.2f} {microseconds:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
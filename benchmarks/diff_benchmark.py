@@ -0,0 +1,79 @@
+"""Benchmark diffing large collection instrument versions: a full recursive comparison of the two
+documents, against the diff of their hashed trees, both when the trees are first built and when
+the base version's tree is already kept, as it is when several versions are compared with it.
+
+Run with ``python -m benchmarks.diff_benchmark``.
+"""
+
+import copy
+import time
+from collections.abc import Callable, Iterator
+from typing import Any
+
+from eq_cir_management_ui.cir_api.stub_server import synthetic_instrument, synthetic_metadata
+from eq_cir_management_ui.diff.engine import CHANGED, Change, diff_trees, hash_tree
+
+# Sections of 50 questions in each document.
+SECTIONS = (100, 400)
+REPEATS = 5
+
+
+def full_diff(old: Any, new: Any, path: str = "") -> Iterator[Change]:
+    """Compare every value of two documents, matching arrays by position."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() | new.keys():
+            yield from full_diff(old.get(key), new.get(key), f"{path}.{key}")
+    elif isinstance(old, list) and isinstance(new, list):
+        for index in range(max(len(old), len(new))):
+            old_item = old[index] if index < len(old) else None
+            new_item = new[index] if index < len(new) else None
+            yield from full_diff(old_item, new_item, f"{path}[{index}]")
+    elif type(old) is not type(new) or old != new:
+        yield Change(CHANGED, path, old, new)
+
+
+def versions(document: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Later versions of a document: the same, with one answer changed, with a section added, and
+    with two sections swapped.
+    """
+    changed = copy.deepcopy(document)
+    changed["sections"][-1]["groups"][0]["blocks"][-1]["question"]["answers"][0]["mandatory"] = True
+    added = copy.deepcopy(document)
+    added["sections"].insert(1, copy.deepcopy(document["sections"][0]) | {"id": "section-new"})
+    reordered = copy.deepcopy(document)
+    reordered["sections"][0], reordered["sections"][1] = reordered["sections"][1], reordered["sections"][0]
+    return {
+        "identical": copy.deepcopy(document),
+        "answer changed": changed,
+        "section added": added,
+        "reordered": reordered,
+    }
+
+
+def timed(action: Callable[[], Any]) -> float:
+    """The fewest milliseconds an action takes in several runs."""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        action()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    """Compare the time of each way of diffing each later version with its base."""
+    for sections in SECTIONS:
+        document = synthetic_instrument(synthetic_metadata(1)[0], sections=sections, questions=50)
+        base = hash_tree(document)
+        hashing = timed(lambda document=document: hash_tree(document))
+        print(f"{sections} sections of 50 questions, hashing a version takes {hashing:.1f} ms")
+        for name, version in versions(document).items():
+            target = hash_tree(version)
+            full = timed(lambda old=document, new=version: list(full_diff(old, new)))
+            built = timed(lambda old=document, new=version: list(diff_trees(hash_tree(old), hash_tree(new))))
+            kept = timed(lambda old=base, new=target: list(diff_trees(old, new)))
+            print(f"  {name:<15} full {full:8.1f} ms   trees built {built:8.1f} ms   trees kept {kept:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
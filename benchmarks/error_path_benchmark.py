@@ -0,0 +1,63 @@
+"""Benchmark the cost of answering requests for missing pages: through Flask with every error
+logged, through Flask with repeated errors summarised, and for a known scanner path, which is
+answered before Flask.
+
+Log lines are written to a discarded stream, so their cost is counted but not shown.
+
+Run with ``python -m benchmarks.error_path_benchmark``.
+"""
+
+import contextlib
+import os
+import timeit
+
+from werkzeug.test import EnvironBuilder
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.config.logging_config import queue_logging
+
+ITERATIONS = 2000
+
+
+class EveryErrorLoggedConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+    """Configuration logging every 4xx error, without a scanner matcher."""
+
+    LOG_CLIENT_ERROR_SUMMARY_INTERVAL = 0
+    SCANNER_PATH_PREFIXES = ()
+    SCANNER_PATH_SUFFIXES = ()
+
+
+def start_response(_status: str, _headers: list[tuple[str, str]], _exc_info: object = None) -> None:
+    """Discard the response status and headers."""
+
+
+def main() -> None:
+    """Time a 404 response on each path."""
+    cases = (
+        ("Flask, every error logged", EveryErrorLoggedConfig, "/wp-login.php"),
+        ("Flask, errors summarised", DefaultConfig, "/missing-page"),
+        ("scanner path", DefaultConfig, "/wp-login.php"),
+    )
+
+    timings = {}
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+        for name, config, path in cases:
+            app = create_app(config)
+            environ = EnvironBuilder(path=path).get_environ()
+            seconds = min(
+                timeit.repeat(
+                    lambda app=app, environ=environ: b"".join(app(environ.copy(), start_response)),
+                    number=ITERATIONS,
+                    repeat=5,
+                ),
+            )
+            timings[name] = seconds / ITERATIONS
+        queue_logging.stop()
+
+    for name, seconds in timings.items():
+        print(f"{name:<27} {seconds * 1_000_000:8.1f} µs/response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""HTTP load test and latency regression check.
+
+The application is started under gunicorn with ``gunicorn_config.py`` and each route is loaded
+in turn by an asyncio client, with a number of concurrent keep-alive connections for a fixed
+time. Throughput and p50, p95 and p99 latency are reported per route, alongside in-process
+timings of ``render_template`` for each page. The results are written as JSON, and compared
+with a committed baseline: a latency more than the tolerance above its baseline, or a
+throughput more than the tolerance below it, is a regression, and the run exits with status 1.
+
+Timings depend on the machine, so the baseline should be recorded, with ``--update-baseline``,
+on the machine the check runs on.
+
+Run with ``python -m benchmarks.load_test``, or ``make benchmark``.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Any
+
+from benchmarks.server_profiles_benchmark import PORT, start_server
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE = ROOT / "benchmarks" / "baseline.json"
+RESULTS = ROOT / "build" / "benchmark-results.json"
+
+# Each route, with the status it is expected to answer with.
+ROUTES = {"/": 200, "/status": 200, "/page-not-found": 404, "/403": 403, "/favicon.ico": 200}
+# Below the worker's admission control limit, so that no request is shed.
+CONCURRENCY = 8
+DURATION = 5.0
+TOLERANCE = 0.3
+RENDER_ITERATIONS = 200
+
+# Metrics where higher is worse, and where lower is worse.
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+THROUGHPUT_METRICS = ("requests_per_second",)
+
+
+async def read_response(reader: asyncio.StreamReader) -> int:
+    """Read an HTTP/1.1 response, with either a Content-Length or a chunked body.
+
+    :param reader: The connection.
+    :return: The response status.
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(int(headers.get("content-length", "0")))
+    return int(status_line.split()[1])
+
+
+async def client(path: str, deadline: float, latencies: list[float], statuses: list[int]) -> None:
+    """Request a path over one keep-alive connection until the deadline, reconnecting if the
+    server closes the connection.
+    """
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{PORT}\r\nAccept-Encoding: gzip, br\r\n\r\n".encode()
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    try:
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                writer.write(request)
+                status = await read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+                continue
+            latencies.append(time.perf_counter() - start)
+            statuses.append(status)
+    finally:
+        writer.close()
+
+
+async def load_route(path: str, concurrency: int, duration: float) -> tuple[list[float], list[int]]:
+    """Load a route with concurrent clients for a time.
+
+    :return: The latency, in seconds, and status of each response.
+    """
+    latencies: list[float] = []
+    statuses: list[int] = []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(client(path, deadline, latencies, statuses) for _ in range(concurrency)))
+    return latencies, statuses
+
+
+def summarise(latencies: list[float], statuses: list[int], expected: int, duration: float) -> dict[str, float]:
+    """Summarise the responses for a route.
+
+    :return: Throughput, latency percentiles and the number of responses with an unexpected status.
+    """
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests_per_second": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p95_ms": round(percentiles[94] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+        "unexpected_statuses": sum(1 for status in statuses if status != expected),
+    }
+
+
+def render_timings() -> dict[str, float]:
+    """Time ``render_template`` of each page in process, without the page cache.
+
+    :return: Milliseconds per render, keyed on page.
+    """
+    # Imported here, so that the load test's own process does not hold the application.
+    # pylint: disable=import-outside-toplevel
+    from flask import render_template
+
+    from eq_cir_management_ui import create_app
+    from eq_cir_management_ui.config.config import DefaultConfig
+    from eq_cir_management_ui.errors.pages import ERROR_CONTENT
+
+    app = create_app(type("QuietConfig", (DefaultConfig,), {"LOG_LEVEL": "WARNING"}))
+    pages: dict[str, tuple[str, dict[str, Any]]] = {"index.html": ("index.html", {})}
+    pages |= {
+        f"error.html ({status})": ("error.html", {"error_content": ERROR_CONTENT[status]}) for status in (404, 500)
+    }
+
+    timings = {}
+    with app.test_request_context("/"):
+        for name, (template, context) in pages.items():
+            seconds = min(
+                timeit.repeat(
+                    lambda template=template, context=context: render_template(template, **context),
+                    number=RENDER_ITERATIONS,
+                    repeat=3,
+                ),
+            )
+            timings[name] = round(seconds / RENDER_ITERATIONS * 1000, 3)
+    return timings
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Compare results with the baseline.
+
+    :param results: The results of this run.
+    :param baseline: The results of the baseline run.
+    :param tolerance: The fraction by which a metric may be worse than its baseline.
+    :return: A description of each regression.
+    """
+    regressions = []
+    for path, metrics in results["routes"].items():
+        base = baseline.get("routes", {}).get(path)
+        if base is None:
+            continue
+        if metrics["unexpected_statuses"]:
+            regressions.append(f"{path}: {metrics['unexpected_statuses']} responses with an unexpected status")
+        regressions.extend(
+            f"{path} {metric}: {metrics[metric]} > {base[metric]} baseline"
+            for metric in LATENCY_METRICS
+            if metrics[metric] > base[metric] * (1 + tolerance)
+        )
+        regressions.extend(
+            f"{path} {metric}: {metrics[metric]} < {base[metric]} baseline"
+            for metric in THROUGHPUT_METRICS
+            if metrics[metric] < base[metric] * (1 - tolerance)
+        )
+
+    for page, milliseconds in results["render_ms"].items():
+        base_render = baseline.get("render_ms", {}).get(page)
+        if base_render is not None and milliseconds > base_render * (1 + tolerance):
+            regressions.append(f"render {page}: {milliseconds} ms > {base_render} ms baseline")
+    return regressions
+
+
+def run(routes: list[str], concurrency: int, duration: float) -> dict[str, Any]:
+    """Load each route under gunicorn, then time the page renders.
+
+    :return: The results.
+    """
+    results: dict[str, Any] = {
+        "environment": {
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "concurrency": concurrency,
+            "duration": duration,
+        },
+        "routes": {},
+    }
+
+    server = start_server(os.getenv("WEB_SERVER_PROFILE", "io"), {"PAGE_CACHE_ENABLED": "true"})
+    try:
+        for path in routes:
+            # Warm up the route and the connections, outside the measurement.
+            asyncio.run(load_route(path, concurrency, 0.5))
+            latencies, statuses = asyncio.run(load_route(path, concurrency, duration))
+            results["routes"][path] = summarise(latencies, statuses, ROUTES[path], duration)
+    finally:
+        server.terminate()
+        server.wait()
+
+    results["render_ms"] = render_timings()
+    return results
+
+
+def report(results: dict[str, Any]) -> None:
+    """Print the results as a table."""
+    print(f"{'route':<18} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'unexpected':>11}")
+    for path, metrics in results["routes"].items():
+        print(
+            f"{path:<18} {metrics['requests_per_second']:9.0f} {metrics['p50_ms']:8.2f} {metrics['p95_ms']:8.2f} "
+            f"{metrics['p99_ms']:8.2f} {metrics['unexpected_statuses']:11d}",
+        )
+    print()
+    for page, milliseconds in results["render_ms"].items():
+        print(f"render_template {page:<18} {milliseconds:8.3f} ms")
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the load test and compare it with the baseline.
+
+    :return: The exit status, 1 if there was a regression.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=list(ROUTES))
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="connections per route")
+    parser.add_argument("--duration", type=float, default=DURATION, help="seconds per route")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="fraction a metric may regress by")
+    parser.add_argument("--output", type=Path, default=RESULTS)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="record this run as the baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.routes, args.concurrency, args.duration)
+    report(results)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nNo baseline at {args.baseline}, record one with --update-baseline")
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+    print(f"\nCompared with {args.baseline}, tolerance {args.tolerance:.0%}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("No regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
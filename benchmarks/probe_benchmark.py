@@ -0,0 +1,45 @@
+"""Benchmark the cost of a health probe, answered by Flask versus the health check middleware.
+
+Run with ``python -m benchmarks.probe_benchmark``.
+"""
+
+import timeit
+
+from werkzeug.test import EnvironBuilder
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+
+ITERATIONS = 5000
+
+
+def start_response(_status: str, _headers: list[tuple[str, str]]) -> None:
+    """Discard the response status and headers."""
+
+
+def probe(wsgi_app, environ: dict) -> None:
+    """Send a single probe to a WSGI application and consume the body."""
+    b"".join(wsgi_app(environ.copy(), start_response))
+
+
+def main() -> None:
+    """Compare the per-probe cost of each path through the application."""
+    app = create_app(DefaultConfig)
+    flask_wsgi_app = app.wsgi_app.wsgi_app  # The application behind the health check middleware.
+
+    status = EnvironBuilder(path="/status").get_environ()
+    ready = EnvironBuilder(path="/ready").get_environ()
+
+    cases = {
+        "/status through Flask and Talisman (before)": lambda: probe(flask_wsgi_app, status),
+        "/status in middleware (after)": lambda: probe(app.wsgi_app, status),
+        "/ready in middleware (cached)": lambda: probe(app.wsgi_app, ready),
+    }
+
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=ITERATIONS, repeat=5)) / ITERATIONS
+        print(f"{name:<45} {seconds * 1_000_000:8.1f} µs/probe")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark the search index of collection instruments at 100,000 collection instruments: the
+memory the index takes and the time to build it from the metadata feed, the latency of searches
+as a user types, against filtering the feed for each search, and the time to apply an update of
+a few changed collection instruments, against building the index again.
+
+Run with ``python -m benchmarks.search_benchmark``.
+"""
+
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+from eq_cir_management_ui.cir_api.stub_server import synthetic_metadata
+from eq_cir_management_ui.search.index import SearchIndex, words
+
+INSTRUMENTS = 100_000
+# Searches as a user types, with and without facets.
+QUERIES: tuple[tuple[str, dict[str, str]], ...] = (
+    ("m", {}),
+    ("mo", {}),
+    ("month", {}),
+    ("monthly 1", {}),
+    ("monthly 12", {}),
+    ("monthly 1234", {}),
+    ("1234", {}),
+    ("survey", {"language": "cy"}),
+    ("retail", {"form_type": "0004", "language": "en"}),
+    ("", {"survey_id": "12345"}),
+    ("nothing", {}),
+)
+REPEATS = 200
+# Collection instruments changed, added and removed by each update.
+CHANGES = 100
+
+
+def filter_feed(rows: list[dict[str, Any]], text: str, limit: int = 10, **facets: str) -> tuple[int, list[Any]]:
+    """Search the feed without an index, as filtering the listing for each keystroke would."""
+    prefixes = words(text)
+    matches = [
+        row
+        for row in rows
+        if all(row[field] == value for field, value in facets.items())
+        and all(
+            any(word.startswith(prefix) for word in words(f"{row['survey_id']} {row['form_type']} {row['title']}"))
+            for prefix in prefixes
+        )
+    ]
+    return len(matches), matches[:limit]
+
+
+def latencies(search: Callable[[], Any], repeats: int) -> tuple[float, float]:
+    """The median and 99th percentile milliseconds of a search."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        search()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), statistics.quantiles(samples, n=100)[98]
+
+
+def updated_feed(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """The feed after new versions of some collection instruments, some added, and some removed."""
+    feed = [row | {"ci_version": row["ci_version"] + 1, "title": row["title"] + " (revised)"} for row in rows[:CHANGES]]
+    feed += rows[CHANGES : len(rows) - CHANGES]
+    feed += [
+        {"survey_id": f"{number}", "form_type": "0001", "language": "en", "title": f"New Survey {number}"}
+        for number in range(90000, 90000 + CHANGES)
+    ]
+    return feed
+
+
+def main() -> None:
+    """Measure the index at 100,000 collection instruments."""
+    rows = synthetic_metadata(INSTRUMENTS, versions=1)
+
+    start = time.perf_counter()
+    SearchIndex().update(rows)
+    built = time.perf_counter() - start
+    # Traced in a second build, as tracing slows it.
+    index = SearchIndex()
+    tracemalloc.start()
+    index.update(rows)
+    size = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    tracemalloc.stop()
+    print(f"{INSTRUMENTS} collection instruments: index built in {built * 1000:.0f} ms, taking {size:.1f} MB")
+
+    print(f"  {'search':<38} index p50/p99 ms   first search ms   filtering the feed ms")
+    for text, facets in QUERIES:
+        # Each keystroke's prefix is searched first by one request, and then from the kept bitset.
+        index.update(updated_feed(rows))
+        index.update(rows)
+        start = time.perf_counter()
+        total, _ = index.search(text, **facets)
+        first = (time.perf_counter() - start) * 1000
+        median, p99 = latencies(lambda text=text, facets=facets: index.search(text, **facets), REPEATS)
+        filtering, _ = latencies(lambda text=text, facets=facets: filter_feed(rows, text, **facets), 3)
+        label = " ".join([repr(text), *(f"{field}={value}" for field, value in facets.items())])
+        print(f"  {label:<38} {median:7.3f} /{p99:7.3f}   {first:15.3f}   {filtering:21.1f}   ({total} matches)")
+
+    feed = updated_feed(rows)
+    start = time.perf_counter()
+    counts = index.update(feed)
+    applied = time.perf_counter() - start
+    start = time.perf_counter()
+    SearchIndex().update(feed)
+    rebuilt = time.perf_counter() - start
+    print(
+        f"  update of {counts[0]} added, {counts[1]} changed and {counts[2]} removed: applied in "
+        f"{applied * 1000:.0f} ms, rebuilt in {rebuilt * 1000:.0f} ms",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark the per-response cost of the security headers, added by Flask-Talisman, which the
+application used before, and by the precomputed header middleware.
+
+Run with ``python -m benchmarks.secure_headers_benchmark``.
+"""
+
+import timeit
+
+from flask import Flask
+from flask_talisman import Talisman
+from werkzeug.test import EnvironBuilder
+
+from eq_cir_management_ui import content_security_policy
+from eq_cir_management_ui.middleware.secure_headers import SecureHeadersMiddleware
+
+ITERATIONS = 5000
+CDN_URL = "https://cdn.ons.gov.uk"
+
+
+def start_response(_status: str, _headers: list[tuple[str, str]], _exc_info: object = None) -> None:
+    """Discard the response status and headers."""
+
+
+def plain_app() -> Flask:
+    """A Flask application with a single, trivial, view."""
+    app = Flask(__name__)
+    app.add_url_rule("/", view_func=lambda: "ok")
+    return app
+
+
+def main() -> None:
+    """Compare the cost of a trivial response with each way of adding the security headers."""
+    policy = content_security_policy(CDN_URL)
+
+    baseline = plain_app()
+
+    talisman = plain_app()
+    Talisman().init_app(
+        talisman,
+        force_https=False,
+        content_security_policy=policy,
+        content_security_policy_nonce_in=["script-src"],
+        frame_options="DENY",
+        strict_transport_security=True,
+        strict_transport_security_max_age=31536000,
+    )
+
+    precomputed = plain_app()
+    precomputed.wsgi_app = SecureHeadersMiddleware(  # type: ignore[method-assign]
+        precomputed.wsgi_app,
+        content_security_policy=policy,
+    )
+
+    environ = EnvironBuilder(path="/", headers={"X-Forwarded-Proto": "https"}).get_environ()
+    cases = {"no security headers": baseline, "Flask-Talisman (before)": talisman, "precomputed (after)": precomputed}
+
+    timings = {}
+    for name, app in cases.items():
+        seconds = min(
+            timeit.repeat(
+                lambda app=app: b"".join(app(environ.copy(), start_response)),
+                number=ITERATIONS,
+                repeat=5,
+            ),
+        )
+        timings[name] = seconds / ITERATIONS
+
+    for name, seconds in timings.items():
+        overhead = seconds - timings["no security headers"]
+        print(f"{name:<25} {seconds * 1_000_000:8.1f} µs/response   overhead {overhead * 1_000_000:6.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark the gunicorn deployment profiles: throughput, latency and memory of each.
+
+Each profile is started with ``gunicorn -c gunicorn_config.py`` on a local port, loaded by
+client threads over keep-alive connections for a fixed time, and its memory measured as the
+proportional set size (PSS) of the master and workers, which counts pages shared copy-on-write
+once rather than once per process.
+
+Run with ``python -m benchmarks.server_profiles_benchmark``.
+"""
+
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+PORT = 5198
+CLIENTS = 32
+DURATION = 10.0
+PATHS = ("/", "/404-not-found")
+PROFILES = (
+    ("cpu", {}),
+    ("io", {}),
+    ("low-memory", {}),
+    ("io, not preloaded", {"WEB_SERVER_PROFILE": "io", "WEB_SERVER_PRELOAD_APP": "false"}),
+)
+
+
+def start_server(profile: str, environ: dict[str, str]) -> subprocess.Popen[bytes]:
+    """Start gunicorn with a profile and wait until it is ready."""
+    env = {
+        **os.environ,
+        "WEB_SERVER_PROFILE": profile,
+        # Render every page, so the benchmark measures the work a cache miss does.
+        "PAGE_CACHE_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+        **environ,
+    }
+    server = subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "--bind", f"127.0.0.1:{PORT}", "app:app"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=1)
+            connection.request("GET", "/ready")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    msg = f"gunicorn did not become ready with profile {profile}"
+    raise RuntimeError(msg)
+
+
+def load(deadline: float, latencies: list[float]) -> None:
+    """Send requests on one keep-alive connection until the deadline, reconnecting when a
+    worker restarting after max_requests closes it.
+    """
+    connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=10)
+    count = 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            connection.request("GET", PATHS[count % len(PATHS)])
+            connection.getresponse().read()
+        except (http.client.RemoteDisconnected, ConnectionError):
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - start)
+        count += 1
+
+
+def pss(pid: int) -> int:
+    """The proportional set size, in bytes, of a process and its children."""
+    total = 0
+    children = Path(f"/proc/{pid}/task/{pid}/children").read_text().split()
+    for process in (pid, *map(int, children)):
+        for line in Path(f"/proc/{process}/smaps_rollup").read_text().splitlines():
+            if line.startswith("Pss:"):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+def main() -> None:
+    """Run the load against each profile in turn."""
+    print(f"{os.cpu_count()} CPUs, {CLIENTS} clients for {DURATION:.0f}s per profile")
+    print(f"{'profile':<20} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'PSS MiB':>8}")
+    for name, environ in PROFILES:
+        server = start_server(name, environ)
+        try:
+            latencies: list[float] = []
+            deadline = time.monotonic() + DURATION
+            clients = [threading.Thread(target=load, args=(deadline, latencies)) for _ in range(CLIENTS)]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            memory = pss(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{name:<20} {len(latencies) / DURATION:8.0f} {percentiles[49] * 1000:8.1f} "
+            f"{percentiles[98] * 1000:8.1f} {memory / 1024 / 1024:8.1f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark warming the CIR API response caches of several workers, with and without the
+cache shared between them, against the stub CIR API server.
+
+Run with ``python -m benchmarks.shared_cache_benchmark``.
+"""
+
+import logging
+import multiprocessing
+import random
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+import structlog
+
+from eq_cir_management_ui.cache.response_cache import ResponseCache
+from eq_cir_management_ui.cache.shared_memory import SharedMemoryCache
+from eq_cir_management_ui.cir_api.client import CirApiClient
+from eq_cir_management_ui.cir_api.stub_server import StubCirServer
+
+WORKERS = 3
+LATENCY = 0.01
+ITERATIONS = 20000
+
+
+def warm_worker(url: str, shared_cache_path: str | None, guids: list[str], seed: int) -> None:
+    """Fetch every collection instrument, in an order of its own, as a newly started worker would."""
+    random.Random(seed).shuffle(guids)  # noqa: S311
+    shared_cache = SharedMemoryCache(shared_cache_path) if shared_cache_path else None
+    client = CirApiClient(url, cache=ResponseCache(1024, 60, 60), shared_cache=shared_cache)
+    for guid in guids:
+        client.get_collection_instrument(guid)
+
+
+def warm(server: StubCirServer, shared_cache_path: str | None) -> tuple[float, int]:
+    """Warm every worker at once, returning the time taken and the number of upstream calls."""
+    guids = [entry["guid"] for entry in server.metadata]
+    requests = server.requests
+    start = time.perf_counter()
+    workers = [
+        multiprocessing.get_context("fork").Process(
+            target=warm_worker,
+            args=(server.url, shared_cache_path, guids, seed),
+        )
+        for seed in range(WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start, server.requests - requests
+
+
+def main() -> None:
+    """Compare cold starts of the workers, and the cost of a shared cache hit."""
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.INFO))
+
+    with StubCirServer(instruments=50, latency=LATENCY) as server, tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / "shared.cache")
+        print(f"{WORKERS} workers, {len(server.metadata)} collection instruments, {LATENCY * 1000:.0f}ms latency")
+        for name, shared_cache_path in (("per-worker caches (before)", None), ("shared cache (after)", path)):
+            duration, requests = warm(server, shared_cache_path)
+            print(f"{name:<30} {duration:6.2f}s to warm {requests:5d} upstream calls")
+
+        shared_cache = SharedMemoryCache(path)
+        key = f"/v1/retrieve_collection_instrument?guid={server.metadata[0]['guid']}".encode()
+        size = len(shared_cache.get(key) or b"")
+        seconds = min(timeit.repeat(lambda: shared_cache.get(key), number=ITERATIONS, repeat=5)) / ITERATIONS
+        print(f"shared cache hit, {size} byte value  {seconds * 1_000_000:6.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark the cold start of the application: importing it, creating it and serving the
+first request for ``/``. Each run is a fresh interpreter, as a newly scaled up container is.
+
+Run with ``make benchmark-startup``. A phase whose median is over its budget fails the run,
+which exits with status 1.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RUNS = 5
+
+# Seconds each phase of a cold start may take.
+BUDGETS = {"import": 1.5, "create_app": 0.5, "first_request": 0.1}
+
+COLD_START = """
+import json, time
+start = time.perf_counter()
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+imported = time.perf_counter()
+app = create_app(DefaultConfig)
+created = time.perf_counter()
+response = app.test_client().get("/")
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "create_app": created - imported,
+    "first_request": served - created,
+}))
+"""
+
+
+def cold_start() -> dict[str, float]:
+    """Time each phase of starting the application in a new interpreter.
+
+    :return: The seconds taken by each phase.
+    """
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", COLD_START],
+        cwd=ROOT,
+        env={**os.environ, "LOG_LEVEL": "WARNING"},
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    phases: dict[str, float] = json.loads(result.stdout.splitlines()[-1])
+    return phases
+
+
+def measure(runs: int = RUNS) -> dict[str, float]:
+    """The median time of each phase over several cold starts.
+
+    :param runs: The number of cold starts.
+    :return: The median seconds taken by each phase.
+    """
+    samples = [cold_start() for _ in range(runs)]
+    return {phase: statistics.median(sample[phase] for sample in samples) for phase in BUDGETS}
+
+
+def main() -> int:
+    """Report the median time of each phase against its budget.
+
+    :return: The exit status, 1 if a phase was over its budget.
+    """
+    phases = measure()
+    over_budget = [phase for phase, seconds in phases.items() if seconds >= BUDGETS[phase]]
+    for phase, seconds in phases.items():
+        status = "  OVER BUDGET" if phase in over_budget else ""
+        print(f"{phase:<15} {seconds * 1000:8.1f} ms  (budget {BUDGETS[phase] * 1000:.0f} ms){status}")
+    print(f"{'total':<15} {sum(phases.values()) * 1000:8.1f} ms")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
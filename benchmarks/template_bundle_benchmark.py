@@ -0,0 +1,69 @@
+"""Benchmark loading templates from their source against loading them from a precompiled bundle:
+compiling every page template into a new environment, as a starting worker does, and looking
+up a compiled template, as every render does.
+
+Run with ``python -m benchmarks.template_bundle_benchmark``.
+"""
+
+import tempfile
+import timeit
+from pathlib import Path
+
+from eq_cir_management_ui import create_app, design_system_config
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.templating.bundle import build_bundle, page_templates
+from eq_cir_management_ui.templating.precompile import precompile_templates
+
+ITERATIONS = 10000
+
+
+def main() -> None:
+    """Compare the start-up compilation and per-lookup cost of each loader."""
+    with tempfile.TemporaryDirectory() as directory:
+        bundle_path = Path(directory) / "templates.zip"
+
+        class SourceConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+            """Load templates from their source, without compiling any at start-up."""
+
+            TEMPLATE_BUNDLE_PATH = None
+            TEMPLATE_WARMUP = False
+            ADMISSION_CONTROL_ENABLED = False
+
+        class BundleConfig(SourceConfig):  # pylint: disable=too-few-public-methods
+            """Load templates from the bundle, without compiling them at start-up."""
+
+            TEMPLATE_BUNDLE_PATH = str(bundle_path)
+
+        source_app = create_app(SourceConfig)
+        manifest = build_bundle(
+            source_app.jinja_env,
+            bundle_path,
+            page_templates(Path("templates")),
+            design_system_config(),
+        )
+        print(f"Bundle of {len(manifest['templates'])} templates, {bundle_path.stat().st_size} bytes\n")
+
+        cases = {
+            "source": (SourceConfig, False),
+            "source, auto_reload": (SourceConfig, True),
+            "bundle": (BundleConfig, False),
+        }
+        for name, (config, auto_reload) in cases.items():
+            apps = [create_app(config) for _ in range(5)]
+            for app in apps:
+                app.jinja_env.auto_reload = auto_reload
+            compile_seconds = min(timeit.timeit(lambda app=app: precompile_templates(app), number=1) for app in apps)
+
+            environment = apps[0].jinja_env
+            lookup_seconds = min(
+                timeit.repeat(lambda env=environment: env.get_template("base.html"), number=ITERATIONS, repeat=5),
+            )
+
+            print(
+                f"{name:<20} compile {compile_seconds * 1000:7.1f} ms"
+                f"   lookup {lookup_seconds / ITERATIONS * 1_000_000:6.2f} µs",
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark validating uploaded collection instrument documents of several megabytes: reading
+the whole body and loading it before checking it, against spooling it and validating it as it
+is parsed, through the admin upload route. Reports the peak memory traced and the time of each,
+and of uploading a document again, answered from the cache of reports.
+
+Run with ``python -m benchmarks.upload_benchmark``.
+"""
+
+import json
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.cir_api.stub_server import synthetic_instrument, synthetic_metadata
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.uploads.validation import DocumentValidator, document_events
+
+ADMIN_TOKEN = "benchmark-admin-token"  # noqa: S105
+# Sections of 50 questions in each document, about 20KB each.
+SECTIONS = (100, 400, 1600)
+
+
+class UploadConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+    """Accept documents of up to 64MB."""
+
+    ADMIN_TOKEN = ADMIN_TOKEN
+    MAX_CONTENT_LENGTH = 64 * 1024 * 1024
+    ADMISSION_CONTROL_ENABLED = False
+
+
+def buffered_validation(path: Path) -> bool:
+    """Validate a document as a route reading the whole body, then loading it, would."""
+    validator = DocumentValidator()
+    for event in document_events(json.loads(path.read_bytes())):
+        validator.feed(*event)
+    return True
+
+
+def measure(action: Callable[[], Any], reset: Callable[[], Any]) -> tuple[float, float]:
+    """The seconds an action takes, and the peak megabytes it allocates, traced in a second run
+    as tracing slows it.
+    """
+    reset()
+    start = time.perf_counter()
+    action()
+    seconds = time.perf_counter() - start
+
+    reset()
+    tracemalloc.start()
+    try:
+        action()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak / 1024 / 1024
+
+
+def main() -> None:
+    """Compare the memory and time of buffered and streamed validation of each document size."""
+    app = create_app(UploadConfig)
+    client = app.test_client()
+    cache = app.extensions["upload_cache"]
+    headers = {"Authorization": f"Bearer {ADMIN_TOKEN}", "Content-Type": "application/json"}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for sections in SECTIONS:
+            path = Path(directory) / f"instrument-{sections}.json"
+            document = synthetic_instrument(synthetic_metadata(1)[0], sections=sections, questions=50)
+            path.write_text(json.dumps(document))
+            invalid = Path(directory) / f"invalid-{sections}.json"
+            document["sections"][0]["id"] = 0
+            invalid.write_text(json.dumps(document))
+            del document
+            size = path.stat().st_size
+
+            def upload(document_path: Path, status: int) -> None:
+                with document_path.open("rb") as file:
+                    response = client.post(
+                        "/admin/uploads",
+                        input_stream=file,
+                        content_length=document_path.stat().st_size,
+                        headers=headers,
+                    )
+                assert response.status_code == status, response.json  # noqa: S101
+
+            results = {
+                "buffered": measure(lambda path=path: buffered_validation(path), cache.invalidate),
+                "streamed": measure(lambda path=path: upload(path, 200), cache.invalidate),
+                "uploaded again": measure(lambda path=path: upload(path, 200), lambda path=path: upload(path, 200)),
+                "invalid, streamed": measure(lambda invalid=invalid: upload(invalid, 422), cache.invalidate),
+            }
+            print(f"{size / 1024 / 1024:.1f} MB document")
+            for name, (seconds, peak) in results.items():
+                print(f"  {name:<18} {seconds * 1000:8.1f} ms   peak {peak:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
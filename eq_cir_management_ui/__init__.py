@@ -1,24 +1,48 @@
 """Flask application factory for the EQ CIR Management UI."""
 
+import functools
 import json
 import logging
 import os
+import tempfile
 from pathlib import Path
+from typing import cast
 
 from flask import Flask
-from flask_talisman import Talisman
 from jinja2 import ChainableUndefined, FileSystemLoader
-from semver.version import Version
 
+from eq_cir_management_ui.admin.routes import admin_blueprint
+from eq_cir_management_ui.cache.response_cache import ResponseCache, parse_ttls
+from eq_cir_management_ui.cir_api.client import CirApiClient
 from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.config.logging_config import queue_logging
+from eq_cir_management_ui.errors.pages import ErrorPages
 from eq_cir_management_ui.errors.routes import errors_blueprint
+from eq_cir_management_ui.errors.summary import ClientErrorSummary
+from eq_cir_management_ui.events.broker import EventBroker
+from eq_cir_management_ui.events.jobs import JobProgressSource
+from eq_cir_management_ui.jobs.migration import MIGRATION, migration_handler
+from eq_cir_management_ui.jobs.runner import JobRunner
+from eq_cir_management_ui.jobs.store import JobStore
 from eq_cir_management_ui.main.routes import main_blueprint
-from eq_cir_management_ui.utils.routes import utils_blueprint
+from eq_cir_management_ui.metrics.instrumentation import init_metrics
+from eq_cir_management_ui.metrics.memory import AllocationTracker, RssBudget
+from eq_cir_management_ui.metrics.routes import metrics_blueprint
+from eq_cir_management_ui.middleware.admission import AdmissionMiddleware
+from eq_cir_management_ui.middleware.compression import CompressionMiddleware
+from eq_cir_management_ui.middleware.health import HealthCheckMiddleware, Readiness, tcp_check
+from eq_cir_management_ui.middleware.scanners import ScannerMiddleware, scanner_matcher
+from eq_cir_management_ui.middleware.secure_headers import SecureHeadersMiddleware, csp_nonce
+from eq_cir_management_ui.search.index import SearchIndex
+from eq_cir_management_ui.search.refresh import IndexRefresher
+from eq_cir_management_ui.templating.bundle import BundleLoader
+from eq_cir_management_ui.templating.page_cache import PageCache
+from eq_cir_management_ui.templating.precompile import bytecode_cache, precompile_templates
+from eq_cir_management_ui.utils.routes import static, utils_blueprint
+from eq_cir_management_ui.utils.static_assets import StaticAssetStore
 
 logger = logging.getLogger()
 
-talisman = Talisman()
-
 
 def create_app(app_config: type[DefaultConfig]) -> Flask:
     """Flask application factory, used to isolate the instance of the Flask application.
@@ -29,14 +53,52 @@ def create_app(app_config: type[DefaultConfig]) -> Flask:
     app.config.from_object(app_config)
     app.static_folder = Path("../static")
 
+    queue_logging.init_app(app)
+
     app.register_blueprint(main_blueprint)
     app.register_blueprint(errors_blueprint)
     app.register_blueprint(utils_blueprint)
+    app.register_blueprint(metrics_blueprint)
+    app.register_blueprint(admin_blueprint)
+
+    init_metrics(app)
+    memory_config(app)
+
+    design_system_version = design_system_config()
+    jinja_config(app, design_system_version)
+    static_assets_config(app)
 
-    jinja_config(app)
-    design_system_config()
+    page_cache = PageCache(design_system_version, app.config["PAGE_CACHE_MAX_ENTRIES"])
+    app.extensions["page_cache"] = page_cache
+    app.extensions["error_pages"] = ErrorPages(page_cache)
+    app.extensions["client_error_summary"] = ClientErrorSummary(
+        app.config["LOG_CLIENT_ERROR_SUMMARY_INTERVAL"],
+        app.config["LOG_CLIENT_ERROR_SUMMARY_MAX_ERRORS"],
+    )
+
+    if app.config["TEMPLATE_WARMUP"]:
+        app.extensions["precompiled_templates"] = precompile_templates(app)
+        with app.test_request_context():
+            app.extensions["error_pages"].prerender()
+
+    if app.config["ADMISSION_CONTROL_ENABLED"]:
+        admission_control_config(app)
+    scanner_config(app)
     configure_secure_headers(app)
 
+    app.extensions["cir_api_client"] = cir_api_config(app)
+    jobs_config(app)
+    events_config(app)
+    uploads_config(app)
+    diff_config(app)
+    search_config(app)
+
+    if app.config["COMPRESSION_ENABLED"]:
+        compression_config(app)
+    if app.config["PROFILING_SECRET"] or app.config["PROFILING_SAMPLE_RATE"]:
+        profiling_config(app)
+    health_check_config(app)
+
     return app
 
 
@@ -49,83 +111,370 @@ def env_override(value: str, key: str) -> str:
     return os.getenv(key, value)
 
 
-def jinja_config(app: Flask) -> None:
+def jinja_config(app: Flask, design_system_version: str | None = None) -> None:
     """Configuration for the Flask Jinja2 component. Here we provide a custom loader,
-    so we can load from an array of sources.
+    so we can load from an array of sources, or from a precompiled template bundle.
 
     :param app: The Flask application.
+    :param design_system_version: The design system version, used to key the bytecode cache.
     """
-    # loader for local templates and design system component templates
-    file_system_loader = FileSystemLoader([Path("./node_modules/@ons/design-system"), Path("./templates")])
+    if app.config["TEMPLATE_BUNDLE_PATH"]:
+        # Replaces Flask's loader, which would search the blueprints before the bundle.
+        app.jinja_env.loader = BundleLoader(Path(app.config["TEMPLATE_BUNDLE_PATH"]), design_system_version)
+    else:
+        # loader for local templates and design system component templates
+        file_system_loader = FileSystemLoader([Path("./node_modules/@ons/design-system"), Path("./templates")])
+        app.jinja_loader = file_system_loader
 
-    app.jinja_loader = file_system_loader
     app.jinja_env.undefined = ChainableUndefined
     app.jinja_env.filters["env_override"] = env_override
+    app.jinja_env.globals["design_system_version"] = design_system_version
+
+    if app.config["JINJA_BYTECODE_CACHE_DIR"]:
+        app.jinja_env.bytecode_cache = bytecode_cache(app.config["JINJA_BYTECODE_CACHE_DIR"], design_system_version)
 
     # Clean up white space.
     app.jinja_env.trim_blocks = True
     app.jinja_env.lstrip_blocks = True
 
 
-def design_system_config() -> None:
-    """Set the version of the design system to an environment variable and add an
-    environment variable filter so environment variables can be read from within
-    Jinja. This enables the design system version to be defined once within the
-    package.json file and then reused throughout the application. Primarily to
-    declare the CSS version to use.
+def design_system_config() -> str | None:
+    """Read the version of the design system from the package.json file, so it is defined
+    once there and reused throughout the application, primarily to declare the CSS version
+    to use. The file is parsed once per process, and again only if it changes.
+
+    :return: The design system version, or None if it is missing or invalid.
+    """
+    path = Path("./package.json").resolve()
+    return read_design_system_version(path, path.stat().st_mtime_ns)
+
+
+@functools.cache
+def read_design_system_version(path: Path, _modified: int) -> str | None:
+    """Parse the design system version from a package.json file.
+
+    :param path: The path of the package.json file.
+    :param _modified: The modification time of the file, so a changed file is read again.
+    :return: The design system version, or None if it is missing or invalid.
     """
-    with open(Path("./package.json"), encoding="utf-8") as file:
+    with open(path, encoding="utf-8") as file:
         package_json = json.load(file)
 
-        design_system_version = package_json.get("dependencies", {}).get("@ons/design-system")
+    design_system_version = package_json.get("dependencies", {}).get("@ons/design-system")
 
-        if not design_system_version:
-            logger.exception(
-                "The '@ons/design-system' dependency is not found in package.json. "
-                "Please ensure it is listed under 'dependencies'.",
+    if not design_system_version:
+        logger.error(
+            "The '@ons/design-system' dependency is not found in package.json. "
+            "Please ensure it is listed under 'dependencies'.",
+        )
+        return None
+
+    # Only needed here, so deferred to keep it off the import path.
+    from semver.version import Version  # pylint: disable=import-outside-toplevel
+
+    if not Version.is_valid(design_system_version):
+        logger.error(
+            "The '@ons/design-system' dependency version is invalid. Please ensure it follows semantic versioning.",
+        )
+        return None
+
+    return str(design_system_version)
+
+
+def memory_config(app: Flask) -> None:
+    """Set up the memory diagnostics served by the admin routes, and the worker's resident
+    memory budget, checked after each request, when one is configured.
+
+    :param app: The Flask application.
+    """
+    app.extensions["allocation_tracker"] = AllocationTracker()
+
+    if app.config["WORKER_RSS_BUDGET_MB"]:
+        budget = RssBudget(app.config["WORKER_RSS_BUDGET_MB"] * 1024 * 1024, app.config["WORKER_RSS_CHECK_INTERVAL"])
+        app.extensions["rss_budget"] = budget
+
+        @app.teardown_request
+        def check_rss_budget(_exception: BaseException | None) -> None:
+            budget.check()
+
+
+def static_assets_config(app: Flask) -> None:
+    """Load the static folder into memory and serve it in place of Flask's static file view.
+    Templates link to assets with ``asset_url_for``, which emits fingerprinted URLs.
+
+    :param app: The Flask application.
+    """
+    static_assets = StaticAssetStore()
+    static_assets.load_directory(Path(cast(str, app.static_folder)))
+
+    app.extensions["static_assets"] = static_assets
+    app.jinja_env.globals["asset_url_for"] = static_assets.asset_url_for
+    app.view_functions["static"] = static
+
+
+def cir_api_config(app: Flask) -> CirApiClient:
+    """Create the client for the CIR API. Connections are opened lazily, in the worker
+    processes, so none are shared across a fork. The shared cache is mapped here, so with
+    ``preload_app`` the gunicorn master maps it once for every worker.
+
+    :param app: The Flask application.
+    :return: The client.
+    """
+    cache = None
+    shared_cache = None
+    if app.config["RESPONSE_CACHE_ENABLED"]:
+        cache = ResponseCache(
+            app.config["RESPONSE_CACHE_MAX_ENTRIES"],
+            app.config["RESPONSE_CACHE_TTL"],
+            app.config["RESPONSE_CACHE_STALE_TTL"],
+            parse_ttls(app.config["RESPONSE_CACHE_ENDPOINT_TTLS"]),
+        )
+        if app.config["SHARED_CACHE_PATH"]:
+            # Deferred, as the shared cache is not used unless configured.
+            from eq_cir_management_ui.cache.shared_memory import (  # pylint: disable=import-outside-toplevel
+                SharedMemoryCache,
             )
-        elif not Version.is_valid(design_system_version):
-            logger.exception(
-                "The '@ons/design-system' dependency version is invalid. "
-                "Please ensure it follows semantic versioning.",
+
+            shared_cache = SharedMemoryCache(
+                app.config["SHARED_CACHE_PATH"],
+                app.config["SHARED_CACHE_SLOTS"],
+                app.config["SHARED_CACHE_SLOT_SIZE"],
             )
-        else:
-            os.environ["DESIGN_SYSTEM_VERSION"] = design_system_version
+
+    return CirApiClient(
+        app.config["CIR_API_URL"],
+        timeout=app.config["CIR_API_TIMEOUT"],
+        max_retries=app.config["CIR_API_MAX_RETRIES"],
+        retry_budget_ratio=app.config["CIR_API_RETRY_BUDGET_RATIO"],
+        pool_size=app.config["CIR_API_POOL_SIZE"],
+        max_concurrency=app.config["CIR_API_MAX_CONCURRENCY"],
+        cache=cache,
+        shared_cache=shared_cache,
+    )
 
 
-def configure_secure_headers(app: Flask) -> None:
-    """Use Flask-Talisman to configure secure headers for the application.
+def jobs_config(app: Flask) -> None:
+    """Set up the runner of background jobs, submitted and followed through the admin routes.
+    Its threads are started by the first job submitted in a worker, or for every worker by
+    gunicorn's ``post_worker_init`` hook, so jobs left by a stopped worker are resumed.
+
+    :param app: The Flask application.
+    """
+    path = app.config["JOBS_DB_PATH"] or str(Path(tempfile.gettempdir(), "eq-cir-management-ui-jobs.sqlite3"))
+    app.extensions["job_runner"] = JobRunner(
+        JobStore(path),
+        {MIGRATION: migration_handler(app.extensions["cir_api_client"])},
+        max_workers=app.config["JOBS_MAX_WORKERS"],
+        max_active=app.config["JOBS_MAX_ACTIVE"],
+        batch_size=app.config["JOBS_BATCH_SIZE"],
+        flush_interval=app.config["JOBS_FLUSH_INTERVAL"],
+        lease=app.config["JOBS_LEASE"],
+    )
+
+
+def events_config(app: Flask) -> None:
+    """Set up the broker fanning events out to the server-sent event streams, and the source
+    publishing the progress of jobs to it.
+
+    :param app: The Flask application.
+    """
+    broker = EventBroker(app.config["EVENTS_MAX_SUBSCRIBERS"])
+    app.extensions["event_broker"] = broker
+    app.extensions["job_progress"] = JobProgressSource(
+        broker,
+        app.extensions["job_runner"].store,
+        app.config["EVENTS_POLL_INTERVAL"],
+    )
+
+
+def uploads_config(app: Flask) -> None:
+    """Set up the cache of the validation reports of uploaded documents, by content hash, so a
+    document uploaded again is not parsed again. Reports are only loaded by the request
+    validating the document, so none is served stale.
+
+    :param app: The Flask application.
+    """
+    app.extensions["upload_cache"] = ResponseCache(
+        app.config["UPLOAD_CACHE_MAX_ENTRIES"],
+        app.config["UPLOAD_CACHE_TTL"],
+        stale_ttl=0,
+    )
+
+
+def diff_config(app: Flask) -> None:
+    """Set up the cache of the hashed trees of collection instrument versions, so comparing
+    several versions with the same base hashes the base once.
+
+    :param app: The Flask application.
+    """
+    app.extensions["document_trees"] = ResponseCache(
+        app.config["DIFF_CACHE_MAX_ENTRIES"],
+        app.config["DIFF_CACHE_TTL"],
+        stale_ttl=0,
+    )
+
+
+def search_config(app: Flask) -> None:
+    """Set up the worker's search index of collection instruments, built from the metadata feed
+    by the first search, or by gunicorn's ``post_worker_init`` hook, and then kept up to date.
 
     :param app: The Flask application.
     """
-    csp = {
-        "default-src": ["'self'", app.config["CDN_URL"]],
-        "font-src": ["'self'", app.config["CDN_URL"]],
+    app.extensions["search_index"] = IndexRefresher(
+        SearchIndex(),
+        app.extensions["cir_api_client"],
+        app.config["SEARCH_REFRESH_INTERVAL"],
+    )
+
+
+def admission_control_config(app: Flask) -> None:
+    """Shed requests beyond the worker's and each client's limit of requests in flight, in WSGI
+    middleware ahead of Flask, behind the health checks so probes are always answered. The
+    429 and 503 pages are rendered now, so shedding a request costs no rendering.
+
+    :param app: The Flask application.
+    """
+    error_pages: ErrorPages = app.extensions["error_pages"]
+    with app.test_request_context():
+        pages = {429: error_pages.chunks(429), 503: error_pages.chunks(503)}
+
+    admission = AdmissionMiddleware(
+        app.wsgi_app,
+        pages=pages,
+        max_in_flight=app.config["ADMISSION_MAX_IN_FLIGHT"],
+        max_per_client=app.config["ADMISSION_MAX_PER_CLIENT"],
+        trusted_proxies=app.config["ADMISSION_TRUSTED_PROXIES"],
+        retry_after=app.config["ADMISSION_RETRY_AFTER"],
+    )
+    app.extensions["admission"] = admission
+    app.wsgi_app = admission  # type: ignore[method-assign]
+
+
+def scanner_config(app: Flask) -> None:
+    """Answer requests for known scanner paths with the 404 page, in WSGI middleware ahead of
+    Flask and admission control, so scanners neither reach Flask nor take a request slot.
+    The requests are logged through the client error summary.
+
+    :param app: The Flask application.
+    """
+    matches = scanner_matcher(app.config["SCANNER_PATH_PREFIXES"], app.config["SCANNER_PATH_SUFFIXES"])
+    if matches is None:
+        return
+
+    error_pages: ErrorPages = app.extensions["error_pages"]
+    with app.test_request_context():
+        page = error_pages.chunks(404)
+
+    summary: ClientErrorSummary = app.extensions["client_error_summary"]
+    app.wsgi_app = ScannerMiddleware(  # type: ignore[method-assign]
+        app.wsgi_app,
+        matches=matches,
+        page=page,
+        record=summary.record,
+    )
+
+
+def compression_config(app: Flask) -> None:
+    """Compress responses in WSGI middleware, outside Flask, so the security headers pass
+    through unchanged.
+
+    :param app: The Flask application.
+    """
+    app.wsgi_app = CompressionMiddleware(  # type: ignore[method-assign]
+        app.wsgi_app,
+        min_size=app.config["COMPRESSION_MIN_SIZE"],
+        levels={"br": app.config["COMPRESSION_BROTLI_QUALITY"], "gzip": app.config["COMPRESSION_GZIP_LEVEL"]},
+        mimetypes=app.config["COMPRESSION_MIMETYPES"],
+    )
+
+
+def profiling_config(app: Flask) -> None:
+    """Profile signed and sampled requests, in WSGI middleware around everything but the health
+    checks. The profiles are listed and served by the admin routes.
+
+    :param app: The Flask application.
+    """
+    # Deferred, as profiling is not used unless configured.
+    from eq_cir_management_ui.middleware.profiling import (  # pylint: disable=import-outside-toplevel
+        ProfileStore,
+        ProfilingMiddleware,
+    )
+
+    directory = app.config["PROFILING_DIR"] or Path(tempfile.gettempdir(), "eq-cir-management-ui-profiles")
+    store = ProfileStore(Path(directory), app.config["PROFILING_MAX_PROFILES"])
+
+    app.extensions["profile_store"] = store
+    app.wsgi_app = ProfilingMiddleware(  # type: ignore[method-assign]
+        app.wsgi_app,
+        store=store,
+        secret=app.config["PROFILING_SECRET"],
+        sample_rate=app.config["PROFILING_SAMPLE_RATE"],
+    )
+
+
+def health_check_config(app: Flask) -> None:
+    """Answer the liveness and readiness probes in WSGI middleware, ahead of Flask and the security headers.
+    Readiness covers the start-up template compilation and the TCP reachability of each
+    dependency in READINESS_DEPENDENCIES.
+
+    :param app: The Flask application.
+    """
+    readiness = Readiness(app.config["READINESS_CACHE_TTL"])
+
+    if app.config["TEMPLATE_WARMUP"]:
+        readiness.add_check("templates", lambda: bool(app.extensions.get("precompiled_templates")))
+
+    for address in app.config["READINESS_DEPENDENCIES"]:
+        readiness.add_check(address, tcp_check(address, app.config["READINESS_CHECK_TIMEOUT"]))
+
+    readiness.refresh()
+    app.extensions["readiness"] = readiness
+    app.wsgi_app = HealthCheckMiddleware(app.wsgi_app, readiness)  # type: ignore[method-assign]
+
+
+def content_security_policy(cdn_url: str) -> dict[str, list[str]]:
+    """The content security policy of the application's pages.
+
+    :param cdn_url: The URL of the CDN serving the design system assets.
+    :return: The sources allowed by each directive.
+    """
+    return {
+        "default-src": ["'self'", cdn_url],
+        "font-src": ["'self'", cdn_url],
         "script-src": [
             "'self'",
-            app.config["CDN_URL"],
+            cdn_url,
             "https://*.googletagmanager.com",
             "https://*.google-analytics.com",
         ],
-        "style-src": ["'self'", app.config["CDN_URL"]],
+        "style-src": ["'self'", cdn_url],
         "connect-src": [
             "'self'",
             "https://*.googletagmanager.com",
             "https://*.google-analytics.com",
         ],
         "frame-src": [],
-        "img-src": ["'self'", "data:", app.config["CDN_URL"]],
+        "img-src": ["'self'", "data:", cdn_url],
         "object-src": ["'none'"],
         "base-uri": ["'none'"],
-        "manifest-src": ["'self'", app.config["CDN_URL"]],
+        "manifest-src": ["'self'", cdn_url],
     }
-    talisman.init_app(
-        app,
-        force_https=False,  # HTTPS is managed by infrastructure
-        content_security_policy=csp,
-        content_security_policy_nonce_in=["script-src"],
+
+
+def configure_secure_headers(app: Flask) -> None:
+    """Add the security headers to every response from Flask, in WSGI middleware which
+    serialises them once. HTTPS is managed by infrastructure, so requests are not redirected.
+
+    :param app: The Flask application.
+    """
+    app.wsgi_app = SecureHeadersMiddleware(  # type: ignore[method-assign]
+        app.wsgi_app,
+        content_security_policy=content_security_policy(app.config["CDN_URL"]),
+        nonce_in=["script-src"],
         frame_options="DENY",
-        strict_transport_security=True,
-        strict_transport_security_max_age=31536000,
-        session_cookie_secure=app.config["SESSION_COOKIE_SECURE"],
+        hsts_max_age=31536000,
     )
+    app.jinja_env.globals["csp_nonce"] = csp_nonce
+
+    app.config["SESSION_COOKIE_SAMESITE"] = "Lax"
+    app.config["SESSION_COOKIE_HTTPONLY"] = True
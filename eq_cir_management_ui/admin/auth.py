@@ -0,0 +1,33 @@
+"""Authentication for the admin routes."""
+
+import hmac
+from collections.abc import Callable
+from functools import wraps
+from typing import ParamSpec, TypeVar
+
+from flask import abort, current_app, request
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def admin_required(view: Callable[P, R]) -> Callable[P, R]:
+    """Require the ADMIN_TOKEN as a bearer token. The admin routes are not found when no
+    ADMIN_TOKEN is configured.
+
+    :param view: The view function.
+    :return: The wrapped view function.
+    """
+
+    @wraps(view)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        token = current_app.config["ADMIN_TOKEN"]
+        if not token:
+            abort(404)
+
+        scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.encode(), token.encode()):
+            abort(401)
+        return view(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,258 @@
+"""Admin routes, for operating the service."""
+
+import io
+import os
+import pstats
+from typing import Any
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, send_file, url_for
+from structlog import get_logger
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from eq_cir_management_ui.admin.auth import admin_required
+from eq_cir_management_ui.cache.response_cache import ResponseCache
+from eq_cir_management_ui.events.jobs import JobProgressSource, is_final, job_topic, progress_event
+from eq_cir_management_ui.events.stream import EventResponse, event_response
+from eq_cir_management_ui.jobs.migration import MIGRATION
+from eq_cir_management_ui.jobs.runner import JobRunner
+from eq_cir_management_ui.metrics.memory import AllocationTracker, memory_report
+from eq_cir_management_ui.uploads.spool import receive_upload
+from eq_cir_management_ui.uploads.validation import validate_document
+
+logger = get_logger()
+
+admin_blueprint = Blueprint("admin", __name__, url_prefix="/admin")
+
+
+@admin_blueprint.route("/cache/invalidate", methods=["POST"])
+@admin_required
+def invalidate_cache() -> Response:
+    """Remove CIR API responses from the cache of the worker serving the request, and from the
+    shared cache. The other workers drop their copies when they next see the shared cache.
+
+    Takes an optional ``endpoint`` query parameter to only remove that endpoint's responses.
+
+    :return: 200 response with the number of entries removed from each cache.
+    """
+    endpoint = request.args.get("endpoint")
+    invalidated, shared_invalidated = current_app.extensions["cir_api_client"].invalidate_cache(endpoint)
+
+    logger.info(
+        "Response cache invalidated",
+        endpoint=endpoint,
+        invalidated=invalidated,
+        shared_invalidated=shared_invalidated,
+    )
+    return jsonify(invalidated=invalidated, shared_invalidated=shared_invalidated)
+
+
+@admin_blueprint.route("/profiles", methods=["GET"])
+@admin_required
+def list_profiles() -> Response:
+    """List the request profiles kept, newest first. Not found when profiling is disabled.
+
+    :return: 200 response with the file names of the profiles.
+    """
+    store = current_app.extensions.get("profile_store")
+    if store is None:
+        abort(404)
+    return jsonify(profiles=store.names())
+
+
+@admin_blueprint.route("/profiles/<name>", methods=["GET"])
+@admin_required
+def get_profile(name: str) -> Response:
+    """Serve a request profile, as a text report of the functions with the most cumulative
+    time, or with ``?format=pstats`` as the file itself, for tools such as snakeviz.
+
+    Takes an optional ``limit`` query parameter, the number of functions in the report.
+
+    :return: 200 response with the profile.
+    """
+    store = current_app.extensions.get("profile_store")
+    path = store.path(name) if store is not None else None
+    if path is None:
+        abort(404)
+
+    if request.args.get("format") == "pstats":
+        return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=name)
+
+    report = io.StringIO()
+    stats = pstats.Stats(str(path), stream=report)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(request.args.get("limit", 50, type=int))
+    return Response(report.getvalue(), mimetype="text/plain")
+
+
+@admin_blueprint.route("/memory", methods=["GET"])
+@admin_required
+def memory() -> Response:
+    """Report the memory of the worker serving the request: its resident set size, and the
+    occupancy of the Jinja template cache and the other in-process caches.
+
+    :return: 200 response with the report.
+    """
+    return jsonify(memory_report(current_app))
+
+
+@admin_blueprint.route("/memory/snapshot", methods=["POST"])
+@admin_required
+def start_allocation_tracing() -> Response:
+    """Start tracing allocations in the worker serving the request, and take the snapshot later
+    snapshots are compared with. Tracing slows the worker until it is stopped.
+
+    :return: 200 response with the worker's process ID, as each worker traces its own allocations.
+    """
+    tracker: AllocationTracker = current_app.extensions["allocation_tracker"]
+    tracker.start()
+    return jsonify(pid=os.getpid(), tracing=True)
+
+
+@admin_blueprint.route("/memory/snapshot/diff", methods=["GET"])
+@admin_required
+def allocation_diff() -> tuple[Response, int]:
+    """Compare a new snapshot of the worker's allocations with the one taken when tracing started.
+
+    Takes an optional ``limit`` query parameter, the number of source lines to report.
+
+    :return: 200 response with the source lines whose allocations changed the most, or 409
+        if the worker serving the request is not tracing allocations.
+    """
+    tracker: AllocationTracker = current_app.extensions["allocation_tracker"]
+    differences = tracker.diff(request.args.get("limit", 20, type=int))
+    if differences is None:
+        return jsonify(pid=os.getpid(), error="This worker is not tracing allocations"), 409
+    return jsonify(pid=os.getpid(), differences=differences), 200
+
+
+@admin_blueprint.route("/memory/snapshot", methods=["DELETE"])
+@admin_required
+def stop_allocation_tracing() -> Response:
+    """Stop tracing allocations in the worker serving the request.
+
+    :return: 200 response with the worker's process ID.
+    """
+    tracker: AllocationTracker = current_app.extensions["allocation_tracker"]
+    tracker.stop()
+    return jsonify(pid=os.getpid(), tracing=False)
+
+
+@admin_blueprint.route("/jobs/migrations", methods=["POST"])
+@admin_required
+def submit_migration() -> tuple[Response, int]:
+    """Queue a bulk migration of collection instruments, returning without waiting for it.
+
+    Takes a JSON body with the ``guids`` of the collection instrument versions to migrate, the
+    ``data_version`` to migrate them to, and optionally the ``concurrency``, the number of
+    versions migrated at once.
+
+    :return: 202 response with the id of the job, and its URL in the Location header, or 400
+        if the body is invalid.
+    """
+    body = request.get_json(silent=True) or {}
+    guids = body.get("guids")
+    data_version = body.get("data_version")
+    concurrency = body.get("concurrency", current_app.config["JOBS_DEFAULT_CONCURRENCY"])
+    max_items = current_app.config["JOBS_MAX_ITEMS"]
+    max_concurrency = current_app.config["JOBS_MAX_WORKERS"]
+
+    if not isinstance(guids, list) or not guids or not all(isinstance(guid, str) and guid for guid in guids):
+        return jsonify(error="guids must be a list of collection instrument version ids"), 400
+    if len(guids) > max_items:
+        return jsonify(error=f"A job may migrate at most {max_items} versions"), 400
+    if not isinstance(data_version, str) or not data_version:
+        return jsonify(error="data_version must be the data version to migrate to"), 400
+    if not isinstance(concurrency, int) or isinstance(concurrency, bool) or not 1 <= concurrency <= max_concurrency:
+        return jsonify(error=f"concurrency must be from 1 to {max_concurrency}"), 400
+
+    runner: JobRunner = current_app.extensions["job_runner"]
+    job_id = runner.submit(MIGRATION, guids, {"data_version": data_version}, concurrency)
+    logger.info("Migration job submitted", job_id=job_id, items=len(guids), data_version=data_version)
+
+    response = jsonify(id=job_id, status="queued")
+    response.headers["Location"] = url_for("admin.get_job", job_id=job_id)
+    return response, 202
+
+
+@admin_blueprint.route("/jobs", methods=["GET"])
+@admin_required
+def list_jobs() -> Response:
+    """List the most recent background jobs and their progress, newest first.
+
+    Takes an optional ``limit`` query parameter, the number of jobs.
+
+    :return: 200 response with the jobs.
+    """
+    runner: JobRunner = current_app.extensions["job_runner"]
+    return jsonify(jobs=runner.store.recent(request.args.get("limit", 50, type=int)))
+
+
+@admin_blueprint.route("/jobs/<job_id>", methods=["GET"])
+@admin_required
+def get_job(job_id: str) -> Response:
+    """Report a background job's status and progress, with the errors of its first failed items.
+
+    :return: 200 response with the job.
+    """
+    runner: JobRunner = current_app.extensions["job_runner"]
+    job = runner.store.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+
+@admin_blueprint.route("/jobs/<job_id>/events", methods=["GET"])
+@admin_required
+def job_events(job_id: str) -> EventResponse:
+    """Stream a background job's progress as server-sent events: a ``progress`` event with the
+    job's status and counts now, and another each time they change, until the job finishes.
+
+    :return: 200 event stream, 404 if there is no such job, or 503 if the worker serving the
+        request has its maximum of streams open.
+    """
+    runner: JobRunner = current_app.extensions["job_runner"]
+    job = runner.store.get(job_id, max_errors=0)
+    if job is None:
+        abort(404)
+
+    response = event_response(job_topic(job_id), [progress_event(job)], is_final)
+    source: JobProgressSource = current_app.extensions["job_progress"]
+    source.start()
+    return response
+
+
+@admin_blueprint.route("/uploads", methods=["POST"])
+@admin_required
+def validate_upload() -> tuple[Response, int]:
+    """Validate a collection instrument document, uploaded as a JSON body or as the ``document``
+    file of a form. The document is spooled to disk as it arrives and parsed as a stream,
+    stopping at the first broken rule. Reports are cached by the document's SHA-256 hash, so a
+    document uploaded again is not parsed again.
+
+    :return: 200 response with the validation report of a valid document, 422 with the first
+        error of an invalid one, 400 if the request has no document, or 413 if the body is
+        longer than MAX_CONTENT_LENGTH.
+    """
+    try:
+        spool = receive_upload(request, current_app.config["UPLOAD_SPOOL_MEMORY"])
+    except RequestEntityTooLarge:
+        max_length = current_app.config["MAX_CONTENT_LENGTH"]
+        return jsonify(error=f"The document must be at most {max_length} bytes"), 413
+    if spool is None:
+        return jsonify(error="Upload the document as a JSON body, or as the document file of a form"), 400
+
+    parsed = False
+
+    def validate() -> dict[str, Any]:
+        nonlocal parsed
+        parsed = True
+        return validate_document(spool)
+
+    with spool:
+        digest = spool.digest.hexdigest()
+        cache: ResponseCache = current_app.extensions["upload_cache"]
+        report = cache.get("uploads", digest, validate)
+
+    logger.info("Document validated", sha256=digest, size=spool.size, valid=report["valid"], cached=not parsed)
+    return jsonify(report | {"sha256": digest, "size": spool.size, "cached": not parsed}), (
+        200 if report["valid"] else 422
+    )
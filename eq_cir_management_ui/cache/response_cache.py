@@ -0,0 +1,237 @@
+"""A cache of backend responses, held by each worker process.
+
+Entries expire after a per-endpoint TTL, and the least recently used entry is evicted once
+the cache is full. An expired entry is still served for a further stale period while it is
+refreshed in the background, and concurrent requests for a missing entry share one upstream
+call. A value loaded from before an endpoint's entries were invalidated is not stored.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any
+
+from structlog import get_logger
+
+from eq_cir_management_ui.metrics.registry import Counter
+
+logger = get_logger()
+
+CACHE_EVENTS = Counter(
+    "response_cache_events",
+    "Response cache lookups by outcome (hit, stale, miss), evictions and failed refreshes.",
+    ["endpoint", "event"],
+)
+
+
+@dataclass
+class CacheEntry:
+    """A cached value and the times it is fresh and stale until."""
+
+    value: Any
+    fresh_until: float
+    stale_until: float
+
+
+def parse_ttls(entries: Iterable[str]) -> dict[str, float]:
+    """Parse per-endpoint TTLs.
+
+    :param entries: ``endpoint=seconds`` strings.
+    :return: The TTL of each endpoint.
+    """
+    ttls = {}
+    for entry in entries:
+        endpoint, _, seconds = entry.rpartition("=")
+        ttls[endpoint] = float(seconds)
+    return ttls
+
+
+class ResponseCache:  # pylint: disable=too-many-instance-attributes
+    """A TTL and LRU cache with stale-while-revalidate and request coalescing.
+
+    Cached values are shared between requests, so callers must not modify them.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        default_ttl: float,
+        stale_ttl: float,
+        ttls: dict[str, float] | None = None,
+        *,
+        load_wait: float = 30.0,
+    ) -> None:
+        """Create the cache.
+
+        :param max_entries: Entries held at most.
+        :param default_ttl: Seconds values are fresh for, unless their endpoint has a TTL.
+        :param stale_ttl: Seconds an expired value is served for while it is refreshed.
+        :param ttls: The TTL of each endpoint.
+        :param load_wait: Seconds to wait for another thread loading a value before loading it too.
+        """
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.ttls = ttls or {}
+        self.load_wait = load_wait
+        self._entries: OrderedDict[tuple[str, Hashable], CacheEntry] = OrderedDict()
+        self._loading: dict[tuple[str, Hashable], Future[Any]] = {}
+        # Incremented by each invalidation of every endpoint, and of each endpoint.
+        self._generation = 0
+        self._endpoint_generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, endpoint: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return a cached value, loading it if it is missing.
+
+        A fresh entry is returned as it is. A stale entry is returned while it is refreshed in
+        the background. A missing or expired entry is loaded, by one thread if several ask for
+        it at once, and errors from the loader are raised to each of them. A thread which waited
+        longer than ``load_wait`` for another loads the value itself.
+
+        :param endpoint: The endpoint the value is from, which decides its TTL.
+        :param key: The key of the value within the endpoint.
+        :param loader: Loads the value from the backend.
+        :return: The value.
+        """
+        self._reset_after_fork()
+        cache_key = (endpoint, key)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and now < entry.stale_until:
+                self._entries.move_to_end(cache_key)
+                if now < entry.fresh_until:
+                    CACHE_EVENTS.inc(endpoint=endpoint, event="hit")
+                    return entry.value
+
+                CACHE_EVENTS.inc(endpoint=endpoint, event="stale")
+                if cache_key not in self._loading:
+                    self._loading[cache_key] = Future()
+                    threading.Thread(
+                        target=self._refresh,
+                        args=(cache_key, loader, self._loading[cache_key], self._generation_of(endpoint)),
+                        name="response-cache-refresh",
+                        daemon=True,
+                    ).start()
+                return entry.value
+
+            CACHE_EVENTS.inc(endpoint=endpoint, event="miss")
+            future = self._loading.get(cache_key)
+            generation = self._generation_of(endpoint)
+            if future is None:
+                future = self._loading[cache_key] = Future()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            try:
+                return future.result(timeout=self.load_wait)
+            except TimeoutError:
+                logger.warning("Timed out waiting for a response cache load", endpoint=endpoint)
+                return loader()
+
+        # Any exception, such as a gevent timeout or SystemExit, must end the load, as the
+        # threads waiting for it would otherwise wait for every later miss of the key too.
+        try:
+            value = loader()
+        except BaseException as exception:
+            self._abandon(cache_key, future, exception)
+            raise
+
+        self._store(cache_key, value, future, generation)
+        return value
+
+    def ttl(self, endpoint: str) -> float:
+        """The seconds values from an endpoint are fresh for.
+
+        :param endpoint: The endpoint.
+        :return: The TTL.
+        """
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def invalidate(self, endpoint: str | None = None) -> int:
+        """Remove entries, so they are loaded again on next use.
+
+        :param endpoint: The endpoint to remove entries for, or None for every entry.
+        :return: The number of entries removed.
+        """
+        with self._lock:
+            if endpoint is None:
+                self._generation += 1
+            else:
+                self._endpoint_generations[endpoint] = self._endpoint_generations.get(endpoint, 0) + 1
+            keys = [key for key in self._entries if endpoint is None or key[0] == endpoint]
+            for key in keys:
+                del self._entries[key]
+            # Later misses start a load of their own, rather than waiting for one started before.
+            for key in [key for key in self._loading if endpoint is None or key[0] == endpoint]:
+                del self._loading[key]
+        return len(keys)
+
+    def _generation_of(self, endpoint: str) -> tuple[int, int]:
+        return self._generation, self._endpoint_generations.get(endpoint, 0)
+
+    def _refresh(
+        self,
+        cache_key: tuple[str, Hashable],
+        loader: Callable[[], Any],
+        future: "Future[Any]",
+        generation: tuple[int, int],
+    ) -> None:
+        try:
+            value = loader()
+        except Exception as exception:  # pylint: disable=broad-exception-caught
+            # The stale value is served until it expires, or a later refresh succeeds.
+            CACHE_EVENTS.inc(endpoint=cache_key[0], event="refresh_error")
+            logger.warning("Response cache refresh failed", endpoint=cache_key[0], exc_info=True)
+            self._abandon(cache_key, future, exception)
+            return
+        except BaseException as exception:
+            self._abandon(cache_key, future, exception)
+            raise
+        self._store(cache_key, value, future, generation)
+
+    def _abandon(self, cache_key: tuple[str, Hashable], future: "Future[Any]", exception: BaseException) -> None:
+        with self._lock:
+            if self._loading.get(cache_key) is future:
+                del self._loading[cache_key]
+        future.set_exception(exception)
+
+    def _store(
+        self,
+        cache_key: tuple[str, Hashable],
+        value: Any,
+        future: "Future[Any]",
+        generation: tuple[int, int],
+    ) -> None:
+        ttl = self.ttl(cache_key[0])
+        now = time.monotonic()
+        with self._lock:
+            # Loaded from before the endpoint's entries were invalidated.
+            if generation == self._generation_of(cache_key[0]):
+                self._entries[cache_key] = CacheEntry(value, now + ttl, now + ttl + self.stale_ttl)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.max_entries:
+                    (evicted_endpoint, _), _ = self._entries.popitem(last=False)
+                    CACHE_EVENTS.inc(endpoint=evicted_endpoint, event="eviction")
+            if self._loading.get(cache_key) is future:
+                del self._loading[cache_key]
+        future.set_result(value)
+
+    def _reset_after_fork(self) -> None:
+        # Loads in progress belonged to threads of the parent, which do not exist in the child.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._loading = {}
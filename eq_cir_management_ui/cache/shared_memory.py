@@ -0,0 +1,320 @@
+"""A cache shared by the worker processes of a host, in a memory-mapped file.
+
+The file is a header followed by fixed size slots, grouped into sets of ``ways`` slots. A key
+hashes to one set, and is stored in a free or expired slot of that set, or else in the slot
+written longest ago, which is evicted. Keys and values are bytes, read straight from the
+mapping without any serialisation.
+
+Readers take no locks. Each slot has a sequence number which a writer makes odd while it
+writes and even again once it is done, and a checksum of its contents. A read is retried if
+the sequence number was odd or changed while reading, and discarded if the checksum does not
+match. Writers to a set take an ``fcntl`` record lock on it, shared by every process mapping
+the file.
+
+A worker that misses takes a fill lock on the key's set while it loads the value, so other
+workers missing on the same key wait and read the stored value, rather than loading it again.
+The fill lock is a record lock together with a thread lock, so this holds for the threads of
+one worker as well as for other workers.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Callable
+
+from structlog import get_logger
+
+from eq_cir_management_ui.metrics.registry import Counter
+
+logger = get_logger()
+
+SHARED_CACHE_EVENTS = Counter(
+    "shared_cache_events",
+    "Shared cache lookups by outcome (hit, miss), evictions and values too large to store.",
+    ["event"],
+)
+
+MAGIC = b"EQCIRSC1"
+# Magic, slot count, slot size, ways and the invalidation generation.
+HEADER = struct.Struct("<8sIIIQ")
+HEADER_SIZE = 64
+# Sequence number, key hash, expiry time, write time, key length, value length and checksum.
+SLOT_HEADER = struct.Struct("<QQddIII")
+SLOT_HEADER_SIZE = 48
+SEQUENCE = struct.Struct("<Q")
+GENERATION_OFFSET = 20
+READ_ATTEMPTS = 3
+FILL_LOCK_POLL_INTERVAL = 0.005
+
+
+def key_hash(key: bytes) -> int:
+    """A hash of the key, the same in every process and never zero, which marks a free slot.
+
+    :param key: The key.
+    :return: The hash.
+    """
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+class SharedMemoryCache:  # pylint: disable=too-many-instance-attributes
+    """A fixed size, set associative cache of bytes in a memory-mapped file.
+
+    The first process to open the file creates it, and every other process, including workers
+    forked from a gunicorn master which created it with ``preload_app``, shares it. Memory is
+    only committed for slots which have been written, and counts once per host rather than
+    once per worker.
+
+    A file with another layout is replaced by a new file, never resized, as processes still
+    using it, such as the workers of a previous deployment, would crash reading its mapping
+    once it was truncated. They keep the old file until they close it.
+    """
+
+    def __init__(self, path: str, slots: int = 2048, slot_size: int = 131072, ways: int = 4) -> None:
+        if slots % ways or slot_size <= SLOT_HEADER_SIZE:
+            msg = "slots must be a multiple of ways, and slot_size larger than the slot header"
+            raise ValueError(msg)
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ways = ways
+        self.sets = slots // ways
+        self.size = HEADER_SIZE + slots * slot_size
+        self._fd = self._open()
+        self._mmap = mmap.mmap(self._fd, self.size)
+        self._lock = threading.Lock()
+        # The thread locks of the fill locks taken by this process, keyed on their offset.
+        self._fill_locks: dict[int, threading.Lock] = {}
+        self._pid = os.getpid()
+
+    @property
+    def generation(self) -> int:
+        """The invalidation generation, incremented each time entries are invalidated."""
+        generation: int = SEQUENCE.unpack_from(self._mmap, GENERATION_OFFSET)[0]
+        return generation
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self._mmap.close()
+        os.close(self._fd)
+
+    def get(self, key: bytes) -> bytes | None:
+        """Read an unexpired value.
+
+        :param key: The key.
+        :return: The value, or None if it is missing or expired.
+        """
+        hashed = key_hash(key)
+        now = time.time()
+        for offset in self._set_offsets(hashed):
+            for _ in range(READ_ATTEMPTS):
+                sequence, slot_hash, expires, _stored, key_length, value_length, checksum = SLOT_HEADER.unpack_from(
+                    self._mmap,
+                    offset,
+                )
+                if slot_hash != hashed and not sequence & 1:
+                    break
+                start = offset + SLOT_HEADER_SIZE
+                contents = self._mmap[start : start + key_length + value_length]
+                if sequence & 1 or SEQUENCE.unpack_from(self._mmap, offset)[0] != sequence:
+                    continue
+                if zlib.crc32(contents) != checksum or contents[:key_length] != key:
+                    break
+                if expires <= now:
+                    return None
+                return contents[key_length:]
+        return None
+
+    def set(self, key: bytes, value: bytes, ttl: float) -> bool:
+        """Store a value.
+
+        :param key: The key.
+        :param value: The value.
+        :param ttl: Seconds until the value expires.
+        :return: False if the key and value are too large for a slot.
+        """
+        if SLOT_HEADER_SIZE + len(key) + len(value) > self.slot_size:
+            SHARED_CACHE_EVENTS.inc(event="too_large")
+            return False
+
+        hashed = key_hash(key)
+        now = time.time()
+        contents = key + value
+        offsets = self._set_offsets(hashed)
+        with self._write_lock(offsets[0]):
+            offset = self._choose_slot(offsets, hashed, key, now)
+            sequence = SEQUENCE.unpack_from(self._mmap, offset)[0] | 1
+            SEQUENCE.pack_into(self._mmap, offset, sequence)
+            self._mmap[offset + SLOT_HEADER_SIZE : offset + SLOT_HEADER_SIZE + len(contents)] = contents
+            SLOT_HEADER.pack_into(
+                self._mmap,
+                offset,
+                sequence,
+                hashed,
+                now + ttl,
+                now,
+                len(key),
+                len(value),
+                zlib.crc32(contents),
+            )
+            SEQUENCE.pack_into(self._mmap, offset, sequence + 1)
+        return True
+
+    def get_or_load(self, key: bytes, loader: Callable[[], bytes], ttl: float, wait: float = 5.0) -> bytes:
+        """Read a value, or load and store it. Only one process loads a missing value at once.
+
+        :param key: The key.
+        :param loader: Loads the value.
+        :param ttl: Seconds until a loaded value expires.
+        :param wait: Seconds to wait for another process loading the value before loading it too.
+        :return: The value.
+        """
+        value = self.get(key)
+        if value is not None:
+            SHARED_CACHE_EVENTS.inc(event="hit")
+            return value
+
+        fill_lock = self._set_offsets(key_hash(key))[0] + 1
+        thread_lock = self._fill_thread_lock(fill_lock)
+        locked = self._acquire_fill_lock(fill_lock, thread_lock, wait)
+        try:
+            # Another process may have stored the value while this one waited.
+            value = self.get(key) if locked else None
+            if value is not None:
+                SHARED_CACHE_EVENTS.inc(event="hit")
+                return value
+            SHARED_CACHE_EVENTS.inc(event="miss")
+            value = loader()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            if locked:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, fill_lock)
+                thread_lock.release()
+
+    def invalidate(self, prefix: bytes = b"") -> int:
+        """Remove entries, and increment the generation so processes drop copies they hold.
+
+        :param prefix: Only remove entries whose keys start with this prefix.
+        :return: The number of entries removed.
+        """
+        removed = 0
+        for first_slot in range(HEADER_SIZE, self.size, self.slot_size * self.ways):
+            with self._write_lock(first_slot):
+                for offset in range(first_slot, first_slot + self.slot_size * self.ways, self.slot_size):
+                    sequence, slot_hash, *_ = SLOT_HEADER.unpack_from(self._mmap, offset)
+                    start = offset + SLOT_HEADER_SIZE
+                    if slot_hash and self._mmap[start : start + len(prefix)] == prefix:
+                        SLOT_HEADER.pack_into(self._mmap, offset, (sequence | 1) + 1, 0, 0, 0, 0, 0, 0)
+                        removed += 1
+
+        with self._write_lock(0):
+            SEQUENCE.pack_into(self._mmap, GENERATION_OFFSET, self.generation + 1)
+        return removed
+
+    def _open(self) -> int:
+        # Checking and replacing the file is serialised across processes by a lock on it. A
+        # process which waited for the lock on a file which has since been replaced opens the
+        # new file instead.
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    expected = HEADER.pack(MAGIC, self.slots, self.slot_size, self.ways, 0)[:GENERATION_OFFSET]
+                    if os.fstat(fd).st_size == self.size and os.pread(fd, GENERATION_OFFSET, 0) == expected:
+                        return fd
+                    self._replace_file()
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _replace_file(self) -> None:
+        logger.info("Creating shared cache", path=self.path, size=self.size)
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(temporary_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, HEADER.pack(MAGIC, self.slots, self.slot_size, self.ways, 0), 0)
+        finally:
+            os.close(fd)
+        os.replace(temporary_path, self.path)
+
+    def _set_offsets(self, hashed: int) -> list[int]:
+        first = HEADER_SIZE + (hashed % self.sets) * self.ways * self.slot_size
+        return [first + way * self.slot_size for way in range(self.ways)]
+
+    def _choose_slot(self, offsets: list[int], hashed: int, key: bytes, now: float) -> int:
+        oldest, oldest_stored = offsets[0], float("inf")
+        for offset in offsets:
+            _sequence, slot_hash, expires, stored, key_length, *_ = SLOT_HEADER.unpack_from(self._mmap, offset)
+            start = offset + SLOT_HEADER_SIZE
+            if slot_hash == hashed and self._mmap[start : start + key_length] == key:
+                return offset
+            if not slot_hash or expires <= now:
+                return offset
+            if stored < oldest_stored:
+                oldest, oldest_stored = offset, stored
+
+        SHARED_CACHE_EVENTS.inc(event="eviction")
+        return oldest
+
+    def _write_lock(self, offset: int) -> "_RecordLock":
+        self._reset_after_fork()
+        return _RecordLock(self._fd, offset, self._lock)
+
+    def _fill_thread_lock(self, offset: int) -> threading.Lock:
+        self._reset_after_fork()
+        with self._lock:
+            return self._fill_locks.setdefault(offset, threading.Lock())
+
+    def _acquire_fill_lock(self, offset: int, thread_lock: threading.Lock, wait: float) -> bool:
+        # Record locks belong to the process, so another thread of this one would be granted the
+        # record lock while this thread holds it, and load the value too.
+        deadline = time.monotonic() + wait
+        if not thread_lock.acquire(timeout=wait):
+            logger.warning("Timed out waiting for the shared cache fill lock")
+            return False
+        while True:
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, offset)
+            except OSError:
+                if time.monotonic() >= deadline:
+                    thread_lock.release()
+                    logger.warning("Timed out waiting for the shared cache fill lock")
+                    return False
+                time.sleep(FILL_LOCK_POLL_INTERVAL)
+            else:
+                return True
+
+    def _reset_after_fork(self) -> None:
+        # The thread locks may have been inherited in a locked state.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._fill_locks = {}
+
+
+class _RecordLock:
+    """An exclusive ``fcntl`` lock on one byte of a file, held by one thread at a time.
+
+    Record locks belong to the process, so the thread lock stops two threads of one process
+    both holding it.
+    """
+
+    def __init__(self, fd: int, offset: int, thread_lock: threading.Lock) -> None:
+        self.fd = fd
+        self.offset = offset
+        self.thread_lock = thread_lock
+
+    def __enter__(self) -> None:
+        self.thread_lock.acquire()
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, self.offset)
+
+    def __exit__(self, *_: object) -> None:
+        fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, self.offset)
+        self.thread_lock.release()
@@ -0,0 +1,436 @@
+"""Client for the CIR (Collection Instrument Registry) API.
+
+Each worker process holds one client. It keeps idle keep-alive connections in a pool, issues
+independent calls concurrently on a bounded thread pool, retries failed idempotent calls
+within a retry budget and records the duration of every call.
+"""
+
+import http.client
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlencode, urlsplit
+
+from structlog import get_logger
+
+from eq_cir_management_ui.cache.response_cache import ResponseCache
+from eq_cir_management_ui.metrics.registry import Counter, Histogram
+
+if TYPE_CHECKING:
+    from eq_cir_management_ui.cache.shared_memory import SharedMemoryCache
+
+logger = get_logger()
+
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+CALL_DURATION = Histogram(
+    "cir_api_call_duration_seconds",
+    "Duration of calls to the CIR API, including retries.",
+    ["endpoint", "outcome"],
+)
+CALL_RETRIES = Counter("cir_api_call_retries", "Number of retried CIR API calls.", ["endpoint"])
+
+
+class CirApiError(Exception):
+    """A call to the CIR API failed."""
+
+    def __init__(self, message: str, status: int | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class CirApiTimeoutError(CirApiError):
+    """A call to the CIR API did not complete within its timeout."""
+
+
+class RetryBudget:
+    """Limits retries to a fraction of calls, so a struggling backend is not sent a multiple
+    of its normal traffic. Every call deposits ``ratio`` tokens, up to ``max_tokens``, and
+    every retry withdraws one.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float = 10) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        """Record a call."""
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spend a token on a retry.
+
+        :return: True if the retry is within the budget.
+        """
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class ConnectionPool:
+    """A pool of keep-alive HTTP connections to one host.
+
+    Idle connections are reused most recently used first. Connections the server will close
+    are discarded, and at most ``max_idle`` idle connections are kept.
+    """
+
+    def __init__(self, base_url: str, max_idle: int) -> None:
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port
+        self.max_idle = max_idle
+        self.created = 0
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue()
+
+    def acquire(self, timeout: float) -> http.client.HTTPConnection:
+        """Take an idle connection, or open a new one.
+
+        :param timeout: The socket timeout for the call the connection is used for.
+        :return: The connection.
+        """
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            connection = connection_class(self.host, self.port, timeout=timeout)
+            self.created += 1
+
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection
+
+    def release(self, connection: http.client.HTTPConnection, *, reusable: bool) -> None:
+        """Return a connection to the pool, or close it.
+
+        :param connection: The connection.
+        :param reusable: Whether the connection can carry another request.
+        """
+        if reusable and self._idle.qsize() < self.max_idle:
+            self._idle.put_nowait(connection)
+        else:
+            connection.close()
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class CirApiClient:  # pylint: disable=too-many-instance-attributes
+    """Client for the CIR API.
+
+    Every call has a total timeout covering all of its attempts. Idempotent calls which fail
+    with a connection error, a timeout or a 502/503/504 are retried with jittered exponential
+    back-off, up to ``max_retries`` times and within the retry budget. With a ``cache``,
+    JSON responses are served from it, and with a ``shared_cache`` as well, responses missing
+    from the worker's cache are looked up in the cache shared by every worker on the host.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        base_url: str,
+        *,
+        timeout: float = 5.0,
+        max_retries: int = 2,
+        retry_budget_ratio: float = 0.2,
+        pool_size: int = 10,
+        max_concurrency: int = 4,
+        cache: ResponseCache | None = None,
+        shared_cache: "SharedMemoryCache | None" = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.base_path = urlsplit(self.base_url).path
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_budget = RetryBudget(retry_budget_ratio)
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.shared_cache = shared_cache
+        self._shared_generation = shared_cache.generation if shared_cache is not None else 0
+        self._pid = os.getpid()
+        self._pool = ConnectionPool(self.base_url, pool_size)
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self) -> ConnectionPool:
+        """The connection pool of this process. A forked worker starts with a fresh pool, as
+        sockets inherited from the parent are shared with it.
+        """
+        self._reset_after_fork()
+        return self._pool
+
+    def reset(self) -> None:
+        """Discard the connection pool and thread pool, for example after a fork."""
+        self._pid = os.getpid()
+        self._pool = ConnectionPool(self.base_url, self.pool_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """Close idle connections and stop the thread pool."""
+        self._pool.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_json(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+        *,
+        cached: bool = True,
+    ) -> Any:
+        """GET an endpoint of the API and decode the JSON response.
+
+        :param endpoint: The path of the endpoint, relative to the base URL.
+        :param params: Query string parameters, None values are left out.
+        :param timeout: Total seconds for the call including retries, defaults to the client timeout.
+        :param cached: Whether the response may come from, and is kept in, the caches.
+        :return: The decoded response, which must not be modified if the client has a cache.
+        """
+        query = urlencode(sorted((key, value) for key, value in (params or {}).items() if value is not None))
+        path = f"{self.base_path}{endpoint}" + (f"?{query}" if query else "")
+
+        def fetch() -> bytes:
+            status, body = self.request("GET", path, endpoint=endpoint, timeout=timeout)
+            if status != 200:
+                msg = f"CIR API {endpoint} returned {status}"
+                raise CirApiError(msg, status)
+            return body
+
+        cache, shared_cache = self.cache, self.shared_cache
+        if cache is None or not cached:
+            return json.loads(fetch())
+        if shared_cache is None:
+            return cache.get(endpoint, path, lambda: json.loads(fetch()))
+
+        if shared_cache.generation != self._shared_generation:
+            # Another worker invalidated the shared cache, so drop this worker's copies too.
+            self._shared_generation = shared_cache.generation
+            cache.invalidate()
+
+        return cache.get(
+            endpoint,
+            path,
+            lambda: json.loads(
+                shared_cache.get_or_load(path.encode(), fetch, cache.ttl(endpoint), wait=timeout or self.timeout),
+            ),
+        )
+
+    def invalidate_cache(self, endpoint: str | None = None) -> tuple[int, int]:
+        """Remove cached responses from this worker's cache and the shared cache.
+
+        :param endpoint: Only remove responses from this endpoint, or every response if None.
+        :return: The number of responses removed from each cache.
+        """
+        invalidated = self.cache.invalidate(endpoint) if self.cache is not None else 0
+        shared_invalidated = 0
+        if self.shared_cache is not None:
+            shared_invalidated = self.shared_cache.invalidate(f"{self.base_path}{endpoint or ''}".encode())
+            self._shared_generation = self.shared_cache.generation
+        return invalidated, shared_invalidated
+
+    def request(  # pylint: disable=too-many-locals
+        self,
+        method: str,
+        path: str,
+        *,
+        endpoint: str,
+        body: bytes | None = None,
+        timeout: float | None = None,
+    ) -> tuple[int, bytes]:
+        """Send a request, retrying failed idempotent requests.
+
+        :param method: The HTTP method.
+        :param path: The request path and query string.
+        :param endpoint: The endpoint name the call is recorded under.
+        :param body: The request body.
+        :param timeout: Total seconds for the call including retries, defaults to the client timeout.
+        :return: The response status and body.
+        """
+        start = time.perf_counter()
+        deadline = start + (timeout or self.timeout)
+        retryable = method in ("GET", "HEAD", "PUT", "DELETE")
+        headers = {"Accept": "application/json"}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        self.retry_budget.deposit()
+        outcome = "error"
+
+        attempt = 0
+        try:
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    msg = f"CIR API {endpoint} timed out"
+                    raise CirApiTimeoutError(msg)
+                try:
+                    status, response_body = self._send(method, path, headers, body, remaining, replay=retryable)
+                except (OSError, http.client.HTTPException) as exception:
+                    if not self._may_retry(attempt, deadline, endpoint, retryable=retryable):
+                        error = CirApiTimeoutError if isinstance(exception, TimeoutError) else CirApiError
+                        msg = f"CIR API {endpoint} failed: {exception!r}"
+                        raise error(msg) from exception
+                else:
+                    if status not in RETRYABLE_STATUSES or not self._may_retry(
+                        attempt,
+                        deadline,
+                        endpoint,
+                        retryable=retryable,
+                    ):
+                        outcome = str(status)
+                        return status, response_body
+                attempt += 1
+        finally:
+            duration = time.perf_counter() - start
+            CALL_DURATION.observe(duration, endpoint=endpoint, outcome=outcome)
+            logger.debug("CIR API call", endpoint=endpoint, outcome=outcome, duration_ms=round(duration * 1000, 1))
+
+    def gather(self, **calls: Callable[[], Any]) -> dict[str, Any]:
+        """Run independent calls concurrently and wait for all of them.
+
+        :param calls: The calls, keyed on the name of their result.
+        :return: The results, keyed as the calls were. The first exception raised is re-raised.
+        """
+        executor = self._get_executor()
+        futures = {name: executor.submit(call) for name, call in calls.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def get_ci_metadata(self, **filters: str | None) -> list[dict[str, Any]]:
+        """The metadata of the latest version of each collection instrument matching the filters.
+
+        :param filters: survey_id, form_type and language filters.
+        :return: The metadata.
+        """
+        result: list[dict[str, Any]] = self.get_json("/v2/ci_metadata", filters)
+        return result
+
+    def get_ci_versions(
+        self,
+        survey_id: str,
+        form_type: str,
+        language: str,
+        *,
+        cached: bool = True,
+    ) -> list[dict[str, Any]]:
+        """The metadata of every published version of a collection instrument.
+
+        :param cached: Whether the versions may come from the caches, rather than the CIR API.
+        :return: The metadata of each version.
+        """
+        params = {"survey_id": survey_id, "form_type": form_type, "language": language}
+        result: list[dict[str, Any]] = self.get_json("/v1/ci_metadata", params, cached=cached)
+        return result
+
+    def get_collection_instrument(self, guid: str) -> dict[str, Any]:
+        """A collection instrument document.
+
+        :param guid: The id of the collection instrument version.
+        :return: The document.
+        """
+        result: dict[str, Any] = self.get_json("/v1/retrieve_collection_instrument", {"guid": guid})
+        return result
+
+    def publish_collection_instrument(self, document: dict[str, Any]) -> dict[str, Any]:
+        """Publish a collection instrument document as a new version. Not retried, as publishing
+        twice would publish two versions.
+
+        :param document: The document.
+        :return: The metadata of the published version.
+        """
+        endpoint = "/v1/publish_collection_instrument"
+        status, body = self.request(
+            "POST",
+            f"{self.base_path}{endpoint}",
+            endpoint=endpoint,
+            body=json.dumps(document).encode(),
+        )
+        if status not in (200, 201):
+            msg = f"CIR API {endpoint} returned {status}"
+            raise CirApiError(msg, status)
+        result: dict[str, Any] = json.loads(body)
+        return result
+
+    def get_ci_overview(self, survey_id: str, form_type: str, language: str) -> dict[str, Any]:
+        """The metadata and version list of a collection instrument, fetched concurrently.
+
+        :return: The ``metadata`` of the latest version and its ``versions``.
+        """
+        return self.gather(
+            metadata=lambda: self.get_ci_metadata(survey_id=survey_id, form_type=form_type, language=language),
+            versions=lambda: self.get_ci_versions(survey_id, form_type, language),
+        )
+
+    def _send(  # pylint: disable=too-many-arguments
+        self,
+        method: str,
+        path: str,
+        headers: dict[str, str],
+        body: bytes | None,
+        timeout: float,
+        *,
+        replay: bool,
+    ) -> tuple[int, bytes]:
+        pool = self.pool
+        connection = pool.acquire(timeout)
+        reused = connection.sock is not None
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response_body = response.read()
+        except (ConnectionResetError, http.client.RemoteDisconnected, BrokenPipeError):
+            connection.close()
+            if not reused or not replay:
+                raise
+            # The server closed an idle keep-alive connection, try once on a new connection. Only
+            # idempotent requests are replayed, as the server may have received the request first.
+            return self._send(method, path, headers, body, timeout, replay=False)
+        except BaseException:
+            connection.close()
+            raise
+
+        pool.release(connection, reusable=not response.will_close)
+        return response.status, response_body
+
+    def _may_retry(self, attempt: int, deadline: float, endpoint: str, *, retryable: bool) -> bool:
+        if not retryable or attempt >= self.max_retries:
+            return False
+
+        backoff = min(1.0, 0.05 * 2**attempt) * random.uniform(0.5, 1.0)  # noqa: S311
+        # Withdrawn last, so a retry abandoned for the deadline does not spend the budget.
+        if time.perf_counter() + backoff >= deadline or not self.retry_budget.withdraw():
+            return False
+
+        CALL_RETRIES.inc(endpoint=endpoint)
+        time.sleep(backoff)
+        return True
+
+    def _reset_after_fork(self) -> None:
+        if self._pid != os.getpid():
+            self.reset()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        self._reset_after_fork()
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="cir-api")
+            return self._executor
@@ -0,0 +1,34 @@
+"""Keyset paginated data sources over the CIR API."""
+
+import heapq
+from collections.abc import Callable
+from operator import itemgetter
+from typing import Any
+
+from eq_cir_management_ui.cir_api.client import CirApiClient
+from eq_cir_management_ui.utils.pagination import Fetch, Key
+
+# Identifies a collection instrument, across its versions.
+ci_key: Callable[[dict[str, Any]], Key] = itemgetter("survey_id", "form_type", "language")
+# The type of each value of ``ci_key``.
+CI_KEY_TYPES = (str, str, str)
+
+
+def ci_metadata_source(client: CirApiClient) -> Fetch[dict[str, Any]]:
+    """A source of the latest version of each collection instrument, ordered by survey, form
+    type and language.
+
+    The CIR API returns the metadata unpaginated, and in no particular order, from the
+    client's cache. Each fetch selects the rows it needs with a bounded heap, without sorting,
+    or copying, the whole list.
+
+    :param client: The CIR API client.
+    :return: The source.
+    """
+
+    def fetch(after: Key | None, limit: int) -> list[dict[str, Any]]:
+        rows = client.get_ci_metadata()
+        candidates = rows if after is None else (row for row in rows if ci_key(row) > after)
+        return heapq.nsmallest(limit, candidates, key=ci_key)
+
+    return fetch
@@ -0,0 +1,302 @@
+"""An in-process stub of the CIR API, serving synthetic collection instruments.
+
+Used by the tests and benchmarks, and for running the UI locally without the CIR API::
+
+    python -m eq_cir_management_ui.cir_api.stub_server --port 3030
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Self
+from urllib.parse import parse_qs, urlsplit
+
+SURVEY_TITLES = ("Monthly Business Survey", "Quarterly Stocks Survey", "Annual Business Survey", "Retail Sales")
+LANGUAGES = ("en", "cy")
+
+
+def synthetic_metadata(count: int, versions: int = 3) -> list[dict[str, Any]]:
+    """Metadata for ``count`` collection instruments, each published in several versions.
+
+    :param count: The number of collection instruments.
+    :param versions: The number of versions of each collection instrument.
+    :return: The metadata of every version.
+    """
+    metadata: list[dict[str, Any]] = []
+    for number in range(count):
+        survey_id = f"{number // 4 + 1000:04d}"
+        form_type = f"{number % 4 + 1:04d}"
+        language = LANGUAGES[number % 7 == 6]
+        metadata.extend(
+            {
+                "guid": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{survey_id}/{form_type}/{language}/{version}")),
+                "survey_id": survey_id,
+                "form_type": form_type,
+                "language": language,
+                "title": f"{SURVEY_TITLES[number % len(SURVEY_TITLES)]} {survey_id}",
+                "ci_version": version,
+                "data_version": "0.0.3",
+                "published_at": f"2025-{version % 12 + 1:02d}-{number % 28 + 1:02d}T09:00:00Z",
+            }
+            for version in range(1, versions + 1)
+        )
+    return metadata
+
+
+def synthetic_instrument(metadata: dict[str, Any], sections: int = 5, questions: int = 10) -> dict[str, Any]:
+    """A collection instrument document for a metadata entry.
+
+    :param metadata: The metadata of the collection instrument version.
+    :param sections: The number of sections in the document.
+    :param questions: The number of questions in each section.
+    :return: The document.
+    """
+    return {
+        **{key: metadata[key] for key in ("survey_id", "form_type", "language", "title", "data_version")},
+        "id": metadata["guid"],
+        "sections": [
+            {
+                "id": f"section-{section}",
+                "title": f"Section {section}",
+                "groups": [
+                    {
+                        "id": f"group-{section}",
+                        "blocks": [
+                            {
+                                "id": f"block-{section}-{question}",
+                                "type": "Question",
+                                "question": {
+                                    "id": f"question-{section}-{question}",
+                                    "title": f"What was the value of item {question}?",
+                                    "type": "General",
+                                    "answers": [
+                                        {
+                                            "id": f"answer-{section}-{question}",
+                                            "type": "Currency" if question % 2 else "Number",
+                                            "label": f"Item {question}",
+                                            "mandatory": question % 3 == 0,
+                                        },
+                                    ],
+                                },
+                            }
+                            for question in range(questions)
+                        ],
+                    },
+                ],
+            }
+            for section in range(sections)
+        ],
+    }
+
+
+class StubCirServer:  # pylint: disable=too-many-instance-attributes
+    """A threaded HTTP/1.1 server implementing the read and publish endpoints of the CIR API.
+    Published documents are kept in ``published``, and retrieved by the id of their version.
+
+        ``latency`` delays every response, and ``fail_next`` makes the following requests fail
+        with a given status, to exercise timeouts and retries.
+    """
+
+    def __init__(self, instruments: int = 20, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0) -> None:
+        self.metadata = synthetic_metadata(instruments)
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self.published: list[dict[str, Any]] = []
+        self._documents: dict[str, dict[str, Any]] = {}
+        self._failures: list[int] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> Self:
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            name="stub-cir-api",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving requests."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *_: object) -> None:
+        self.stop()
+
+    def fail_next(self, count: int, status: int = 503) -> None:
+        """Fail the next requests.
+
+        :param count: The number of requests to fail.
+        :param status: The status to fail them with.
+        """
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def handle(
+        self,
+        path: str,
+        query: dict[str, str],
+        document: Any = None,
+    ) -> tuple[int, Any]:
+        """Answer a request.
+
+        :param path: The request path.
+        :param query: The query string parameters.
+        :param document: The JSON body of a POST request.
+        :return: The response status and JSON body.
+        """
+        with self._lock:
+            self.requests += 1
+            failure = self._failures.pop(0) if self._failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if failure:
+            return failure, {"message": "Injected failure"}
+
+        filters = {key: query[key] for key in ("survey_id", "form_type", "language") if key in query}
+        matching = [entry for entry in self.metadata if all(entry[key] == value for key, value in filters.items())]
+
+        match path:
+            case "/v1/ci_metadata" if len(filters) == 3:
+                return (200, matching) if matching else (404, {"message": "No CI found"})
+            case "/v2/ci_metadata":
+                latest: dict[tuple[str, str, str], dict[str, Any]] = {}
+                for entry in matching:
+                    latest[(entry["survey_id"], entry["form_type"], entry["language"])] = entry
+                return 200, list(latest.values())
+            case "/v1/publish_collection_instrument":
+                return self.publish(document)
+            case "/v1/retrieve_collection_instrument":
+                return self.retrieve(query.get("guid", ""))
+            case _:
+                return 404, {"message": "Not found"}
+
+    def retrieve(self, guid: str) -> tuple[int, Any]:
+        """Retrieve the document of a collection instrument version, as published or synthesised.
+
+        :param guid: The id of the version.
+        :return: The response status and the document.
+        """
+        with self._lock:
+            published = self._documents.get(guid)
+        if published is not None:
+            return 200, published
+        for entry in self.metadata:
+            if entry["guid"] == guid:
+                return 200, synthetic_instrument(entry)
+        return 404, {"message": "No CI found"}
+
+    def publish(self, document: Any) -> tuple[int, Any]:
+        """Publish a collection instrument document as the next version of its collection instrument.
+
+        :param document: The document.
+        :return: The response status and the metadata of the published version.
+        """
+        if not isinstance(document, dict) or not {"survey_id", "form_type", "language"} <= document.keys():
+            return 400, {"message": "Invalid collection instrument"}
+
+        key = (document["survey_id"], document["form_type"], document["language"])
+        with self._lock:
+            versions = [
+                entry["ci_version"]
+                for entry in self.metadata
+                if key == (entry["survey_id"], entry["form_type"], entry["language"])
+            ]
+            entry = {
+                "guid": str(uuid.uuid4()),
+                "survey_id": key[0],
+                "form_type": key[1],
+                "language": key[2],
+                "title": document.get("title", ""),
+                "ci_version": max(versions, default=0) + 1,
+                "data_version": document.get("data_version", ""),
+                "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            self.metadata.append(entry)
+            self.published.append(document)
+            self._documents[entry["guid"]] = document | {"id": entry["guid"]}
+        return 201, entry
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Request handler delegating to the stub server."""
+
+            protocol_version = "HTTP/1.1"
+            # The headers and body are written separately, which Nagle's algorithm would delay.
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                """Count each new connection."""
+                super().setup()
+                with stub._lock:  # pylint: disable=protected-access
+                    stub.connections += 1
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                """Answer a GET request."""
+                self.respond()
+
+            def do_POST(self) -> None:  # pylint: disable=invalid-name
+                """Answer a POST request, with a JSON body."""
+                try:
+                    document = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))))
+                except ValueError:
+                    document = None
+                self.respond(document)
+
+            def respond(self, document: Any = None) -> None:
+                """Answer the request from the stub server."""
+                parts = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+                status, payload = stub.handle(parts.path, query, document)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_: Any) -> None:
+                """Do not log requests."""
+
+        return Handler
+
+
+def main() -> None:  # pragma: no cover - command line entry point
+    """Run the stub server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3030)
+    parser.add_argument("--instruments", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    arguments = parser.parse_args()
+
+    server = StubCirServer(arguments.instruments, arguments.host, arguments.port, arguments.latency)
+    server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
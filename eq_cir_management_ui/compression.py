@@ -0,0 +1,69 @@
+"""Content encodings supported by the application, for static assets and responses."""
+
+import gzip
+import zlib
+from collections.abc import Callable
+from typing import Protocol
+
+import brotli
+
+
+class StreamEncoder(Protocol):
+    """Incrementally compresses a response body."""
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk, returning whatever output is ready."""
+
+    def flush(self) -> bytes:
+        """Return all output for the input so far, without ending the stream."""
+
+    def finish(self) -> bytes:
+        """End the stream, returning the remaining output."""
+
+
+class GzipEncoder:
+    """A gzip stream encoder."""
+
+    def __init__(self, level: int) -> None:
+        # 16 + MAX_WBITS selects the gzip container rather than a raw zlib stream.
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk, returning whatever output is ready."""
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        """Return all output for the input so far, without ending the stream."""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """End the stream, returning the remaining output."""
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    """A brotli stream encoder."""
+
+    def __init__(self, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk, returning whatever output is ready."""
+        return bytes(self._compressor.process(data))
+
+    def flush(self) -> bytes:
+        """Return all output for the input so far, without ending the stream."""
+        return bytes(self._compressor.flush())
+
+    def finish(self) -> bytes:
+        """End the stream, returning the remaining output."""
+        return bytes(self._compressor.finish())
+
+
+# Encoders keyed on their Content-Encoding token, in order of preference.
+ENCODERS: dict[str, Callable[[bytes], bytes]] = {
+    "br": lambda data: brotli.compress(data, quality=11),
+    "gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+}
+# Stream encoder factories keyed on their Content-Encoding token, taking a compression level.
+STREAM_ENCODERS: dict[str, Callable[[int], StreamEncoder]] = {"br": BrotliEncoder, "gzip": GzipEncoder}
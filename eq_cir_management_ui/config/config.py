@@ -10,10 +10,204 @@ class DefaultConfig:  # pylint: disable=too-few-public-methods
 
     LOG_FORMAT = os.environ.get("LOG_FORMAT", "JSON")
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    # Fraction of "Request received" lines to keep.
+    LOG_REQUEST_SAMPLE_RATE = float(os.getenv("LOG_REQUEST_SAMPLE_RATE", "1.0"))
+    # Maximum 4xx error lines per second per worker, 0 for no limit. 5xx errors are always logged.
+    LOG_CLIENT_ERROR_RATE_LIMIT = int(os.getenv("LOG_CLIENT_ERROR_RATE_LIMIT", "0"))
+    # Seconds over which repeats of a 4xx error are counted and then logged as one summary line,
+    # 0 to log every 4xx error.
+    LOG_CLIENT_ERROR_SUMMARY_INTERVAL = float(os.getenv("LOG_CLIENT_ERROR_SUMMARY_INTERVAL", "60"))
+    # Distinct 4xx errors counted per summary interval, later ones are counted together.
+    LOG_CLIENT_ERROR_SUMMARY_MAX_ERRORS = int(os.getenv("LOG_CLIENT_ERROR_SUMMARY_MAX_ERRORS", "1000"))
 
     CDN_URL = os.getenv("CDN_URL", "https://cdn.ons.gov.uk")
     SESSION_COOKIE_SECURE = False
 
+    # Directory for the on-disk Jinja bytecode cache, unset to disable the cache.
+    JINJA_BYTECODE_CACHE_DIR = os.getenv("JINJA_BYTECODE_CACHE_DIR")
+    # Precompiled template bundle, built by eq_cir_management_ui.templating.bundle, to load
+    # templates from in place of their source. Unset to load templates from their source.
+    TEMPLATE_BUNDLE_PATH = os.getenv("TEMPLATE_BUNDLE_PATH")
+    # Compile the page templates when the application is created, rather than on first request.
+    TEMPLATE_WARMUP = os.getenv("TEMPLATE_WARMUP", "true").lower() == "true"
+    # Serve static pages, such as the index and error pages, from a cache of rendered output.
+    PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+    PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "128"))
+
+    # Rows per page of a listing, by default and at most.
+    LISTING_PAGE_SIZE = int(os.getenv("LISTING_PAGE_SIZE", "100"))
+    LISTING_MAX_PAGE_SIZE = int(os.getenv("LISTING_MAX_PAGE_SIZE", "1000"))
+    # Rows fetched from a listing's data source at a time, while its page is streamed.
+    LISTING_BATCH_SIZE = int(os.getenv("LISTING_BATCH_SIZE", "200"))
+    # Bytes of a streamed page buffered before each write to the client.
+    STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "8192"))
+
+    # Seconds browsers may cache static assets requested by their plain, unfingerprinted, name.
+    STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+
+    # Compression of responses, with brotli or gzip, whichever the client accepts, brotli first.
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    # Responses smaller than this many bytes are not worth compressing.
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    COMPRESSION_MIMETYPES = (
+        "text/html",
+        "text/css",
+        "text/plain",
+        "application/javascript",
+        "application/json",
+        "image/svg+xml",
+    )
+
+    # Directory shared by the gunicorn workers for metrics snapshots, unset for a single process.
+    # gunicorn_config.py gives each server a directory of its own when this is not set.
+    METRICS_MULTIPROCESS_DIR = os.getenv("METRICS_MULTIPROCESS_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0"))
+
+    # Dependencies, as comma separated host:port pairs, which must accept connections to be ready.
+    READINESS_DEPENDENCIES = tuple(address for address in os.getenv("READINESS_DEPENDENCIES", "").split(",") if address)
+    READINESS_CHECK_TIMEOUT = float(os.getenv("READINESS_CHECK_TIMEOUT", "1.0"))
+    # Seconds a readiness result is reused for, so probes never run the checks themselves.
+    READINESS_CACHE_TTL = float(os.getenv("READINESS_CACHE_TTL", "10"))
+
+    # Requests for paths starting or ending with any of these, comma separated, are answered
+    # with a 404 before Flask. Both empty to disable. Neither may match a route of the application.
+    # A prefix ending in a letter or digit matches whole path segments only, see scanner_matcher.
+    SCANNER_PATH_PREFIXES = tuple(
+        prefix
+        for prefix in os.getenv(
+            "SCANNER_PATH_PREFIXES",
+            "/wp-,/wordpress,/.env,/.git,/.aws,/.ssh,/phpmyadmin,/pma,/cgi-bin,/vendor/phpunit,/xmlrpc,"
+            "/actuator,/boaform,/HNAP1,/owa,/solr,/console,/autodiscover",
+        ).split(",")
+        if prefix
+    )
+    SCANNER_PATH_SUFFIXES = tuple(
+        suffix
+        for suffix in os.getenv("SCANNER_PATH_SUFFIXES", ".php,.asp,.aspx,.jsp,.cgi,.env,.bak,.sql").split(",")
+        if suffix
+    )
+
+    # Shed requests a worker cannot handle promptly with a 503, or a 429 for a client over its limit.
+    ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+    # Requests each worker handles at once, 0 for no limit. Under gunicorn, 0 is one less than
+    # the worker's threads, so a thread is always free to shed queued requests, see
+    # server_profiles.limit_worker.
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "0"))
+    # Requests each worker handles at once for one client, 0 for no limit.
+    ADMISSION_MAX_PER_CLIENT = int(os.getenv("ADMISSION_MAX_PER_CLIENT", "0"))
+    # Proxies in front of the application which add the client's address to X-Forwarded-For.
+    ADMISSION_TRUSTED_PROXIES = int(os.getenv("ADMISSION_TRUSTED_PROXIES", "0"))
+    # Seconds rejected clients are asked to wait before retrying.
+    ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+    CIR_API_URL = os.getenv("CIR_API_URL", "http://localhost:3030")
+    # Seconds for a CIR API call in total, including its retries.
+    CIR_API_TIMEOUT = float(os.getenv("CIR_API_TIMEOUT", "5.0"))
+    CIR_API_MAX_RETRIES = int(os.getenv("CIR_API_MAX_RETRIES", "2"))
+    # Retries allowed per CIR API call, averaged over recent calls.
+    CIR_API_RETRY_BUDGET_RATIO = float(os.getenv("CIR_API_RETRY_BUDGET_RATIO", "0.2"))
+    # Idle keep-alive connections kept open to the CIR API per worker.
+    CIR_API_POOL_SIZE = int(os.getenv("CIR_API_POOL_SIZE", "10"))
+    # Independent CIR API calls made concurrently per worker.
+    CIR_API_MAX_CONCURRENCY = int(os.getenv("CIR_API_MAX_CONCURRENCY", "4"))
+
+    # Cache of CIR API responses in each worker.
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    # Seconds a response is fresh for, unless its endpoint is in RESPONSE_CACHE_ENDPOINT_TTLS.
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+    # Seconds an expired response is still served for while it is refreshed in the background.
+    RESPONSE_CACHE_STALE_TTL = float(os.getenv("RESPONSE_CACHE_STALE_TTL", "300"))
+    # Comma separated endpoint=seconds pairs. A published collection instrument version never changes.
+    RESPONSE_CACHE_ENDPOINT_TTLS = tuple(
+        entry
+        for entry in os.getenv("RESPONSE_CACHE_ENDPOINT_TTLS", "/v1/retrieve_collection_instrument=3600").split(",")
+        if entry
+    )
+    # Memory-mapped file holding responses shared by every worker on the host, such as
+    # /dev/shm/eq-cir-management-ui.cache. Unset to disable. Used beneath the response cache.
+    SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH")
+    SHARED_CACHE_SLOTS = int(os.getenv("SHARED_CACHE_SLOTS", "2048"))
+    # Bytes per slot, responses larger than a slot are not shared.
+    SHARED_CACHE_SLOT_SIZE = int(os.getenv("SHARED_CACHE_SLOT_SIZE", "131072"))
+
+    # Resident memory, in megabytes, beyond which a gunicorn worker finishes its requests in
+    # flight and is replaced. 0 for no budget, leaving workers to be replaced after max_requests.
+    WORKER_RSS_BUDGET_MB = int(os.getenv("WORKER_RSS_BUDGET_MB", "0"))
+    # Seconds between reads of a worker's resident memory.
+    WORKER_RSS_CHECK_INTERVAL = float(os.getenv("WORKER_RSS_CHECK_INTERVAL", "5"))
+
+    # Background jobs, such as bulk migrations, see eq_cir_management_ui.jobs. The SQLite
+    # database of jobs and their progress, shared by the workers on the host. Unset for a
+    # database in the temporary directory.
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH")
+    # Threads running the items of jobs in each worker, shared by its jobs.
+    JOBS_MAX_WORKERS = int(os.getenv("JOBS_MAX_WORKERS", "8"))
+    # Jobs run at once by each worker, later jobs are queued.
+    JOBS_MAX_ACTIVE = int(os.getenv("JOBS_MAX_ACTIVE", "2"))
+    # Items of a job run at once, when the job does not ask for a number.
+    JOBS_DEFAULT_CONCURRENCY = int(os.getenv("JOBS_DEFAULT_CONCURRENCY", "4"))
+    # Items whose outcomes are written to the database together, and the most seconds between writes.
+    JOBS_BATCH_SIZE = int(os.getenv("JOBS_BATCH_SIZE", "50"))
+    JOBS_FLUSH_INTERVAL = float(os.getenv("JOBS_FLUSH_INTERVAL", "1"))
+    # Seconds a job's progress may go unwritten before another worker resumes the job.
+    JOBS_LEASE = float(os.getenv("JOBS_LEASE", "30"))
+    # Items in one job at most.
+    JOBS_MAX_ITEMS = int(os.getenv("JOBS_MAX_ITEMS", "5000"))
+
+    # Server-sent event streams of job progress, see eq_cir_management_ui.events. Streams open
+    # at once in each worker, 0 for no limit. Under gunicorn's gthread workers, 0 is a quarter
+    # of the worker's threads, see server_profiles.limit_worker.
+    EVENTS_MAX_SUBSCRIBERS = int(os.getenv("EVENTS_MAX_SUBSCRIBERS", "0"))
+    # Seconds without events after which a stream sends a heartbeat.
+    EVENTS_HEARTBEAT_INTERVAL = float(os.getenv("EVENTS_HEARTBEAT_INTERVAL", "15"))
+    # Seconds after which a stream ends and the browser reconnects, so that under gthread
+    # workers no thread is held by a stream indefinitely.
+    EVENTS_MAX_DURATION = float(os.getenv("EVENTS_MAX_DURATION", "300"))
+    # Milliseconds a browser waits before reconnecting to an ended stream.
+    EVENTS_RETRY = int(os.getenv("EVENTS_RETRY", "3000"))
+    # Seconds between reads of the jobs' progress, while a worker has streams open.
+    EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "1"))
+
+    # Bytes of a request body at most, larger bodies are refused with a 413. Bodies declaring a
+    # larger Content-Length are refused before any of them is read.
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(32 * 1024 * 1024)))
+    # Bytes of an uploaded document held in memory, beyond which it is spooled to a temporary file.
+    UPLOAD_SPOOL_MEMORY = int(os.getenv("UPLOAD_SPOOL_MEMORY", str(1024 * 1024)))
+    # Validation reports kept in each worker, by the SHA-256 hash of the uploaded document, and
+    # the seconds each is kept for.
+    UPLOAD_CACHE_MAX_ENTRIES = int(os.getenv("UPLOAD_CACHE_MAX_ENTRIES", "512"))
+    UPLOAD_CACHE_TTL = float(os.getenv("UPLOAD_CACHE_TTL", "86400"))
+
+    # Hashed trees of collection instrument versions kept in each worker for diffing, and the
+    # seconds each is kept for. Versions do not change, so trees only expire to free memory.
+    DIFF_CACHE_MAX_ENTRIES = int(os.getenv("DIFF_CACHE_MAX_ENTRIES", "64"))
+    DIFF_CACHE_TTL = float(os.getenv("DIFF_CACHE_TTL", "3600"))
+    # Changes shown on a diff page at most.
+    DIFF_MAX_CHANGES = int(os.getenv("DIFF_MAX_CHANGES", "500"))
+
+    # Seconds between reads of the metadata feed, through the response cache, to bring each
+    # worker's search index of collection instruments up to date.
+    SEARCH_REFRESH_INTERVAL = float(os.getenv("SEARCH_REFRESH_INTERVAL", "30"))
+    # Matches returned by a search, by default and at most.
+    SEARCH_RESULTS = int(os.getenv("SEARCH_RESULTS", "10"))
+    SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "100"))
+
+    # Bearer token for the /admin routes, unset to disable them.
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+    # Key for signing requests to be profiled, see eq_cir_management_ui.middleware.profiling.
+    # Profiling is disabled, and costs nothing, when this is unset and the sample rate is 0.
+    PROFILING_SECRET = os.getenv("PROFILING_SECRET")
+    # Fraction of requests profiled without a signature.
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    # Directory profiles are written to, shared by the workers. Unset for a temporary directory.
+    PROFILING_DIR = os.getenv("PROFILING_DIR")
+    # Profiles kept in the directory, the oldest are removed first.
+    PROFILING_MAX_PROFILES = int(os.getenv("PROFILING_MAX_PROFILES", "50"))
+
 
 class DeployedConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
     """Configuration for the STAGING environment.
@@ -0,0 +1,194 @@
+"""Logging configuration for the EQ CIR Management UI application.
+
+Both structlog and standard library loggers hand their records to a queue. A listener thread
+takes them off the queue, renders them and writes them to stdout, so formatting (including
+tracebacks) and log I/O happen off the request thread.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+import structlog
+from flask import Flask
+
+# The message logged for every request, and for every handled HTTP error.
+REQUEST_RECEIVED_EVENT = "Request received"
+ERROR_EVENT = "an error has occurred"
+# The message summarising the repeats of a client error, logged once per summary interval.
+REPEATED_ERRORS_EVENT = "an error has occurred repeatedly"
+
+
+class DeferredQueueHandler(QueueHandler):
+    """A queue handler which leaves formatting to the listener thread.
+
+    The standard QueueHandler formats the record before enqueueing it, so that it can be
+    pickled. Records here never leave the process, so they are enqueued untouched.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Enqueue the record as it is."""
+        return record
+
+
+class SamplingFilter(logging.Filter):  # pylint: disable=too-few-public-methods
+    """Drop a share of high volume log events.
+
+    Events are matched on their message. Each event can be sampled, keeping the given fraction
+    of records, and rate limited, keeping at most the given number of records per second.
+    Records logged at ERROR or above are always kept.
+    """
+
+    def __init__(self, sample_rates: dict[str, float], rate_limits: dict[str, int]) -> None:
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limits = rate_limits
+        self._windows: dict[str, tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """Decide whether the record is logged."""
+        if record.levelno >= logging.ERROR:
+            return True
+
+        event = event_name(record)
+
+        sample_rate = self.sample_rates.get(event)
+        if sample_rate is not None and random.random() >= sample_rate:  # noqa: S311
+            return False
+
+        rate_limit = self.rate_limits.get(event)
+        if rate_limit:
+            second = int(time.monotonic())
+            with self._lock:
+                window, count = self._windows.get(event, (second, 0))
+                if window != second:
+                    window, count = second, 0
+                self._windows[event] = (window, count + 1)
+            return count < rate_limit
+
+        return True
+
+
+def event_name(record: logging.LogRecord) -> str:
+    """The message of a record, without any structured fields.
+
+    :param record: A record from either structlog or a standard library logger.
+    :return: The message.
+    """
+    if isinstance(record.msg, dict):
+        return str(record.msg.get("event", ""))
+    return str(record.msg)
+
+
+class QueueLogging:
+    """Sends every log record through a queue to a listener thread, which renders the records
+    with structlog and writes them to stdout.
+    """
+
+    def __init__(self) -> None:
+        self.log_level = logging.INFO
+        self.log_format = "JSON"
+        self.sampling_filter: SamplingFilter | None = None
+        self._listener: QueueListener | None = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self.restart_after_fork)
+        atexit.register(self.stop)
+
+    def init_app(self, app: Flask) -> None:
+        """Configure logging from the application config.
+
+        :param app: The Flask application.
+        """
+        self.log_level = logging.getLevelNamesMapping().get(app.config["LOG_LEVEL"].upper(), logging.INFO)
+        self.log_format = app.config["LOG_FORMAT"]
+        self.sampling_filter = SamplingFilter(
+            sample_rates={REQUEST_RECEIVED_EVENT: app.config["LOG_REQUEST_SAMPLE_RATE"]},
+            rate_limits={ERROR_EVENT: app.config["LOG_CLIENT_ERROR_RATE_LIMIT"]},
+        )
+
+        structlog.configure(
+            processors=[
+                structlog.contextvars.merge_contextvars,
+                structlog.stdlib.add_log_level,
+                structlog.processors.TimeStamper(fmt="iso", utc=True),
+                structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+            ],
+            logger_factory=structlog.stdlib.LoggerFactory(),
+            wrapper_class=structlog.stdlib.BoundLogger,
+            cache_logger_on_first_use=True,
+        )
+
+        self.start()
+
+    def start(self) -> None:
+        """Start, or restart, the listener thread and point the root logger at its queue."""
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+
+            log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+            queue_handler = DeferredQueueHandler(log_queue)
+            if self.sampling_filter is not None:
+                queue_handler.addFilter(self.sampling_filter)
+
+            root_logger = logging.getLogger()
+            for handler in [handler for handler in root_logger.handlers if isinstance(handler, DeferredQueueHandler)]:
+                root_logger.removeHandler(handler)
+            root_logger.addHandler(queue_handler)
+            root_logger.setLevel(self.log_level)
+
+            self._listener = QueueListener(log_queue, self._stream_handler(), respect_handler_level=True)
+            self._listener.start()
+
+    def stop(self) -> None:
+        """Write out any queued records and stop the listener thread."""
+        with self._lock:
+            if self._listener is not None:
+                self._listener.stop()
+                self._listener = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the listener thread has been started in this process."""
+        return self._listener is not None
+
+    def _stream_handler(self) -> logging.Handler:
+        renderer = (
+            structlog.processors.JSONRenderer()
+            if str(self.log_format).upper() == "JSON"
+            else structlog.dev.ConsoleRenderer(colors=False)
+        )
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(
+            structlog.stdlib.ProcessorFormatter(
+                processors=[
+                    structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                    structlog.processors.format_exc_info,
+                    renderer,
+                ],
+                foreign_pre_chain=[
+                    structlog.stdlib.add_log_level,
+                    structlog.processors.TimeStamper(fmt="iso", utc=True),
+                ],
+            ),
+        )
+        return stream_handler
+
+    def restart_after_fork(self) -> None:
+        """Restart the listener in a forked worker. Threads are not inherited by the child, and
+        the inherited lock may have been held at the time of the fork.
+        """
+        self._lock = threading.Lock()
+        if self._listener is not None:
+            self._listener = None
+            self.start()
+
+
+queue_logging = QueueLogging()
@@ -0,0 +1,162 @@
+"""Structural diff of collection instrument documents, by hashed subtrees.
+
+Each object and array of a document is hashed bottom-up, from the hashes of its children and
+the values of its leaves, into a tree of the same shape. Two subtrees with the same hash are
+equal, so a diff compares the hashes of two trees from the top and only descends into the
+subtrees which differ, skipping each unchanged section in one comparison, however large.
+
+A tree is built once for each document version and kept, as versions do not change, so
+comparing several versions against the same base hashes the base once.
+"""
+
+import hashlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any, cast
+
+# Bytes of each subtree's hash. 128 bits, so that two different subtrees never share a hash.
+DIGEST_SIZE = 16
+
+# Kinds of change.
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+REORDERED = "reordered"
+
+
+class Node:  # pylint: disable=too-few-public-methods
+    """An object or array of a document, with the hash of its content and the trees of the
+    objects and arrays within it. Leaves are compared by value, so have no node.
+    """
+
+    __slots__ = ("children", "digest", "value")
+
+    def __init__(self, value: Any, digest: bytes, children: dict[Any, "Node"]) -> None:
+        self.value = value
+        self.digest = digest
+        # The trees of the objects and arrays within, by key or index.
+        self.children = children
+
+
+@dataclass
+class Change:
+    """A difference between two documents: the path of the value, as ``sections[2].title``,
+    and the value before and after, None for a value added or removed. A ``reordered`` change
+    has the ids of an array's items, in their order before and after.
+    """
+
+    kind: str
+    path: str
+    old: Any
+    new: Any
+
+
+def hash_tree(value: dict[str, Any] | list[Any]) -> Node:
+    """Hash an object or array bottom-up. The hash of an object does not depend on the order of
+    its keys, and that of an array does on the order of its items.
+
+    :param value: The object or array, which must not be modified while the tree is used.
+    :return: The tree.
+    """
+    children: dict[Any, Node] = {}
+    items: list[tuple[Any, Any]]
+    if isinstance(value, dict):
+        parts = ["{"]
+        items = sorted(value.items())
+    else:
+        parts = ["["]
+        items = list(enumerate(value))
+    for key, item in items:
+        if isinstance(item, dict | list):
+            child = children[key] = hash_tree(item)
+            parts.append(f"{key!r}#{child.digest.hex()}")
+        else:
+            # repr tells the leaf's type from its value, so "1", 1 and True hash differently.
+            parts.append(f"{key!r}={item!r},")
+    # Hashed in one update, which is faster than an update for each key.
+    digest = hashlib.blake2b("".join(parts).encode(), digest_size=DIGEST_SIZE).digest()
+    return Node(value, digest, children)
+
+
+def diff_trees(old: Node, new: Node, path: str = "") -> Iterator[Change]:
+    """The changes from one document's tree to another's, in document order, found as they are
+    iterated. Arrays of objects with unique ids, such as sections and blocks, are matched by id,
+    so an inserted section is one change rather than a change to every section after it.
+
+    :param old: The tree of the earlier document.
+    :param new: The tree of the later document.
+    :param path: The path of the trees within their documents.
+    :return: The changes.
+    """
+    if old.digest == new.digest:
+        return
+    if isinstance(old.value, dict) and isinstance(new.value, dict):
+        yield from _diff_objects(old, new, path)
+    elif isinstance(old.value, list) and isinstance(new.value, list):
+        yield from _diff_arrays(old, new, path)
+    else:
+        yield Change(CHANGED, path, old.value, new.value)
+
+
+def _diff_objects(old: Node, new: Node, path: str) -> Iterator[Change]:
+    for key, value in old.value.items():
+        child_path = f"{path}.{key}" if path else key
+        if key not in new.value:
+            yield Change(REMOVED, child_path, value, None)
+        else:
+            yield from _diff_children(old, new, key, key, child_path)
+    for key, value in new.value.items():
+        if key not in old.value:
+            yield Change(ADDED, f"{path}.{key}" if path else key, None, value)
+
+
+def _diff_arrays(old: Node, new: Node, path: str) -> Iterator[Change]:
+    old_ids, new_ids = item_ids(old.value), item_ids(new.value)
+    if old_ids is None or new_ids is None:
+        # Matched by position.
+        for index in range(min(len(old.value), len(new.value))):
+            yield from _diff_children(old, new, index, index, f"{path}[{index}]")
+        for index in range(len(new.value), len(old.value)):
+            yield Change(REMOVED, f"{path}[{index}]", old.value[index], None)
+        for index in range(len(old.value), len(new.value)):
+            yield Change(ADDED, f"{path}[{index}]", None, new.value[index])
+        return
+
+    old_positions = {item_id: index for index, item_id in enumerate(old_ids)}
+    new_positions = {item_id: index for index, item_id in enumerate(new_ids)}
+    for index, item_id in enumerate(old_ids):
+        if item_id not in new_positions:
+            yield Change(REMOVED, f"{path}[{index}]", old.value[index], None)
+    for index, item_id in enumerate(new_ids):
+        if item_id in old_positions:
+            yield from _diff_children(old, new, old_positions[item_id], index, f"{path}[{index}]")
+        else:
+            yield Change(ADDED, f"{path}[{index}]", None, new.value[index])
+
+    kept_before = [item_id for item_id in old_ids if item_id in new_positions]
+    kept_after = [item_id for item_id in new_ids if item_id in old_positions]
+    if kept_before != kept_after:
+        yield Change(REORDERED, path, kept_before, kept_after)
+
+
+def _diff_children(old: Node, new: Node, old_key: Any, new_key: Any, path: str) -> Iterator[Change]:
+    """The changes between a child of each tree, by their key or index."""
+    old_child, new_child = old.children.get(old_key), new.children.get(new_key)
+    if old_child is not None and new_child is not None:
+        yield from diff_trees(old_child, new_child, path)
+        return
+    old_value, new_value = old.value[old_key], new.value[new_key]
+    if type(old_value) is not type(new_value) or old_value != new_value:
+        yield Change(CHANGED, path, old_value, new_value)
+
+
+def item_ids(items: list[Any]) -> list[str] | None:
+    """The ids of an array's items, if every item is an object with an id of its own.
+
+    :param items: The array.
+    :return: The ids in order, or None if the items are not all identified, or share an id.
+    """
+    ids = [item.get("id") if isinstance(item, dict) else None for item in items]
+    if not all(isinstance(item_id, str) for item_id in ids) or len(set(ids)) != len(ids):
+        return None
+    return cast(list[str], ids)
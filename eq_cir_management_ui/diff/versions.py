@@ -0,0 +1,22 @@
+"""The hashed trees of collection instrument versions, kept for diffing."""
+
+from eq_cir_management_ui.cache.response_cache import ResponseCache
+from eq_cir_management_ui.cir_api.client import CirApiClient
+from eq_cir_management_ui.diff.engine import Node, hash_tree
+
+# The cache endpoint the trees are kept under.
+TREES = "document-trees"
+
+
+def version_tree(trees: ResponseCache, client: CirApiClient, guid: str) -> Node:
+    """The tree of a collection instrument version, hashed when first diffed and then kept, as
+    a version does not change. Concurrent requests for a version's tree share one fetch and hash.
+
+    :param trees: The cache of trees.
+    :param client: The CIR API client the version is fetched with.
+    :param guid: The id of the version.
+    :return: The tree.
+    :raises CirApiError: If the version cannot be fetched.
+    """
+    tree: Node = trees.get(TREES, guid, lambda: hash_tree(client.get_collection_instrument(guid)))
+    return tree
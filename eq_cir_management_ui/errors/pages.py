@@ -0,0 +1,112 @@
+"""Content of the error pages, and the pages themselves, rendered once per status."""
+
+from typing import Any
+
+from flask import current_app, render_template
+
+from eq_cir_management_ui.middleware.secure_headers import csp_nonce
+from eq_cir_management_ui.templating.page_cache import PageCache
+
+error_content_401 = {
+    "title": "Unauthorised",
+    "heading": "Unauthorised",
+    "message": ["You do not have permission to view this page."],
+}
+error_content_403 = {
+    "title": "Forbidden",
+    "heading": "Forbidden",
+    "message": ["You do not have permission to view this page."],
+}
+error_content_404 = {
+    "title": "Page not found",
+    "heading": "Page not found",
+    "message": [
+        "If you entered a web address, check it is correct.",
+        "If you pasted the web address, check you copied the whole address.",
+    ],
+}
+error_content_429 = {
+    "title": "Too many requests",
+    "heading": "Too many requests",
+    "message": ["You have made too many requests in a short time. Please wait a moment and try again."],
+}
+error_content_500 = {
+    "title": "Internal Server Error",
+    "heading": "Sorry, there is a problem with the service",
+    "message": ["Please try again later or contact support if the problem persists."],
+}
+error_content_503 = {
+    "title": "Service unavailable",
+    "heading": "Sorry, the service is busy",
+    "message": ["Please try again in a few moments."],
+}
+
+# The content of the page for each status. 400 deliberately shows the 500 page, and 405 the 404 page.
+ERROR_CONTENT: dict[int, dict[str, Any]] = {
+    400: error_content_500,
+    401: error_content_401,
+    403: error_content_403,
+    404: error_content_404,
+    405: error_content_404,
+    429: error_content_429,
+    500: error_content_500,
+    503: error_content_503,
+}
+
+
+class ErrorPages:
+    """The error page of each status, rendered once and kept split where the CSP nonce goes.
+    Unlike the page cache, looking a page up needs no key built from its context.
+    """
+
+    def __init__(self, page_cache: PageCache) -> None:
+        self.page_cache = page_cache
+        self._pages: dict[int, tuple[bytes, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    @property
+    def size(self) -> int:
+        """The number of bytes of rendered output held."""
+        return sum(len(chunk) for chunks in list(self._pages.values()) for chunk in chunks)
+
+    def chunks(self, status: int) -> tuple[bytes, ...]:
+        """The page for a status, rendered on first use. Must be called with a request context.
+
+        :param status: An HTTP status in ERROR_CONTENT.
+        :return: The encoded page, split where the CSP nonce goes.
+        """
+        chunks = self._pages.get(status)
+        if chunks is None:
+            # Rendering twice in a race is harmless, both renders are identical.
+            chunks = self.page_cache.render_chunks("error.html", error_content=ERROR_CONTENT[status])
+            self._pages[status] = chunks
+        return chunks
+
+    def prerender(self) -> None:
+        """Render the page of every status. Must be called with a request context."""
+        for status in ERROR_CONTENT:
+            self.chunks(status)
+
+    def render(self, status: int) -> bytes:
+        """The page for a status, with the current request's CSP nonce.
+
+        :param status: An HTTP status in ERROR_CONTENT.
+        :return: The encoded page.
+        """
+        return csp_nonce().encode().join(self.chunks(status))
+
+
+def render_error_page(status: int) -> bytes:
+    """Render the error page for a status from the application's pre-rendered pages. When the
+    page cache is disabled the page is rendered on every call.
+
+    :param status: An HTTP status in ERROR_CONTENT.
+    :return: The encoded page.
+    """
+    if not current_app.config["PAGE_CACHE_ENABLED"]:
+        return render_template("error.html", error_content=ERROR_CONTENT[status]).encode()
+
+    error_pages: ErrorPages = current_app.extensions["error_pages"]
+    return error_pages.render(status)
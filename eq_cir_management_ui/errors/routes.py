@@ -1,6 +1,6 @@
 """Errors routes."""
 
-from flask import Blueprint, render_template, request
+from flask import Blueprint, current_app, request
 from structlog import get_logger
 from werkzeug.exceptions import (
     BadRequest,
@@ -8,101 +8,104 @@ from werkzeug.exceptions import (
     InternalServerError,
     MethodNotAllowed,
     NotFound,
+    ServiceUnavailable,
+    TooManyRequests,
     Unauthorized,
 )
 
+from eq_cir_management_ui.config.logging_config import ERROR_EVENT
+from eq_cir_management_ui.errors.pages import render_error_page
+from eq_cir_management_ui.errors.summary import ClientErrorSummary
+from eq_cir_management_ui.metrics.instrumentation import ERROR_HANDLER_INVOCATIONS
+
 logger = get_logger()
 
 errors_blueprint = Blueprint("errors", __name__)
 
-error_content_401 = {
-    "title": "Unauthorised",
-    "heading": "Unauthorised",
-    "message": ["You do not have permission to view this page."],
-}
-error_content_403 = {
-    "title": "Forbidden",
-    "heading": "Forbidden",
-    "message": ["You do not have permission to view this page."],
-}
-error_content_404 = {
-    "title": "Page not found",
-    "heading": "Page not found",
-    "message": [
-        "If you entered a web address, check it is correct.",
-        "If you pasted the web address, check you copied the whole address.",
-    ],
-}
-error_content_500 = {
-    "title": "Internal Server Error",
-    "heading": "Sorry, there is a problem with the service",
-    "message": ["Please try again later or contact support if the problem persists."],
-}
-
 
 def log_exception(exception: Exception, status_code: int) -> None:
-    """Log the exception with the appropriate log level based on the status code."""
-    log = logger.warning if status_code < 500 else logger.error
+    """Log the exception with the appropriate log level based on the status code.
+    Client errors are expected, so only server errors are logged with a traceback, and
+    repeats of a client error are summarised periodically rather than logged each time.
+    """
+    ERROR_HANDLER_INVOCATIONS.inc(status=str(status_code))
 
-    log(
-        "an error has occurred",
-        exc_info=exception,
-        url=request.url,
-        status_code=status_code,
-    )
+    if status_code < 500:
+        summary: ClientErrorSummary = current_app.extensions["client_error_summary"]
+        summary.record(status_code, request.method, request.path, url=request.url, error=str(exception))
+    else:
+        logger.error(ERROR_EVENT, exc_info=exception, url=request.url, status_code=status_code)
 
 
 @errors_blueprint.app_errorhandler(400)
-def bad_request(exception: BadRequest) -> tuple[str, int]:
+def bad_request(exception: BadRequest) -> tuple[bytes, int]:
     """400 page.
     :return: Rendered HTML.
     This is deliberately returning the 500 page.
     """
     log_exception(exception, 400)
-    return render_template("error.html", error_content=error_content_500), 400
+    return render_error_page(400), 400
 
 
 @errors_blueprint.app_errorhandler(401)
-def unauthorized(exception: Unauthorized) -> tuple[str, int]:
+def unauthorized(exception: Unauthorized) -> tuple[bytes, int]:
     """401 page.
     :return: Rendered HTML.
     """
     log_exception(exception, 401)
-    return render_template("error.html", error_content=error_content_401), 401
+    return render_error_page(401), 401
 
 
 @errors_blueprint.app_errorhandler(403)
-def forbidden(exception: Forbidden) -> tuple[str, int]:
+def forbidden(exception: Forbidden) -> tuple[bytes, int]:
     """403 page.
     :return: Rendered HTML.
     """
     log_exception(exception, 403)
-    return render_template("error.html", error_content=error_content_403), 403
+    return render_error_page(403), 403
 
 
 @errors_blueprint.app_errorhandler(404)
-def page_not_found(exception: NotFound) -> tuple[str, int]:
+def page_not_found(exception: NotFound) -> tuple[bytes, int]:
     """404 page.
     :return: Rendered HTML.
     """
     log_exception(exception, 404)
-    return render_template("error.html", error_content=error_content_404), 404
+    return render_error_page(404), 404
 
 
 @errors_blueprint.app_errorhandler(405)
-def method_not_allowed(exception: MethodNotAllowed) -> tuple[str, int]:
+def method_not_allowed(exception: MethodNotAllowed) -> tuple[bytes, int]:
     """405 page.
     :return: Rendered HTML.
     This is deliberately returning the 404 page.
     """
     log_exception(exception, 405)
-    return render_template("error.html", error_content=error_content_404), 405
+    return render_error_page(405), 405
+
+
+@errors_blueprint.app_errorhandler(429)
+def too_many_requests(exception: TooManyRequests) -> tuple[bytes, int]:
+    """429 page.
+    :return: Rendered HTML.
+    """
+    log_exception(exception, 429)
+    return render_error_page(429), 429
 
 
 @errors_blueprint.app_errorhandler(500)
-def internal_server_error(exception: InternalServerError) -> tuple[str, int]:
+def internal_server_error(exception: InternalServerError) -> tuple[bytes, int]:
     """500 page.
     :return: Rendered HTML.
     """
     log_exception(exception, 500)
-    return render_template("error.html", error_content=error_content_500), 500
+    return render_error_page(500), 500
+
+
+@errors_blueprint.app_errorhandler(503)
+def service_unavailable(exception: ServiceUnavailable) -> tuple[bytes, int]:
+    """503 page.
+    :return: Rendered HTML.
+    """
+    log_exception(exception, 503)
+    return render_error_page(503), 503
@@ -0,0 +1,105 @@
+"""Aggregation of repeated client errors into periodic summary log lines."""
+
+import threading
+import time
+
+from structlog import get_logger
+
+from eq_cir_management_ui.config.logging_config import ERROR_EVENT, REPEATED_ERRORS_EVENT
+
+logger = get_logger()
+
+# Status, method and path of a client error.
+ErrorKey = tuple[int, str, str]
+
+# The path errors are counted under once a window has seen its maximum of distinct errors.
+OTHER_PATHS = "(other)"
+
+
+class ClientErrorSummary:
+    """Logs the first occurrence of each client error in a window, and counts its repeats.
+    When the window ends, a background thread logs one summary line per repeated error, so a
+    flood of identical errors costs a counter increment each rather than a log line each. The
+    thread runs while errors are being counted, and stops after a window without any.
+    """
+
+    def __init__(self, interval: float, max_errors: int = 1000) -> None:
+        """Create the summary.
+
+        :param interval: Seconds each window lasts, 0 to log every error.
+        :param max_errors: Distinct errors counted per window. Later errors are counted under
+            a single path, as scanners request paths without end.
+        """
+        self.interval = interval
+        self.max_errors = max_errors
+        self._repeats: dict[ErrorKey, int] = {}
+        self._window_end = time.monotonic() + interval
+        self._flusher: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def record(self, status_code: int, method: str, path: str, **details: str) -> None:
+        """Log a client error, or count it if it has been logged in this window.
+
+        :param status_code: The status of the response.
+        :param method: The request method.
+        :param path: The request path.
+        :param details: Further fields, logged with the first occurrence only.
+        """
+        if not self.interval:
+            logger.warning(ERROR_EVENT, status_code=status_code, method=method, path=path, **details)
+            return
+
+        if time.monotonic() >= self._window_end:
+            self.flush()
+
+        key = (status_code, method, path)
+        with self._lock:
+            repeats = self._repeats.get(key)
+            if repeats is None and len(self._repeats) >= self.max_errors:
+                key = (status_code, method, OTHER_PATHS)
+                repeats = self._repeats.get(key, 0)
+            self._repeats[key] = 0 if repeats is None else repeats + 1
+            # A flusher inherited from the process this one was forked from is not alive here.
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically,
+                    name="client-error-summary",
+                    daemon=True,
+                )
+                self._flusher.start()
+
+        if repeats is None:
+            logger.warning(ERROR_EVENT, status_code=status_code, method=method, path=path, **details)
+
+    def flush(self) -> int:
+        """Log a summary line for each error repeated in the window, and start a new window.
+
+        :return: The number of summary lines logged.
+        """
+        with self._lock:
+            repeats, self._repeats = self._repeats, {}
+            started = self._window_end - self.interval
+            self._window_end = time.monotonic() + self.interval
+
+        seconds = round(time.monotonic() - started, 1)
+        summaries = [(key, count) for key, count in repeats.items() if count]
+        for (status_code, method, path), count in summaries:
+            logger.warning(
+                REPEATED_ERRORS_EVENT,
+                status_code=status_code,
+                method=method,
+                path=path,
+                count=count,
+                seconds=seconds,
+            )
+        return len(summaries)
+
+    def _flush_periodically(self) -> None:
+        while True:
+            time.sleep(max(0.0, self._window_end - time.monotonic()))
+            with self._lock:
+                if not self._repeats:
+                    self._flusher = None
+                    return
+            if time.monotonic() >= self._window_end:
+                self.flush()
@@ -0,0 +1,119 @@
+"""In-process fan-out of events to subscribers, such as the server-sent event streams of the
+browsers watching a job.
+
+Each worker has one broker. Its event sources publish to a topic, and every subscriber to the
+topic gets its own bounded queue of the events, so a slow subscriber drops its oldest events
+rather than holding up the source or the other subscribers. Events describe a state, such as
+a job's progress, so a subscriber which misses some is still up to date after the next one.
+
+The broker waits with ``threading`` primitives, so under the gevent worker class, which patches
+them, a waiting subscriber holds a greenlet rather than a thread.
+"""
+
+import threading
+from collections import deque
+from typing import Any
+
+from eq_cir_management_ui.metrics.registry import Counter
+
+REJECTED_SUBSCRIBERS = Counter(
+    "event_subscribers_rejected",
+    "Event stream subscriptions rejected as the worker had its maximum of subscribers.",
+)
+
+# The name of an event and its data.
+Event = tuple[str, dict[str, Any]]
+
+
+class Subscription:
+    """A subscriber's queue of the events published to a topic."""
+
+    def __init__(self, broker: "EventBroker", topic: str, max_events: int) -> None:
+        self.broker = broker
+        self.topic = topic
+        self.events: deque[Event] = deque(maxlen=max_events)
+        self._ready = threading.Event()
+
+    def put(self, event: Event) -> None:
+        """Queue an event, dropping the oldest if the queue is full."""
+        self.events.append(event)
+        self._ready.set()
+
+    def get(self, timeout: float) -> list[Event]:
+        """Wait for events.
+
+        :param timeout: Most seconds to wait.
+        :return: The events queued, oldest first, or none if the timeout passed first.
+        """
+        self._ready.wait(timeout)
+        self._ready.clear()
+        return [self.events.popleft() for _ in range(len(self.events))]
+
+    def close(self) -> None:
+        """Stop receiving events."""
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """Delivers each event published to a topic to every subscriber to the topic, up to a
+    maximum number of subscribers in the worker.
+    """
+
+    def __init__(self, max_subscribers: int, max_events: int = 16) -> None:
+        """Create the broker.
+
+        :param max_subscribers: Subscribers at once, further subscriptions are rejected, 0 for no limit.
+        :param max_events: Events queued for each subscriber.
+        """
+        self.max_subscribers = max_subscribers
+        self.max_events = max_events
+        self.subscribers = 0
+        self._topics: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str) -> Subscription | None:
+        """Subscribe to the events published to a topic.
+
+        :param topic: The topic.
+        :return: The subscription, or None if the worker has its maximum of subscribers.
+        """
+        with self._lock:
+            if self.max_subscribers and self.subscribers >= self.max_subscribers:
+                REJECTED_SUBSCRIBERS.inc()
+                return None
+            subscription = Subscription(self, topic, self.max_events)
+            self._topics.setdefault(topic, set()).add(subscription)
+            self.subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """End a subscription, if it has not already ended.
+
+        :param subscription: The subscription.
+        """
+        with self._lock:
+            subscriptions = self._topics.get(subscription.topic, set())
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+                self.subscribers -= 1
+                if not subscriptions:
+                    del self._topics[subscription.topic]
+
+    def publish(self, topic: str, name: str, data: dict[str, Any]) -> int:
+        """Publish an event to the subscribers to a topic.
+
+        :param topic: The topic.
+        :param name: The name of the event.
+        :param data: The event's data, which must not be modified once published.
+        :return: The number of subscribers the event was delivered to.
+        """
+        with self._lock:
+            subscriptions = list(self._topics.get(topic, ()))
+        for subscription in subscriptions:
+            subscription.put((name, data))
+        return len(subscriptions)
+
+    def topics(self) -> set[str]:
+        """The topics with subscribers."""
+        with self._lock:
+            return set(self._topics)
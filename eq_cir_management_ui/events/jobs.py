@@ -0,0 +1,115 @@
+"""Publishes the progress of background jobs to the worker's event broker.
+
+Jobs are run by any worker on the host, so their progress is read from the job store, which
+one thread per worker polls while the worker has event streams open. Each change is read and
+published once, however many browsers are watching.
+"""
+
+import os
+import threading
+import time
+from typing import Any
+
+from structlog import get_logger
+
+from eq_cir_management_ui.events.broker import Event, EventBroker
+from eq_cir_management_ui.jobs.migration import MIGRATION
+from eq_cir_management_ui.jobs.store import FINISHED, JobStore
+
+logger = get_logger()
+
+# Published to when a migration publishes new collection instrument versions.
+LISTING_TOPIC = "collection-instruments"
+# Seconds of updates read again on each poll, as another process may commit an update
+# stamped earlier than one already read.
+OVERLAP = 2.0
+
+
+def job_topic(job_id: str) -> str:
+    """The topic the progress of a job is published to."""
+    return f"jobs/{job_id}"
+
+
+def progress_event(job: dict[str, Any]) -> Event:
+    """The event describing a job's status and progress."""
+    return "progress", {key: job[key] for key in ("id", "status", "total", "succeeded", "failed")}
+
+
+def is_final(event: Event) -> bool:
+    """Whether an event reports that its job has finished."""
+    name, data = event
+    return name == "progress" and data["status"] in FINISHED
+
+
+class JobProgressSource:  # pylint: disable=too-many-instance-attributes
+    """Polls the job store for changes to jobs while the worker has subscribers, publishing a
+    ``progress`` event to the topic of each changed job, and a ``changed`` event to the listing
+    topic when a migration has published new versions.
+    """
+
+    def __init__(self, broker: EventBroker, store: JobStore, interval: float) -> None:
+        """Create the source.
+
+        :param broker: The broker to publish to.
+        :param store: The job store.
+        :param interval: Seconds between polls.
+        """
+        self.broker = broker
+        self.store = store
+        self.interval = interval
+        self.since = time.time()
+        # The status and progress last published for each job, with the time it was updated.
+        self._published: dict[str, tuple[tuple[str, int, int], float]] = {}
+        self._pid: int | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start polling, if not already polling in this process. Called after subscribing, as
+        polling stops once the broker has no subscribers.
+        """
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="job-progress", daemon=True)
+            self._thread.start()
+
+    def poll(self) -> int:
+        """Publish the changes to jobs since the last poll.
+
+        :return: The number of subscribers events were delivered to.
+        """
+        delivered = 0
+        for job in self.store.updated_since(self.since - OVERLAP):
+            state = (job["status"], job["succeeded"], job["failed"])
+            previous = self._published.get(job["id"])
+            if previous is not None and previous[0] == state:
+                continue
+
+            self._published[job["id"]] = (state, job["updated_at"])
+            self.since = max(self.since, job["updated_at"])
+            delivered += self.broker.publish(job_topic(job["id"]), *progress_event(job))
+            if (
+                job["kind"] == MIGRATION
+                and job["succeeded"]
+                and (previous is None or previous[0][1] != job["succeeded"])
+            ):
+                delivered += self.broker.publish(LISTING_TOPIC, "changed", {})
+
+        # Jobs updated before the overlap are not read again, so need not be remembered.
+        horizon = self.since - OVERLAP
+        self._published = {job_id: entry for job_id, entry in self._published.items() if entry[1] > horizon}
+        return delivered
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self.broker.subscribers:
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Unable to read the progress of jobs")
+            time.sleep(self.interval)
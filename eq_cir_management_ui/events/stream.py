@@ -0,0 +1,111 @@
+"""Server-sent event streams of the events published to a topic of the worker's event broker."""
+
+import json
+import time
+from collections.abc import Callable, Iterator, Sequence
+
+from flask import Response, current_app, request
+
+from eq_cir_management_ui.errors.pages import render_error_page
+from eq_cir_management_ui.events.broker import Event, EventBroker, Subscription
+
+# The id of a stream's final event. A browser reconnecting after it is told not to reconnect again.
+FINAL_EVENT_ID = "final"
+
+# An event stream, or a response with no stream.
+EventResponse = Response | tuple[bytes, int, dict[str, str]]
+
+
+def format_event(event: Event, event_id: str | None = None) -> bytes:
+    """Encode an event in the server-sent events format.
+
+    :param event: The name and data of the event.
+    :param event_id: The id of the event, sent back by a reconnecting browser.
+    :return: The encoded event.
+    """
+    name, data = event
+    id_field = f"id: {event_id}\n" if event_id else ""
+    return f"{id_field}event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+def event_stream(  # pylint: disable=too-many-arguments
+    subscription: Subscription | None,
+    initial: Sequence[Event],
+    *,
+    final: Callable[[Event], bool],
+    heartbeat: float,
+    max_duration: float,
+    retry: int,
+) -> Iterator[bytes]:
+    """Stream the initial events, then the subscription's events, until a final event or the
+    stream's maximum duration. A comment is sent after ``heartbeat`` seconds without events, so
+    proxies keep the connection open, and a browser which has gone is noticed, as the write fails.
+
+    :param subscription: The subscription, or None to send only the initial events.
+    :param initial: The events sent first, such as the current state.
+    :param final: Whether an event is the last of the stream.
+    :param heartbeat: Seconds without events before a heartbeat is sent.
+    :param max_duration: Seconds after which the stream ends, for the browser to reconnect.
+    :param retry: Milliseconds the browser waits before reconnecting.
+    :return: The encoded stream.
+    """
+    yield f"retry: {retry}\n\n".encode()
+    for event in initial:
+        if final(event):
+            yield format_event(event, FINAL_EVENT_ID)
+            return
+        yield format_event(event)
+    if subscription is None:
+        return
+
+    deadline = time.monotonic() + max_duration
+    while (remaining := deadline - time.monotonic()) > 0:
+        events = subscription.get(min(heartbeat, remaining))
+        if not events:
+            yield b": heartbeat\n\n"
+        for event in events:
+            if final(event):
+                yield format_event(event, FINAL_EVENT_ID)
+                return
+            yield format_event(event)
+
+
+def event_response(topic: str, initial: Sequence[Event], final: Callable[[Event], bool]) -> EventResponse:
+    """A server-sent event stream of a topic, subscribed to unless an initial event is final.
+
+    A stream holds a worker thread under gthread workers, so streams end after
+    EVENTS_MAX_DURATION, and each worker serves at most its broker's maximum of subscribers.
+
+    :param topic: The topic.
+    :param initial: The events sent first, such as the current state.
+    :param final: Whether an event is the last of the stream.
+    :return: The streamed response, 204 if the browser is reconnecting after the final event,
+        or 503 if the worker has its maximum of streams open.
+    """
+    if request.headers.get("Last-Event-ID") == FINAL_EVENT_ID:
+        return b"", 204, {}
+
+    config = current_app.config
+    subscription = None
+    if not any(final(event) for event in initial):
+        broker: EventBroker = current_app.extensions["event_broker"]
+        subscription = broker.subscribe(topic)
+        if subscription is None:
+            return render_error_page(503), 503, {"Retry-After": str(config["EVENTS_RETRY"] // 1000 or 1)}
+
+    response = Response(
+        event_stream(
+            subscription,
+            initial,
+            final=final,
+            heartbeat=config["EVENTS_HEARTBEAT_INTERVAL"],
+            max_duration=config["EVENTS_MAX_DURATION"],
+            retry=config["EVENTS_RETRY"],
+        ),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+    if subscription is not None:
+        # On close, rather than when the stream ends, as the stream is not started if the browser goes first.
+        response.call_on_close(subscription.close)
+    return response
@@ -0,0 +1,65 @@
+"""Bulk migration of collection instruments, run as a background job.
+
+Each item of a migration job is the guid of a collection instrument version. The version is
+fetched from the CIR API, transformed for the job's target data version, and published as a new
+version of the collection instrument, unless the latest version already has that data version,
+so an item run again after its job was interrupted does not publish twice.
+
+The default transform, ``stamp_data_version``, only stamps the target data version on the
+document. A migration whose data version changes the document's schema passes its own
+transform to ``migration_handler``.
+"""
+
+from collections.abc import Callable
+from typing import Any
+
+from structlog import get_logger
+
+from eq_cir_management_ui.cir_api.client import CirApiClient
+from eq_cir_management_ui.jobs.runner import Handler
+
+logger = get_logger()
+
+MIGRATION = "migration"
+
+# Transforms a collection instrument document for a data version, returning the new document.
+Transform = Callable[[dict[str, Any], str], dict[str, Any]]
+
+
+def stamp_data_version(document: dict[str, Any], data_version: str) -> dict[str, Any]:
+    """Stamp a data version on a collection instrument document, leaving the rest of the document
+    as it is. The published version's id is left out, as the CIR API assigns the new version its
+    own.
+
+    :param document: The document, which is not modified, as it may be cached.
+    :param data_version: The data version to migrate to.
+    :return: The stamped document.
+    """
+    return {key: value for key, value in document.items() if key != "id"} | {"data_version": data_version}
+
+
+def migration_handler(client: CirApiClient, transform: Transform = stamp_data_version) -> Handler:
+    """The handler of migration jobs, whose options name the ``data_version`` to migrate to.
+
+    :param client: The client for the CIR API.
+    :param transform: Transforms each document for the data version.
+    :return: The handler.
+    """
+
+    def migrate(guid: str, options: dict[str, Any]) -> None:
+        document = client.get_collection_instrument(guid)
+        data_version = options["data_version"]
+        # Read past the caches, which may not have seen a version published moments ago.
+        versions = client.get_ci_versions(
+            document["survey_id"],
+            document["form_type"],
+            document["language"],
+            cached=False,
+        )
+        latest = max(versions, key=lambda version: version["ci_version"], default=None)
+        if latest is not None and latest["data_version"] == data_version:
+            logger.info("Collection instrument already migrated", guid=guid, data_version=data_version)
+            return
+        client.publish_collection_instrument(transform(document, data_version))
+
+    return migrate
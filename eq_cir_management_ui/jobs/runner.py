@@ -0,0 +1,273 @@
+"""Runs background jobs in a worker process, on a bounded pool of threads.
+
+A supervisor thread claims jobs from the store, up to ``max_active`` at a time, and runs each
+on a thread of its own. A job's thread hands its items to the pool shared by every job,
+keeping at most the job's ``concurrency`` items in flight, and records their outcomes in
+batches, of ``batch_size`` items or every ``flush_interval`` seconds, which renews its lease.
+
+Items are run at least once: an item whose outcome was not recorded before its process
+stopped is run again when the job is resumed, so handlers should tolerate a repeat.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from structlog import get_logger
+
+from eq_cir_management_ui.jobs.store import FAILED, SUCCEEDED, ItemResult, JobStore
+from eq_cir_management_ui.metrics.registry import Counter
+
+logger = get_logger()
+
+JOB_ITEMS = Counter("job_items", "Items of background jobs run, by kind of job and outcome.", ["kind", "status"])
+
+# Runs an item of a job, given the job's options, raising if the item failed.
+Handler = Callable[[str, dict[str, Any]], None]
+
+
+class JobRunner:  # pylint: disable=too-many-instance-attributes
+    """Claims jobs from the store and runs their items with the handler for their kind.
+
+    Threads are started on first use in each process, so none are started in a gunicorn master
+    which preloads the application, and a forked worker starts its own.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        store: JobStore,
+        handlers: Mapping[str, Handler],
+        *,
+        max_workers: int = 8,
+        max_active: int = 2,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        lease: float = 30.0,
+    ) -> None:
+        """Create the runner.
+
+        :param store: The store of jobs.
+        :param handlers: The handler of each kind of job.
+        :param max_workers: Threads running items, shared by every job.
+        :param max_active: Jobs run at once.
+        :param batch_size: Items whose outcomes are recorded together.
+        :param flush_interval: Most seconds between recording a job's progress.
+        :param lease: Seconds a job is held without its progress being recorded, before
+            another process may resume it.
+        """
+        self.store = store
+        self.handlers = handlers
+        self.max_workers = max_workers
+        self.max_active = max_active
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lease = lease
+        # The threads running the active jobs, keyed on job id, guarded by the lock.
+        self.active: dict[str, threading.Thread] = {}
+        self._pid: int | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._supervisor: threading.Thread | None = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, items: Sequence[str], options: dict[str, Any], concurrency: int) -> str:
+        """Queue a job, to be run by the first process with capacity for it.
+
+        :param kind: The kind of job.
+        :param items: The items of the job.
+        :param options: Options passed to the handler with every item.
+        :param concurrency: The number of the job's items run at once.
+        :return: The id of the job.
+        """
+        if kind not in self.handlers:
+            msg = f"No handler for jobs of kind {kind!r}"
+            raise ValueError(msg)
+        job_id = self.store.create(kind, items, options, concurrency)
+        self.start()
+        self._wake.set()
+        return job_id
+
+    def start(self) -> None:
+        """Start claiming and running jobs in this process, if not already started."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.active = {}
+            self._wake = threading.Event()
+            self._stopping = threading.Event()
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="jobs")
+            self._supervisor = threading.Thread(
+                target=self._supervise,
+                args=(self._executor, self._stopping),
+                name="jobs-supervisor",
+                daemon=True,
+            )
+            self._supervisor.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop claiming jobs, and stop running the active jobs once their items in flight have
+        finished. Their progress is recorded and their leases released, so another process
+        resumes them at once.
+
+        :param timeout: Most seconds to wait for the items in flight.
+        """
+        with self._lock:
+            if self._pid != os.getpid() or self._executor is None or self._supervisor is None:
+                return
+            self._pid = None
+            self._stopping.set()
+            self._wake.set()
+            executor, supervisor = self._executor, self._supervisor
+
+        # Joined without the lock, which the jobs take as they finish. Once the supervisor has
+        # stopped, no job is added.
+        deadline = time.monotonic() + timeout
+        supervisor.join(timeout)
+        with self._lock:
+            threads = list(self.active.values())
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _supervise(self, executor: ThreadPoolExecutor, stopping: threading.Event) -> None:
+        """Claim jobs while there is capacity for them, checking for jobs queued by other
+        processes, or abandoned by them, several times per lease.
+
+        :param executor: The pool running the items.
+        :param stopping: Set when the runner is stopping.
+        """
+        while not stopping.is_set():
+            self._wake.clear()
+            try:
+                while self._has_capacity() and (job := self.store.claim(self.lease)) is not None:
+                    job_id = job[0]
+                    thread = threading.Thread(
+                        target=self._run,
+                        args=(RunningJob(self, *job), executor, stopping),
+                        name=f"job-{job_id[:8]}",
+                        daemon=True,
+                    )
+                    with self._lock:
+                        self.active[job_id] = thread
+                    thread.start()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception("Unable to claim jobs")
+            self._wake.wait(self.lease / 3)
+
+    def _run(self, job: "RunningJob", executor: ThreadPoolExecutor, stopping: threading.Event) -> None:
+        """Run a claimed job, then make room for the next one."""
+        try:
+            job.run(executor, stopping)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Job stopped unexpectedly", job_id=job.job_id, kind=job.kind)
+            self._release(job.job_id)
+        finally:
+            with self._lock:
+                self.active.pop(job.job_id, None)
+            self._wake.set()
+
+    def _has_capacity(self) -> bool:
+        with self._lock:
+            return len(self.active) < self.max_active
+
+    def _release(self, job_id: str) -> None:
+        """Hand a job which stopped unexpectedly to another process at once, rather than once its lease lapses."""
+        try:
+            self.store.release(job_id, elsewhere=True)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Unable to release the job", job_id=job_id)
+
+
+class RunningJob:  # pylint: disable=too-many-instance-attributes
+    """A job while it is run by this process."""
+
+    def __init__(
+        self,
+        runner: JobRunner,
+        job_id: str,
+        kind: str,
+        options: dict[str, Any],
+        concurrency: int,
+    ) -> None:
+        self.runner = runner
+        self.store = runner.store
+        self.job_id = job_id
+        self.kind = kind
+        self.options = options
+        self.handler = runner.handlers[kind]
+        self.concurrency = concurrency
+        self.slots = threading.Semaphore(concurrency)
+        # Appended to by the pool's threads, and emptied by the job's thread.
+        self.results: deque[ItemResult] = deque()
+        self.recorded_at = time.monotonic()
+        self.owned = True
+
+    def run(self, executor: ThreadPoolExecutor, stopping: threading.Event) -> None:
+        """Run the job's pending items, then finish the job, or release it if the runner is stopping.
+
+        :param executor: The pool running the items.
+        :param stopping: Set when the runner is stopping.
+        """
+        for position, item in self.store.pending_items(self.job_id):
+            self.take_slot()
+            if len(self.results) >= self.runner.batch_size or self.flush_due():
+                self.record()
+            if stopping.is_set() or not self.owned:
+                self.slots.release()
+                break
+            executor.submit(self.run_item, position, item)
+
+        # Wait for the items in flight, by taking every slot.
+        for _ in range(self.concurrency):
+            self.take_slot()
+        self.record()
+
+        if not self.owned:
+            logger.warning("Job was resumed by another process", job_id=self.job_id, kind=self.kind)
+        elif stopping.is_set() and self.store.pending_items(self.job_id):
+            self.store.release(self.job_id)
+            logger.info("Job released for another process to resume", job_id=self.job_id, kind=self.kind)
+        else:
+            logger.info("Job finished", job_id=self.job_id, kind=self.kind, status=self.store.finish(self.job_id))
+
+    def run_item(self, position: int, item: str) -> None:
+        """Run an item, on a thread of the pool, and free its slot once its outcome is kept."""
+        try:
+            result = self.outcome(position, item)
+            self.results.append(result)
+            JOB_ITEMS.inc(kind=self.kind, status=result[1])
+        finally:
+            self.slots.release()
+
+    def outcome(self, position: int, item: str) -> ItemResult:
+        """Run an item with the job's handler.
+
+        :return: The position, status and error of the item.
+        """
+        try:
+            self.handler(item, self.options)
+        except Exception as exception:  # noqa: BLE001 pylint: disable=broad-exception-caught
+            return position, FAILED, str(exception) or repr(exception)
+        return position, SUCCEEDED, None
+
+    def take_slot(self) -> None:
+        """Wait for a slot for an item, recording progress, and so renewing the lease, while waiting."""
+        while not self.slots.acquire(timeout=self.runner.flush_interval):  # pylint: disable=consider-using-with
+            self.record()
+
+    def flush_due(self) -> bool:
+        """Whether progress has not been recorded for the flush interval."""
+        return time.monotonic() - self.recorded_at >= self.runner.flush_interval
+
+    def record(self) -> None:
+        """Record the outcomes of the items finished since progress was last recorded."""
+        results = [self.results.popleft() for _ in range(len(self.results))]
+        self.recorded_at = time.monotonic()
+        if self.owned:
+            self.owned = self.store.record(self.job_id, results, self.runner.lease)
@@ -0,0 +1,262 @@
+"""A SQLite store of background jobs, their items and their progress.
+
+The database is a local file shared by every worker on the host. A job is run by one process
+at a time, which holds a lease on it and renews the lease as it records progress. A job whose
+lease has lapsed, because its process was stopped or died, is claimed by another process,
+which runs only the items not yet recorded as finished.
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import Iterator, Sequence
+from typing import Any
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    concurrency INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    succeeded INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, lease_expires);
+CREATE INDEX IF NOT EXISTS jobs_by_updated_at ON jobs (updated_at);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+# Job statuses. A job is queued until a process claims it, and running until its items are finished.
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+FINISHED = (COMPLETED, FAILED)
+# Item statuses, an item is pending until it has succeeded or failed.
+PENDING = "pending"
+SUCCEEDED = "succeeded"
+
+JOB_COLUMNS = (
+    "id",
+    "kind",
+    "status",
+    "concurrency",
+    "total",
+    "succeeded",
+    "failed",
+    "attempts",
+    "created_at",
+    "updated_at",
+)
+SELECT_JOBS = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs"  # noqa: S608
+
+# The outcome of an item: its position in the job, its status and the error if it failed.
+ItemResult = tuple[int, str, str | None]
+
+
+class JobStore:
+    """Jobs, their items and their progress, in a SQLite database in write-ahead logging mode,
+    so reading a job's progress never waits for the process recording it.
+
+    The connection is opened on first use, and used by one thread at a time. A forked process
+    opens its own.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._token = uuid.uuid4().hex[:8]
+        self._pid: int | None = None
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def owner(self) -> str:
+        """The owner of the leases this process holds, as a forked process holds its own."""
+        return f"{os.getpid()}-{self._token}"
+
+    def create(self, kind: str, items: Sequence[str], options: dict[str, Any], concurrency: int) -> str:
+        """Queue a job.
+
+        :param kind: The kind of job, naming the handler which runs its items.
+        :param items: The items, each passed to the handler in turn.
+        :param options: Options passed to the handler with every item.
+        :param concurrency: The number of the job's items run at once.
+        :return: The id of the job.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, kind, options, status, concurrency, total, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(options), QUEUED, concurrency, len(items), now, now),
+            )
+            connection.executemany(
+                "INSERT INTO job_items (job_id, position, item, status) VALUES (?, ?, ?, ?)",
+                ((job_id, position, item, PENDING) for position, item in enumerate(items)),
+            )
+        return job_id
+
+    def claim(self, lease: float) -> tuple[str, str, dict[str, Any], int] | None:
+        """Take the oldest job which is queued, or whose lease held by another process has lapsed.
+        This process's own lapsed leases are left, as their jobs may still be running here.
+
+        :param lease: Seconds the claim lasts unless renewed.
+        :return: The id, kind, options and concurrency of the job, or None if there is none to claim.
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            # One statement, so two processes claiming at once cannot both take the job.
+            row = connection.execute(
+                "UPDATE jobs SET status = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?"
+                " WHERE id = (SELECT id FROM jobs"
+                "  WHERE status = ? OR (status = ? AND lease_expires < ? AND owner IS NOT ?)"
+                "  ORDER BY created_at LIMIT 1)"
+                " RETURNING id, kind, options, concurrency",
+                (RUNNING, self.owner, now + lease, now, QUEUED, RUNNING, now, self.owner),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, options, concurrency = row
+        return job_id, kind, json.loads(options), concurrency
+
+    def pending_items(self, job_id: str) -> list[tuple[int, str]]:
+        """The items of a job which have not finished.
+
+        :param job_id: The job.
+        :return: The position and item of each, in order.
+        """
+        with self._transaction() as connection:
+            return connection.execute(
+                "SELECT position, item FROM job_items WHERE job_id = ? AND status = ? ORDER BY position",
+                (job_id, PENDING),
+            ).fetchall()
+
+    def record(self, job_id: str, results: Sequence[ItemResult], lease: float) -> bool:
+        """Record the outcome of a batch of items and the job's progress in one transaction, and
+        renew this process's lease on the job.
+
+        :param job_id: The job.
+        :param results: The position, status and error of each finished item.
+        :param lease: Seconds the lease lasts unless renewed again.
+        :return: Whether this process still held the lease, nothing is recorded if not.
+        """
+        now = time.time()
+        succeeded = sum(1 for _, status, _ in results if status == SUCCEEDED)
+        with self._transaction() as connection:
+            renewed = connection.execute(
+                "UPDATE jobs SET succeeded = succeeded + ?, failed = failed + ?, lease_expires = ?, updated_at = ?"
+                " WHERE id = ? AND owner = ? AND status = ?",
+                (succeeded, len(results) - succeeded, now + lease, now, job_id, self.owner, RUNNING),
+            ).rowcount
+            if renewed:
+                connection.executemany(
+                    "UPDATE job_items SET status = ?, error = ? WHERE job_id = ? AND position = ?",
+                    ((status, error, job_id, position) for position, status, error in results),
+                )
+        return bool(renewed)
+
+    def release(self, job_id: str, *, elsewhere: bool = False) -> None:
+        """Give up this process's lease on an unfinished job, so another process resumes it at once.
+
+        :param job_id: The job.
+        :param elsewhere: Whether only other processes may resume it, as when it stopped
+            unexpectedly here, and this process would only stop it again.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET owner = ?, lease_expires = 0, updated_at = ?"
+                " WHERE id = ? AND owner = ? AND status = ?",
+                (self.owner if elsewhere else None, time.time(), job_id, self.owner, RUNNING),
+            )
+
+    def finish(self, job_id: str) -> str:
+        """Mark a job finished, as failed if any of its items failed.
+
+        :param job_id: The job.
+        :return: The job's final status.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = CASE WHEN failed > 0 THEN ? ELSE ? END, owner = NULL, updated_at = ?"
+                " WHERE id = ? AND owner = ?",
+                (FAILED, COMPLETED, time.time(), job_id, self.owner),
+            )
+            status: str = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        return status
+
+    def get(self, job_id: str, max_errors: int = 20) -> dict[str, Any] | None:
+        """A job, its progress and the errors of its first failed items.
+
+        :param job_id: The job.
+        :param max_errors: The number of failed items to include.
+        :return: The job, or None if there is no such job.
+        """
+        with self._transaction() as connection:
+            row = connection.execute(f"{SELECT_JOBS} WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            errors = connection.execute(
+                "SELECT item, error FROM job_items WHERE job_id = ? AND status = ? ORDER BY position LIMIT ?",
+                (job_id, FAILED, max_errors),
+            ).fetchall()
+        return dict(zip(JOB_COLUMNS, row, strict=True)) | {"errors": [{"item": i, "error": e} for i, e in errors]}
+
+    def recent(self, limit: int = 50) -> list[dict[str, Any]]:
+        """The most recently created jobs and their progress.
+
+        :param limit: The number of jobs.
+        :return: The jobs, newest first.
+        """
+        with self._transaction() as connection:
+            rows = connection.execute(f"{SELECT_JOBS} ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(zip(JOB_COLUMNS, row, strict=True)) for row in rows]
+
+    def updated_since(self, since: float) -> list[dict[str, Any]]:
+        """The jobs whose status or progress has changed since a time.
+
+        :param since: The time, in seconds since the epoch.
+        :return: The jobs, least recently updated first.
+        """
+        with self._transaction() as connection:
+            rows = connection.execute(f"{SELECT_JOBS} WHERE updated_at > ? ORDER BY updated_at", (since,)).fetchall()
+        return [dict(zip(JOB_COLUMNS, row, strict=True)) for row in rows]
+
+    def close(self) -> None:
+        """Close this process's connection, a later call opens another."""
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """This process's connection, in a transaction which commits, or rolls back on an error."""
+        if self._pid != os.getpid():
+            # The connection and lock of the parent process are not used after a fork.
+            self._pid, self._connection, self._lock = os.getpid(), None, threading.Lock()
+        with self._lock:
+            if self._connection is None:
+                self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+                self._connection.execute("PRAGMA journal_mode = WAL")
+                self._connection.executescript(SCHEMA)
+            with self._connection:
+                yield self._connection
@@ -1,33 +1,149 @@
 """Routes for the EQ CIR Management UI."""
 
-import logging
+from itertools import islice
 
 from flask import (
     Blueprint,
-    render_template,
+    Response,
+    abort,
+    current_app,
+    jsonify,
     request,
 )
+from structlog import get_logger
+
+from eq_cir_management_ui.cir_api.client import CirApiError
+from eq_cir_management_ui.cir_api.sources import CI_KEY_TYPES, ci_key, ci_metadata_source
+from eq_cir_management_ui.config.logging_config import REQUEST_RECEIVED_EVENT
+from eq_cir_management_ui.diff.engine import diff_trees
+from eq_cir_management_ui.diff.versions import version_tree
+from eq_cir_management_ui.events.jobs import LISTING_TOPIC, JobProgressSource
+from eq_cir_management_ui.events.stream import EventResponse, event_response
+from eq_cir_management_ui.search.index import FACETS
+from eq_cir_management_ui.search.refresh import IndexRefresher
+from eq_cir_management_ui.templating.page_cache import render_cached_template
+from eq_cir_management_ui.templating.streaming import stream_page
+from eq_cir_management_ui.utils.pagination import KeysetPage, decode_cursor
 
 main_blueprint = Blueprint("main", __name__)
 
-logger = logging.getLogger(__name__)
+logger = get_logger()
 
 
 @main_blueprint.before_request
 def before_request_func() -> None:
-    """Log the request before it is processed."""
-    if request.endpoint != "status":
-        message = "Request received"
-        logger.info(message)
+    """Log the request before it is processed. Status checks are not logged."""
+    if request.endpoint != "main.status":
+        logger.info(REQUEST_RECEIVED_EVENT, method=request.method, path=request.path)
 
 
 @main_blueprint.route("/", methods=["GET"])
-def index() -> str:
+def index() -> bytes:
     """UI index.
 
     :return: 200 index page.
     """
-    return render_template("index.html")
+    return render_cached_template("index.html")
+
+
+@main_blueprint.route("/collection-instruments", methods=["GET"])
+def collection_instruments() -> Response:
+    """Listing of the latest version of each collection instrument, a page at a time. The page
+    is streamed as its rows are fetched, so memory per request does not grow with its size.
+
+    Takes optional ``after``, the cursor of the page, and ``per_page`` query parameters.
+
+    :return: 200 streamed listing page, 400 for an invalid cursor, 503 if the CIR API fails.
+    """
+    try:
+        after = decode_cursor(request.args.get("after"), CI_KEY_TYPES)
+    except ValueError:
+        abort(400)
+    per_page = request.args.get("per_page", current_app.config["LISTING_PAGE_SIZE"], type=int)
+
+    page = KeysetPage(
+        ci_metadata_source(current_app.extensions["cir_api_client"]),
+        ci_key,
+        after=after,
+        size=min(per_page, current_app.config["LISTING_MAX_PAGE_SIZE"]),
+        batch_size=current_app.config["LISTING_BATCH_SIZE"],
+    )
+    try:
+        page.prefetch()
+    except CirApiError:
+        abort(503)
+    return stream_page("collection_instruments.html", page=page)
+
+
+@main_blueprint.route("/collection-instruments/diff", methods=["GET"])
+def collection_instrument_diff() -> Response:
+    """The changes between two versions of a collection instrument, such as before and after a
+    migration. The versions' hashed trees are fetched, or taken from the cache, before the page
+    starts, and the changes are found as the page is streamed.
+
+    Takes the ``base`` and ``target`` query parameters, the ids of the versions.
+
+    :return: 200 streamed diff page, 400 if a version is not given, 404 if one does not exist,
+        or 503 if the CIR API fails.
+    """
+    base, target = request.args.get("base"), request.args.get("target")
+    if not base or not target:
+        abort(400)
+
+    trees, client = current_app.extensions["document_trees"], current_app.extensions["cir_api_client"]
+    try:
+        old, new = version_tree(trees, client, base), version_tree(trees, client, target)
+    except CirApiError as error:
+        abort(404 if error.status == 404 else 503)
+
+    max_changes = current_app.config["DIFF_MAX_CHANGES"]
+    return stream_page(
+        "collection_instrument_diff.html",
+        base=old.value,
+        target=new.value,
+        changes=islice(diff_trees(old, new), max_changes + 1),
+        max_changes=max_changes,
+    )
+
+
+@main_blueprint.route("/collection-instruments/search", methods=["GET"])
+def collection_instrument_search() -> Response:
+    """Search the latest version of each collection instrument, in the worker's search index,
+    for the typeahead of the index page.
+
+    Takes optional ``q``, words which are prefixes of words of the survey id, form type or
+    title, ``survey_id``, ``form_type`` and ``language`` facets, and ``limit`` query parameters.
+
+    :return: 200 response with the number of matches and the metadata of the first, or 503 if
+        the index has not been built and the CIR API fails.
+    """
+    refresher: IndexRefresher = current_app.extensions["search_index"]
+    try:
+        search_index = refresher.current()
+    except CirApiError:
+        abort(503)
+
+    limit = request.args.get("limit", current_app.config["SEARCH_RESULTS"], type=int)
+    facets = {field: request.args[field] for field in FACETS if request.args.get(field)}
+    total, rows = search_index.search(
+        request.args.get("q", ""),
+        max(0, min(limit, current_app.config["SEARCH_MAX_RESULTS"])),
+        **facets,
+    )
+    return jsonify(total=total, results=rows)
+
+
+@main_blueprint.route("/collection-instruments/events", methods=["GET"])
+def collection_instrument_events() -> EventResponse:
+    """Stream a ``changed`` server-sent event each time a migration publishes new collection
+    instrument versions, so the listing page can offer to reload.
+
+    :return: 200 event stream, or 503 if the worker serving the request has its maximum of streams open.
+    """
+    response = event_response(LISTING_TOPIC, [], lambda _event: False)
+    source: JobProgressSource = current_app.extensions["job_progress"]
+    source.start()
+    return response
 
 
 @main_blueprint.route("/status", methods=["GET"])
@@ -36,5 +152,4 @@ def status() -> tuple[str, int]:
 
     :return: Empty 200 response.
     """
-    logger.info("Status check hit")
     return "", 200
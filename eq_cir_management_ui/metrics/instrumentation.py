@@ -0,0 +1,71 @@
+"""Request, template and error handler metrics for the application."""
+
+import threading
+import time
+
+from flask import Flask, Response, before_render_template, g, request, template_rendered
+from jinja2 import Template
+
+from eq_cir_management_ui.metrics.registry import REGISTRY, Counter, Histogram
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling requests, from the first Flask before_request hook to the response.",
+    ["endpoint", "method", "status"],
+)
+TEMPLATE_RENDER_DURATION = Histogram(
+    "template_render_duration_seconds",
+    "Time spent rendering Jinja templates.",
+    ["template"],
+)
+ERROR_HANDLER_INVOCATIONS = Counter(
+    "error_handler_invocations",
+    "Number of responses rendered by the error handlers.",
+    ["status"],
+)
+
+# Start times of templates being rendered on the current thread. A stack, as a template may
+# render another template.
+_render_starts = threading.local()
+
+
+def init_metrics(app: Flask) -> None:
+    """Record request and template render metrics for the application, and configure how they
+    are shared between worker processes.
+
+    :param app: The Flask application.
+    """
+    REGISTRY.configure(app.config["METRICS_MULTIPROCESS_DIR"], app.config["METRICS_FLUSH_INTERVAL"])
+
+    app.before_request(_start_request_timer)
+    app.after_request(_observe_request_duration)
+    before_render_template.connect(_start_render_timer, app)
+    template_rendered.connect(_observe_render_duration, app)
+
+
+def _start_request_timer() -> None:
+    g.request_start_time = time.perf_counter()
+
+
+def _observe_request_duration(response: Response) -> Response:
+    start = g.get("request_start_time")
+    if start is not None:
+        REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            endpoint=request.endpoint or "none",
+            method=request.method,
+            status=str(response.status_code),
+        )
+    return response
+
+
+def _start_render_timer(_: Flask, **__: object) -> None:
+    if not hasattr(_render_starts, "stack"):
+        _render_starts.stack = []
+    _render_starts.stack.append(time.perf_counter())
+
+
+def _observe_render_duration(_: Flask, template: Template, **__: object) -> None:
+    stack = getattr(_render_starts, "stack", None)
+    if stack:
+        TEMPLATE_RENDER_DURATION.observe(time.perf_counter() - stack.pop(), template=template.name or "none")
@@ -0,0 +1,192 @@
+"""Memory diagnostics of a worker process, and the resident memory budget which recycles a
+worker that outgrows it.
+"""
+
+import os
+import resource
+import signal
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+from flask import Flask
+from structlog import get_logger
+
+from eq_cir_management_ui.metrics.registry import Counter
+
+logger = get_logger()
+
+WORKER_RECYCLES = Counter(
+    "worker_recycles",
+    "Workers which asked gunicorn to replace them, by reason.",
+    ["reason"],
+)
+
+STATM_PATH = Path("/proc/self/statm")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def resident_memory() -> int:
+    """The resident set size of this process. Where /proc is not available, the peak resident
+    set size is returned instead.
+
+    :return: The size in bytes.
+    """
+    try:
+        return int(STATM_PATH.read_text(encoding="ascii").split()[1]) * PAGE_SIZE
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def memory_report(app: Flask) -> dict[str, Any]:
+    """Report the memory of this worker: its resident set size, and the occupancy of each of
+    the application's in-process caches.
+
+    :param app: The Flask application.
+    :return: The report.
+    """
+    jinja_cache = app.jinja_env.cache
+    response_cache = app.extensions["cir_api_client"].cache
+    shared_cache = app.extensions["cir_api_client"].shared_cache
+    search_index = app.extensions["search_index"].index
+    budget: RssBudget | None = app.extensions.get("rss_budget")
+    traced, peak = tracemalloc.get_traced_memory()
+
+    return {
+        "pid": os.getpid(),
+        "rss": resident_memory(),
+        "rss_budget": budget.limit if budget is not None else None,
+        "caches": {
+            "jinja_templates": {
+                "entries": len(jinja_cache) if jinja_cache is not None else 0,
+                "capacity": getattr(jinja_cache, "capacity", None),
+            },
+            "pages": {
+                "entries": len(app.extensions["page_cache"]),
+                "capacity": app.extensions["page_cache"].max_entries,
+                "bytes": app.extensions["page_cache"].size,
+            },
+            "error_pages": {
+                "entries": len(app.extensions["error_pages"]),
+                "bytes": app.extensions["error_pages"].size,
+            },
+            "static_assets": {
+                "entries": len(app.extensions["static_assets"]),
+                "bytes": app.extensions["static_assets"].size,
+            },
+            "cir_api_responses": (
+                {"entries": len(response_cache), "capacity": response_cache.max_entries}
+                if response_cache is not None
+                else None
+            ),
+            # Mapped once per host, and only resident for the slots written.
+            "shared_responses": {"bytes": shared_cache.size} if shared_cache is not None else None,
+            "search_index": {"entries": len(search_index), "capacity": search_index.capacity},
+            "document_trees": {
+                "entries": len(app.extensions["document_trees"]),
+                "capacity": app.extensions["document_trees"].max_entries,
+            },
+            "upload_reports": {
+                "entries": len(app.extensions["upload_cache"]),
+                "capacity": app.extensions["upload_cache"].max_entries,
+            },
+        },
+        "tracemalloc": {"tracing": tracemalloc.is_tracing(), "traced": traced, "peak": peak},
+    }
+
+
+class AllocationTracker:
+    """Traces allocations with tracemalloc between a baseline snapshot and later snapshots.
+
+    Tracing slows every allocation, so it only runs from ``start`` until ``stop``.
+    """
+
+    def __init__(self, frames: int = 1) -> None:
+        self.frames = frames
+        self.baseline: tracemalloc.Snapshot | None = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start tracing, if it is not already, and take the baseline snapshot."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            self.baseline = self.take_snapshot()
+
+    def diff(self, limit: int = 20) -> list[dict[str, Any]] | None:
+        """Compare a new snapshot with the baseline.
+
+        :param limit: The number of source lines to report.
+        :return: The source lines whose allocations grew or shrank the most since the baseline,
+            or None if there is no baseline.
+        """
+        with self._lock:
+            if self.baseline is None:
+                return None
+            differences = self.take_snapshot().compare_to(self.baseline, "lineno")
+
+        return [
+            {
+                "location": str(difference.traceback),
+                "size": difference.size,
+                "size_diff": difference.size_diff,
+                "count": difference.count,
+                "count_diff": difference.count_diff,
+            }
+            for difference in differences[:limit]
+        ]
+
+    def stop(self) -> None:
+        """Stop tracing and discard the baseline."""
+        with self._lock:
+            tracemalloc.stop()
+            self.baseline = None
+
+    @staticmethod
+    def take_snapshot() -> tracemalloc.Snapshot:
+        """Take a snapshot, without the allocations made by tracemalloc itself."""
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(inclusive=False, filename_pattern=tracemalloc.__file__),),
+        )
+
+
+class RssBudget:  # pylint: disable=too-few-public-methods
+    """Recycles a gunicorn worker whose resident memory grows beyond a budget.
+
+    The worker's memory is read at most once per interval, after a request. Once it is over
+    budget, the worker sends itself SIGTERM, on which gunicorn stops it accepting requests,
+    lets its requests in flight finish, and starts a replacement.
+    """
+
+    def __init__(self, limit: int, interval: float = 5.0) -> None:
+        """Create the budget.
+
+        :param limit: Bytes of resident memory the worker may use.
+        :param interval: Seconds between reads of the worker's memory.
+        """
+        self.limit = limit
+        self.interval = interval
+        self.exceeded = False
+        self._next_check = 0.0
+
+    def check(self) -> bool:
+        """Read the worker's memory, if it is due, and recycle the worker if it is over budget.
+
+        :return: Whether the worker was asked to stop.
+        """
+        now = time.monotonic()
+        if self.exceeded or now < self._next_check:
+            return False
+        self._next_check = now + self.interval
+
+        rss = resident_memory()
+        if rss <= self.limit:
+            return False
+
+        self.exceeded = True
+        WORKER_RECYCLES.inc(reason="rss_budget")
+        logger.warning("Worker memory budget exceeded, recycling worker", rss=rss, budget=self.limit)
+        os.kill(os.getpid(), signal.SIGTERM)
+        return True
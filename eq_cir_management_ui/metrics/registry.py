@@ -0,0 +1,371 @@
+"""A small Prometheus compatible metrics registry, which aggregates across worker processes.
+
+Every process keeps its metrics in memory. When a multiprocess directory is configured, a
+background thread periodically writes a snapshot of the process's metrics to a file in that
+directory, and a scrape sums the snapshots of every process with the live values of the
+process serving it. An exiting worker folds its values into a single snapshot of every exited
+worker and removes its own, so counters never go backwards, and the directory does not gain a
+file for each worker ever started.
+"""
+
+import contextlib
+import fcntl
+import json
+import logging
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0, math.inf)
+
+# The values of a metric keyed on its label values, in the order of its label names.
+Samples = dict[tuple[str, ...], list[float]]
+# The values of every metric, as written to a snapshot file.
+Snapshot = dict[str, list[list[Any]]]
+
+# The snapshot of the workers which have exited, and the file locked while it is updated.
+DEAD_SNAPSHOT = "dead.json"
+SNAPSHOTS_LOCK = "snapshots.lock"
+
+
+class Metric(ABC):
+    """A metric family with a fixed set of label names."""
+
+    metric_type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        registry: "Registry | None" = None,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._samples: Samples = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _label_values(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            msg = f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            raise ValueError(msg)
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Samples:
+        """Return a copy of the metric's values.
+
+        :return: The values keyed on label values.
+        """
+        with self._lock:
+            return {labels: list(values) for labels, values in self._samples.items()}
+
+    def reset(self) -> None:
+        """Discard every recorded value. The lock is replaced, as after a fork it may have been
+        inherited in a locked state.
+        """
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    @abstractmethod
+    def expose(self, samples: Samples) -> list[str]:
+        """Render values of this metric in the Prometheus text format.
+
+        :param samples: The values to render.
+        :return: The exposition lines.
+        """
+
+
+class Counter(Metric):
+    """A monotonically increasing count."""
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increment the counter.
+
+        :param amount: The amount to increase the counter by.
+        :param labels: The label values.
+        """
+        key = self._label_values(labels)
+        with self._lock:
+            values = self._samples.setdefault(key, [0.0])
+            values[0] += amount
+
+    def expose(self, samples: Samples) -> list[str]:
+        """Render the counter in the Prometheus text format."""
+        return [
+            f"{self.name}_total{format_labels(self.labelnames, labels)} {format_value(values[0])}"
+            for labels, values in sorted(samples.items())
+        ]
+
+
+class Histogram(Metric):
+    """A distribution of observations, counted in cumulative buckets.
+
+    Values are stored as the per-bucket counts followed by the sum of the observations.
+    """
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        registry: "Registry | None" = None,
+        *,
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        if self.buckets[-1] != math.inf:
+            self.buckets += (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation.
+
+        :param value: The observed value.
+        :param labels: The label values.
+        """
+        key = self._label_values(labels)
+        bucket = next(index for index, upper_bound in enumerate(self.buckets) if value <= upper_bound)
+        with self._lock:
+            values = self._samples.setdefault(key, [0.0] * (len(self.buckets) + 1))
+            values[bucket] += 1
+            values[-1] += value
+
+    def expose(self, samples: Samples) -> list[str]:
+        """Render the histogram in the Prometheus text format."""
+        lines = []
+        for labels, values in sorted(samples.items()):
+            cumulative = 0.0
+            for upper_bound, count in zip(self.buckets, values, strict=False):
+                cumulative += count
+                bucket_labels = format_labels((*self.labelnames, "le"), (*labels, format_value(upper_bound)))
+                lines.append(f"{self.name}_bucket{bucket_labels} {format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(values[-1])}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {format_value(cumulative)}")
+        return lines
+
+
+class Registry:
+    """A collection of metrics, optionally shared between the processes of a gunicorn server."""
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+        self.directory: Path | None = None
+        self.flush_interval = 1.0
+        self._flusher: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # Held while writing this process's snapshot, so none is written once it has retired.
+        self._flush_lock = threading.Lock()
+        os.register_at_fork(after_in_child=self.reset_after_fork)
+
+    def register(self, metric: Metric) -> None:
+        """Add a metric to the registry.
+
+        :param metric: The metric.
+        """
+        if metric.name in self.metrics:
+            msg = f"Metric {metric.name} is already registered"
+            raise ValueError(msg)
+        self.metrics[metric.name] = metric
+
+    def configure(self, directory: str | None, flush_interval: float = 1.0) -> None:
+        """Share metrics between processes through snapshot files in the given directory.
+
+        :param directory: The directory to write snapshots to, or None to only report this process.
+        :param flush_interval: Seconds between snapshots.
+        """
+        self.flush_interval = flush_interval
+        self.directory = Path(directory) if directory else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._start_flusher()
+
+    @property
+    def snapshot_path(self) -> Path | None:
+        """The snapshot file of this process."""
+        return self.directory / f"worker-{os.getpid()}.json" if self.directory else None
+
+    def snapshot(self) -> Snapshot:
+        """Serialisable copy of every metric value in this process."""
+        return to_snapshot({name: metric.samples() for name, metric in self.metrics.items()})
+
+    def flush(self) -> None:
+        """Write this process's snapshot, atomically replacing the previous one."""
+        with self._flush_lock:
+            path = self.snapshot_path
+            if path is not None:
+                write_snapshot(path, self.snapshot())
+
+    def retire(self) -> None:
+        """Fold this process's values into the snapshot of the exited workers, and remove its
+        own snapshot, as a worker does when it exits. No snapshot is written afterwards.
+        """
+        with self._flush_lock:
+            directory, path = self.directory, self.snapshot_path
+            # Stops the flusher.
+            self.directory = None
+            if directory is None or path is None:
+                return
+
+            with snapshots_locked(directory, fcntl.LOCK_EX):
+                dead_path = directory / DEAD_SNAPSHOT
+                totals: dict[str, Samples] = {}
+                if dead_path.exists():
+                    add_snapshot(totals, read_snapshot(dead_path) or {})
+                add_snapshot(totals, self.snapshot())
+                write_snapshot(dead_path, to_snapshot(totals))
+                path.unlink(missing_ok=True)
+
+    def collect(self) -> dict[str, Samples]:
+        """Sum the live values of this process with the snapshots of every other process, and
+        of the exited workers.
+
+        :return: The values of every metric keyed on metric name.
+        """
+        collected = {name: metric.samples() for name, metric in self.metrics.items()}
+        directory = self.directory
+        if directory is None:
+            return collected
+
+        # Read together, so a worker retiring meanwhile is counted once.
+        with snapshots_locked(directory, fcntl.LOCK_SH):
+            snapshots = [read_snapshot(path) for path in directory.glob("*.json") if path != self.snapshot_path]
+        for snapshot in snapshots:
+            add_snapshot(collected, snapshot or {}, known_only=True)
+        return collected
+
+    def generate_latest(self) -> str:
+        """Render every metric in the Prometheus text exposition format.
+
+        :return: The exposition text.
+        """
+        lines = []
+        for name, samples in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.metric_type}")
+            lines.extend(metric.expose(samples))
+        return "\n".join(lines) + "\n"
+
+    def _start_flusher(self) -> None:
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_periodically, name="metrics-flusher", daemon=True)
+                self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        while self.directory is not None:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Unable to write metrics snapshot")
+
+    def reset_after_fork(self) -> None:
+        """Start a forked process with empty metrics. Values recorded before the fork belong to
+        the parent, and the parent's flusher thread is not inherited.
+        """
+        for metric in self.metrics.values():
+            metric.reset()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        if self.directory:
+            self._start_flusher()
+
+
+@contextlib.contextmanager
+def snapshots_locked(directory: Path, operation: int) -> Iterator[None]:
+    """Lock the snapshots of a directory, shared to read them, or exclusively to retire one.
+
+    :param directory: The multiprocess metrics directory.
+    :param operation: ``fcntl.LOCK_SH`` or ``fcntl.LOCK_EX``.
+    """
+    # flock, unlike lockf, also excludes the other threads of this process, each with its own file.
+    with (directory / SNAPSHOTS_LOCK).open("a") as lock_file:
+        fcntl.flock(lock_file, operation)
+        yield
+
+
+def read_snapshot(path: Path) -> Snapshot | None:
+    """Read a snapshot file.
+
+    :param path: The file.
+    :return: The snapshot, or None if it cannot be read, which is logged.
+    """
+    try:
+        snapshot: Snapshot = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        logger.warning("Unable to read metrics snapshot %s", path.name)
+        return None
+    return snapshot
+
+
+def write_snapshot(path: Path, snapshot: Snapshot) -> None:
+    """Write a snapshot file, atomically replacing the previous one.
+
+    :param path: The file.
+    :param snapshot: The snapshot.
+    """
+    temporary_path = path.with_suffix(".tmp")
+    temporary_path.write_text(json.dumps(snapshot), encoding="utf-8")
+    temporary_path.replace(path)
+
+
+def to_snapshot(totals: dict[str, Samples]) -> Snapshot:
+    """The serialisable form of the values of each metric.
+
+    :param totals: The values of each metric.
+    :return: The snapshot.
+    """
+    return {name: [[list(labels), values] for labels, values in samples.items()] for name, samples in totals.items()}
+
+
+def add_snapshot(totals: dict[str, Samples], snapshot: Snapshot, *, known_only: bool = False) -> None:
+    """Add the values of a snapshot to totals.
+
+    :param totals: The values of each metric, added to.
+    :param snapshot: The snapshot.
+    :param known_only: Whether to skip metrics which are not already in the totals.
+    """
+    for name, samples in snapshot.items():
+        if known_only and name not in totals:
+            continue
+        metric_totals = totals.setdefault(name, {})
+        for labels, values in samples:
+            merged = metric_totals.setdefault(tuple(labels), [0.0] * len(values))
+            for index, value in enumerate(values):
+                merged[index] += value
+
+
+def format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    """Render label pairs, escaping the values as required by the exposition format."""
+    pairs = [f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values, strict=True)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape_label_value(value: str) -> str:
+    """Escape backslashes, new lines and double quotes in a label value."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    """Render a sample value as the exposition format expects."""
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+REGISTRY = Registry()
@@ -0,0 +1,16 @@
+"""Routes exposing the application metrics."""
+
+from flask import Blueprint, Response
+
+from eq_cir_management_ui.metrics.registry import REGISTRY
+
+metrics_blueprint = Blueprint("metrics", __name__)
+
+
+@metrics_blueprint.route("/metrics", methods=["GET"])
+def metrics() -> Response:
+    """Metrics endpoint, totals for every worker process in the Prometheus text format.
+
+    :return: 200 metrics response.
+    """
+    return Response(REGISTRY.generate_latest(), mimetype="text/plain; version=0.0.4")
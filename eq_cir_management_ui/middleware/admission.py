@@ -0,0 +1,174 @@
+"""WSGI middleware shedding requests beyond what a worker can handle promptly.
+
+A gunicorn worker queues the requests its threads are not free to handle, without limit, so
+under a burst every request waits longer. Admission control counts the requests each worker
+is handling, in total and per client, and answers those over either limit at once, from a
+page rendered at start-up, rather than letting them queue behind the admitted ones.
+"""
+
+import functools
+import threading
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+from eq_cir_management_ui.metrics.registry import Counter
+from eq_cir_management_ui.middleware.secure_headers import NONCE_ENVIRON_KEY
+
+if TYPE_CHECKING:
+    from _typeshed.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
+
+SHED_REQUESTS = Counter(
+    "admission_shed_requests",
+    "Requests rejected by admission control, 503 over the worker's limit and 429 over the client's.",
+    ["status"],
+)
+
+
+class AdmissionMiddleware:  # pylint: disable=too-many-instance-attributes
+    """Admits a request while the worker, and the client making it, are within their limits of
+    requests in flight. A request stays in flight until its response has been sent, or closed.
+
+    Rejected requests are answered with a 429 when the client is over its limit, otherwise a
+    503, with a Retry-After header. The pages are rendered once, split where the CSP nonce
+    goes, so the security headers middleware must wrap this one.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        wsgi_app: "WSGIApplication",
+        *,
+        pages: Mapping[int, tuple[bytes, ...]],
+        max_in_flight: int,
+        max_per_client: int = 0,
+        trusted_proxies: int = 0,
+        retry_after: int = 5,
+    ) -> None:
+        """Create the middleware.
+
+        :param wsgi_app: The application to admit requests to.
+        :param pages: The 429 and 503 pages, split where the CSP nonce goes.
+        :param max_in_flight: Requests handled at once by the worker, 0 for no limit.
+        :param max_per_client: Requests handled at once for a client, 0 for no limit.
+        :param trusted_proxies: Proxies which add the client's address to X-Forwarded-For.
+        :param retry_after: Seconds rejected clients are asked to wait before retrying.
+        """
+        self.wsgi_app = wsgi_app
+        self.pages = {HTTPStatus(status): chunks for status, chunks in pages.items()}
+        self.max_in_flight = max_in_flight
+        self.max_per_client = max_per_client
+        self.trusted_proxies = trusted_proxies
+        self.retry_after = str(retry_after)
+        self.in_flight = 0
+        self.client_in_flight: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, environ: "WSGIEnvironment", start_response: "StartResponse") -> Iterable[bytes]:
+        client = self.client(environ) if self.max_per_client else ""
+        rejected = self.admit(client)
+        if rejected is not None:
+            SHED_REQUESTS.inc(status=str(rejected.value))
+            return self.reject(rejected, environ, start_response)
+
+        try:
+            app_iter = self.wsgi_app(environ, start_response)
+        except BaseException:
+            self.release(client)
+            raise
+        return InFlightResponse(app_iter, functools.partial(self.release, client))
+
+    def client(self, environ: "WSGIEnvironment") -> str:
+        """The address of the client making a request. Behind proxies it is the address the
+        outermost trusted proxy added to X-Forwarded-For, as earlier entries may be forged.
+
+        :param environ: The WSGI environment of the request.
+        :return: The client's address.
+        """
+        if self.trusted_proxies:
+            forwarded: list[str] = environ.get("HTTP_X_FORWARDED_FOR", "").split(",")
+            if len(forwarded) >= self.trusted_proxies:
+                return forwarded[-self.trusted_proxies].strip()
+        return str(environ.get("REMOTE_ADDR", ""))
+
+    def admit(self, client: str) -> HTTPStatus | None:
+        """Count a request in flight, if the limits allow it.
+
+        :param client: The client's address, or an empty string when clients are not limited.
+        :return: The status to reject the request with, or None if it was admitted.
+        """
+        with self._lock:
+            in_flight_for_client = self.client_in_flight.get(client, 0)
+            if self.max_per_client and in_flight_for_client >= self.max_per_client:
+                return HTTPStatus.TOO_MANY_REQUESTS
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return HTTPStatus.SERVICE_UNAVAILABLE
+
+            self.in_flight += 1
+            self.client_in_flight[client] = in_flight_for_client + 1
+        return None
+
+    def release(self, client: str) -> None:
+        """Count a request as no longer in flight.
+
+        :param client: The client's address, as passed to ``admit``.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if (remaining := self.client_in_flight[client] - 1) > 0:
+                self.client_in_flight[client] = remaining
+            else:
+                del self.client_in_flight[client]
+
+    def reject(self, status: HTTPStatus, environ: "WSGIEnvironment", start_response: "StartResponse") -> list[bytes]:
+        """Answer a request with the page for the status.
+
+        :param status: The status to reject the request with.
+        :param environ: The WSGI environment of the request.
+        :param start_response: The WSGI start_response callable.
+        :return: The response body.
+        """
+        body = environ.get(NONCE_ENVIRON_KEY, "").encode().join(self.pages[status])
+        start_response(
+            f"{status.value} {status.phrase}",
+            [
+                ("Content-Type", "text/html; charset=utf-8"),
+                ("Content-Length", str(len(body))),
+                ("Retry-After", self.retry_after),
+                ("Cache-Control", "no-store"),
+            ],
+        )
+        return [body] if environ.get("REQUEST_METHOD") != "HEAD" else []
+
+
+class InFlightResponse:
+    """Wraps a response body to release its request once the body has been sent, or closed.
+    Servers always close the body, but test clients only read it.
+    """
+
+    def __init__(self, app_iter: Iterable[bytes], release: Callable[[], None]) -> None:
+        self.app_iter = app_iter
+        self._iterator = iter(app_iter)
+        self._release: Callable[[], None] | None = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self
+
+    def __next__(self) -> bytes:
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._released()
+            raise
+
+    def close(self) -> None:
+        """Close the wrapped body, and release its request."""
+        try:
+            if hasattr(self.app_iter, "close"):
+                self.app_iter.close()
+        finally:
+            self._released()
+
+    def _released(self) -> None:
+        if self._release is not None:
+            release, self._release = self._release, None
+            release()
@@ -0,0 +1,131 @@
+"""WSGI middleware compressing responses with brotli or gzip, negotiated from Accept-Encoding."""
+
+from collections.abc import Iterable, Iterator
+from itertools import chain
+from typing import TYPE_CHECKING, Any
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+from eq_cir_management_ui.compression import STREAM_ENCODERS, StreamEncoder
+
+if TYPE_CHECKING:
+    from _typeshed.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
+
+UNCOMPRESSIBLE_STATUSES = ("1", "204", "304")
+
+
+class CompressionMiddleware:  # pylint: disable=too-few-public-methods
+    """Compresses text responses for clients which accept it.
+
+    Responses with a known length below the minimum size are sent as they are. Responses
+    with a known length are compressed in one go, with a new Content-Length. Streamed
+    responses, which have no Content-Length, are compressed chunk by chunk, and each chunk
+    is flushed so the client receives it without waiting for the rest of the stream.
+    """
+
+    def __init__(
+        self,
+        wsgi_app: "WSGIApplication",
+        *,
+        min_size: int,
+        levels: dict[str, int],
+        mimetypes: Iterable[str],
+    ) -> None:
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+        self.levels = {encoding: level for encoding, level in levels.items() if encoding in STREAM_ENCODERS}
+        self.mimetypes = frozenset(mimetypes)
+
+    def __call__(self, environ: "WSGIEnvironment", start_response: "StartResponse") -> Iterable[bytes]:
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return self.wsgi_app(environ, start_response)
+
+        accepted = parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING"))
+        encoding = next((encoding for encoding in self.levels if accepted[encoding]), None)
+        captured: dict[str, Any] = {}
+
+        def capture_start_response(status: str, headers: list[tuple[str, str]], exc_info: Any = None) -> Any:
+            captured.update(status=status, headers=headers, exc_info=exc_info)
+            return lambda _: None  # The legacy write callable is not supported.
+
+        app_iter = self.wsgi_app(environ, capture_start_response)
+        if "status" not in captured:
+            # The application may defer start_response until its body is first iterated.
+            iterator = iter(app_iter)
+            app_iter = ClosingIterator(chain([next(iterator, b"")], iterator), getattr(app_iter, "close", None))
+        status, headers = captured["status"], Headers(captured["headers"])
+
+        if not self._is_compressible(status, headers):
+            start_response(status, headers.to_wsgi_list(), captured["exc_info"])
+            return app_iter
+
+        headers["Vary"] = merge_vary(headers.get("Vary", ""))
+
+        if encoding is None:
+            start_response(status, headers.to_wsgi_list(), captured["exc_info"])
+            return app_iter
+
+        headers["Content-Encoding"] = encoding
+        if (etag := headers.get("ETag")) and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        encoder = STREAM_ENCODERS[encoding](self.levels[encoding])
+
+        if "Content-Length" in headers:
+            body = compress_body(app_iter, encoder)
+            headers["Content-Length"] = str(len(body))
+            start_response(status, headers.to_wsgi_list(), captured["exc_info"])
+            return [body]
+
+        start_response(status, headers.to_wsgi_list(), captured["exc_info"])
+        return compress_stream(app_iter, encoder)
+
+    def _is_compressible(self, status: str, headers: Headers) -> bool:
+        if status.startswith(UNCOMPRESSIBLE_STATUSES) or "Content-Encoding" in headers:
+            return False
+        if "no-transform" in headers.get("Cache-Control", ""):
+            return False
+        if headers.get("Content-Type", "").split(";")[0].strip() not in self.mimetypes:
+            return False
+        content_length = headers.get("Content-Length", type=int)
+        return content_length is None or content_length >= self.min_size
+
+
+def merge_vary(vary: str) -> str:
+    """Add Accept-Encoding to an existing Vary header value."""
+    fields = [field.strip() for field in vary.split(",") if field.strip()]
+    if "*" in fields or "accept-encoding" in (field.lower() for field in fields):
+        return ", ".join(fields)
+    return ", ".join([*fields, "Accept-Encoding"])
+
+
+def compress_body(app_iter: Iterable[bytes], encoder: StreamEncoder) -> bytes:
+    """Compress a complete response body.
+
+    :param app_iter: The body returned by the application.
+    :param encoder: The encoder to compress with.
+    :return: The compressed body.
+    """
+    try:
+        return b"".join(encoder.compress(chunk) for chunk in app_iter) + encoder.finish()
+    finally:
+        if hasattr(app_iter, "close"):
+            app_iter.close()
+
+
+def compress_stream(app_iter: Iterable[bytes], encoder: StreamEncoder) -> Iterator[bytes]:
+    """Compress a streamed response body, flushing the output for each chunk.
+
+    :param app_iter: The body returned by the application.
+    :param encoder: The encoder to compress with.
+    :return: The compressed chunks.
+    """
+    try:
+        for chunk in app_iter:
+            if chunk and (compressed := encoder.compress(chunk) + encoder.flush()):
+                yield compressed
+        yield encoder.finish()
+    finally:
+        if hasattr(app_iter, "close"):
+            app_iter.close()
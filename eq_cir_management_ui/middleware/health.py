@@ -0,0 +1,125 @@
+"""WSGI middleware answering liveness and readiness probes before Flask handles the request."""
+
+import json
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from _typeshed.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
+
+LIVENESS_PATH = "/status"
+READINESS_PATH = "/ready"
+
+PROBE_HEADERS = [("Cache-Control", "no-store"), ("X-Content-Type-Options", "nosniff")]
+
+
+class Readiness:
+    """A set of named readiness checks. Their combined result is cached for a time to live, and
+    an expired result is refreshed on a background thread while the previous result is
+    returned, so probes never wait for the checks to run.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.checks: dict[str, Callable[[], bool]] = {}
+        self._report: dict[str, Any] = {"ready": False, "checks": {}}
+        self._expires = 0.0
+        self._refreshing = threading.Lock()
+
+    def add_check(self, name: str, check: Callable[[], bool]) -> None:
+        """Register a check, which returns True when the dependency is ready.
+
+        :param name: The name of the check in the report.
+        :param check: The check.
+        """
+        self.checks[name] = check
+
+    def refresh(self) -> dict[str, Any]:
+        """Run every check and cache the result.
+
+        :return: The overall readiness and the result of each check.
+        """
+        results = {name: run_check(check) for name, check in self.checks.items()}
+        self._report = {"ready": all(results.values()), "checks": results}
+        self._expires = time.monotonic() + self.ttl
+        return self._report
+
+    def report(self) -> dict[str, Any]:
+        """Return the cached result of the checks, starting a background refresh once it has expired.
+
+        :return: The overall readiness and the result of each check.
+        """
+        # Released by the refresh thread.
+        # pylint: disable-next=consider-using-with
+        if time.monotonic() >= self._expires and self._refreshing.acquire(blocking=False):
+            threading.Thread(target=self._refresh_in_background, name="readiness-refresh", daemon=True).start()
+        return self._report
+
+    def reset_after_fork(self) -> None:
+        """Replace the refresh lock, which may have been inherited held by a refresh thread
+        that does not exist in this process, and expire the cached result.
+        """
+        self._refreshing = threading.Lock()
+        self._expires = 0.0
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            self._refreshing.release()
+
+
+def run_check(check: Callable[[], bool]) -> bool:
+    """Run a readiness check, treating an exception as not ready."""
+    try:
+        return bool(check())
+    except Exception:  # noqa: BLE001 pylint: disable=broad-exception-caught
+        return False
+
+
+def tcp_check(address: str, timeout: float) -> Callable[[], bool]:
+    """Create a check that a TCP connection can be opened to a dependency.
+
+    :param address: The dependency as host:port.
+    :param timeout: Seconds to wait for the connection.
+    :return: The check.
+    """
+    host, _, port = address.rpartition(":")
+
+    def check() -> bool:
+        with socket.create_connection((host, int(port)), timeout=timeout):
+            return True
+
+    return check
+
+
+class HealthCheckMiddleware:  # pylint: disable=too-few-public-methods
+    """Answers the liveness probe without touching the application, and the readiness probe
+    from the cached readiness report. Every other request is passed to the application.
+    """
+
+    def __init__(self, wsgi_app: "WSGIApplication", readiness: Readiness) -> None:
+        self.wsgi_app = wsgi_app
+        self.readiness = readiness
+
+    def __call__(self, environ: "WSGIEnvironment", start_response: "StartResponse") -> Iterable[bytes]:
+        path = environ.get("PATH_INFO")
+
+        if path == LIVENESS_PATH and environ.get("REQUEST_METHOD") in ("GET", "HEAD"):
+            start_response("200 OK", [("Content-Length", "0"), *PROBE_HEADERS])
+            return [b""]
+
+        if path == READINESS_PATH and environ.get("REQUEST_METHOD") in ("GET", "HEAD"):
+            report = self.readiness.report()
+            body = json.dumps(report).encode()
+            status = "200 OK" if report["ready"] else "503 Service Unavailable"
+            start_response(
+                status,
+                [("Content-Type", "application/json"), ("Content-Length", str(len(body))), *PROBE_HEADERS],
+            )
+            return [body] if environ["REQUEST_METHOD"] != "HEAD" else []
+
+        return self.wsgi_app(environ, start_response)
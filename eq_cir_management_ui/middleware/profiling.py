@@ -0,0 +1,181 @@
+"""WSGI middleware capturing a call profile of selected requests.
+
+A request is profiled when it carries a valid signature, in the ``X-Profile`` header or the
+``profile`` query parameter, or when it is sampled. The profile covers everything beneath
+this middleware on the request's thread: routing, the views and their CIR API calls, template
+rendering, the security headers and compression. Each profile is written, in the ``pstats``
+format, to a directory which keeps only the most recent profiles.
+
+The middleware is only installed when profiling is enabled, so otherwise it costs nothing.
+"""
+
+import cProfile
+import hashlib
+import hmac
+import os
+import random
+import re
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import parse_qs
+
+from eq_cir_management_ui.metrics.registry import Counter
+
+if TYPE_CHECKING:
+    from _typeshed.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
+
+PROFILED_REQUESTS = Counter(
+    "profiled_requests",
+    "Requests profiled, by whether they were signed or sampled.",
+    ["trigger"],
+)
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_PARAMETER = "profile"
+PROFILE_SUFFIX = ".prof"
+
+
+def sign_profile_request(secret: str, path: str, expires: int) -> str:
+    """Sign a request for a profile of a path, for the ``X-Profile`` header or ``profile``
+    query parameter.
+
+    :param secret: The PROFILING_SECRET.
+    :param path: The path to profile, without the query string.
+    :param expires: Unix time after which the signature is no longer accepted.
+    :return: The signed value.
+    """
+    signature = hmac.new(secret.encode(), f"{expires}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+class ProfileStore:
+    """A directory holding the most recent profiles, shared by every worker."""
+
+    def __init__(self, directory: Path, max_profiles: int) -> None:
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def new_name(self, method: str, path: str) -> str:
+        """Name a profile so that names sort by the time they were taken.
+
+        :param method: The request method.
+        :param path: The request path.
+        :return: The file name of the profile.
+        """
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:64] or "root"
+        return f"{time.time_ns()}-{os.getpid()}-{method}-{slug}{PROFILE_SUFFIX}"
+
+    def save(self, profile: cProfile.Profile, name: str) -> Path:
+        """Write a profile, removing the oldest profiles beyond the maximum.
+
+        :param profile: The finished profile.
+        :param name: The file name, from ``new_name``.
+        :return: The path of the profile.
+        """
+        path = self.directory / name
+        profile.dump_stats(path)
+        with self._lock:
+            for stale in self.names()[self.max_profiles :]:
+                (self.directory / stale).unlink(missing_ok=True)
+        return path
+
+    def names(self) -> list[str]:
+        """The file names of the profiles, newest first."""
+        return sorted((path.name for path in self.directory.glob(f"*{PROFILE_SUFFIX}")), reverse=True)
+
+    def path(self, name: str) -> Path | None:
+        """The path of a profile, or None if there is no such profile.
+
+        :param name: The file name of the profile.
+        :return: The path.
+        """
+        return self.directory / name if name in self.names() else None
+
+
+class ProfilingMiddleware:
+    """Profiles signed and sampled requests. A profiled response is buffered, so that producing
+    its body is in the profile, and carries the name of its profile in the ``X-Profile-Id`` header.
+    """
+
+    def __init__(
+        self,
+        wsgi_app: "WSGIApplication",
+        *,
+        store: ProfileStore,
+        secret: str | None = None,
+        sample_rate: float = 0.0,
+    ) -> None:
+        """Create the middleware.
+
+        :param wsgi_app: The application to profile.
+        :param store: Where profiles are written.
+        :param secret: The key requests for a profile are signed with, None to only sample.
+        :param sample_rate: The fraction of requests profiled regardless of a signature.
+        """
+        self.wsgi_app = wsgi_app
+        self.store = store
+        self.secret = secret
+        self.sample_rate = sample_rate
+
+    def __call__(self, environ: "WSGIEnvironment", start_response: "StartResponse") -> Iterable[bytes]:
+        trigger = self.trigger(environ)
+        if trigger is None:
+            return self.wsgi_app(environ, start_response)
+
+        PROFILED_REQUESTS.inc(trigger=trigger)
+        name = self.store.new_name(environ.get("REQUEST_METHOD", "GET"), environ.get("PATH_INFO", ""))
+
+        def profiled_start_response(status: str, headers: list[tuple[str, str]], exc_info: Any = None) -> Any:
+            return start_response(status, [*headers, ("X-Profile-Id", name)], exc_info)
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            app_iter = self.wsgi_app(environ, profiled_start_response)
+            try:
+                body = b"".join(app_iter)
+            finally:
+                if hasattr(app_iter, "close"):
+                    app_iter.close()
+        finally:
+            profile.disable()
+            self.store.save(profile, name)
+        return [body]
+
+    def trigger(self, environ: "WSGIEnvironment") -> str | None:
+        """Decide whether to profile a request.
+
+        :param environ: The WSGI environment of the request.
+        :return: "signed" or "sampled" if the request is to be profiled, otherwise None.
+        """
+        if self.secret:
+            signed = (
+                environ.get("HTTP_X_PROFILE")
+                or parse_qs(environ.get("QUERY_STRING", "")).get(
+                    PROFILE_QUERY_PARAMETER,
+                    [""],
+                )[0]
+            )
+            if signed and self.verify(signed, environ.get("PATH_INFO", "")):
+                return "signed"
+
+        if self.sample_rate and random.random() < self.sample_rate:  # noqa: S311
+            return "sampled"
+        return None
+
+    def verify(self, signed: str, path: str) -> bool:
+        """Check that a signed value was signed for the path with the secret, and has not expired.
+
+        :param signed: The value of the header or query parameter.
+        :param path: The request path.
+        :return: Whether the request may be profiled.
+        """
+        expires, _, _ = signed.partition(".")
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        return hmac.compare_digest(signed, sign_profile_request(str(self.secret), path, int(expires)))
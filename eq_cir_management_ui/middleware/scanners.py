@@ -0,0 +1,86 @@
+"""WSGI middleware answering requests from vulnerability scanners before Flask dispatches them.
+
+Scanners request the same well known paths of other frameworks, such as ``/wp-login.php`` or
+``/.env``, on every site they find. Each of those would otherwise be routed, handled, logged
+and rendered by Flask as a 404. They are matched here, with a single compiled expression,
+and answered with the 404 page rendered at start-up.
+"""
+
+import re
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING
+
+from eq_cir_management_ui.metrics.registry import Counter
+from eq_cir_management_ui.middleware.secure_headers import NONCE_ENVIRON_KEY
+
+if TYPE_CHECKING:
+    from _typeshed.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
+
+SCANNER_REQUESTS = Counter(
+    "scanner_requests",
+    "Requests for known scanner paths, answered with a 404 before Flask.",
+)
+
+
+def scanner_matcher(prefixes: Iterable[str], suffixes: Iterable[str]) -> Callable[[str], bool] | None:
+    """Compile one case-insensitive expression matching paths which start or end with any of
+    the given strings. A prefix ending in a letter or digit only matches whole path segments,
+    so ``/console`` matches ``/console/login`` but not ``/consoles``. Any other prefix, such
+    as ``/wp-``, matches as it is.
+
+    :param prefixes: Path prefixes, such as ``/wp-admin``.
+    :param suffixes: Path suffixes, such as ``.php``.
+    :return: A function telling whether a path matches, or None if there is nothing to match.
+    """
+    alternatives = [f"^{re.escape(prefix)}" + ("(?:/|$)" if prefix[-1].isalnum() else "") for prefix in prefixes]
+    alternatives += [f"{re.escape(suffix)}$" for suffix in suffixes]
+    if not alternatives:
+        return None
+
+    pattern = re.compile("|".join(alternatives), re.IGNORECASE)
+    return lambda path: pattern.search(path) is not None
+
+
+class ScannerMiddleware:  # pylint: disable=too-few-public-methods
+    """Answers requests for scanner paths with a 404 page, without calling the application.
+
+    The page is rendered once, split where the CSP nonce goes, so the security headers
+    middleware must wrap this one.
+    """
+
+    def __init__(
+        self,
+        wsgi_app: "WSGIApplication",
+        *,
+        matches: Callable[[str], bool],
+        page: tuple[bytes, ...],
+        record: Callable[[int, str, str], None] | None = None,
+    ) -> None:
+        """Create the middleware.
+
+        :param wsgi_app: The application to pass other requests to.
+        :param matches: Tells whether a path is a scanner path.
+        :param page: The 404 page, split where the CSP nonce goes.
+        :param record: Called with the status, method and path of each scanner request, to log it.
+        """
+        self.wsgi_app = wsgi_app
+        self.matches = matches
+        self.page = page
+        self.record = record
+
+    def __call__(self, environ: "WSGIEnvironment", start_response: "StartResponse") -> Iterable[bytes]:
+        path = environ.get("PATH_INFO", "")
+        if not self.matches(path):
+            return self.wsgi_app(environ, start_response)
+
+        SCANNER_REQUESTS.inc()
+        method = environ.get("REQUEST_METHOD", "GET")
+        if self.record is not None:
+            self.record(404, method, path)
+
+        body = environ.get(NONCE_ENVIRON_KEY, "").encode().join(self.page)
+        start_response(
+            "404 Not Found",
+            [("Content-Type", "text/html; charset=utf-8"), ("Content-Length", str(len(body)))],
+        )
+        return [body] if method != "HEAD" else []
@@ -0,0 +1,108 @@
+"""WSGI middleware adding the security headers to every response from Flask.
+
+The headers are serialised once, when the middleware is created. Only the content security
+policy's nonce differs between responses, so the policy is split where the nonce goes and each
+response joins the pieces around a new nonce. The headers and their values match those
+Flask-Talisman set with the same options.
+"""
+
+import secrets
+from collections.abc import Iterable, Mapping
+from typing import TYPE_CHECKING, Any
+
+from flask import request
+
+if TYPE_CHECKING:
+    from _typeshed.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
+
+# The key of the current request's nonce in the WSGI environment.
+NONCE_ENVIRON_KEY = "eq_cir_management_ui.csp_nonce"
+# Random bytes in a nonce, which encode to 32 URL safe characters.
+NONCE_BYTES = 24
+
+CSP_HEADER = "Content-Security-Policy"
+HSTS_HEADER = "Strict-Transport-Security"
+DEFAULT_REFERRER_POLICY = "strict-origin-when-cross-origin"
+DEFAULT_PERMISSIONS_POLICY = (("browsing-topics", "()"),)
+
+# Marks where the nonce goes while the policy is serialised. Header values cannot contain it.
+_NONCE_MARKER = "\0"
+
+
+def split_policy(policy: Mapping[str, Iterable[str]], nonce_in: Iterable[str]) -> tuple[str, ...]:
+    """Serialise a content security policy, split where the nonce is added.
+
+    :param policy: The sources allowed by each directive.
+    :param nonce_in: The directives which also allow the request's nonce.
+    :return: The pieces of the policy, to be joined with the nonce source.
+    """
+    nonce_in = frozenset(nonce_in)
+    directives = []
+    for directive, sources in policy.items():
+        serialised = f"{directive} {' '.join(sources)}"
+        if directive in nonce_in:
+            serialised += f" {_NONCE_MARKER}"
+        directives.append(serialised)
+
+    return tuple("; ".join(directives).split(_NONCE_MARKER))
+
+
+class SecureHeadersMiddleware:  # pylint: disable=too-few-public-methods
+    """Adds the security headers to responses, replacing any the application set, and makes a
+    nonce for each request available to templates through ``csp_nonce``.
+
+    Strict-Transport-Security is only sent on requests made, or forwarded, over HTTPS.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        wsgi_app: "WSGIApplication",
+        *,
+        content_security_policy: Mapping[str, Iterable[str]],
+        nonce_in: Iterable[str] = ("script-src",),
+        frame_options: str = "DENY",
+        hsts_max_age: int | None = 31536000,
+        referrer_policy: str = DEFAULT_REFERRER_POLICY,
+        permissions_policy: Iterable[tuple[str, str]] = DEFAULT_PERMISSIONS_POLICY,
+    ) -> None:
+        self.wsgi_app = wsgi_app
+        self.csp_pieces = split_policy(content_security_policy, nonce_in)
+        self.leading_headers = [
+            ("Permissions-Policy", ", ".join(f"{feature}={allow}" for feature, allow in permissions_policy)),
+            ("X-Frame-Options", frame_options),
+            ("X-Content-Type-Options", "nosniff"),
+        ]
+        self.hsts_header = (HSTS_HEADER, f"max-age={hsts_max_age}; includeSubDomains") if hsts_max_age else None
+        self.referrer_header = ("Referrer-Policy", referrer_policy)
+
+        names = [name.lower() for name, _ in self.leading_headers] + [CSP_HEADER.lower(), "referrer-policy"]
+        self.replaced = frozenset(names)
+        self.replaced_secure = self.replaced | {HSTS_HEADER.lower()}
+
+    def __call__(self, environ: "WSGIEnvironment", start_response: "StartResponse") -> Iterable[bytes]:
+        nonce = secrets.token_urlsafe(NONCE_BYTES)
+        environ[NONCE_ENVIRON_KEY] = nonce
+
+        added = [*self.leading_headers, (CSP_HEADER, f"'nonce-{nonce}'".join(self.csp_pieces))]
+        replaced = self.replaced
+        if self.hsts_header and (
+            environ.get("wsgi.url_scheme") == "https" or environ.get("HTTP_X_FORWARDED_PROTO") == "https"
+        ):
+            added.append(self.hsts_header)
+            replaced = self.replaced_secure
+        added.append(self.referrer_header)
+
+        def add_headers(status: str, headers: list[tuple[str, str]], exc_info: Any = None) -> Any:
+            kept = [header for header in headers if header[0].lower() not in replaced]
+            return start_response(status, kept + added, exc_info)
+
+        return self.wsgi_app(environ, add_headers)
+
+
+def csp_nonce() -> str:
+    """The content security policy nonce of the current request, for use in templates.
+
+    :return: The nonce, or an empty string outside the middleware.
+    """
+    nonce: str = request.environ.get(NONCE_ENVIRON_KEY, "")
+    return nonce
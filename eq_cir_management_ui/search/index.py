@@ -0,0 +1,303 @@
+"""In-memory search index of the latest version of each collection instrument.
+
+Each collection instrument has a slot, a small integer. The index maps each word of the searched
+fields, and each value of the facets, to the slots it occurs in. A search looks its words up by
+prefix in the sorted list of words, and combines their slots with those of the facet values as
+bitsets, so a search costs a few operations on integers of one bit per slot, however many
+collection instruments match.
+
+The index is brought up to date with the metadata feed by applying the differences: only the
+words and facet values of the collection instruments added, changed or removed are touched.
+"""
+
+import bisect
+import re
+import threading
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Any
+
+from eq_cir_management_ui.cir_api.sources import ci_key
+from eq_cir_management_ui.utils.pagination import Key
+
+# Fields searched by exact value.
+FACETS = ("survey_id", "form_type", "language")
+# Fields whose words are searched by prefix.
+SEARCHED = ("survey_id", "form_type", "title")
+# Bytes, about, each member of a set of slots costs. A set larger than a bitset of every slot,
+# at a bit per slot, becomes that bitset.
+MEMBER_BYTES = 32
+# New or removed words above which the sorted list of words is sorted again, rather than
+# updated a word at a time.
+RESORT_WORDS = 64
+# Bitsets of the prefixes searched kept at most.
+PREFIX_CACHE_SIZE = 256
+
+WORD = re.compile(r"\w+")
+
+
+def words(text: str) -> list[str]:
+    """The words of a text, folded to lower case.
+
+    :param text: The text.
+    :return: The words.
+    """
+    return WORD.findall(text.casefold())
+
+
+def to_bits(slots: Iterable[int], capacity: int) -> int:
+    """A bitset, with the bit of each slot set.
+
+    :param slots: The slots.
+    :param capacity: The number of slots of the index.
+    :return: The bitset.
+    """
+    buffer = bytearray((capacity + 7) // 8)
+    for slot in slots:
+        buffer[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def bit_slots(bits: int, limit: int) -> list[int]:
+    """The lowest set bits of a bitset.
+
+    :param bits: The bitset.
+    :param limit: The number of slots returned at most.
+    :return: The slots of the bits, in order.
+    """
+    slots: list[int] = []
+    while bits and len(slots) < limit:
+        lowest = bits & -bits
+        slots.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return slots
+
+
+class Postings:  # pylint: disable=too-few-public-methods
+    """The slots a word or facet value occurs in: a set while it occurs in few, and a bitset,
+    an int with a bit for each slot, once the set would take more memory. A bitset is kept,
+    even if slots are removed from it.
+    """
+
+    __slots__ = ("bits", "members")
+
+    def __init__(self) -> None:
+        self.members: set[int] | None = set()
+        self.bits = 0
+
+    def apply(self, added: list[int], removed: list[int], capacity: int) -> bool:
+        """Add and remove slots.
+
+        :param added: The slots added.
+        :param removed: The slots removed.
+        :param capacity: The number of slots of the index.
+        :return: Whether any slot remains.
+        """
+        if self.members is not None:
+            self.members.difference_update(removed)
+            self.members.update(added)
+            if len(self.members) * MEMBER_BYTES * 8 > capacity:
+                self.bits, self.members = to_bits(self.members, capacity), None
+            else:
+                return bool(self.members)
+        if removed:
+            self.bits &= ~to_bits(removed, capacity)
+        if added:
+            self.bits |= to_bits(added, capacity)
+        return bool(self.bits)
+
+
+class SearchIndex:  # pylint: disable=too-many-instance-attributes
+    """Searches the latest version of each collection instrument by the prefixes of the words
+    of its survey id, form type and title, and by exact survey id, form type and language.
+    Updated by one thread at a time, and searched by any number, each update applied at once.
+    """
+
+    def __init__(self) -> None:
+        # The slot of each collection instrument, and the metadata in each slot, empty if free.
+        self._slots: dict[Key, int] = {}
+        self._rows: list[dict[str, Any]] = []
+        self._free: list[int] = []
+        self._all = Postings()
+        self._words: dict[str, Postings] = {}
+        self._sorted_words: list[str] = []
+        # The bitsets of the prefixes searched since the last update, the oldest dropped first.
+        self._prefixes: dict[str, int] = {}
+        self._facets: dict[str, dict[str, Postings]] = {field: {} for field in FACETS}
+        # Held while searching and while applying an update, and for the whole of an update.
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    @property
+    def capacity(self) -> int:
+        """The number of slots, including those freed by removed collection instruments, which
+        is the number of bits of each bitset.
+        """
+        return len(self._rows)
+
+    def update(self, rows: list[dict[str, Any]]) -> tuple[int, int, int]:
+        """Bring the index up to date with the metadata feed, by adding, changing and removing
+        only the collection instruments which differ.
+
+        :param rows: The metadata of the latest version of each collection instrument, which
+            must not be modified once indexed.
+        :return: The number of collection instruments added, changed and removed.
+        """
+        latest = {ci_key(row): row for row in rows}
+        with self._update_lock:
+            removed = [slot for key, slot in self._slots.items() if key not in latest]
+            added, changed = [], []
+            for key, row in latest.items():
+                slot = self._slots.get(key)
+                if slot is None:
+                    added.append((key, row))
+                elif self._rows[slot] is not row and self._rows[slot] != row:
+                    changed.append((slot, row))
+                else:
+                    # Equal, so indexed as it is, but kept in place of the earlier row so that
+                    # the earlier feed can be freed.
+                    self._rows[slot] = row
+
+            added.sort(key=lambda item: item[0])
+            with self._lock:
+                self._apply(added, changed, removed)
+        return len(added), len(changed), len(removed)
+
+    def search(self, text: str = "", limit: int = 20, **facets: str) -> tuple[int, list[dict[str, Any]]]:
+        """Find the collection instruments with a word starting with each word of a text, and
+        with each facet value given.
+
+        :param text: The text, whose words are prefixes of the words sought.
+        :param limit: The number of matches returned at most.
+        :param facets: The value of each facet sought, of ``FACETS``.
+        :return: The number of matches, and the metadata of the first, in the order of survey
+            id, form type and language of those indexed together, and otherwise as indexed.
+        """
+        with self._lock:
+            capacity = len(self._rows)
+            bits = self._bits(self._all, capacity)
+            for field, value in facets.items():
+                postings = self._facets[field].get(value)
+                bits &= self._bits(postings, capacity) if postings is not None else 0
+            for prefix in set(words(text)):
+                bits &= self._prefix_bits(prefix, capacity)
+            rows = [self._rows[slot] for slot in bit_slots(bits, limit)]
+        return bits.bit_count(), rows
+
+    def _prefix_bits(self, prefix: str, capacity: int) -> int:
+        """The bitset of the slots of every word starting with a prefix. Short prefixes start
+        many words, so the bitsets of prefixes are kept until the next update.
+        """
+        bits = self._prefixes.get(prefix)
+        if bits is not None:
+            return bits
+
+        bits = 0
+        members: set[int] = set()
+        for index in range(bisect.bisect_left(self._sorted_words, prefix), len(self._sorted_words)):
+            word = self._sorted_words[index]
+            if not word.startswith(prefix):
+                break
+            postings = self._words[word]
+            if postings.members is None:
+                bits |= postings.bits
+            else:
+                members.update(postings.members)
+        if members:
+            bits |= to_bits(members, capacity)
+
+        if len(self._prefixes) >= PREFIX_CACHE_SIZE:
+            del self._prefixes[next(iter(self._prefixes))]
+        self._prefixes[prefix] = bits
+        return bits
+
+    @staticmethod
+    def _bits(postings: Postings, capacity: int) -> int:
+        return postings.bits if postings.members is None else to_bits(postings.members, capacity)
+
+    def _apply(
+        self,
+        added: list[tuple[Key, dict[str, Any]]],
+        changed: list[tuple[int, dict[str, Any]]],
+        removed: list[int],
+    ) -> None:
+        """Apply an update, gathering the slots added to and removed from each word and facet
+        value, so each is updated once.
+        """
+        changes: defaultdict[tuple[str, str], tuple[list[int], list[int]]] = defaultdict(lambda: ([], []))
+        for slot in removed:
+            row = self._rows[slot]
+            self._postings_of(row, slot, changes, 1)
+            del self._slots[ci_key(row)]
+            self._rows[slot] = {}
+            self._free.append(slot)
+        for slot, row in changed:
+            self._postings_of(self._rows[slot], slot, changes, 1)
+            self._postings_of(row, slot, changes, 0)
+            self._rows[slot] = row
+        # Freed slots are reused from the lowest, so collection instruments added together
+        # keep the order of their keys.
+        self._free.sort(reverse=True)
+        added_slots = []
+        for key, row in added:
+            slot = self._free.pop() if self._free else len(self._rows)
+            if slot == len(self._rows):
+                self._rows.append(row)
+            else:
+                self._rows[slot] = row
+            self._slots[key] = slot
+            added_slots.append(slot)
+            self._postings_of(row, slot, changes, 0)
+
+        capacity = len(self._rows)
+        self._prefixes.clear()
+        self._all.apply(added_slots, removed, capacity)
+        self._apply_postings(changes, capacity)
+
+    def _apply_postings(
+        self,
+        changes: defaultdict[tuple[str, str], tuple[list[int], list[int]]],
+        capacity: int,
+    ) -> None:
+        """Add and remove the slots of each word and facet value, dropping those left empty."""
+        new_words, old_words = [], []
+        for (field, value), (slots_added, slots_removed) in changes.items():
+            postings_by_value = self._words if field == "" else self._facets[field]
+            postings = postings_by_value.get(value)
+            if postings is None:
+                postings = postings_by_value[value] = Postings()
+                if field == "":
+                    new_words.append(value)
+            if not postings.apply(slots_added, slots_removed, capacity):
+                del postings_by_value[value]
+                if field == "":
+                    old_words.append(value)
+        self._sort_words(new_words, old_words)
+
+    @staticmethod
+    def _postings_of(
+        row: dict[str, Any],
+        slot: int,
+        changes: defaultdict[tuple[str, str], tuple[list[int], list[int]]],
+        side: int,
+    ) -> None:
+        """Record a slot as added to (side 0), or removed from (side 1), the words and facet
+        values of a row. Words are keyed under the empty field.
+        """
+        for field in FACETS:
+            changes[(field, row[field])][side].append(slot)
+        for word in set(words(" ".join(str(row.get(field, "")) for field in SEARCHED))):
+            changes[("", word)][side].append(slot)
+
+    def _sort_words(self, new_words: list[str], old_words: list[str]) -> None:
+        """Keep the list of words sorted, for prefix lookups."""
+        if len(new_words) + len(old_words) > RESORT_WORDS:
+            self._sorted_words = sorted(self._words)
+            return
+        for word in old_words:
+            del self._sorted_words[bisect.bisect_left(self._sorted_words, word)]
+        for word in new_words:
+            bisect.insort(self._sorted_words, word)
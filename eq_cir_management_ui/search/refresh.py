@@ -0,0 +1,89 @@
+"""Keeps a worker's search index up to date with the CIR API's metadata feed.
+
+The feed is read through the CIR API client's cache, which returns the same list until the
+cached response expires, so the index is only compared with the feed when the feed has been
+fetched again.
+"""
+
+import threading
+import time
+from typing import Any
+
+from structlog import get_logger
+
+from eq_cir_management_ui.cir_api.client import CirApiClient, CirApiError
+from eq_cir_management_ui.search.index import SearchIndex
+
+logger = get_logger()
+
+
+class IndexRefresher:
+    """Brings a search index up to date with the metadata feed as it is searched, at most once
+    an interval. One request at a time brings it up to date, while the others search it as it
+    is, unless it has not yet been built.
+    """
+
+    def __init__(self, index: SearchIndex, client: CirApiClient, interval: float) -> None:
+        """Create the refresher.
+
+        :param index: The search index.
+        :param client: The CIR API client the feed is read with.
+        :param interval: Seconds between reads of the feed.
+        """
+        self.index = index
+        self.client = client
+        self.interval = interval
+        self.refreshed_at: float | None = None
+        # The feed last indexed.
+        self._feed: list[dict[str, Any]] | None = None
+        self._lock = threading.Lock()
+
+    def current(self) -> SearchIndex:
+        """The search index, brought up to date first if the interval has passed.
+
+        :return: The index.
+        :raises CirApiError: If the index has not been built, and the feed cannot be read.
+        """
+        # Released below.
+        # pylint: disable-next=consider-using-with
+        if not self._is_fresh() and self._lock.acquire(blocking=self._feed is None):
+            try:
+                self.refresh()
+            finally:
+                self._lock.release()
+        return self.index
+
+    def refresh(self) -> None:
+        """Bring the index up to date with the feed, unless another thread just has. If the feed
+        cannot be read, the index is searched as it is until the next interval.
+
+        :raises CirApiError: If the index has not been built, and the feed cannot be read.
+        """
+        if self._is_fresh():
+            return
+        try:
+            feed = self.client.get_ci_metadata()
+        except CirApiError:
+            if self._feed is None:
+                raise
+            logger.exception("Unable to bring the search index up to date")
+            feed = self._feed
+
+        if feed is not self._feed:
+            added, changed, removed = self.index.update(feed)
+            self._feed = feed
+            logger.info("Search index updated", added=added, changed=changed, removed=removed)
+        self.refreshed_at = time.monotonic()
+
+    def warm(self) -> None:
+        """Build the index on a background thread, so the first search need not wait for it."""
+        threading.Thread(target=self._warm, name="search-index", daemon=True).start()
+
+    def _is_fresh(self) -> bool:
+        return self.refreshed_at is not None and time.monotonic() - self.refreshed_at < self.interval
+
+    def _warm(self) -> None:
+        try:
+            self.current()
+        except CirApiError:
+            logger.exception("Unable to build the search index")
@@ -0,0 +1,37 @@
+"""Build the precompiled template bundle.
+
+Run with ``python -m eq_cir_management_ui.templating.build [path]``.
+"""
+
+import argparse
+from pathlib import Path
+
+from eq_cir_management_ui import create_app, design_system_config
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.templating.bundle import build_bundle, page_templates
+
+
+class BuildConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+    """Load templates from their source, without compiling any at start-up."""
+
+    TEMPLATE_BUNDLE_PATH = None
+    TEMPLATE_WARMUP = False
+    ADMISSION_CONTROL_ENABLED = False
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Bundle the templates reachable from the application's page templates.
+
+    :param argv: The command line arguments, or None to read them from sys.argv.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", nargs="?", type=Path, default=Path("build/templates.zip"))
+    parser.add_argument("--templates", type=Path, default=Path("templates"), help="The page template directory.")
+    arguments = parser.parse_args(argv)
+
+    app = create_app(BuildConfig)
+    build_bundle(app.jinja_env, arguments.path, page_templates(arguments.templates), design_system_config())
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
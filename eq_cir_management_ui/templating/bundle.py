@@ -0,0 +1,142 @@
+"""Precompiled template bundles.
+
+A bundle is a zip archive of the Python modules Jinja compiles the application's templates to,
+with a manifest of the templates it holds. It is built once per release, by
+``eq_cir_management_ui.templating.build``, from the templates reachable from the page
+templates, and read into memory when the application starts, so a template lookup neither
+searches nor stats the template directories.
+"""
+
+import hashlib
+import json
+import logging
+import zipfile
+from collections.abc import Iterable, MutableMapping
+from pathlib import Path
+from typing import Any
+
+import jinja2
+from jinja2 import BaseLoader, Environment, Template, TemplateNotFound
+
+from eq_cir_management_ui.templating.precompile import parse_reachable_templates
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+# Archive members get a fixed timestamp, so the same templates always build the same bundle.
+ARCHIVE_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+
+
+class TemplateBundleError(Exception):
+    """The bundle was built for another design system or Jinja version."""
+
+
+def module_name(template_name: str) -> str:
+    """The archive member holding the compiled module of a template."""
+    return f"templates/{template_name}.py"
+
+
+def page_templates(directory: Path) -> list[str]:
+    """The page templates in a directory, the roots every other template is reached from.
+
+    :param directory: The application's template directory.
+    :return: The names of the page templates.
+    """
+    return sorted(path.name for path in directory.glob("*.html"))
+
+
+def build_bundle(
+    environment: Environment,
+    path: Path,
+    roots: Iterable[str],
+    design_system_version: str | None,
+) -> dict[str, Any]:
+    """Compile every template reachable from the given roots into a bundle.
+
+    The environment must be configured as the application's is, since options such as
+    ``trim_blocks`` are applied when a template is compiled.
+
+    :param environment: The Jinja environment, loading templates from their source.
+    :param path: The file to write the bundle to.
+    :param roots: The names of the templates to start from.
+    :param design_system_version: The version of the ONS design system the templates come from.
+    :return: The manifest of the bundle.
+    """
+    templates = {}
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, template in sorted(parse_reachable_templates(environment, roots).items()):
+            templates[name] = hashlib.sha256(template.source.encode()).hexdigest()
+            archive.writestr(
+                zipfile.ZipInfo(module_name(name), ARCHIVE_TIMESTAMP),
+                environment.compile(template.tree, name, raw=True),
+                zipfile.ZIP_DEFLATED,
+            )
+
+        manifest = {
+            "design_system_version": design_system_version,
+            "jinja_version": jinja2.__version__,
+            "templates": templates,
+        }
+        archive.writestr(
+            zipfile.ZipInfo(MANIFEST_NAME, ARCHIVE_TIMESTAMP),
+            json.dumps(manifest, indent=2, sort_keys=True),
+            zipfile.ZIP_DEFLATED,
+        )
+
+    logger.info("Bundled %d templates into %s", len(templates), path)
+    return manifest
+
+
+class BundleLoader(BaseLoader):
+    """Loads templates from a bundle, which is read into memory once. Templates are compiled
+    from their module when first loaded, and never reloaded.
+    """
+
+    has_source_access = False
+
+    def __init__(self, path: Path, design_system_version: str | None) -> None:
+        """Read a bundle.
+
+        :param path: The bundle file.
+        :param design_system_version: The version of the ONS design system in use.
+        :raises TemplateBundleError: If the bundle was built for another version.
+        """
+        with zipfile.ZipFile(path) as archive:
+            self.manifest: dict[str, Any] = json.loads(archive.read(MANIFEST_NAME))
+            self._modules = {name: archive.read(module_name(name)) for name in self.manifest["templates"]}
+
+        built_for = (self.manifest["design_system_version"], self.manifest["jinja_version"])
+        if built_for != (design_system_version, jinja2.__version__):
+            msg = (
+                f"Template bundle {path} was built for design system {built_for[0]} and Jinja {built_for[1]}, "
+                f"not design system {design_system_version} and Jinja {jinja2.__version__}"
+            )
+            raise TemplateBundleError(msg)
+
+    def list_templates(self) -> list[str]:
+        """The names of every template in the bundle."""
+        return sorted(self._modules)
+
+    def load(
+        self,
+        environment: Environment,
+        name: str,
+        globals: MutableMapping[str, Any] | None = None,  # noqa: A002
+    ) -> Template:
+        """Compile a template from its module in the bundle.
+
+        :param environment: The Jinja environment.
+        :param name: The name of the template.
+        :param globals: Extra variables available to the template.
+        :return: The template.
+        :raises TemplateNotFound: If the template is not in the bundle.
+        """
+        try:
+            module = self._modules[name]
+        except KeyError:
+            raise TemplateNotFound(name) from None
+
+        code = compile(module, f"<bundle>/{name}", "exec")
+        return environment.template_class.from_code(environment, code, environment.make_globals(globals))
@@ -0,0 +1,115 @@
+"""Cache of fully rendered pages whose output only varies by the CSP nonce."""
+
+import json
+import secrets
+import threading
+from typing import Any
+
+from flask import current_app, has_request_context, render_template, request
+
+from eq_cir_management_ui.middleware.secure_headers import csp_nonce
+
+# Template name, serialised context, design system version and the root URL of the request.
+PageKey = tuple[str, str, str | None, str]
+
+
+class PageCache:
+    """Renders a template once with a placeholder in place of the CSP nonce and keeps the
+    encoded output, split on that placeholder. Serving a cached page is then a join of the
+    stored chunks with the current request's nonce.
+
+    Only pages whose output is fully determined by the template, the context passed in, the
+    design system version and the URLs built by ``url_for`` may be cached. Anything else read
+    from the request while rendering would be frozen into the first response. The URLs depend
+    on the request's scheme, host and script root, such as a proxy's path prefix, so pages are
+    cached for each root URL they are requested at.
+    """
+
+    def __init__(self, design_system_version: str | None, max_entries: int = 128) -> None:
+        self.design_system_version = design_system_version
+        self.max_entries = max_entries
+        # Random, so that page content cannot collide with the placeholder.
+        self.nonce_placeholder = f"csp-nonce-{secrets.token_hex(16)}"
+        self._pages: dict[PageKey, tuple[bytes, ...]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    @property
+    def size(self) -> int:
+        """The number of bytes of rendered output held."""
+        return sum(len(chunk) for chunks in list(self._pages.values()) for chunk in chunks)
+
+    def cache_key(self, template_name: str, context: dict[str, Any]) -> PageKey:
+        """Build the cache key for a template rendered with the given context.
+
+        :param template_name: The name of the template.
+        :param context: The variables the template is rendered with.
+        :return: The cache key.
+        """
+        return (
+            template_name,
+            json.dumps(context, sort_keys=True, default=repr),
+            self.design_system_version,
+            request.root_url if has_request_context() else "",
+        )
+
+    def render(self, template_name: str, **context: Any) -> bytes:
+        """Render a template, or serve it from the cache, with the current request's CSP nonce.
+
+        :param template_name: The name of the template.
+        :param context: The variables to render the template with.
+        :return: The encoded page.
+        """
+        key = self.cache_key(template_name, context)
+        chunks = self._pages.get(key)
+
+        if chunks is None:
+            chunks = self.render_chunks(template_name, **context)
+
+            with self._lock:
+                if key not in self._pages and len(self._pages) >= self.max_entries:
+                    # Evict the oldest page, dictionaries preserve insertion order.
+                    del self._pages[next(iter(self._pages))]
+                self._pages[key] = chunks
+
+        return csp_nonce().encode().join(chunks)
+
+    def render_chunks(self, template_name: str, **context: Any) -> tuple[bytes, ...]:
+        """Render a template with the nonce placeholder, without caching it.
+
+        :param template_name: The name of the template.
+        :param context: The variables to render the template with.
+        :return: The encoded page, split where the CSP nonce goes.
+        """
+        html = render_template(template_name, csp_nonce=lambda: self.nonce_placeholder, **context)
+        return tuple(chunk.encode() for chunk in html.split(self.nonce_placeholder))
+
+    def invalidate(self, template_name: str | None = None) -> int:
+        """Remove cached pages.
+
+        :param template_name: Only remove pages rendered from this template, or everything if None.
+        :return: The number of pages removed.
+        """
+        with self._lock:
+            keys = [key for key in self._pages if template_name is None or key[0] == template_name]
+            for key in keys:
+                del self._pages[key]
+
+        return len(keys)
+
+
+def render_cached_template(template_name: str, **context: Any) -> bytes:
+    """Render a template through the application's page cache. When the cache is disabled
+    the template is rendered on every call.
+
+    :param template_name: The name of the template.
+    :param context: The variables to render the template with.
+    :return: The encoded page.
+    """
+    if not current_app.config["PAGE_CACHE_ENABLED"]:
+        return render_template(template_name, **context).encode()
+
+    page_cache: PageCache = current_app.extensions["page_cache"]
+    return page_cache.render(template_name, **context)
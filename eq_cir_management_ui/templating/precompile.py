@@ -0,0 +1,156 @@
+"""Jinja bytecode caching and start-up template pre-compilation."""
+
+import logging
+import time
+import weakref
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from flask import Flask
+from jinja2 import Environment, FileSystemBytecodeCache, TemplateNotFound, meta, nodes
+
+logger = logging.getLogger(__name__)
+
+# The page templates rendered by the application. Everything they extend, import or
+# include is discovered from these roots.
+WARMUP_TEMPLATES = (
+    "base.html",
+    "collection_instrument_diff.html",
+    "collection_instruments.html",
+    "error.html",
+    "index.html",
+)
+
+
+def bytecode_cache(directory: str, design_system_version: str | None) -> FileSystemBytecodeCache:
+    """Create an on-disk bytecode cache for the Jinja environment.
+
+    Each design system version gets its own sub-directory, so an upgrade never reads
+    bytecode compiled from the previous version's component templates.
+
+    :param directory: The root directory of the cache.
+    :param design_system_version: The version of the ONS design system in use.
+    :return: The bytecode cache.
+    """
+    cache_directory = Path(directory) / (design_system_version or "unversioned")
+    cache_directory.mkdir(parents=True, exist_ok=True)
+    return FileSystemBytecodeCache(str(cache_directory))
+
+
+@dataclass(frozen=True)
+class ParsedTemplate:
+    """A template's source, as its loader gave it, and the syntax tree parsed from it."""
+
+    source: str
+    filename: str | None
+    uptodate: Callable[[], bool] | None
+    tree: nodes.Template
+
+
+def parse_reachable_templates(
+    environment: Environment,
+    roots: Iterable[str],
+    known: Iterable[str] = (),
+) -> dict[str, ParsedTemplate]:
+    """Parse the templates extended, imported or included from the given roots.
+
+    Template names which are only known at render time cannot be followed and are skipped.
+    Templates which are not found are logged and skipped, leaving the templates referring to
+    them parsed.
+
+    :param environment: The Jinja environment used to load the templates.
+    :param roots: The names of the templates to start from.
+    :param known: Templates already walked, which are neither parsed again nor returned.
+    :return: Every reachable template keyed on its name, in discovery order.
+    """
+    seen = set(known)
+    pending = [root for root in dict.fromkeys(roots) if root not in seen]
+    seen.update(pending)
+    parsed = {}
+
+    # The list grows while it is walked, so each newly discovered template is visited in turn.
+    for name in pending:
+        try:
+            source, filename, uptodate = environment.loader.get_source(environment, name)  # type: ignore[union-attr]
+        except TemplateNotFound:
+            logger.warning("Template %s not found, skipped", name)
+            continue
+        tree = environment.parse(source, name, filename)
+        parsed[name] = ParsedTemplate(source, filename, uptodate, tree)
+        for ref in meta.find_referenced_templates(tree):
+            if ref is not None and ref not in seen:
+                seen.add(ref)
+                pending.append(ref)
+
+    return parsed
+
+
+def find_reachable_templates(
+    environment: Environment,
+    roots: Iterable[str],
+    known: Iterable[str] = (),
+) -> list[str]:
+    """The names of the templates extended, imported or included from the given roots, as
+    ``parse_reachable_templates`` finds them.
+
+    :param environment: The Jinja environment used to load the templates.
+    :param roots: The names of the templates to start from.
+    :param known: Templates already walked, which are neither parsed again nor returned.
+    :return: The names of every reachable template, in discovery order.
+    """
+    return list(parse_reachable_templates(environment, roots, known))
+
+
+def cache_template(environment: Environment, name: str, template: ParsedTemplate) -> None:
+    """Compile a parsed template into the environment's template cache, without parsing it again,
+    reading and writing the bytecode cache as ``Environment.get_template`` would.
+
+    :param environment: The Jinja environment.
+    :param name: The name of the template.
+    :param template: The parsed template.
+    """
+    bytecode = environment.bytecode_cache
+    bucket = bytecode.get_bucket(environment, name, template.filename, template.source) if bytecode else None
+    code = bucket.code if bucket is not None else None
+    if code is None:
+        code = environment.compile(template.tree, name, template.filename)
+        if bytecode is not None and bucket is not None:
+            bucket.code = code
+            bytecode.set_bucket(bucket)
+
+    if environment.cache is not None:
+        # Keyed as Environment.get_template looks templates up.
+        environment.cache[(weakref.ref(environment.loader), name)] = environment.template_class.from_code(
+            environment,
+            code,
+            environment.make_globals(None),
+            template.uptodate,
+        )
+
+
+def precompile_templates(app: Flask, roots: Iterable[str] = WARMUP_TEMPLATES) -> list[str]:
+    """Compile every template reachable from the given roots into the Jinja template cache,
+    so that the first request served by a worker does not pay the compilation cost. Each
+    template is parsed once, for both finding the templates it refers to and compiling it.
+
+    :param app: The Flask application.
+    :param roots: The names of the templates to start from.
+    :return: The names of the templates which were compiled.
+    """
+    start = time.perf_counter()
+    environment = app.jinja_env
+
+    if environment.loader.has_source_access:  # type: ignore[union-attr]
+        parsed = parse_reachable_templates(environment, roots)
+        for name, template in parsed.items():
+            cache_template(environment, name, template)
+        compiled = list(parsed)
+    else:
+        # A precompiled bundle holds exactly the reachable templates, and no source to walk.
+        compiled = list(environment.loader.list_templates())  # type: ignore[union-attr]
+        for name in compiled:
+            environment.get_template(name)
+
+    logger.info("Precompiled %d templates in %.1fms", len(compiled), (time.perf_counter() - start) * 1000)
+    return compiled
@@ -0,0 +1,42 @@
+"""Streamed rendering of templates, for pages too large to render in memory."""
+
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from flask import Response, current_app, stream_template
+
+
+def buffered(chunks: Iterable[str], size: int) -> Iterator[bytes]:
+    """Join the many small pieces of a template stream into chunks of about ``size`` bytes, so
+    each write to the client, and each flush of a compressed stream, carries a useful amount.
+
+    :param chunks: The pieces of the page.
+    :param size: The size to buffer up to before sending.
+    :return: The encoded chunks.
+    """
+    buffer: list[str] = []
+    buffered_size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield "".join(buffer).encode()
+            buffer.clear()
+            buffered_size = 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def stream_page(template_name: str, **context: Any) -> Response:
+    """Render a template as it is sent, so the first rows reach the browser while later rows
+    are still being fetched, and the page is never held in memory as a whole.
+
+    Anything the template iterates must fail before the response is started, as once it is,
+    an error can only cut the page short.
+
+    :param template_name: The name of the template.
+    :param context: The variables to render the template with.
+    :return: The streamed response.
+    """
+    chunks = buffered(stream_template(template_name, **context), current_app.config["STREAM_CHUNK_SIZE"])
+    return Response(chunks, mimetype="text/html")
@@ -0,0 +1,77 @@
+"""Receiving uploaded documents without holding them in memory.
+
+An upload is copied a chunk at a time into a spool, held in memory up to a size and in a
+temporary file beyond it, and hashed as it is written, so its content hash is known once it
+has arrived without reading it again.
+"""
+
+import hashlib
+from itertools import chain
+from tempfile import SpooledTemporaryFile
+from typing import Any, cast
+
+from flask import Request
+from werkzeug.formparser import FormDataParser
+
+# Bytes read from the request body at a time.
+CHUNK_SIZE = 65536
+# The form field holding the uploaded document.
+DOCUMENT_FIELD = "document"
+
+
+class HashingSpool(SpooledTemporaryFile[bytes]):  # pylint: disable=too-few-public-methods
+    """A spooled temporary file which keeps the SHA-256 hash and size of what is written to it."""
+
+    def __init__(self, max_memory: int) -> None:
+        """Create the spool.
+
+        :param max_memory: Bytes held in memory, beyond which the spool moves to a temporary file.
+        """
+        super().__init__(max_size=max_memory, mode="w+b")
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: Any) -> int:
+        """Write and hash a chunk."""
+        self.digest.update(data)
+        self.size += len(data)
+        return super().write(data)
+
+
+def receive_upload(request: Request, max_memory: int) -> HashingSpool | None:
+    """Spool an uploaded document, sent as a JSON body, or as the ``document`` file of a form.
+    The body is limited to the application's MAX_CONTENT_LENGTH, and a longer one raises
+    RequestEntityTooLarge, before any of it is read if its length is declared.
+
+    :param request: The request.
+    :param max_memory: Bytes of the document held in memory before it is spooled to disk.
+    :return: The spooled document, positioned at its start, or None if the request has none.
+    """
+    if request.mimetype == "application/json":
+        spool = HashingSpool(max_memory)
+        try:
+            while chunk := request.stream.read(CHUNK_SIZE):
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
+    if request.mimetype == "multipart/form-data":
+        # Parsed here, rather than through request.files, so each file is written to a spool.
+        parser = FormDataParser(
+            stream_factory=lambda *_args, **_kwargs: HashingSpool(max_memory),
+            max_form_memory_size=request.max_form_memory_size,
+            max_content_length=request.max_content_length,
+            max_form_parts=request.max_form_parts,
+        )
+        _, _, files = parser.parse(request.stream, request.mimetype, request.content_length, request.mimetype_params)
+        document = files.get(DOCUMENT_FIELD)
+        for upload in chain.from_iterable(files.listvalues()):
+            if upload is not document:
+                upload.close()
+        if document is not None:
+            return cast(HashingSpool, document.stream)
+
+    return None
@@ -0,0 +1,271 @@
+"""Streaming validation of uploaded collection instrument documents.
+
+A document is parsed incrementally into a stream of events, each the prefix of a value, such as
+``sections.item.id``, the kind of event and the value, and each rule is checked as its event
+arrives. Only the open containers and the ids seen so far are held, never the document, and
+the first broken rule stops the parse, so an invalid document fails without being read to the
+end.
+
+Documents are parsed with ``ijson``, whose C backend parses without holding the document.
+"""
+
+import re
+from collections.abc import Iterator
+from typing import IO, Any
+
+import ijson
+
+# The prefix, kind and value of a parse event, as named by ijson.
+Event = tuple[str, str, Any]
+
+SECTION = "sections.item"
+GROUP = f"{SECTION}.groups.item"
+BLOCK = f"{GROUP}.blocks.item"
+QUESTION = f"{BLOCK}.question"
+ANSWER = f"{QUESTION}.answers.item"
+
+ANSWER_TYPES = (
+    "Address",
+    "Checkbox",
+    "Currency",
+    "Date",
+    "Dropdown",
+    "Duration",
+    "MobileNumber",
+    "MonthYearDate",
+    "Number",
+    "Percentage",
+    "Radio",
+    "TextArea",
+    "TextField",
+    "Unit",
+    "YearDate",
+)
+
+# The kind of value expected at each prefix.
+TYPES = {
+    "": "object",
+    "survey_id": "string",
+    "form_type": "string",
+    "language": "string",
+    "title": "string",
+    "data_version": "string",
+    "sections": "array",
+    SECTION: "object",
+    f"{SECTION}.id": "string",
+    f"{SECTION}.title": "string",
+    f"{SECTION}.groups": "array",
+    GROUP: "object",
+    f"{GROUP}.id": "string",
+    f"{GROUP}.blocks": "array",
+    BLOCK: "object",
+    f"{BLOCK}.id": "string",
+    f"{BLOCK}.type": "string",
+    QUESTION: "object",
+    f"{QUESTION}.id": "string",
+    f"{QUESTION}.title": "string",
+    f"{QUESTION}.type": "string",
+    f"{QUESTION}.answers": "array",
+    ANSWER: "object",
+    f"{ANSWER}.id": "string",
+    f"{ANSWER}.type": "string",
+    f"{ANSWER}.label": "string",
+    f"{ANSWER}.mandatory": "boolean",
+}
+# The keys each object must have.
+REQUIRED = {
+    "": ("survey_id", "form_type", "language", "title", "data_version", "sections"),
+    SECTION: ("id", "groups"),
+    GROUP: ("id", "blocks"),
+    BLOCK: ("id", "type"),
+    QUESTION: ("id", "answers"),
+    ANSWER: ("id", "type"),
+}
+# The arrays which must have at least one item.
+NON_EMPTY = frozenset(("sections", f"{SECTION}.groups", f"{GROUP}.blocks", f"{QUESTION}.answers"))
+# The strings which must match a pattern.
+PATTERNS = {
+    "survey_id": re.compile(r"\d{3,4}"),
+    "form_type": re.compile(r"\d{4}"),
+    "language": re.compile(r"en|cy"),
+    "data_version": re.compile(r"\d+\.\d+\.\d+"),
+    f"{ANSWER}.type": re.compile("|".join(ANSWER_TYPES)),
+}
+# The ids which must be unique within the document.
+IDS = frozenset(prefix for prefix in TYPES if prefix.endswith(".id"))
+# The values reported in a valid document's summary, and the objects counted.
+SUMMARY = ("survey_id", "form_type", "language", "title", "data_version")
+COUNTED = {SECTION: "sections", QUESTION: "questions", ANSWER: "answers"}
+
+# Containers open at once at most, deeper documents are rejected before they exhaust the parser.
+MAX_DEPTH = 32
+
+KINDS = {
+    "start_map": "object",
+    "start_array": "array",
+    "string": "string",
+    "number": "number",
+    "boolean": "boolean",
+    "null": "null",
+}
+
+
+class DocumentError(ValueError):
+    """A rule broken by a document, at the path of the offending value."""
+
+    def __init__(self, path: str, message: str) -> None:
+        super().__init__(f"{path or 'The document'}: {message}")
+        self.path = path
+        self.message = message
+
+
+def parse_events(file: IO[bytes]) -> Iterator[Event]:
+    """Parse a JSON document incrementally, a buffer at a time.
+
+    :param file: The document, read from its current position.
+    :return: The events.
+    """
+    events: Iterator[Event] = ijson.parse(file, buf_size=65536)
+    return events
+
+
+def document_events(value: Any, prefix: str = "") -> Iterator[Event]:
+    """The parse events of a loaded JSON value, as ijson would produce them from its text.
+
+    :param value: The value.
+    :param prefix: The prefix of the value.
+    :return: The events.
+    """
+    if isinstance(value, dict):
+        yield prefix, "start_map", None
+        for key, item in value.items():
+            yield prefix, "map_key", key
+            yield from document_events(item, f"{prefix}.{key}" if prefix else key)
+        yield prefix, "end_map", None
+    elif isinstance(value, list):
+        yield prefix, "start_array", None
+        for item in value:
+            yield from document_events(item, f"{prefix}.item" if prefix else "item")
+        yield prefix, "end_array", None
+    elif value is None:
+        yield prefix, "null", None
+    elif isinstance(value, bool):
+        yield prefix, "boolean", value
+    elif isinstance(value, str):
+        yield prefix, "string", value
+    else:
+        yield prefix, "number", value
+
+
+class Container:  # pylint: disable=too-few-public-methods
+    """An object or array which is open in the parse."""
+
+    __slots__ = ("count", "is_object", "key", "keys", "prefix")
+
+    def __init__(self, prefix: str, is_object: bool) -> None:  # noqa: FBT001
+        self.prefix = prefix
+        self.is_object = is_object
+        # The key of an object's current value, and the keys seen.
+        self.key: str | None = None
+        self.keys: set[str] = set()
+        # The number of an array's items seen.
+        self.count = 0
+
+
+class DocumentValidator:  # pylint: disable=too-few-public-methods
+    """Checks the rules of a collection instrument document as its parse events arrive."""
+
+    def __init__(self) -> None:
+        self.summary: dict[str, Any] = dict.fromkeys(COUNTED.values(), 0)
+        self._open: list[Container] = []
+        self._ids: set[str] = set()
+
+    def feed(self, prefix: str, event: str, value: Any) -> None:
+        """Check a parse event.
+
+        :param prefix: The prefix of the value.
+        :param event: The kind of event.
+        :param value: The value, or the key of a ``map_key`` event.
+        :raises DocumentError: If the event breaks a rule.
+        """
+        containers = self._open
+        if event == "map_key":
+            container = containers[-1]
+            container.key = value
+            if value in container.keys:
+                raise DocumentError(self._path(containers), "is a duplicate key")
+            container.keys.add(value)
+            return
+        if event in ("end_map", "end_array"):
+            self._close(containers[-1])
+            containers.pop()
+            return
+
+        if containers and not containers[-1].is_object:
+            containers[-1].count += 1
+        # Every rule is of a value at a known prefix, so the rest are only checked for their depth.
+        expected = TYPES.get(prefix)
+        if expected is not None:
+            self._check_value(prefix, expected, KINDS[event], value)
+        if event in ("start_map", "start_array"):
+            if len(containers) == MAX_DEPTH:
+                raise DocumentError(self._path(containers), f"nested more than {MAX_DEPTH} deep")
+            containers.append(Container(prefix, event == "start_map"))
+
+    def _check_value(self, prefix: str, expected: str, kind: str, value: Any) -> None:
+        if kind != expected:
+            raise DocumentError(self._path(self._open), f"must be {article(expected)}, not {article(kind)}")
+        pattern = PATTERNS.get(prefix)
+        if pattern is not None and not pattern.fullmatch(value):
+            raise DocumentError(self._path(self._open), f"{value!r} is not valid")
+        if prefix in IDS:
+            if value in self._ids:
+                raise DocumentError(self._path(self._open), f"the id {value!r} is not unique")
+            self._ids.add(value)
+        if prefix in SUMMARY:
+            self.summary[prefix] = value
+        elif prefix in COUNTED:
+            self.summary[COUNTED[prefix]] += 1
+
+    def _close(self, container: Container) -> None:
+        if container.is_object:
+            for key in REQUIRED.get(container.prefix, ()):
+                if key not in container.keys:
+                    raise DocumentError(self._path(self._open[:-1]), f"is missing {key!r}")
+        elif container.prefix in NON_EMPTY and not container.count:
+            raise DocumentError(self._path(self._open[:-1]), "must not be empty")
+
+    @staticmethod
+    def _path(containers: list[Container]) -> str:
+        """The path of the current value within the given open containers, such as ``sections[2].id``."""
+        path = ""
+        for container in containers:
+            if not container.is_object:
+                path += f"[{container.count - 1}]"
+            elif container.key is not None:
+                path += f".{container.key}" if path else container.key
+        return path
+
+
+def article(kind: str) -> str:
+    """A kind of value, with its indefinite article."""
+    return f"an {kind}" if kind in ("object", "array") else f"a {kind}"
+
+
+def validate_document(file: IO[bytes]) -> dict[str, Any]:
+    """Validate a collection instrument document, stopping at the first broken rule.
+
+    :param file: The document, read from its current position.
+    :return: A report of whether the document is valid, its first error if not, and a
+        summary of its metadata and size if it is.
+    """
+    validator = DocumentValidator()
+    feed = validator.feed
+    try:
+        for prefix, event, value in parse_events(file):
+            feed(prefix, event, value)
+    except DocumentError as error:
+        return {"valid": False, "errors": [{"path": error.path, "message": error.message}]}
+    except ijson.JSONError:
+        return {"valid": False, "errors": [{"path": "", "message": "is not valid JSON"}]}
+    return {"valid": True, "errors": [], "summary": validator.summary}
@@ -0,0 +1,117 @@
+"""Keyset pagination over data sources which fetch rows in key order.
+
+A page is identified by the key of the row before it, rather than by an offset, so fetching
+any page costs the same and rows added or removed before it do not shift it. The key is
+passed between requests as an opaque cursor.
+"""
+
+import base64
+import binascii
+import json
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any, Generic, Self, TypeVar
+
+T = TypeVar("T")
+
+# The values a source is ordered by, unique for each row.
+Key = tuple[Any, ...]
+# Fetches up to ``limit`` rows in key order, those after the given key, or the first if None.
+Fetch = Callable[[Key | None, int], Iterable[T]]
+
+
+def encode_cursor(key: Key) -> str:
+    """Encode a key as a URL safe cursor.
+
+    :param key: The key of the last row of a page.
+    :return: The cursor.
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None, types: tuple[type, ...] | None = None) -> Key | None:
+    """Decode a cursor back to a key.
+
+    :param cursor: A cursor from ``encode_cursor``, or None for the first page.
+    :param types: The type of each value of the source's keys, which the key must match, or
+        None to accept a key of any values.
+    :return: The key, or None for the first page.
+    :raises ValueError: If the cursor is not one ``encode_cursor`` could have produced from a
+        key of the source.
+    """
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as exception:
+        msg = f"Invalid cursor {cursor!r}"
+        raise ValueError(msg) from exception
+    if isinstance(key, list) and (
+        types is None
+        or (len(key) == len(types) and all(isinstance(value, type_) for value, type_ in zip(key, types, strict=True)))
+    ):
+        return tuple(key)
+    msg = f"Invalid cursor {cursor!r}"
+    raise ValueError(msg)
+
+
+class KeysetPage(Generic[T]):
+    """A page of rows, fetched from a source in batches while it is iterated, so that only one
+    batch is held at a time however large the page is.
+
+    Each batch is fetched with one row more than it yields, which tells whether there is a
+    further batch, or page. Once iterated, ``next_cursor`` is the cursor of the next page, or
+    None on the last page.
+    """
+
+    def __init__(
+        self,
+        fetch: Fetch[T],
+        key: Callable[[T], Key],
+        *,
+        after: Key | None = None,
+        size: int = 100,
+        batch_size: int = 100,
+    ) -> None:
+        """Create the page.
+
+        :param fetch: The data source.
+        :param key: The key of a row.
+        :param after: The key of the row before the page, None for the first page.
+        :param size: The number of rows in the page.
+        :param batch_size: The number of rows fetched from the source at a time.
+        """
+        self.fetch = fetch
+        self.key = key
+        self.after = after
+        self.size = max(1, size)
+        self.batch_size = max(1, batch_size)
+        self.next_cursor: str | None = None
+        self._prefetched: list[T] | None = None
+
+    def prefetch(self) -> Self:
+        """Fetch the first batch now, so that a failing source fails before a response is started.
+
+        :return: The page.
+        """
+        self._prefetched = self._fetch_batch(self.after, self.size)
+        return self
+
+    def __iter__(self) -> Iterator[T]:
+        after, remaining = self.after, self.size
+        batch = self._prefetched if self._prefetched is not None else self._fetch_batch(after, remaining)
+        self._prefetched = None
+
+        while True:
+            wanted = min(self.batch_size, remaining)
+            yield from batch[:wanted]
+            if len(batch) <= wanted:
+                return
+
+            after, remaining = self.key(batch[wanted - 1]), remaining - wanted
+            if not remaining:
+                self.next_cursor = encode_cursor(after)
+                return
+            batch = self._fetch_batch(after, remaining)
+
+    def _fetch_batch(self, after: Key | None, remaining: int) -> list[T]:
+        return list(self.fetch(after, min(self.batch_size, remaining) + 1))
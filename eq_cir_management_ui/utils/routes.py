@@ -1,17 +1,27 @@
 """Routes for the EQ CIR Management UI utils."""
 
-from typing import cast
+from flask import Blueprint, Response, abort, current_app
 
-from flask import Blueprint, Response, abort, current_app, send_from_directory
+from eq_cir_management_ui.utils.static_assets import StaticAssetStore
 
 utils_blueprint = Blueprint("utils", __name__)
 
 
+def static(filename: str) -> Response:
+    """Serve a static asset from the in-memory asset store.
+    Registered in place of Flask's static file view.
+    """
+    static_assets: StaticAssetStore = current_app.extensions["static_assets"]
+    response = static_assets.response(filename)
+    if response is None:
+        abort(404)
+    return response
+
+
 @utils_blueprint.route("/favicon.ico")
 def favicon() -> Response:
     """Simulate a favicon request."""
-    static_folder = cast(str, current_app.static_folder)
-    return send_from_directory(static_folder, "favicon.ico", mimetype="image/vnd.microsoft.icon")
+    return static("favicon.ico")
 
 
 @utils_blueprint.route("/400")
@@ -38,7 +48,19 @@ def trigger_405() -> Response:
     abort(405)
 
 
+@utils_blueprint.route("/429")
+def trigger_429() -> Response:
+    """Simulate a too many requests error."""
+    abort(429)
+
+
 @utils_blueprint.route("/500")
 def trigger_500() -> Response:
     """Simulate an internal server error."""
     abort(500)
+
+
+@utils_blueprint.route("/503")
+def trigger_503() -> Response:
+    """Simulate a service unavailable error."""
+    abort(503)
@@ -0,0 +1,131 @@
+"""In-memory static asset store, serving precompressed, fingerprinted assets."""
+
+import hashlib
+import mimetypes
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Any
+
+from flask import Response, current_app, request, url_for
+
+from eq_cir_management_ui.compression import ENCODERS
+
+# Served with these types regardless of the platform's mime type database.
+MIMETYPE_OVERRIDES = {".ico": "image/vnd.microsoft.icon"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@dataclass(frozen=True)
+class StaticAsset:
+    """A static file held in memory, with its precompressed variants."""
+
+    name: str
+    content: bytes
+    mimetype: str
+    digest: str
+    variants: dict[str, bytes] = field(default_factory=dict)
+
+    @property
+    def fingerprinted_name(self) -> str:
+        """The name of the asset with the content digest inserted before its suffix."""
+        path = PurePosixPath(self.name)
+        return str(path.with_name(f"{path.stem}.{self.digest[:12]}{path.suffix}"))
+
+    def etag(self, encoding: str | None) -> str:
+        """The entity tag of one representation of the asset."""
+        return f"{self.digest}-{encoding}" if encoding else self.digest
+
+
+class StaticAssetStore:
+    """Static files loaded into memory once, at start-up.
+
+    Each file is stored with a content digest, used for its entity tags and fingerprinted
+    name, and a compressed variant for each supported encoding which makes it smaller.
+    """
+
+    def __init__(self) -> None:
+        self.assets: dict[str, StaticAsset] = {}
+        self.fingerprinted: dict[str, StaticAsset] = {}
+
+    def __len__(self) -> int:
+        return len(self.assets)
+
+    @property
+    def size(self) -> int:
+        """The number of bytes held, including compressed variants."""
+        return sum(len(asset.content) + sum(map(len, asset.variants.values())) for asset in self.assets.values())
+
+    def load_directory(self, directory: Path, prefix: str = "") -> None:
+        """Load every file below a directory.
+
+        :param directory: The directory to load.
+        :param prefix: Prefix for the names of the loaded assets.
+        """
+        for path in sorted(directory.rglob("*")):
+            if path.is_file():
+                self.add(f"{prefix}{path.relative_to(directory).as_posix()}", path.read_bytes())
+
+    def add(self, name: str, content: bytes) -> StaticAsset:
+        """Add an asset to the store.
+
+        :param name: The name the asset is requested by.
+        :param content: The content of the asset.
+        :return: The stored asset.
+        """
+        suffix = PurePosixPath(name).suffix
+        mimetype = MIMETYPE_OVERRIDES.get(suffix) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        variants = {}
+        for encoding, encode in ENCODERS.items():
+            encoded = encode(content)
+            if len(encoded) < len(content):
+                variants[encoding] = encoded
+
+        asset = StaticAsset(name, content, mimetype, hashlib.sha256(content).hexdigest()[:32], variants)
+        self.assets[name] = asset
+        self.fingerprinted[asset.fingerprinted_name] = asset
+        return asset
+
+    def asset_url_for(self, endpoint: str, **values: Any) -> str:
+        """A drop in replacement for ``url_for`` which links static files by their
+        fingerprinted name, so they can be cached forever.
+
+        :param endpoint: The endpoint to build a URL for.
+        :param values: The values of the URL rule.
+        :return: The URL.
+        """
+        if endpoint == "static" and (asset := self.assets.get(values.get("filename", ""))):
+            values["filename"] = asset.fingerprinted_name
+        return url_for(endpoint, **values)
+
+    def response(self, name: str) -> Response | None:
+        """Build the response for a request for an asset, honouring Accept-Encoding and
+        If-None-Match. Fingerprinted names are cached forever.
+
+        :param name: The requested name of the asset.
+        :return: The response, or None if there is no such asset.
+        """
+        immutable = name in self.fingerprinted
+        asset = self.fingerprinted.get(name) or self.assets.get(name)
+        if asset is None:
+            return None
+
+        encoding = next((encoding for encoding in asset.variants if request.accept_encodings[encoding]), None)
+        etag = asset.etag(encoding)
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(asset.variants[encoding] if encoding else asset.content, mimetype=asset.mimetype)
+            if encoding:
+                response.content_encoding = encoding
+
+        response.set_etag(etag)
+        if asset.variants:
+            response.vary.add("Accept-Encoding")
+        if immutable:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config["STATIC_MAX_AGE"]
+        return response
@@ -1,14 +1,97 @@
-"""Gunicorn configuration."""
+"""Gunicorn configuration.
 
+The worker layout comes from the profile named by ``WEB_SERVER_PROFILE``, see
+``server_profiles``. The application is preloaded in the master by default, so it is created,
+and its templates compiled, once and shared copy-on-write with the workers. Otherwise, as under
+the ``async`` profile, the master never imports the application, and only the workers do.
+
+Unless ``METRICS_MULTIPROCESS_DIR`` names one, the workers share their metrics through a
+directory of this server's own, so ``/metrics`` reports the totals of every worker.
+"""
+
+import gc
 import os
+import shutil
+import tempfile
 
 import gunicorn
 
-workers = int(os.getenv("WEB_SERVER_WORKERS", "3"))
-threads = int(os.getenv("WEB_SERVER_THREADS", "10"))
-keepalive = int(os.getenv("HTTP_KEEP_ALIVE", "2"))
+from server_profiles import clear_snapshots, init_worker, limit_worker, server_settings
+
+settings = server_settings()
+worker_class = settings["worker_class"]
+workers = settings["workers"]
+threads = settings["threads"]
+keepalive = settings["keepalive"]
+timeout = settings["timeout"]
+max_requests = settings["max_requests"]
+max_requests_jitter = settings["max_requests_jitter"]
+preload_app = settings["preload_app"]
+worker_connections = settings["worker_connections"]
 loglevel = os.getenv("LOG_LEVEL", "info")
 ACCESSLOG = "-"
 ERRORLOG = "-"
 BIND = "0.0.0.0:5100"
 gunicorn.SERVER_SOFTWARE = "None"
+
+# In memory where there is a tmpfs for it, as in containers. Set before the application reads
+# its configuration, in the master when it is preloaded, and inherited by the workers.
+DEFAULT_METRICS_DIRECTORY = os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),  # noqa: S108
+    f"eq-cir-metrics-{os.getpid()}",
+)
+os.environ.setdefault("METRICS_MULTIPROCESS_DIR", DEFAULT_METRICS_DIRECTORY)
+
+
+def on_starting(_server: object) -> None:
+    """Create the metrics directory, and discard snapshots left in it by a previous server."""
+    metrics_directory = os.environ["METRICS_MULTIPROCESS_DIR"]
+    os.makedirs(metrics_directory, exist_ok=True)
+    clear_snapshots(metrics_directory)
+
+
+def on_exit(_server: object) -> None:
+    """Remove this server's own metrics directory."""
+    if os.environ["METRICS_MULTIPROCESS_DIR"] == DEFAULT_METRICS_DIRECTORY:
+        shutil.rmtree(DEFAULT_METRICS_DIRECTORY, ignore_errors=True)
+
+
+def pre_fork(_server: object, _worker: object) -> None:
+    """Move the objects of the preloaded application out of the garbage collector's reach, so
+    collections in the workers do not write to, and so copy, the pages shared with the master.
+    """
+    gc.freeze()
+
+
+def post_fork(_server: object, worker: object) -> None:
+    """Reinitialise the per-process state of the preloaded application in the new worker."""
+    if preload_app:
+        init_worker(worker.app.wsgi())  # type: ignore[attr-defined]
+
+
+def post_worker_init(worker: object) -> None:
+    """Limit the requests the worker admits to those its settings, including any given on the
+    command line, let it handle at once. Start running background jobs in the worker, resuming
+    any left by a stopped worker, and build its search index.
+    """
+    cfg = worker.cfg  # type: ignore[attr-defined]
+    app = worker.app.wsgi()  # type: ignore[attr-defined]
+    limit_worker(
+        app,
+        {"worker_class": cfg.worker_class_str, "threads": cfg.threads, "worker_connections": cfg.worker_connections},
+    )
+    app.extensions["job_runner"].start()
+    app.extensions["search_index"].warm()
+
+
+def worker_exit(_server: object, worker: object) -> None:
+    """Hand the exiting worker's background jobs back to the other workers, fold its metrics into
+    those of the exited workers, so its counts are kept, and log the repeats of client errors it
+    has counted since its last summary.
+    """
+    # Imported here, in the worker, which has already loaded the application.
+    from eq_cir_management_ui.metrics.registry import REGISTRY
+
+    worker.app.wsgi().extensions["job_runner"].stop()  # type: ignore[attr-defined]
+    REGISTRY.retire()
+    worker.app.wsgi().extensions["client_error_summary"].flush()  # type: ignore[attr-defined]
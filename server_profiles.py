@@ -0,0 +1,206 @@
+"""Gunicorn deployment profiles, sized from the CPUs and memory available to the container.
+
+A profile sets the worker class and the number of worker processes and threads:
+
+- ``cpu``: rendering bound work, one process per CPU plus one, with few threads, as threads
+  of one process share the GIL.
+- ``io``: work waiting on backend calls, one process per CPU with many threads, which wait
+  on sockets without holding the GIL.
+- ``low-memory``: as few processes as possible, recycled more often.
+- ``async``: gevent workers, one process per CPU, for deployments serving many long-lived
+  event streams, each of which holds a greenlet rather than one of a few threads. Needs the
+  ``async`` extra, which installs ``gevent``.
+
+Workers are then capped so that their estimated memory fits within the cgroup memory limit.
+
+This module is read by the gunicorn master from ``gunicorn_config.py``, so it does not import
+the application: gevent workers patch the standard library when they start, and the master
+must not have created the application's locks and threads before then.
+"""
+
+import math
+import os
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from flask import Flask
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+# Estimated resident memory of the master process, and of each worker process.
+MASTER_MEMORY = 80 * 1024 * 1024
+WORKER_MEMORY = int(os.getenv("WEB_SERVER_WORKER_MEMORY", str(150 * 1024 * 1024)))
+
+
+@dataclass(frozen=True)
+class Profile:  # pylint: disable=too-many-instance-attributes
+    """Gunicorn settings for a kind of deployment."""
+
+    name: str
+    worker_class: str
+    workers: int
+    threads: int
+    keepalive: int = 2
+    timeout: int = 30
+    # Workers are restarted after this many requests, plus a random jitter so they do not all
+    # restart at once, which bounds the growth of a leaking worker.
+    max_requests: int = 10000
+    max_requests_jitter: int = 1000
+    preload_app: bool = True
+    # Connections served at once by each gevent worker.
+    worker_connections: int = 1000
+
+    def settings(self) -> dict[str, Any]:
+        """The gunicorn settings of the profile.
+
+        :return: The settings, keyed on gunicorn setting name.
+        """
+        settings = asdict(self)
+        del settings["name"]
+        return settings
+
+
+def available_cpus(cgroup_root: Path = CGROUP_ROOT) -> int:
+    """The number of CPUs the process may use, the smaller of its CPU affinity and any cgroup
+    CPU quota, rounded up.
+
+    :param cgroup_root: The cgroup filesystem mount point.
+    :return: The number of CPUs.
+    """
+    # CPU affinity is only available on Linux.
+    sched_getaffinity = getattr(os, "sched_getaffinity", None)
+    cpus = len(sched_getaffinity(0)) if sched_getaffinity is not None else os.cpu_count() or 1
+
+    quota = period = None
+    if (cpu_max := cgroup_root / "cpu.max").exists():
+        quota, period = cpu_max.read_text().split()
+    elif (cfs_quota := cgroup_root / "cpu" / "cpu.cfs_quota_us").exists():
+        quota, period = cfs_quota.read_text().strip(), (cgroup_root / "cpu" / "cpu.cfs_period_us").read_text().strip()
+
+    if quota is not None and period is not None and quota not in ("max", "-1"):
+        cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    return max(1, cpus)
+
+
+def memory_limit(cgroup_root: Path = CGROUP_ROOT) -> int | None:
+    """The cgroup memory limit of the process.
+
+    :param cgroup_root: The cgroup filesystem mount point.
+    :return: The limit in bytes, or None if there is no limit.
+    """
+    for path in (cgroup_root / "memory.max", cgroup_root / "memory" / "memory.limit_in_bytes"):
+        if path.exists():
+            limit = path.read_text().strip()
+            # cgroup v1 reports no limit as a very large number rather than "max".
+            if limit == "max" or int(limit) >= 2**60:
+                return None
+            return int(limit)
+    return None
+
+
+def build_profile(name: str, cpus: int, memory: int | None) -> Profile:
+    """Size a named profile for the available CPUs and memory.
+
+    :param name: The profile, one of ``cpu``, ``io``, ``low-memory`` or ``async``.
+    :param cpus: The number of CPUs available.
+    :param memory: The memory limit in bytes, or None if there is no limit.
+    :return: The profile.
+    """
+    match name:
+        case "cpu":
+            profile = Profile(name, "gthread", workers=cpus + 1, threads=2)
+        case "io":
+            profile = Profile(name, "gthread", workers=cpus, threads=16, keepalive=5)
+        case "low-memory":
+            profile = Profile(name, "gthread", workers=1, threads=8, max_requests=2000, max_requests_jitter=200)
+        case "async":
+            # Not preloaded, as gevent must patch the standard library before the application
+            # creates its locks and threads, which it does in the worker.
+            profile = Profile(name, "gevent", workers=cpus, threads=1, keepalive=5, preload_app=False)
+        case _:
+            msg = f"Unknown web server profile {name!r}, expected one of cpu, io, low-memory or async"
+            raise ValueError(msg)
+
+    if memory is not None:
+        affordable = max(1, (memory - MASTER_MEMORY) // WORKER_MEMORY)
+        profile = replace(profile, workers=min(profile.workers, affordable))
+    return profile
+
+
+def worker_concurrency(settings: dict[str, Any]) -> int:
+    """The number of requests a worker handles at once: its threads, or its connections under gevent.
+
+    :param settings: The gunicorn settings.
+    :return: The number of requests.
+    """
+    return int(settings["worker_connections"] if settings["worker_class"] == "gevent" else settings["threads"])
+
+
+def server_settings(environ: dict[str, str] | None = None) -> dict[str, Any]:
+    """The gunicorn settings for this host. ``WEB_SERVER_PROFILE`` selects the profile, and
+    ``WEB_SERVER_WORKERS``, ``WEB_SERVER_THREADS``, ``HTTP_KEEP_ALIVE`` and
+    ``WEB_SERVER_PRELOAD_APP`` override its settings.
+
+    :param environ: The environment, defaults to ``os.environ``.
+    :return: The settings, keyed on gunicorn setting name.
+    """
+    environ = os.environ.copy() if environ is None else environ
+    settings = build_profile(
+        environ.get("WEB_SERVER_PROFILE", "io"),
+        available_cpus(),
+        memory_limit(),
+    ).settings()
+
+    overrides: dict[str, tuple[str, Callable[[str], Any]]] = {
+        "workers": ("WEB_SERVER_WORKERS", int),
+        "threads": ("WEB_SERVER_THREADS", int),
+        "keepalive": ("HTTP_KEEP_ALIVE", int),
+        "preload_app": ("WEB_SERVER_PRELOAD_APP", lambda value: value.lower() == "true"),
+    }
+    for setting, (variable, parse) in overrides.items():
+        if variable in environ:
+            settings[setting] = parse(environ[variable])
+    return settings
+
+
+def init_worker(app: "Flask") -> None:
+    """Reinitialise the per-process state of an application in a newly forked worker.
+
+    Threads do not survive a fork, and sockets and locks inherited from the master would be
+    shared with it and with every other worker. The metrics flusher and log listener are
+    restarted by ``os.register_at_fork`` hooks, and the caches detect the fork themselves.
+
+    :param app: The application, created in the master when it was preloaded.
+    """
+    app.extensions["cir_api_client"].reset()
+    app.extensions["readiness"].reset_after_fork()
+
+
+def limit_worker(app: "Flask", settings: dict[str, Any]) -> None:
+    """Limit the requests a worker's application admits at once to those the worker handles at
+    once, and its event streams under gthread workers, from the settings it was started with,
+    wherever they came from, unless the application's configuration sets the limits.
+
+    :param app: The application in the worker.
+    :param settings: The worker's gunicorn settings.
+    """
+    admission = app.extensions.get("admission")
+    if admission is not None and not app.config["ADMISSION_MAX_IN_FLIGHT"]:
+        # One less, so a thread is always free to shed queued requests.
+        admission.max_in_flight = max(1, worker_concurrency(settings) - 1)
+    # A stream holds a thread, so most are left for other requests. Under gevent it holds a
+    # greenlet, and the streams are only bounded by the worker's connections.
+    if settings["worker_class"] != "gevent" and not app.config["EVENTS_MAX_SUBSCRIBERS"]:
+        app.extensions["event_broker"].max_subscribers = max(1, worker_concurrency(settings) // 4)
+
+
+def clear_snapshots(directory: str) -> None:
+    """Remove the metrics snapshots left in the multiprocess metrics directory by a previous
+    server, so totals restart with the server.
+
+    :param directory: The multiprocess metrics directory.
+    """
+    for path in Path(directory).glob("*.json"):
+        path.unlink(missing_ok=True)
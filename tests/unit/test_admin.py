@@ -0,0 +1,78 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the admin routes."""
+
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.cir_api.stub_server import StubCirServer
+from eq_cir_management_ui.config.config import DefaultConfig
+
+ADMIN_TOKEN = "test-admin-token"  # noqa: S105
+
+
+class AdminConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+    """Config with the admin routes enabled."""
+
+    ADMIN_TOKEN = ADMIN_TOKEN
+
+
+@pytest.fixture
+def admin_client():
+    """A test client for an application with the admin routes enabled."""
+    return create_app(AdminConfig).test_client()
+
+
+def test_admin_routes_are_not_found_without_a_token(client):
+    """Test that the admin routes are disabled when no ADMIN_TOKEN is configured."""
+    assert client.post("/admin/cache/invalidate").status_code == 404
+
+
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong", f"Basic {ADMIN_TOKEN}"])
+def test_admin_routes_require_the_token(admin_client, authorization):
+    """Test that requests without the admin bearer token are unauthorised."""
+    headers = {"Authorization": authorization} if authorization else {}
+
+    assert admin_client.post("/admin/cache/invalidate", headers=headers).status_code == 401
+
+
+def test_invalidate_cache():
+    """Test that the route removes cached CIR API responses."""
+    with StubCirServer() as stub:
+        app = create_app(type("StubConfig", (AdminConfig,), {"CIR_API_URL": stub.url}))
+        cir_api_client = app.extensions["cir_api_client"]
+        cir_api_client.get_ci_metadata()
+        cir_api_client.get_ci_versions("1000", "0001", "en")
+        cir_api_client.get_ci_metadata()
+        headers = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+        assert stub.requests == 2
+        response = app.test_client().post("/admin/cache/invalidate?endpoint=/v2/ci_metadata", headers=headers)
+        assert response.json == {"invalidated": 1, "shared_invalidated": 0}
+        response = app.test_client().post("/admin/cache/invalidate", headers=headers)
+        assert response.json == {"invalidated": 1, "shared_invalidated": 0}
+
+        cir_api_client.get_ci_metadata()
+        assert stub.requests == 3
+
+
+def test_invalidate_without_a_cache():
+    """Test that the route succeeds when the response cache is disabled."""
+    app = create_app(type("UncachedConfig", (AdminConfig,), {"RESPONSE_CACHE_ENABLED": False}))
+
+    response = app.test_client().post(
+        "/admin/cache/invalidate",
+        headers={"Authorization": f"Bearer {ADMIN_TOKEN}"},
+    )
+
+    assert response.json == {"invalidated": 0, "shared_invalidated": 0}
+
+
+def test_app_maps_the_shared_cache(tmp_path):
+    """Test that the application maps the shared cache when a path is configured."""
+    path = str(tmp_path / "shared.cache")
+    app = create_app(type("SharedConfig", (AdminConfig,), {"SHARED_CACHE_PATH": path}))
+
+    shared_cache = app.extensions["cir_api_client"].shared_cache
+    assert shared_cache.path == path
+    assert shared_cache.slots == app.config["SHARED_CACHE_SLOTS"]
@@ -0,0 +1,161 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for admission control and load shedding."""
+
+import re
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.middleware.admission import SHED_REQUESTS, AdmissionMiddleware
+
+PAGES = {429: (b"too many ", b""), 503: (b"busy ", b"")}
+
+
+def shed(status: int) -> float:
+    """The number of requests shed with a status."""
+    return SHED_REQUESTS.samples().get((str(status),), [0.0])[0]
+
+
+def hello(_environ, start_response):
+    """A WSGI application answering every request."""
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"hello"]
+
+
+def request(middleware, remote_addr="10.0.0.1", **options):
+    """Send a request through the middleware, leaving it in flight until its body is closed.
+
+    :return: The status and the unread body.
+    """
+    statuses = []
+    environ = EnvironBuilder(environ_base={"REMOTE_ADDR": remote_addr}, **options).get_environ()
+    body = middleware(environ, lambda status, _headers, _exc_info=None: statuses.append(status))
+    return statuses[0], body
+
+
+class OneRequestConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+    """Configuration handling one request at a time."""
+
+    ADMISSION_MAX_IN_FLIGHT = 1
+    ADMISSION_RETRY_AFTER = 7
+
+
+@pytest.fixture
+def one_request_app():
+    """An application handling one request at a time."""
+    return create_app(OneRequestConfig)
+
+
+def test_requests_over_worker_limit_are_shed():
+    """Test that requests over the worker's limit get a 503 until a request completes."""
+    middleware = AdmissionMiddleware(hello, pages=PAGES, max_in_flight=2)
+    shed_before = shed(503)
+
+    _, first = request(middleware)
+    _, second = request(middleware, remote_addr="10.0.0.2")
+    status, body = request(middleware)
+
+    assert status == "503 Service Unavailable"
+    assert list(body) == [b"busy "]
+    assert shed(503) == shed_before + 1
+
+    first.close()
+    status, _ = request(middleware)
+    assert status == "200 OK"
+    assert middleware.in_flight == 2
+    second.close()
+
+
+def test_requests_over_client_limit_are_rejected():
+    """Test that a client over its limit gets a 429, while other clients are admitted."""
+    middleware = AdmissionMiddleware(hello, pages=PAGES, max_in_flight=0, max_per_client=1)
+
+    _, first = request(middleware)
+
+    assert request(middleware)[0] == "429 Too Many Requests"
+    assert request(middleware, remote_addr="10.0.0.2")[0] == "200 OK"
+
+    assert list(first) == [b"hello"]
+    assert request(middleware)[0] == "200 OK"
+    assert middleware.client_in_flight == {"10.0.0.1": 1, "10.0.0.2": 1}
+
+
+@pytest.mark.parametrize(
+    "forwarded_for, expected",
+    [
+        ("203.0.113.7, 198.51.100.1", "203.0.113.7"),
+        ("192.0.2.1, 203.0.113.7, 198.51.100.1", "203.0.113.7"),
+        ("198.51.100.1", "10.0.0.1"),
+    ],
+)
+def test_client_is_read_from_trusted_proxies(forwarded_for, expected):
+    """Test that the client's address is the one added by the outermost trusted proxy."""
+    middleware = AdmissionMiddleware(hello, pages=PAGES, max_in_flight=0, max_per_client=1, trusted_proxies=2)
+    environ = EnvironBuilder(environ_base={"REMOTE_ADDR": "10.0.0.1"}, headers={"X-Forwarded-For": forwarded_for})
+
+    assert middleware.client(environ.get_environ()) == expected
+
+
+def test_failed_request_is_released():
+    """Test that a request whose application raises is no longer in flight."""
+
+    def failing(_environ, _start_response):
+        raise RuntimeError
+
+    middleware = AdmissionMiddleware(failing, pages=PAGES, max_in_flight=1, max_per_client=1)
+
+    with pytest.raises(RuntimeError):
+        request(middleware)
+
+    assert middleware.in_flight == 0
+    assert not middleware.client_in_flight
+
+
+def test_head_request_is_shed_without_body():
+    """Test that a shed HEAD request gets no body."""
+    middleware = AdmissionMiddleware(hello, pages=PAGES, max_in_flight=1)
+    request(middleware)
+
+    status, body = request(middleware, method="HEAD")
+
+    assert status == "503 Service Unavailable"
+    assert body == []
+
+
+def test_shed_page_is_prerendered_with_security_headers(one_request_app):
+    """Test that a shed request gets the busy page, with a Retry-After header and the nonce of its policy."""
+    held = one_request_app.wsgi_app(EnvironBuilder(path="/").get_environ(), lambda *_: None)
+
+    response = one_request_app.test_client().get("/")
+    nonce = re.search(r"'nonce-([^']*)'", response.headers["Content-Security-Policy"]).group(1)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    assert "Sorry, the service is busy" in response.get_data(as_text=True)
+    assert f'nonce="{nonce}"' in response.get_data(as_text=True)
+
+    held.close()
+    assert one_request_app.test_client().get("/").status_code == 200
+
+
+def test_health_probes_bypass_admission_control(one_request_app):
+    """Test that probes are answered while every request slot is taken."""
+    held = one_request_app.wsgi_app(EnvironBuilder(path="/").get_environ(), lambda *_: None)
+
+    assert one_request_app.test_client().get("/status").status_code == 200
+
+    held.close()
+
+
+def test_worker_limit_is_not_derived_from_the_environment(monkeypatch):
+    """Test that the application sets no worker limit by default, whatever the web server
+    settings in the environment, as gunicorn sets it from the worker's own settings.
+    """
+    monkeypatch.setenv("WEB_SERVER_THREADS", "4")
+
+    app = create_app(DefaultConfig)
+
+    assert app.extensions["admission"].max_in_flight == 0
@@ -6,7 +6,12 @@ design system configuration, and secure headers.
 import json
 import os
 
-from eq_cir_management_ui import create_app, design_system_config, env_override
+from eq_cir_management_ui import (
+    create_app,
+    design_system_config,
+    env_override,
+    read_design_system_version,
+)
 from eq_cir_management_ui.config.config import DefaultConfig
 
 
@@ -49,15 +54,40 @@ def test_env_override_returns_default_when_env_not_set():
     assert env_override("default", "UNSET_KEY") == "default"
 
 
-def test_design_system_config_sets_env(monkeypatch, tmp_path):
-    """Test that the design system configuration sets the environment variable correctly."""
+def test_design_system_config_reads_version(monkeypatch, tmp_path):
+    """Test that the design system configuration reads the version without setting the environment."""
+    package_json = tmp_path / "package.json"
+    package_json.write_text(json.dumps({"dependencies": {"@ons/design-system": "1.2.3"}}))
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("DESIGN_SYSTEM_VERSION", raising=False)
+
+    assert design_system_config() == "1.2.3"
+    assert "DESIGN_SYSTEM_VERSION" not in os.environ
+
+
+def test_design_system_config_rereads_changed_file(monkeypatch, tmp_path):
+    """Test that the package.json file is parsed once, and again only after it changes."""
     package_json = tmp_path / "package.json"
     package_json.write_text(json.dumps({"dependencies": {"@ons/design-system": "1.2.3"}}))
 
     monkeypatch.chdir(tmp_path)
 
     design_system_config()
-    assert os.environ["DESIGN_SYSTEM_VERSION"] == "1.2.3"
+    hits = read_design_system_version.cache_info().hits
+    assert design_system_config() == "1.2.3"
+    assert read_design_system_version.cache_info().hits == hits + 1
+
+    package_json.write_text(json.dumps({"dependencies": {"@ons/design-system": "2.0.0"}}))
+    modified = package_json.stat().st_mtime_ns + 1_000_000_000
+    os.utime(package_json, ns=(modified, modified))
+
+    assert design_system_config() == "2.0.0"
+
+
+def test_design_system_version_is_a_jinja_global(app):
+    """Test that the design system version is available to every template."""
+    assert app.jinja_env.globals["design_system_version"] == design_system_config()
 
 
 def test_design_system_config_logs_invalid_version(monkeypatch, tmp_path, caplog):
@@ -97,7 +127,7 @@ def test_secure_headers_configured():
     client = app.test_client()
     response = client.get("/test")
 
-    # Check that Talisman has added the CSP header
+    # Check that the CSP header has been added
     csp_header = response.headers.get("Content-Security-Policy")
     assert csp_header is not None
     assert "default-src" in csp_header
@@ -0,0 +1,338 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the CIR API client, against the stub CIR API server."""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from eq_cir_management_ui.cache.response_cache import ResponseCache
+from eq_cir_management_ui.cache.shared_memory import SharedMemoryCache
+from eq_cir_management_ui.cir_api.client import (
+    CALL_DURATION,
+    CALL_RETRIES,
+    CirApiClient,
+    CirApiError,
+    CirApiTimeoutError,
+    ConnectionPool,
+    RetryBudget,
+)
+from eq_cir_management_ui.cir_api.stub_server import StubCirServer
+
+
+@pytest.fixture
+def stub():
+    """A running stub CIR API server."""
+    with StubCirServer() as server:
+        yield server
+
+
+@pytest.fixture
+def cir_client(stub):
+    """A client for the stub CIR API server."""
+    client = CirApiClient(stub.url, timeout=2.0)
+    yield client
+    client.close()
+
+
+def unused_address():
+    """An address nothing is listening on."""
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        host, port = unused.getsockname()
+    return f"http://{host}:{port}"
+
+
+def test_connections_are_reused(stub, cir_client):
+    """Test that sequential calls share one keep-alive connection."""
+    for _ in range(10):
+        cir_client.get_ci_metadata()
+
+    assert stub.requests == 10
+    assert stub.connections == 1
+    assert cir_client.pool.created == 1
+
+
+def test_get_ci_metadata_returns_the_latest_versions(cir_client):
+    """Test that the metadata endpoint is called with the filters and the latest versions returned."""
+    metadata = cir_client.get_ci_metadata(survey_id="1000", form_type="0001", language=None)
+
+    assert [(entry["survey_id"], entry["form_type"], entry["ci_version"]) for entry in metadata] == [
+        ("1000", "0001", 3),
+    ]
+
+
+def test_get_ci_versions_and_collection_instrument(cir_client):
+    """Test fetching every version of a collection instrument and a version's document."""
+    versions = cir_client.get_ci_versions("1000", "0001", "en")
+    document = cir_client.get_collection_instrument(versions[0]["guid"])
+
+    assert [version["ci_version"] for version in versions] == [1, 2, 3]
+    assert document["id"] == versions[0]["guid"]
+    assert document["sections"]
+
+
+@pytest.mark.parametrize(
+    ("path", "params"),
+    [
+        ("/v1/ci_metadata", {"survey_id": "9999", "form_type": "0001", "language": "en"}),
+        ("/v1/ci_metadata", {"survey_id": "1000"}),
+        ("/v1/retrieve_collection_instrument", {"guid": "unknown"}),
+        ("/v1/unknown", None),
+    ],
+)
+def test_error_statuses_raise(cir_client, path, params):
+    """Test that a non-200 response raises an error carrying the status."""
+    with pytest.raises(CirApiError) as error:
+        cir_client.get_json(path, params)
+
+    assert error.value.status == 404
+
+
+def test_overview_calls_are_concurrent(stub, cir_client):
+    """Test that the calls behind the overview are made at the same time."""
+    stub.latency = 0.2
+
+    start = time.perf_counter()
+    overview = cir_client.get_ci_overview("1000", "0001", "en")
+    duration = time.perf_counter() - start
+
+    assert overview["metadata"][0]["ci_version"] == 3
+    assert len(overview["versions"]) == 3
+    assert duration < 0.35
+
+
+def test_gather_reraises_errors(cir_client):
+    """Test that an error in one of the gathered calls is raised."""
+    with pytest.raises(CirApiError):
+        cir_client.gather(ok=cir_client.get_ci_metadata, missing=lambda: cir_client.get_collection_instrument("x"))
+
+
+def test_failed_calls_are_retried(stub, cir_client):
+    """Test that 503 responses are retried and counted."""
+    retries = CALL_RETRIES.samples().get(("/v2/ci_metadata",), [0.0])[0]
+    stub.fail_next(2)
+
+    assert cir_client.get_ci_metadata()
+    assert stub.requests == 3
+    assert CALL_RETRIES.samples()[("/v2/ci_metadata",)][0] == retries + 2
+
+
+def test_retries_are_limited(stub, cir_client):
+    """Test that a call is attempted at most max_retries + 1 times."""
+    stub.fail_next(5, status=502)
+
+    with pytest.raises(CirApiError) as error:
+        cir_client.get_ci_metadata()
+
+    assert error.value.status == 502
+    assert stub.requests == 3
+
+
+def test_retries_are_limited_by_the_budget(stub):
+    """Test that no retries are made once the retry budget is spent."""
+    client = CirApiClient(stub.url, retry_budget_ratio=0)
+    client.retry_budget = RetryBudget(0, max_tokens=1)
+    stub.fail_next(3)
+
+    with pytest.raises(CirApiError):
+        client.get_ci_metadata()
+
+    assert stub.requests == 2
+
+
+def test_retries_abandoned_for_the_deadline_do_not_spend_the_budget(stub):
+    """Test that a retry which would not finish before the deadline leaves the budget untouched."""
+    client = CirApiClient(stub.url)
+    client.retry_budget = RetryBudget(0, max_tokens=1)
+    stub.fail_next(1)
+
+    with pytest.raises(CirApiError):
+        client.get_json("/v2/ci_metadata", timeout=0.02)
+
+    assert stub.requests == 1
+    assert client.retry_budget.withdraw()
+
+
+def test_retry_budget_refills():
+    """Test that calls deposit tokens up to the maximum."""
+    budget = RetryBudget(0.5, max_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_unreachable_api_raises_after_retries():
+    """Test that connection errors are retried, then raised."""
+    client = CirApiClient(unused_address(), timeout=2.0)
+
+    with pytest.raises(CirApiError, match="failed"):
+        client.get_ci_metadata()
+
+
+def test_non_idempotent_calls_are_not_retried():
+    """Test that a POST is not retried after a connection error."""
+    client = CirApiClient(unused_address())
+    retries = CALL_RETRIES.samples().get(("publish",), [0.0])[0]
+
+    with pytest.raises(CirApiError):
+        client.request("POST", "/v1/publish", endpoint="publish", body=b"{}")
+
+    assert CALL_RETRIES.samples().get(("publish",), [0.0])[0] == retries
+
+
+def test_slow_calls_time_out(stub):
+    """Test that a call slower than its timeout raises a timeout error."""
+    stub.latency = 0.5
+    client = CirApiClient(stub.url, timeout=0.1)
+
+    with pytest.raises(CirApiTimeoutError):
+        client.get_ci_metadata()
+
+
+def test_expired_deadline_raises_before_sending(stub, cir_client):
+    """Test that no request is sent once the deadline has passed."""
+    with pytest.raises(CirApiTimeoutError):
+        cir_client.get_json("/v2/ci_metadata", timeout=1e-9)
+
+    assert stub.requests == 0
+
+
+def test_stale_keep_alive_connection_is_replaced(stub, cir_client):
+    """Test that a call on an idle connection closed underneath it is sent on a new connection."""
+    cir_client.get_ci_metadata()
+    connection = cir_client.pool.acquire(1.0)
+    connection.sock.shutdown(socket.SHUT_RDWR)
+    cir_client.pool.release(connection, reusable=True)
+
+    assert cir_client.get_ci_metadata()
+    assert stub.connections == 2
+
+
+def test_publish_on_a_stale_connection_is_not_replayed(stub, cir_client):
+    """Test that a publish on an idle connection closed underneath it fails rather than being sent
+    again, as it may have been received.
+    """
+    cir_client.get_ci_metadata()
+    connection = cir_client.pool.acquire(1.0)
+    connection.sock.shutdown(socket.SHUT_RDWR)
+    cir_client.pool.release(connection, reusable=True)
+
+    with pytest.raises(CirApiError):
+        cir_client.publish_collection_instrument({"survey_id": "1000", "form_type": "0001", "language": "en"})
+
+    assert stub.connections == 1
+
+
+def test_connection_closed_by_server_is_an_error():
+    """Test that a new connection closed without a response fails the call."""
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def accept_and_close():
+        for _ in range(3):
+            connection, _address = listener.accept()
+            connection.recv(1024)
+            connection.close()
+
+    thread = threading.Thread(target=accept_and_close, daemon=True)
+    thread.start()
+    host, port = listener.getsockname()
+    client = CirApiClient(f"http://{host}:{port}")
+
+    with pytest.raises(CirApiError, match="RemoteDisconnected"):
+        client.get_ci_metadata()
+
+    thread.join()
+    listener.close()
+
+
+def test_call_durations_are_recorded(cir_client):
+    """Test that each call is recorded by endpoint and outcome."""
+    count = sum(CALL_DURATION.samples().get(("/v2/ci_metadata", "200"), [0.0])[:-1])
+
+    cir_client.get_ci_metadata()
+
+    assert sum(CALL_DURATION.samples()[("/v2/ci_metadata", "200")][:-1]) == count + 1
+
+
+def test_pool_discards_connections_beyond_its_size():
+    """Test that unreusable connections and connections beyond max_idle are closed."""
+    pool = ConnectionPool("https://cir.example.com", max_idle=1)
+    first, second, third = pool.acquire(1.0), pool.acquire(1.0), pool.acquire(1.0)
+
+    pool.release(first, reusable=True)
+    pool.release(second, reusable=True)
+    pool.release(third, reusable=False)
+
+    assert pool.created == 3
+    assert pool.acquire(1.0) is first
+    pool.close()
+
+
+def test_pools_are_not_shared_across_a_fork(stub, cir_client, monkeypatch):
+    """Test that a process with a different pid gets a fresh connection and thread pool."""
+    cir_client.get_ci_overview("1000", "0001", "en")
+    pool = cir_client.pool
+    connections = stub.connections
+
+    monkeypatch.setattr("eq_cir_management_ui.cir_api.client.os.getpid", lambda: -1)
+
+    assert cir_client.pool is not pool
+    assert cir_client.get_ci_overview("1000", "0001", "en")
+    assert stub.connections > connections
+
+
+def cached_client(url, path):
+    """A client with its own response cache and the shared cache at the path, like a worker."""
+    return CirApiClient(
+        url,
+        cache=ResponseCache(10, default_ttl=60, stale_ttl=60),
+        shared_cache=SharedMemoryCache(path, slots=16, slot_size=65536),
+    )
+
+
+def test_workers_share_responses(stub, tmp_path):
+    """Test that a response fetched by one worker is served to another from the shared cache."""
+    path = str(tmp_path / "shared.cache")
+    first_worker, second_worker = cached_client(stub.url, path), cached_client(stub.url, path)
+
+    assert first_worker.get_ci_metadata(survey_id="1000") == second_worker.get_ci_metadata(survey_id="1000")
+    assert second_worker.get_ci_metadata(survey_id="1000")
+    assert stub.requests == 1
+
+
+def test_shared_invalidation_reaches_every_worker(stub, tmp_path):
+    """Test that invalidating through one worker makes the others drop their copies."""
+    path = str(tmp_path / "shared.cache")
+    first_worker, second_worker = cached_client(stub.url, path), cached_client(stub.url, path)
+    first_worker.get_ci_metadata()
+    second_worker.get_ci_metadata()
+    first_worker.get_ci_versions("1000", "0001", "en")
+
+    assert first_worker.invalidate_cache("/v2/ci_metadata") == (1, 1)
+    second_worker.get_ci_metadata()
+    first_worker.get_ci_metadata()
+
+    assert stub.requests == 3
+    assert first_worker.invalidate_cache() == (2, 2)
+
+
+def test_uncached_client_invalidates_nothing(cir_client):
+    """Test that invalidating a client without caches removes nothing."""
+    assert cir_client.invalidate_cache() == (0, 0)
+
+
+def test_app_creates_the_client(app):
+    """Test that the application creates a client from its configuration."""
+    client = app.extensions["cir_api_client"]
+
+    assert isinstance(client, CirApiClient)
+    assert client.base_url == app.config["CIR_API_URL"]
+    assert client.max_concurrency == app.config["CIR_API_MAX_CONCURRENCY"]
@@ -0,0 +1,162 @@
+"""Unit tests for the response compression middleware."""
+
+import gzip
+import zlib
+
+import brotli
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.compression import STREAM_ENCODERS
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.middleware.compression import CompressionMiddleware, merge_vary
+
+HTML = b"<p>Collection instrument</p>\n" * 100
+
+
+def compressed_client(response, **kwargs):
+    """A test client for the middleware wrapping an application which returns the response."""
+    options = {"min_size": 500, "levels": {"br": 4, "gzip": 6}, "mimetypes": ["text/html"], **kwargs}
+    return Client(CompressionMiddleware(response, **options))
+
+
+def decode(encoding, body):
+    """Decompress a body with the named encoding."""
+    if encoding == "br":
+        return brotli.decompress(body)
+    return gzip.decompress(body)
+
+
+@pytest.mark.parametrize("encoding", list(STREAM_ENCODERS))
+def test_response_is_compressed_with_accepted_encoding(encoding):
+    """Test that a large HTML response is compressed with the encoding the client accepts."""
+    client = compressed_client(Response(HTML, mimetype="text/html", headers={"ETag": '"abc"'}))
+
+    response = client.get("/", headers={"Accept-Encoding": encoding})
+
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"abc"'
+    assert int(response.headers["Content-Length"]) == len(response.data) < len(HTML)
+    assert decode(encoding, response.data) == HTML
+
+
+def test_brotli_is_preferred():
+    """Test that the first configured encoding accepted by the client is chosen."""
+    client = compressed_client(Response(HTML, mimetype="text/html"))
+
+    response = client.get("/", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["Content-Encoding"] == "br"
+
+
+def test_identity_response_still_varies_on_accept_encoding():
+    """Test that a client which does not accept compression is told the response varies."""
+    client = compressed_client(Response(HTML, mimetype="text/html", headers={"Vary": "Cookie"}))
+
+    response = client.get("/")
+
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Cookie, Accept-Encoding"
+    assert response.data == HTML
+
+
+@pytest.mark.parametrize(
+    ("response", "method"),
+    [
+        (Response(b"<p>small</p>", mimetype="text/html"), "GET"),
+        (Response(HTML, mimetype="image/png"), "GET"),
+        (Response(HTML, mimetype="text/html", headers={"Content-Encoding": "br"}), "GET"),
+        (Response(HTML, mimetype="text/html", headers={"Cache-Control": "no-transform"}), "GET"),
+        (Response(status=304), "GET"),
+        (Response(HTML, mimetype="text/html"), "HEAD"),
+    ],
+)
+def test_response_is_passed_through(response, method):
+    """Test that small, binary, already encoded, no-transform, empty and HEAD responses are untouched."""
+    client = compressed_client(response)
+
+    result = client.open("/", method=method, headers={"Accept-Encoding": "gzip"})
+
+    assert result.headers.get("Content-Encoding") == response.headers.get("Content-Encoding")
+    assert "Vary" not in result.headers
+
+
+@pytest.mark.parametrize("encoding", list(STREAM_ENCODERS))
+def test_streamed_response_is_flushed_per_chunk(encoding):
+    """Test that each chunk of a streamed response can be decompressed as soon as it arrives."""
+    chunks = [b"<li>row %d</li>" % number for number in range(3)]
+    client = compressed_client(Response(iter([b"", *chunks]), mimetype="text/html"))
+
+    response = client.get("/", headers={"Accept-Encoding": encoding}, buffered=False)
+    if encoding == "br":
+        decompress = brotli.Decompressor().process
+    else:
+        decompress = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+    received = [decompress(chunk) for chunk in response.iter_encoded()]
+
+    assert "Content-Length" not in response.headers
+    assert received[: len(chunks)] == chunks
+    assert b"".join(received) == b"".join(chunks)
+
+
+def test_deferred_start_response_is_supported():
+    """Test an application which only calls start_response when its body is iterated."""
+
+    def deferred_app(_environ, start_response):
+        start_response("200 OK", [("Content-Type", "text/html")])
+        yield HTML
+
+    response = compressed_client(deferred_app).get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert gzip.decompress(response.data) == HTML
+
+
+@pytest.mark.parametrize(
+    ("vary", "expected"),
+    [
+        ("", "Accept-Encoding"),
+        ("Cookie", "Cookie, Accept-Encoding"),
+        ("*", "*"),
+        ("accept-encoding", "accept-encoding"),
+    ],
+)
+def test_merge_vary(vary, expected):
+    """Test that Accept-Encoding is added to Vary once."""
+    assert merge_vary(vary) == expected
+
+
+def test_pages_are_compressed_with_security_headers():
+    """Test that compression is installed by create_app and keeps the security headers."""
+
+    class SmallResponsesConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration compressing every response."""
+
+        COMPRESSION_MIN_SIZE = 0
+
+    client = create_app(SmallResponsesConfig).test_client()
+
+    plain = client.get("/")
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["X-Frame-Options"] == "DENY"
+    assert "Content-Security-Policy" in response.headers
+    assert b"CI migration process" in gzip.decompress(response.data)
+    assert len(response.data) < len(plain.data)
+
+
+def test_compression_can_be_disabled():
+    """Test that responses are sent as they are when compression is disabled."""
+
+    class NoCompressionConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration with compression disabled."""
+
+        COMPRESSION_ENABLED = False
+        COMPRESSION_MIN_SIZE = 0
+
+    response = create_app(NoCompressionConfig).test_client().get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
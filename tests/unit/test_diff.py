@@ -0,0 +1,200 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the structural diff of collection instrument versions."""
+
+import copy
+
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.cir_api.stub_server import StubCirServer, synthetic_instrument, synthetic_metadata
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.diff.engine import ADDED, CHANGED, REMOVED, REORDERED, Change, diff_trees, hash_tree
+from eq_cir_management_ui.diff.versions import version_tree
+from eq_cir_management_ui.jobs.migration import stamp_data_version
+
+
+@pytest.fixture
+def document():
+    """A collection instrument document of 4 sections of 3 questions."""
+    return synthetic_instrument(synthetic_metadata(1)[0], sections=4, questions=3)
+
+
+@pytest.fixture
+def stub():
+    """A stub CIR API serving 2 collection instruments."""
+    with StubCirServer(instruments=2) as server:
+        yield server
+
+
+@pytest.fixture
+def diff_app(stub, tmp_path):
+    """An application using the stub CIR API, showing at most 3 changes on a diff page."""
+    config = type(
+        "DiffConfig",
+        (DefaultConfig,),
+        {"CIR_API_URL": stub.url, "JOBS_DB_PATH": str(tmp_path / "jobs.sqlite3"), "DIFF_MAX_CHANGES": 3},
+    )
+    app = create_app(config)
+    yield app
+    app.extensions["job_runner"].store.close()
+
+
+def diff(old, new):
+    """The changes between two documents."""
+    return list(diff_trees(hash_tree(old), hash_tree(new)))
+
+
+def test_equal_documents_have_equal_hashes(document):
+    """Test that a document's hash depends on its content, not the order of its keys."""
+    reordered = dict(reversed(list(copy.deepcopy(document).items())))
+
+    assert hash_tree(reordered).digest == hash_tree(document).digest
+    assert not diff(document, reordered)
+
+
+@pytest.mark.parametrize(("old", "new"), [("1", 1), (1, True), (None, "None"), (1, 1.0)])
+def test_leaves_of_different_types_differ(old, new):
+    """Test that leaves which Python considers equal, or whose text is the same, are told apart."""
+    assert hash_tree({"value": old}).digest != hash_tree({"value": new}).digest
+    assert diff({"value": old}, {"value": new}) == [Change(CHANGED, "value", old, new)]
+
+
+def test_unchanged_subtrees_are_skipped(document, monkeypatch):
+    """Test that only the subtrees on the path to a change are compared."""
+    changed = copy.deepcopy(document)
+    changed["sections"][2]["groups"][0]["blocks"][1]["question"]["title"] = "What was the total?"
+    compared = []
+    original = diff_trees
+
+    def counting(old, new, path=""):
+        compared.append(path)
+        return original(old, new, path)
+
+    monkeypatch.setattr("eq_cir_management_ui.diff.engine.diff_trees", counting)
+
+    changes = list(original(hash_tree(document), hash_tree(changed)))
+
+    assert changes == [
+        Change(
+            CHANGED,
+            "sections[2].groups[0].blocks[1].question.title",
+            "What was the value of item 1?",
+            "What was the total?",
+        ),
+    ]
+    # The 8 arrays and objects on the path to the change, and the 3 sections and 2 blocks beside
+    # them, each compared by its hash alone.
+    assert len(compared) == 8 + 3 + 2
+    assert "sections[3].groups" not in compared
+
+
+def test_items_are_matched_by_id(document):
+    """Test that a section inserted, and one removed, are single changes, and a move is reported once."""
+    changed = copy.deepcopy(document)
+    inserted = {"id": "section-new", "groups": []}
+    removed = changed["sections"].pop(3)
+    changed["sections"].insert(1, inserted)
+
+    assert diff(document, changed) == [
+        Change(REMOVED, "sections[3]", removed, None),
+        Change(ADDED, "sections[1]", None, inserted),
+    ]
+
+    changed["sections"][2], changed["sections"][3] = changed["sections"][3], changed["sections"][2]
+
+    assert diff(document, changed)[-1] == Change(
+        REORDERED,
+        "sections",
+        ["section-0", "section-1", "section-2"],
+        ["section-0", "section-2", "section-1"],
+    )
+
+
+@pytest.mark.parametrize(
+    ("old", "new", "changes"),
+    [
+        (["a", "b"], ["a", "c", "d"], [Change(CHANGED, "tags[1]", "b", "c"), Change(ADDED, "tags[2]", None, "d")]),
+        (["a", "b"], ["a"], [Change(REMOVED, "tags[1]", "b", None)]),
+        ([{"id": "x"}, {"id": "x"}], [{"id": "x"}], [Change(REMOVED, "tags[1]", {"id": "x"}, None)]),
+        ([["a"]], [["b"]], [Change(CHANGED, "tags[0][0]", "a", "b")]),
+        ([{"a": 1}], [["a", 1]], [Change(CHANGED, "tags[0]", {"a": 1}, ["a", 1])]),
+        ([{"a": 1}], ["a"], [Change(CHANGED, "tags[0]", {"a": 1}, "a")]),
+    ],
+)
+def test_items_without_ids_are_matched_by_position(old, new, changes):
+    """Test arrays whose items are not all objects with unique ids."""
+    assert diff({"tags": old}, {"tags": new}) == changes
+
+
+def test_keys_added_and_removed(document):
+    """Test that keys added to and removed from an object are reported."""
+    changed = copy.deepcopy(document)
+    del changed["title"]
+    changed["legal_basis"] = "Notice is given under section 1"
+
+    assert diff(document, changed) == [
+        Change(REMOVED, "title", document["title"], None),
+        Change(ADDED, "legal_basis", None, "Notice is given under section 1"),
+    ]
+
+
+def test_version_trees_are_kept(diff_app, stub):
+    """Test that a version's tree is built once, and reused for later diffs."""
+    guid = stub.metadata[0]["guid"]
+    trees, client = diff_app.extensions["document_trees"], diff_app.extensions["cir_api_client"]
+
+    assert version_tree(trees, client, guid) is version_tree(trees, client, guid)
+
+
+def test_diff_page_shows_the_changes_of_a_migration(diff_app, stub):
+    """Test that the diff page lists the changes from a version to the version migrated from it."""
+    base = stub.metadata[0]
+    migrated = stamp_data_version(synthetic_instrument(base), "0.0.4")
+    migrated["sections"][0]["title"] = "Your business"
+    target = stub.publish(migrated)[1]
+
+    response = diff_app.test_client().get(f"/collection-instruments/diff?base={base['guid']}&target={target['guid']}")
+
+    html = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert "Content-Length" not in response.headers
+    assert html.count('<tr class="ons-table__row">') == 4
+    assert "<code>data_version</code>" in html
+    assert "<code>sections[0].title</code>" in html
+    assert '<code>"Your business"</code>' in html
+
+
+def test_diff_page_of_equal_versions(diff_app, stub):
+    """Test that comparing a version with itself shows that there are no changes."""
+    guid = stub.metadata[0]["guid"]
+
+    html = diff_app.test_client().get(f"/collection-instruments/diff?base={guid}&target={guid}").get_data(as_text=True)
+
+    assert "The versions are the same." in html
+
+
+def test_diff_page_shows_at_most_the_maximum_of_changes(diff_app, stub):
+    """Test that a diff with more changes than the maximum is cut short with a notice."""
+    base = stub.metadata[0]
+    changed = synthetic_instrument(base)
+    for section in changed["sections"]:
+        section["title"] = section["title"].upper()
+    target = stub.publish(changed)[1]
+
+    response = diff_app.test_client().get(f"/collection-instruments/diff?base={base['guid']}&target={target['guid']}")
+
+    html = response.get_data(as_text=True)
+    assert html.count('<tr class="ons-table__row">') == 5
+    assert "Only the first 3 changes are shown." in html
+
+
+@pytest.mark.parametrize(
+    ("query", "failures", "status"),
+    [("base=a", 0, 400), ("base=a&target=b", 0, 404), ("base=a&target=b", 10, 503)],
+)
+def test_diff_page_errors(diff_app, stub, query, failures, status):
+    """Test that a missing version is a bad request, and an unknown one or a failing CIR API is reported."""
+    stub.fail_next(failures, status=500)
+
+    assert diff_app.test_client().get(f"/collection-instruments/diff?{query}").status_code == status
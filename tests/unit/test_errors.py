@@ -1,9 +1,15 @@
 """Module testing error responses."""
 
+import re
+import time
+
 import pytest
+from flask import template_rendered
 
 from eq_cir_management_ui import create_app
 from eq_cir_management_ui.config import config
+from eq_cir_management_ui.config.logging_config import ERROR_EVENT, REPEATED_ERRORS_EVENT
+from eq_cir_management_ui.errors.summary import ClientErrorSummary
 
 
 @pytest.fixture(name="test_client")
@@ -25,6 +31,8 @@ def create_client():
         ("/400", 400, "Sorry, there is a problem with the service"),  # 400 returns 500 content
         ("/403", 403, "Forbidden"),
         ("/401", 401, "Unauthorised"),
+        ("/429", 429, "Too many requests"),
+        ("/503", 503, "Sorry, the service is busy"),
     ],
 )
 def test_error_responses(test_client, route, expected_status, expected_text):
@@ -32,3 +40,102 @@ def test_error_responses(test_client, route, expected_status, expected_text):
     response = test_client.get(route)
     assert response.status_code == expected_status
     assert expected_text in response.get_data(as_text=True)
+
+
+def test_error_pages_are_rendered_at_start_up():
+    """Test that serving an error page renders no template, and carries the request's nonce."""
+    app = create_app(config.DefaultConfig)
+    rendered = []
+    template_rendered.connect(lambda _, template, **__: rendered.append(template.name), app, weak=False)
+
+    response = app.test_client().get("/page-not-found")
+    nonce = re.search(r"'nonce-([^']*)'", response.headers["Content-Security-Policy"]).group(1)
+
+    assert not rendered
+    assert f'nonce="{nonce}"' in response.get_data(as_text=True)
+
+
+def test_error_pages_are_rendered_on_first_use_without_warmup():
+    """Test that without warm-up an error page is rendered by its first request only."""
+
+    class NoWarmupConfig(config.DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration with template warm-up disabled."""
+
+        TEMPLATE_WARMUP = False
+
+    app = create_app(NoWarmupConfig)
+    error_pages = app.extensions["error_pages"]
+
+    with app.test_request_context():
+        assert error_pages.chunks(403) is error_pages.chunks(403)
+    assert "Forbidden" in app.test_client().get("/403").get_data(as_text=True)
+
+
+def test_repeated_client_errors_are_summarised(monkeypatch, caplog):
+    """Test that only the first of identical client errors is logged, and its repeats are
+    counted into one summary line at the end of the window.
+    """
+    now = [100.0]
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    summary = ClientErrorSummary(interval=60)
+
+    with caplog.at_level("INFO"):
+        for _ in range(3):
+            summary.record(404, "GET", "/missing", url="http://localhost/missing")
+        summary.record(405, "POST", "/")
+        now[0] = 130.0
+        summary.record(404, "GET", "/missing")
+        now[0] = 160.0
+        summary.record(404, "GET", "/missing")
+
+    records = [record.msg for record in caplog.records]
+    assert [record["event"] for record in records] == [ERROR_EVENT, ERROR_EVENT, REPEATED_ERRORS_EVENT, ERROR_EVENT]
+    assert records[0]["url"] == "http://localhost/missing"
+    assert records[2].items() >= {"path": "/missing", "status_code": 404, "count": 3, "seconds": 60.0}.items()
+
+
+def test_repeats_are_summarised_when_the_window_ends_without_further_errors(caplog):
+    """Test that a window's repeats are summarised once it ends, even if no error follows, and
+    again once errors resume after a quiet window.
+    """
+    summary = ClientErrorSummary(interval=0.05)
+
+    with caplog.at_level("INFO"):
+        for burst in range(2):
+            summary.record(404, "GET", f"/missing/{burst}")
+            summary.record(404, "GET", f"/missing/{burst}")
+            deadline = time.monotonic() + 5
+            while event_names(caplog).count(REPEATED_ERRORS_EVENT) <= burst:
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            # Long enough for a quiet window to stop the flusher.
+            time.sleep(0.15)
+
+    assert event_names(caplog) == [ERROR_EVENT, REPEATED_ERRORS_EVENT] * 2
+
+
+def event_names(caplog):
+    """The events of the captured log records."""
+    return [record.msg["event"] for record in caplog.records]
+
+
+def test_distinct_client_errors_are_capped():
+    """Test that errors beyond the distinct maximum are counted together."""
+    summary = ClientErrorSummary(interval=60, max_errors=2)
+
+    for path in ("/one", "/two", "/three", "/four"):
+        summary.record(404, "GET", path)
+
+    assert summary.flush() == 1
+
+
+def test_client_errors_are_logged_each_time_without_interval(caplog):
+    """Test that every client error is logged when summaries are disabled."""
+    summary = ClientErrorSummary(interval=0)
+
+    with caplog.at_level("INFO"):
+        summary.record(404, "GET", "/missing")
+        summary.record(404, "GET", "/missing")
+
+    assert [record.msg["event"] for record in caplog.records] == [ERROR_EVENT, ERROR_EVENT]
+    assert summary.flush() == 0
@@ -0,0 +1,289 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the event broker and the server-sent event streams of job progress."""
+
+import threading
+import time
+
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.cir_api.stub_server import StubCirServer
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.events.broker import REJECTED_SUBSCRIBERS, EventBroker
+from eq_cir_management_ui.events.jobs import LISTING_TOPIC, JobProgressSource, job_topic
+from eq_cir_management_ui.events.stream import event_stream, format_event
+from eq_cir_management_ui.jobs.migration import MIGRATION
+from eq_cir_management_ui.jobs.store import SUCCEEDED, JobStore
+
+ADMIN_TOKEN = "test-admin-token"  # noqa: S105
+HEADERS = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+@pytest.fixture
+def events_app(tmp_path):
+    """An application with the admin routes, and quick event streams."""
+    config = type(
+        "EventsConfig",
+        (DefaultConfig,),
+        {
+            "ADMIN_TOKEN": ADMIN_TOKEN,
+            "JOBS_DB_PATH": str(tmp_path / "jobs.sqlite3"),
+            "EVENTS_MAX_SUBSCRIBERS": 2,
+            "EVENTS_HEARTBEAT_INTERVAL": 0.05,
+            "EVENTS_MAX_DURATION": 0.2,
+            "EVENTS_POLL_INTERVAL": 0.02,
+        },
+    )
+    app = create_app(config)
+    yield app
+    app.extensions["job_runner"].store.close()
+
+
+@pytest.fixture
+def other_store(events_app):
+    """The application's job store as seen by another process, which runs the jobs."""
+    store = JobStore(events_app.extensions["job_runner"].store.path)
+    yield store
+    store.close()
+
+
+def run_job(store, job_id, succeeded):
+    """Record the progress of a job as the process running it would, then finish it."""
+    assert store.claim(lease=60)[0] == job_id
+    for position in range(succeeded):
+        time.sleep(0.05)
+        store.record(job_id, [(position, SUCCEEDED, None)], lease=60)
+    store.finish(job_id)
+
+
+def test_events_are_delivered_to_every_subscriber_to_the_topic():
+    """Test that an event published once is queued for every subscriber to its topic, and no others."""
+    broker = EventBroker(max_subscribers=10)
+    subscriptions = [broker.subscribe("jobs/a") for _ in range(3)]
+    other = broker.subscribe("jobs/b")
+
+    assert broker.publish("jobs/a", "progress", {"succeeded": 1}) == 3
+
+    assert all(subscription.get(0) == [("progress", {"succeeded": 1})] for subscription in subscriptions)
+    assert other.get(0) == []
+    assert broker.topics() == {"jobs/a", "jobs/b"}
+
+
+def test_slow_subscriber_drops_its_oldest_events():
+    """Test that a subscriber's queue is bounded, keeping the latest events."""
+    broker = EventBroker(max_subscribers=1, max_events=2)
+    subscription = broker.subscribe("jobs/a")
+
+    for succeeded in range(5):
+        broker.publish("jobs/a", "progress", {"succeeded": succeeded})
+
+    assert [data["succeeded"] for _, data in subscription.get(0)] == [3, 4]
+
+
+def test_subscribers_are_capped():
+    """Test that subscriptions over the maximum are rejected until one closes."""
+    broker = EventBroker(max_subscribers=1)
+    rejected_before = REJECTED_SUBSCRIBERS.samples().get((), [0.0])[0]
+    subscription = broker.subscribe("jobs/a")
+
+    assert broker.subscribe("jobs/b") is None
+    assert REJECTED_SUBSCRIBERS.samples()[()][0] == rejected_before + 1
+
+    subscription.close()
+    subscription.close()
+    assert broker.subscribers == 0
+    assert broker.topics() == set()
+    assert broker.subscribe("jobs/b") is not None
+
+
+def test_subscribers_are_not_capped_without_a_maximum():
+    """Test that a broker with no maximum accepts every subscription."""
+    broker = EventBroker(max_subscribers=0)
+
+    assert all(broker.subscribe(f"jobs/{index}") is not None for index in range(100))
+    assert broker.subscribers == 100
+
+
+def test_stream_sends_heartbeats_until_its_maximum_duration():
+    """Test that an idle stream sends heartbeats, and ends after its maximum duration."""
+    subscription = EventBroker(max_subscribers=1).subscribe("jobs/a")
+
+    stream = list(
+        event_stream(subscription, [], final=lambda _event: False, heartbeat=0.02, max_duration=0.1, retry=500),
+    )
+
+    assert stream[0] == b"retry: 500\n\n"
+    assert set(stream[1:]) == {b": heartbeat\n\n"}
+    assert 3 <= len(stream) - 1 <= 6
+
+
+def test_stream_ends_with_the_final_event():
+    """Test that a stream ends with its final event, marked so the browser does not reconnect."""
+    broker = EventBroker(max_subscribers=1)
+    subscription = broker.subscribe("jobs/a")
+    broker.publish("jobs/a", "progress", {"status": "running"})
+    broker.publish("jobs/a", "progress", {"status": "completed"})
+    broker.publish("jobs/a", "progress", {"status": "never sent"})
+
+    stream = event_stream(
+        subscription,
+        [("progress", {"status": "queued"})],
+        final=lambda event: event[1]["status"] == "completed",
+        heartbeat=1,
+        max_duration=1,
+        retry=500,
+    )
+
+    assert list(stream)[1:] == [
+        b'event: progress\ndata: {"status":"queued"}\n\n',
+        b'event: progress\ndata: {"status":"running"}\n\n',
+        b'id: final\nevent: progress\ndata: {"status":"completed"}\n\n',
+    ]
+
+
+def test_job_events_stream_progress_until_the_job_finishes(events_app, other_store):
+    """Test that a job's stream sends its progress now, and as it changes, ending when the job finishes."""
+    store = events_app.extensions["job_runner"].store
+    job_id = store.create(MIGRATION, ["a", "b"], {"data_version": "0.0.4"}, 1)
+    events_app.config["EVENTS_MAX_DURATION"] = 10
+    threading.Timer(0.1, run_job, (other_store, job_id, 2)).start()
+
+    with events_app.test_client().get(f"/admin/jobs/{job_id}/events", headers=HEADERS) as response:
+        body = response.get_data(as_text=True)
+
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-store"
+    assert body.startswith("retry: 3000\n\nevent: progress\ndata: ")
+    assert '"status":"queued"' in body
+    assert '"succeeded":1' in body
+    final = f'{{"id":"{job_id}","status":"completed","total":2,"succeeded":2,"failed":0}}'
+    assert body.endswith(f"id: final\nevent: progress\ndata: {final}\n\n")
+    assert events_app.extensions["event_broker"].subscribers == 0
+
+
+def test_finished_job_is_sent_without_subscribing(events_app, other_store):
+    """Test that the stream of a finished job is its final progress, and a reconnect is told to stop."""
+    store = events_app.extensions["job_runner"].store
+    job_id = store.create(MIGRATION, ["a"], {}, 1)
+    run_job(other_store, job_id, 1)
+    client = events_app.test_client()
+
+    body = client.get(f"/admin/jobs/{job_id}/events", headers=HEADERS).get_data(as_text=True)
+    reconnect = client.get(f"/admin/jobs/{job_id}/events", headers=HEADERS | {"Last-Event-ID": "final"})
+
+    assert body.count("event: progress") == 1
+    assert "id: final" in body
+    assert reconnect.status_code == 204
+    assert events_app.extensions["event_broker"].subscribers == 0
+
+
+def test_streams_over_the_worker_limit_are_rejected(events_app):
+    """Test that a stream over the worker's maximum is answered with a 503 and a Retry-After header."""
+    broker = events_app.extensions["event_broker"]
+    held = [broker.subscribe("jobs/held") for _ in range(2)]
+
+    response = events_app.test_client().get("/collection-instruments/events")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    for subscription in held:
+        subscription.close()
+
+
+def test_unknown_job_events_are_not_found(events_app):
+    """Test that the stream of a job which does not exist is not found."""
+    assert events_app.test_client().get("/admin/jobs/unknown/events", headers=HEADERS).status_code == 404
+
+
+def test_listing_events_are_streamed(events_app):
+    """Test that the listing stream sends heartbeats until its maximum duration, then unsubscribes."""
+    with events_app.test_client().get("/collection-instruments/events") as response:
+        body = response.get_data(as_text=True)
+
+    assert body.startswith("retry: 3000\n\n: heartbeat\n\n")
+    assert events_app.extensions["event_broker"].subscribers == 0
+
+
+def test_source_publishes_each_change_once(tmp_path):
+    """Test that a poll publishes the jobs changed since the last, and tells the listing about migrations."""
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    broker = EventBroker(max_subscribers=10)
+    source = JobProgressSource(broker, store, interval=1)
+    migration = store.create(MIGRATION, ["a", "b"], {}, 1)
+    other = store.create("other", ["a"], {}, 1)
+    watchers = [broker.subscribe(job_topic(migration)), broker.subscribe(job_topic(other))]
+    listing = broker.subscribe(LISTING_TOPIC)
+
+    assert source.poll() == 2
+    assert source.poll() == 0
+    store.claim(lease=60)
+    store.record(migration, [(0, SUCCEEDED, None)], lease=60)
+    store.claim(lease=60)
+    store.record(other, [(0, SUCCEEDED, None)], lease=60)
+
+    assert source.poll() == 3
+    assert [event[1]["status"] for event in watchers[0].get(0)] == ["queued", "running"]
+    assert [event[1]["succeeded"] for event in watchers[1].get(0)] == [0, 1]
+    assert listing.get(0) == [("changed", {})]
+    store.close()
+
+
+def test_source_forgets_jobs_it_will_not_read_again(tmp_path, monkeypatch):
+    """Test that the source forgets the jobs updated before the overlap, which it does not read again."""
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    broker = EventBroker(max_subscribers=1)
+    source = JobProgressSource(broker, store, interval=1)
+    subscription = broker.subscribe(job_topic(store.create("test", ["a"], {}, 1)))
+    assert source.poll() == 1
+    time.sleep(0.2)
+    store.create("test", ["a"], {}, 1)
+    monkeypatch.setattr("eq_cir_management_ui.events.jobs.OVERLAP", 0.1)
+    assert source.poll() == 0
+
+    # Read again, as it would be were it updated, the forgotten job is published again.
+    monkeypatch.setattr("eq_cir_management_ui.events.jobs.OVERLAP", 2.0)
+
+    assert source.poll() == 1
+    assert len(subscription.get(0)) == 2
+    store.close()
+
+
+def test_source_polls_while_there_are_subscribers(tmp_path):
+    """Test that the source's thread polls while the broker has subscribers, and stops once it has none."""
+    store = JobStore(str(tmp_path / "missing" / "jobs.sqlite3"))
+    broker = EventBroker(max_subscribers=1)
+    source = JobProgressSource(broker, store, interval=0.01)
+    subscription = broker.subscribe(job_topic("a"))
+
+    source.start()
+    source.start()
+    time.sleep(0.05)
+    subscription.close()
+
+    deadline = time.monotonic() + 5
+    while any(thread.name == "job-progress" for thread in threading.enumerate()):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_stream_of_initial_events_only():
+    """Test that a stream without a subscription ends after its initial events."""
+    stream = event_stream(None, [("changed", {})], final=lambda _event: False, heartbeat=1, max_duration=1, retry=500)
+
+    assert list(stream) == [b"retry: 500\n\n", b"event: changed\ndata: {}\n\n"]
+
+
+def test_format_event():
+    """Test the encoding of an event with an id."""
+    assert format_event(("changed", {}), "7") == b"id: 7\nevent: changed\ndata: {}\n\n"
+
+
+def test_listing_page_listens_for_changes():
+    """Test that the listing page opens the listing's event stream."""
+    with StubCirServer(instruments=1) as stub:
+        app = create_app(type("StubConfig", (DefaultConfig,), {"CIR_API_URL": stub.url}))
+        body = app.test_client().get("/collection-instruments").get_data(as_text=True)
+
+    assert 'new EventSource("/collection-instruments/events")' in body
+    assert 'id="listing-changed"' in body
@@ -0,0 +1,130 @@
+"""Unit tests for the liveness and readiness probe middleware."""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.middleware.health import HealthCheckMiddleware, Readiness, tcp_check
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll until the condition is true or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_liveness_is_answered_before_flask(app, client):
+    """Test that the liveness probe does not run Flask hooks or add the security headers."""
+    hooks = []
+    app.before_request(lambda: hooks.append("before_request"))
+
+    response = client.get("/status")
+
+    assert response.status_code == 200
+    assert response.data == b""
+    assert response.headers["Cache-Control"] == "no-store"
+    assert "Content-Security-Policy" not in response.headers
+    assert not hooks
+
+
+def test_other_methods_on_status_reach_flask(client):
+    """Test that only GET and HEAD probes are short-circuited."""
+    assert client.post("/status").status_code == 405
+
+
+def test_status_route_answers_without_middleware(app):
+    """Test that the Flask status route still answers when dispatched directly."""
+    with app.test_request_context("/status"):
+        response = app.full_dispatch_request()
+
+    assert response.status_code == 200
+
+
+def test_readiness_reports_compiled_templates(client):
+    """Test that the readiness probe reports the template warm-up."""
+    response = client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json == {"ready": True, "checks": {"templates": True}}
+
+
+def test_readiness_head_has_no_body():
+    """Test that a HEAD readiness probe gets the status and headers of a GET, without the body."""
+    middleware = HealthCheckMiddleware(lambda *_: [], Readiness(ttl=60))
+    responses = []
+
+    def start_response(status, headers, _exc_info=None):
+        responses.append((status, dict(headers)))
+
+    get_body = middleware({"PATH_INFO": "/ready", "REQUEST_METHOD": "GET"}, start_response)
+    head_body = middleware({"PATH_INFO": "/ready", "REQUEST_METHOD": "HEAD"}, start_response)
+
+    assert not list(head_body)
+    assert responses[1] == responses[0]
+    assert responses[1][1]["Content-Length"] == str(len(b"".join(get_body)))
+
+
+def test_readiness_fails_for_unreachable_dependency():
+    """Test that an unreachable dependency makes the service unready."""
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        address = f"127.0.0.1:{unused.getsockname()[1]}"
+
+    class DependencyConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration with a dependency which is not listening."""
+
+        READINESS_DEPENDENCIES = (address,)
+
+    response = create_app(DependencyConfig).test_client().get("/ready")
+
+    assert response.status_code == 503
+    assert response.json["checks"] == {"templates": True, address: False}
+
+
+def test_tcp_check_connects_to_listening_dependency():
+    """Test that a listening dependency is reported as ready."""
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        assert tcp_check(f"127.0.0.1:{server.getsockname()[1]}", timeout=1)()
+
+
+def test_readiness_result_is_cached():
+    """Test that probes within the time to live do not run the checks."""
+    calls = []
+    readiness = Readiness(ttl=60)
+    readiness.add_check("counted", lambda: calls.append(1) or True)
+    readiness.refresh()
+
+    for _ in range(10):
+        assert readiness.report()["ready"] is True
+
+    assert len(calls) == 1
+
+
+def test_expired_readiness_is_refreshed_in_background():
+    """Test that an expired result is returned while the checks run on another thread."""
+    ready = threading.Event()
+    readiness = Readiness(ttl=0)
+    readiness.add_check("slow", lambda: ready.wait(5))
+    ready.set()
+    readiness.refresh()
+    ready.clear()
+    readiness.add_check("not yet", ready.is_set)
+
+    assert readiness.report()["ready"] is True
+    ready.set()
+    assert wait_for(lambda: readiness.report()["checks"].get("not yet"))
+
+
+@pytest.mark.parametrize("check", [lambda: False, lambda: 1 / 0])
+def test_failing_check_is_not_ready(check):
+    """Test that checks returning False or raising make the service unready."""
+    readiness = Readiness(ttl=60)
+    readiness.add_check("failing", check)
+
+    assert readiness.refresh() == {"ready": False, "checks": {"failing": False}}
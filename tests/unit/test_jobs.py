@@ -0,0 +1,369 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for background jobs and the bulk migration routes."""
+
+import http.client
+import threading
+import time
+
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.cir_api.client import CirApiClient, CirApiError
+from eq_cir_management_ui.cir_api.stub_server import StubCirServer
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.jobs.migration import stamp_data_version
+from eq_cir_management_ui.jobs.runner import JOB_ITEMS, JobRunner
+from eq_cir_management_ui.jobs.store import COMPLETED, FAILED, RUNNING, SUCCEEDED, JobStore
+
+ADMIN_TOKEN = "test-admin-token"  # noqa: S105
+HEADERS = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+def wait_for(job_store, job_id, status, timeout=10.0):
+    """Wait for a job to reach a status.
+
+    :return: The job.
+    """
+    deadline = time.monotonic() + timeout
+    while (job := job_store.get(job_id))["status"] != status:
+        assert time.monotonic() < deadline, job
+        time.sleep(0.01)
+    return job
+
+
+@pytest.fixture
+def job_store(tmp_path):
+    """A job store in a temporary database."""
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def other_store(job_store):
+    """The job store as seen by another process."""
+    store = JobStore(job_store.path)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def runners():
+    """Creates job runners, stopping them after the test."""
+    created = []
+
+    def create(job_store, handler, **options):
+        runner = JobRunner(job_store, {"test": handler}, **{"flush_interval": 0.05, **options})
+        created.append(runner)
+        return runner
+
+    yield create
+    for runner in created:
+        runner.stop()
+
+
+@pytest.fixture
+def stub():
+    """A stub CIR API."""
+    with StubCirServer(instruments=5) as server:
+        yield server
+
+
+@pytest.fixture
+def jobs_app(stub, tmp_path):
+    """An application running jobs against the stub CIR API."""
+    config = type(
+        "JobsConfig",
+        (DefaultConfig,),
+        {
+            "ADMIN_TOKEN": ADMIN_TOKEN,
+            "CIR_API_URL": stub.url,
+            "JOBS_DB_PATH": str(tmp_path / "jobs.sqlite3"),
+            "JOBS_FLUSH_INTERVAL": 0.05,
+            "JOBS_MAX_ITEMS": 10,
+        },
+    )
+    app = create_app(config)
+    yield app
+    app.extensions["job_runner"].stop()
+    app.extensions["job_runner"].store.close()
+
+
+def test_migration_runs_in_the_background(stub, jobs_app):
+    """Test that a submitted migration returns at once, and publishes a migrated version of each instrument."""
+    # The first version of each of the 5 collection instruments.
+    entries = stub.metadata[::3]
+    guids = [entry["guid"] for entry in entries]
+    client = jobs_app.test_client()
+
+    response = client.post("/admin/jobs/migrations", json={"guids": guids, "data_version": "0.0.4"}, headers=HEADERS)
+
+    assert response.status_code == 202
+    assert response.headers["Location"] == f"/admin/jobs/{response.json['id']}"
+    wait_for(jobs_app.extensions["job_runner"].store, response.json["id"], COMPLETED)
+    job = client.get(response.headers["Location"], headers=HEADERS).json
+    assert job["succeeded"] == job["total"] == 5
+    assert job["failed"] == 0
+    assert job["errors"] == []
+    assert sorted((document["form_type"], document["data_version"]) for document in stub.published) == sorted(
+        (entry["form_type"], "0.0.4") for entry in entries
+    )
+    assert all("id" not in document for document in stub.published)
+    assert client.get("/admin/jobs", headers=HEADERS).json["jobs"][0]["id"] == job["id"]
+
+
+def test_migration_run_again_is_not_published_again(stub, jobs_app):
+    """Test that a collection instrument whose latest version has the data version already is not
+    published again, even once its versions are cached.
+    """
+    client = jobs_app.test_client()
+    body = {"guids": [stub.metadata[0]["guid"]], "data_version": "0.0.4"}
+    jobs_app.extensions["cir_api_client"].get_ci_versions("1000", "0001", "en")
+
+    for _ in range(2):
+        job_id = client.post("/admin/jobs/migrations", json=body, headers=HEADERS).json["id"]
+        assert wait_for(jobs_app.extensions["job_runner"].store, job_id, COMPLETED)["succeeded"] == 1
+
+    assert len(stub.published) == 1
+
+
+def test_failed_items_are_reported(stub, jobs_app):
+    """Test that items which fail are recorded with their error, and fail the job."""
+    client = jobs_app.test_client()
+    body = {"guids": [stub.metadata[0]["guid"], "unknown"], "data_version": "0.0.4", "concurrency": 1}
+
+    job_id = client.post("/admin/jobs/migrations", json=body, headers=HEADERS).json["id"]
+
+    wait_for(jobs_app.extensions["job_runner"].store, job_id, FAILED)
+    job = client.get(f"/admin/jobs/{job_id}", headers=HEADERS).json
+    assert (job["succeeded"], job["failed"]) == (1, 1)
+    assert job["errors"] == [{"item": "unknown", "error": "CIR API /v1/retrieve_collection_instrument returned 404"}]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {},
+        {"guids": [], "data_version": "0.0.4"},
+        {"guids": ["a", 1], "data_version": "0.0.4"},
+        {"guids": ["a"] * 11, "data_version": "0.0.4"},
+        {"guids": ["a"]},
+        {"guids": ["a"], "data_version": "0.0.4", "concurrency": 0},
+        {"guids": ["a"], "data_version": "0.0.4", "concurrency": True},
+        {"guids": ["a"], "data_version": "0.0.4", "concurrency": 9},
+    ],
+)
+def test_invalid_migrations_are_rejected(jobs_app, body):
+    """Test that a migration without valid guids, data version or concurrency is rejected."""
+    response = jobs_app.test_client().post("/admin/jobs/migrations", json=body, headers=HEADERS)
+
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_unknown_job_is_not_found(jobs_app):
+    """Test that a job which does not exist is not found."""
+    assert jobs_app.test_client().get("/admin/jobs/unknown", headers=HEADERS).status_code == 404
+
+
+def test_job_routes_require_the_token(client):
+    """Test that the job routes are disabled when no ADMIN_TOKEN is configured."""
+    assert client.post("/admin/jobs/migrations", json={}).status_code == 404
+    assert client.get("/admin/jobs").status_code == 404
+
+
+def test_items_in_flight_are_limited_to_the_job_concurrency(job_store, runners):
+    """Test that a job runs no more items at once than its concurrency, on a larger pool."""
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def handler(_item, _options):
+        with lock:
+            in_flight.append(1)
+            peak.append(len(in_flight))
+        time.sleep(0.01)
+        with lock:
+            in_flight.pop()
+
+    runner = runners(job_store, handler, max_workers=8)
+    job_id = runner.submit("test", [str(number) for number in range(20)], {}, 3)
+
+    assert wait_for(job_store, job_id, COMPLETED)["succeeded"] == 20
+    assert max(peak) == 3
+
+
+def test_outcomes_are_recorded_in_batches(job_store, runners, monkeypatch):
+    """Test that item outcomes are written to the store in batches, not one write per item."""
+    writes = []
+    record = job_store.record
+
+    def counting_record(job_id, results, lease):
+        writes.append(len(results))
+        return record(job_id, results, lease)
+
+    monkeypatch.setattr(job_store, "record", counting_record)
+    runner = runners(job_store, lambda _item, _options: None, batch_size=25, flush_interval=10)
+    succeeded_before = JOB_ITEMS.samples().get(("test", SUCCEEDED), [0.0])[0]
+
+    job_id = runner.submit("test", [str(number) for number in range(100)], {}, 4)
+
+    wait_for(job_store, job_id, COMPLETED)
+    assert sum(writes) == 100
+    assert len(writes) < 10
+    assert JOB_ITEMS.samples()[("test", SUCCEEDED)][0] == succeeded_before + 100
+
+
+def test_interrupted_job_is_resumed_once_its_lease_lapses(job_store, other_store, runners):
+    """Test that a job abandoned by its process is resumed by another, which runs only its unfinished items."""
+    job_id = job_store.create("test", ["a", "b", "c", "d"], {"data_version": "0.0.4"}, 2)
+    assert job_store.claim(lease=0.1)[0] == job_id
+    job_store.record(job_id, [(0, SUCCEEDED, None), (1, SUCCEEDED, None)], lease=0.1)
+    run = []
+
+    # Another process, as the first never recorded the remaining items.
+    runners(other_store, lambda item, options: run.append((item, options["data_version"])), lease=0.3).start()
+
+    job = wait_for(job_store, job_id, COMPLETED)
+    assert sorted(run) == [("c", "0.0.4"), ("d", "0.0.4")]
+    assert (job["succeeded"], job["attempts"]) == (4, 2)
+
+
+def test_lease_is_renewed_while_an_item_runs(job_store, other_store, runners):
+    """Test that a job whose item runs longer than the lease is not resumed by another process."""
+    claims = []
+
+    def handler(_item, _options):
+        for _ in range(4):
+            time.sleep(0.1)
+            claims.append(other_store.claim(lease=60))
+
+    job_id = runners(job_store, handler, lease=0.15).submit("test", ["a"], {}, 1)
+
+    assert wait_for(job_store, job_id, COMPLETED)["attempts"] == 1
+    assert claims == [None] * 4
+
+
+def test_stopped_runner_releases_its_jobs(job_store, other_store, runners):
+    """Test that a stopping runner records its progress and releases its job to be resumed at once."""
+    started = threading.Event()
+    run = []
+
+    def handler(item, _options):
+        run.append(item)
+        started.set()
+        time.sleep(0.02)
+
+    first = runners(job_store, handler)
+    job_id = first.submit("test", [str(number) for number in range(50)], {}, 1)
+    assert started.wait(5)
+
+    first.stop()
+
+    job = job_store.get(job_id)
+    assert job["status"] == RUNNING
+    assert 0 < job["succeeded"] < 50
+    runners(other_store, handler, lease=60).start()
+    assert wait_for(job_store, job_id, COMPLETED)["succeeded"] == 50
+    assert sorted(run, key=int) == [str(number) for number in range(50)]
+
+
+def test_runner_stops_a_job_resumed_elsewhere(job_store, other_store, runners):
+    """Test that a runner whose lease was taken over stops running the job."""
+    taken = threading.Event()
+    run = []
+
+    def handler(item, _options):
+        run.append(item)
+        if not taken.is_set():
+            # The lease lapses while the item runs, and another process claims the job.
+            time.sleep(0.3)
+            assert other_store.claim(lease=60) is not None
+            taken.set()
+
+    runner = runners(job_store, handler, batch_size=1, lease=0.1, flush_interval=10)
+    job_id = runner.submit("test", ["a", "b", "c"], {}, 1)
+
+    assert taken.wait(5)
+    deadline = time.monotonic() + 5
+    while runner.active:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert run == ["a"]
+    assert job_store.get(job_id)["succeeded"] == 0
+
+
+def test_submitting_an_unknown_kind_of_job_is_rejected(job_store, runners):
+    """Test that a job can only be submitted for a kind the runner has a handler for."""
+    with pytest.raises(ValueError, match="No handler"):
+        runners(job_store, lambda _item, _options: None).submit("unknown", ["a"], {}, 1)
+
+
+def test_runner_logs_store_errors(tmp_path, runners):
+    """Test that a runner whose store cannot be opened keeps running, logging the error."""
+    runner = runners(JobStore(str(tmp_path / "missing" / "jobs.sqlite3")), lambda _item, _options: None)
+
+    runner.start()
+    runner.start()
+
+    assert runner.active == {}
+
+
+def test_runner_logs_jobs_which_stop_unexpectedly(job_store, other_store, runners, monkeypatch):
+    """Test that a job whose items cannot be read is logged, makes room for the next job, and is
+    released for another process to resume at once.
+    """
+    runner = runners(job_store, lambda _item, _options: None)
+    monkeypatch.setattr(job_store, "pending_items", lambda _job_id: 1 / 0)
+
+    job_id = runner.submit("test", ["a"], {}, 1)
+
+    deadline = time.monotonic() + 5
+    while job_store.get(job_id)["status"] != RUNNING or runner.active:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert job_store.claim(lease=60) is None
+    assert other_store.claim(lease=60)[0] == job_id
+
+
+def test_runner_logs_jobs_which_cannot_be_released(job_store, runners, monkeypatch, caplog):
+    """Test that a job which stops unexpectedly, and cannot then be released, is logged."""
+    runner = runners(job_store, lambda _item, _options: None)
+    monkeypatch.setattr(job_store, "pending_items", lambda _job_id: 1 / 0)
+    monkeypatch.setattr(job_store, "release", lambda _job_id, **_options: 1 / 0)
+
+    with caplog.at_level("ERROR"):
+        runner.submit("test", ["a"], {}, 1)
+        deadline = time.monotonic() + 5
+        while "Unable to release the job" not in caplog.text:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+
+def test_stamp_data_version_leaves_the_cached_document_unchanged():
+    """Test that stamping a data version copies the document, without the id of the version it
+    was published as.
+    """
+    document = {"id": "guid", "survey_id": "1000", "data_version": "0.0.3"}
+
+    assert stamp_data_version(document, "0.0.4") == {"survey_id": "1000", "data_version": "0.0.4"}
+    assert document["data_version"] == "0.0.3"
+
+
+def test_publish_rejects_an_invalid_document(stub):
+    """Test that the CIR API client raises when a document cannot be published."""
+    client = CirApiClient(stub.url)
+
+    with pytest.raises(CirApiError, match="returned 400"):
+        client.publish_collection_instrument({"title": "No survey"})
+    client.close()
+
+
+def test_stub_rejects_a_body_which_is_not_json(stub):
+    """Test that the stub CIR API answers a publish request without a JSON body with a 400."""
+    connection = http.client.HTTPConnection(stub.url.removeprefix("http://"))
+    connection.request("POST", "/v1/publish_collection_instrument", body=b"{")
+
+    assert connection.getresponse().status == 400
+    connection.close()
@@ -0,0 +1,124 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the streamed collection instrument listing."""
+
+import tracemalloc
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.cir_api.stub_server import StubCirServer
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.templating.streaming import buffered
+
+
+class ListingConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+    """Configuration allowing pages of any size."""
+
+    LISTING_MAX_PAGE_SIZE = 100_000
+
+
+@pytest.fixture
+def stub():
+    """A stub CIR API serving 40 collection instruments."""
+    with StubCirServer(instruments=40) as server:
+        yield server
+
+
+@pytest.fixture
+def listing_client(stub):
+    """A test client for an application using the stub CIR API."""
+    return create_app(type("StubConfig", (ListingConfig,), {"CIR_API_URL": stub.url})).test_client()
+
+
+def synthetic_source(count):
+    """A source of ``count`` generated rows, created as they are fetched."""
+
+    def fetch(after, limit):
+        start = 0 if after is None else int(after[0]) + 1
+        for number in range(start, min(start + limit, count)):
+            survey_id = f"{number:06d}"
+            yield {
+                "survey_id": survey_id,
+                "form_type": "0001",
+                "language": "en",
+                "title": f"Survey {survey_id}",
+                "ci_version": 1,
+                "published_at": "2025-01-01T09:00:00Z",
+            }
+
+    return lambda _client: fetch
+
+
+def test_listing_is_ordered_and_paginated(listing_client):
+    """Test that the listing shows each collection instrument once, in order, across its pages."""
+    first = listing_client.get("/collection-instruments?per_page=25")
+    html = first.get_data(as_text=True)
+
+    assert first.status_code == 200
+    assert "Content-Length" not in first.headers
+    assert html.count('<tr class="ons-table__row">') == 26
+    assert html.index(">1000<") < html.index(">1001<")
+    assert "First page" not in html
+
+    next_url = html.split('href="/collection-instruments?after=')[1].split('"')[0].replace("&amp;", "&")
+    second = listing_client.get(f"/collection-instruments?after={next_url}").get_data(as_text=True)
+
+    assert second.count('<tr class="ons-table__row">') == 16
+    assert "First page" in second
+    assert "Next page" not in second
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "WzEsMiwzXQ", "WyIxMDAwIl0"])
+def test_listing_rejects_an_invalid_cursor(listing_client, cursor):
+    """Test that a cursor which was not issued by the listing, including one of a key of the wrong
+    values, is a bad request.
+    """
+    assert listing_client.get(f"/collection-instruments?after={cursor}").status_code == 400
+
+
+def test_listing_fails_before_streaming_when_the_cir_api_is_down(stub, listing_client):
+    """Test that a failing CIR API is reported with the error page, rather than a cut short listing."""
+    stub.fail_next(10, status=500)
+
+    response = listing_client.get("/collection-instruments")
+
+    assert response.status_code == 503
+    assert "Sorry, the service is busy" in response.get_data(as_text=True)
+
+
+def peak_memory_of_listing(app, rows):
+    """Stream a listing of generated rows, discarding each chunk, and return the peak memory allocated meanwhile."""
+    environ = EnvironBuilder(path="/collection-instruments", query_string={"per_page": rows}).get_environ()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        chunks = 0
+        for _ in app(environ, lambda *_: None):
+            chunks += 1
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert chunks > rows // 100
+    return peak
+
+
+def test_streamed_listing_memory_is_bounded(monkeypatch):
+    """Test that streaming a listing of 100,000 rows needs no more memory than one of 1,000 rows."""
+    monkeypatch.setattr("eq_cir_management_ui.main.routes.ci_metadata_source", synthetic_source(100_000))
+    app = create_app(ListingConfig)
+    peak_memory_of_listing(app, 10)
+
+    small = peak_memory_of_listing(app, 1_000)
+    large = peak_memory_of_listing(app, 100_000)
+
+    # The rendered page is around 30MB, which is never held at once.
+    assert large < 1024 * 1024
+    assert large < small * 1.5
+
+
+def test_buffered_joins_small_chunks():
+    """Test that chunks are joined up to the buffer size, and the remainder is sent at the end."""
+    assert list(buffered(["ab", "cd", "e", "fgh", "i"], 4)) == [b"abcd", b"efgh", b"i"]
+    assert not list(buffered([], 4))
@@ -0,0 +1,118 @@
+"""Unit tests for the queue based logging pipeline."""
+
+import json
+import logging
+
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.config.logging_config import (
+    ERROR_EVENT,
+    REQUEST_RECEIVED_EVENT,
+    DeferredQueueHandler,
+    SamplingFilter,
+    event_name,
+    queue_logging,
+)
+
+
+def make_record(message, level=logging.INFO):
+    """Create a log record with the given message."""
+    return logging.LogRecord("test", level, __file__, 1, message, None, None)
+
+
+def test_sample_rate_drops_records():
+    """Test that sampled events are dropped in proportion to the sample rate."""
+    never = SamplingFilter({"sampled": 0.0}, {})
+    always = SamplingFilter({"sampled": 1.0}, {})
+
+    assert not never.filter(make_record("sampled"))
+    assert never.filter(make_record("not sampled"))
+    assert always.filter(make_record("sampled"))
+
+
+def test_rate_limit_caps_records_per_second(monkeypatch):
+    """Test that rate limited events are capped within each second."""
+    monkeypatch.setattr("time.monotonic", lambda: 100.5)
+    sampling_filter = SamplingFilter({}, {"limited": 2})
+
+    assert [sampling_filter.filter(make_record("limited")) for _ in range(3)] == [True, True, False]
+
+    monkeypatch.setattr("time.monotonic", lambda: 101.5)
+    assert sampling_filter.filter(make_record("limited"))
+
+
+def test_errors_are_never_dropped():
+    """Test that records at ERROR or above bypass sampling and rate limits."""
+    sampling_filter = SamplingFilter({"event": 0.0}, {"event": 1})
+
+    assert sampling_filter.filter(make_record("event", logging.ERROR))
+
+
+def test_event_name_of_structlog_and_stdlib_records():
+    """Test that the event is read from both structlog event dicts and plain messages."""
+    assert event_name(make_record({"event": REQUEST_RECEIVED_EVENT, "path": "/"})) == REQUEST_RECEIVED_EVENT
+    assert event_name(make_record("plain message")) == "plain message"
+
+
+def test_records_are_queued_unformatted():
+    """Test that formatting is left to the listener thread."""
+    record = make_record({"event": "structured"})
+
+    assert DeferredQueueHandler(None).prepare(record) is record
+    assert record.msg == {"event": "structured"}
+
+
+def test_listener_writes_json_to_stdout(capsys):
+    """Test that records from structlog and the standard library are rendered as JSON."""
+    create_app(DefaultConfig)
+    logging.getLogger("stdlib").warning("from %s", "stdlib")
+    queue_logging.stop()
+
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert {"event": "from stdlib", "level": "warning"}.items() <= lines[-1].items()
+    assert "timestamp" in lines[-1]
+
+
+def test_status_checks_are_not_logged(client, caplog):
+    """Test that health probes do not produce request log lines."""
+    with caplog.at_level("INFO"):
+        client.get("/status")
+        client.get("/")
+
+    messages = [event_name(record) for record in caplog.records]
+    assert messages.count(REQUEST_RECEIVED_EVENT) == 1
+
+
+@pytest.mark.parametrize(("route", "level", "has_traceback"), [("/404", "WARNING", False), ("/500", "ERROR", True)])
+def test_only_server_errors_are_logged_with_traceback(client, caplog, route, level, has_traceback):
+    """Test that client errors are logged without exception information."""
+    with caplog.at_level("INFO"):
+        client.get(route)
+
+    record = next(record for record in caplog.records if event_name(record) == ERROR_EVENT)
+    assert record.levelname == level
+    assert ("exc_info" in record.msg) is has_traceback
+
+
+def test_listener_is_restarted_after_fork():
+    """Test that a forked worker starts its own listener thread."""
+    create_app(DefaultConfig)
+
+    queue_logging.restart_after_fork()
+
+    assert queue_logging.running
+
+
+def test_unknown_log_level_defaults_to_info():
+    """Test that an unrecognised LOG_LEVEL falls back to INFO."""
+
+    class UnknownLevelConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration with an unrecognised log level."""
+
+        LOG_LEVEL = "CHATTY"
+
+    create_app(UnknownLevelConfig)
+
+    assert logging.getLogger().level == logging.INFO
@@ -0,0 +1,160 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the memory diagnostics and the worker memory budget."""
+
+import os
+import signal
+
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.metrics import memory
+from eq_cir_management_ui.metrics.memory import WORKER_RECYCLES, AllocationTracker, RssBudget, resident_memory
+
+ADMIN_HEADERS = {"Authorization": "Bearer test-admin-token"}
+
+
+class AdminConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+    """Configuration with the admin routes enabled."""
+
+    ADMIN_TOKEN = "test-admin-token"  # noqa: S105
+
+
+@pytest.fixture
+def admin_client():
+    """A test client for an application with the admin routes enabled."""
+    return create_app(AdminConfig).test_client()
+
+
+@pytest.fixture
+def kills(monkeypatch):
+    """Record the signals the process sends, rather than sending them."""
+    sent = []
+    monkeypatch.setattr("os.kill", lambda pid, signum: sent.append((pid, signum)))
+    return sent
+
+
+def test_resident_memory_falls_back_to_peak(monkeypatch, tmp_path):
+    """Test that the peak resident set size is used where /proc is not available."""
+    assert resident_memory() > 0
+
+    monkeypatch.setattr(memory, "STATM_PATH", tmp_path / "missing")
+    assert resident_memory() > 0
+
+
+def test_memory_report(admin_client):
+    """Test that the report covers the worker's memory and the occupancy of its caches."""
+    admin_client.get("/")
+
+    report = admin_client.get("/admin/memory", headers=ADMIN_HEADERS).json
+
+    assert report["pid"] == os.getpid()
+    assert report["rss"] > 0
+    assert report["rss_budget"] is None
+    caches = report["caches"]
+    assert caches["jinja_templates"]["entries"] > 0
+    assert caches["pages"]["entries"] == 1
+    assert caches["pages"]["bytes"] > 0
+    assert caches["error_pages"]["entries"] > 0
+    assert caches["static_assets"]["bytes"] > 0
+    assert caches["cir_api_responses"] == {"entries": 0, "capacity": 1024}
+    assert caches["shared_responses"] is None
+    assert caches["search_index"] == {"entries": 0, "capacity": 0}
+    assert caches["document_trees"] == {"entries": 0, "capacity": 64}
+    assert caches["upload_reports"] == {"entries": 0, "capacity": 512}
+
+
+def test_memory_report_without_optional_caches(tmp_path):
+    """Test that the report covers an application without a Jinja or response cache, and with a shared cache."""
+
+    class UncachedConfig(AdminConfig):  # pylint: disable=too-few-public-methods
+        """Configuration without a response cache, and a memory budget."""
+
+        RESPONSE_CACHE_ENABLED = False
+        WORKER_RSS_BUDGET_MB = 4096
+
+    app = create_app(UncachedConfig)
+    app.jinja_env.cache = None
+
+    report = app.test_client().get("/admin/memory", headers=ADMIN_HEADERS).json
+
+    assert report["rss_budget"] == 4096 * 1024 * 1024
+    assert report["caches"]["jinja_templates"] == {"entries": 0, "capacity": None}
+    assert report["caches"]["cir_api_responses"] is None
+
+    shared = create_app(type("SharedConfig", (AdminConfig,), {"SHARED_CACHE_PATH": str(tmp_path / "shared.cache")}))
+    report = shared.test_client().get("/admin/memory", headers=ADMIN_HEADERS).json
+    assert report["caches"]["shared_responses"]["bytes"] > 0
+
+
+def test_allocation_snapshots_are_diffed(admin_client):
+    """Test that allocations made after tracing starts are reported."""
+    assert admin_client.get("/admin/memory/snapshot/diff", headers=ADMIN_HEADERS).status_code == 409
+
+    try:
+        assert admin_client.post("/admin/memory/snapshot", headers=ADMIN_HEADERS).json["tracing"]
+        retained = [bytearray(1024) for _ in range(100)]
+
+        response = admin_client.get("/admin/memory/snapshot/diff?limit=5", headers=ADMIN_HEADERS)
+        differences = response.json["differences"]
+
+        assert len(retained) == 100
+        assert len(differences) <= 5
+        assert any("test_memory.py" in difference["location"] for difference in differences)
+    finally:
+        assert not admin_client.delete("/admin/memory/snapshot", headers=ADMIN_HEADERS).json["tracing"]
+
+
+def test_allocation_tracker_restarts_without_stopping():
+    """Test that starting again while tracing takes a new baseline."""
+    tracker = AllocationTracker()
+    try:
+        tracker.start()
+        first = tracker.baseline
+        tracker.start()
+        assert tracker.baseline is not first
+    finally:
+        tracker.stop()
+    assert tracker.diff() is None
+
+
+def test_worker_over_budget_is_recycled(monkeypatch, kills):
+    """Test that a worker over its budget sends itself SIGTERM once, and only reads its memory once per interval."""
+    reads = []
+    monkeypatch.setattr(memory, "resident_memory", lambda: reads.append(True) or 200)
+    recycles_before = WORKER_RECYCLES.samples().get(("rss_budget",), [0.0])[0]
+    budget = RssBudget(limit=100, interval=60)
+
+    assert budget.check()
+    assert not budget.check()
+
+    assert kills == [(os.getpid(), signal.SIGTERM)]
+    assert len(reads) == 1
+    assert WORKER_RECYCLES.samples()[("rss_budget",)][0] == recycles_before + 1
+
+
+def test_worker_within_budget_is_kept(monkeypatch, kills):
+    """Test that a worker within its budget is not recycled, and is checked again after the interval."""
+    now = [100.0]
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    monkeypatch.setattr(memory, "resident_memory", lambda: 50)
+    budget = RssBudget(limit=100, interval=5)
+
+    assert not budget.check()
+    monkeypatch.setattr(memory, "resident_memory", lambda: 150)
+    assert not budget.check()
+    now[0] = 105.0
+    assert budget.check()
+    assert len(kills) == 1
+
+
+def test_budget_is_checked_after_requests(monkeypatch, kills):
+    """Test that the application checks its budget when a request completes."""
+    monkeypatch.setattr(memory, "resident_memory", lambda: 2 * 1024 * 1024)
+    app = create_app(type("BudgetConfig", (DefaultConfig,), {"WORKER_RSS_BUDGET_MB": 1}))
+
+    assert app.test_client().get("/").status_code == 200
+
+    assert kills == [(os.getpid(), signal.SIGTERM)]
+    assert app.extensions["rss_budget"].exceeded
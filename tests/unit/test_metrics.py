@@ -0,0 +1,228 @@
+"""Unit tests for the metrics registry, instrumentation and endpoint."""
+
+import json
+import os
+import time
+
+import pytest
+
+from eq_cir_management_ui.metrics.registry import Counter, Histogram, Registry
+
+
+@pytest.fixture(name="registry")
+def create_registry(tmp_path):
+    """A registry sharing snapshots through a temporary directory."""
+    registry = Registry()
+    registry.configure(str(tmp_path), flush_interval=60)
+    yield registry
+    registry.configure(None)
+
+
+def test_metrics_endpoint_reports_request_duration(client):
+    """Test that requests are counted per endpoint, method and status."""
+    client.get("/")
+    response = client.get("/metrics")
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert 'http_request_duration_seconds_count{endpoint="main.index",method="GET",status="200"}' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="main.index",method="GET",status="200",le="+Inf"}' in text
+
+
+def test_metrics_endpoint_reports_render_duration_and_errors(app, client):
+    """Test that template renders and error handler invocations are recorded."""
+    app.extensions["page_cache"].invalidate()
+    client.get("/page-not-found")
+    text = client.get("/metrics").get_data(as_text=True)
+
+    assert 'template_render_duration_seconds_count{template="error.html"}' in text
+    assert 'error_handler_invocations_total{status="404"}' in text
+    assert 'http_request_duration_seconds_count{endpoint="none",method="GET",status="404"}' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    """Test the exposition of histogram buckets, sum and count."""
+    registry = Registry()
+    histogram = Histogram("latency_seconds", "Latency.", ["route"], registry, buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, route="/")
+
+    assert registry.generate_latest().splitlines() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/",le="0.1"} 1',
+        'latency_seconds_bucket{route="/",le="1"} 2',
+        'latency_seconds_bucket{route="/",le="+Inf"} 3',
+        'latency_seconds_sum{route="/"} 5.55',
+        'latency_seconds_count{route="/"} 3',
+    ]
+
+
+def test_label_values_are_escaped():
+    """Test that label values are escaped as the exposition format requires."""
+    registry = Registry()
+    Counter("hits", "Hits.", ["path"], registry).inc(path='a"b\\c\nd')
+
+    assert 'hits_total{path="a\\"b\\\\c\\nd"} 1' in registry.generate_latest()
+
+
+def test_metric_rejects_unknown_labels():
+    """Test that observations must provide exactly the declared labels."""
+    counter = Counter("hits", "Hits.", ["path"], Registry())
+
+    with pytest.raises(ValueError, match="expects labels"):
+        counter.inc(status="200")
+
+
+def test_metric_names_are_unique():
+    """Test that a metric name can only be registered once."""
+    registry = Registry()
+    Counter("hits", "Hits.", registry=registry)
+
+    with pytest.raises(ValueError, match="already registered"):
+        Counter("hits", "Hits.", registry=registry)
+
+
+def test_collect_sums_snapshots_of_other_workers(registry, tmp_path):
+    """Test that a scrape reports the totals of every worker process."""
+    counter = Counter("hits", "Hits.", ["path"], registry)
+    counter.inc(2, path="/")
+    (tmp_path / "worker-1.json").write_text(json.dumps({"hits": [[["/"], [3.0]], [["/status"], [1.0]]]}))
+    (tmp_path / "worker-2.json").write_text(json.dumps({"hits": [[["/"], [5.0]]], "removed_metric": []}))
+    (tmp_path / "worker-3.json").write_text("{not json")
+
+    assert registry.collect()["hits"] == {("/",): [10.0], ("/status",): [1.0]}
+
+
+def test_flush_writes_snapshot_of_this_worker(registry, tmp_path):
+    """Test that the snapshot of this process is written and excluded from its own totals."""
+    counter = Counter("hits", "Hits.", registry=registry)
+    counter.inc()
+    registry.flush()
+
+    assert json.loads((tmp_path / f"worker-{os.getpid()}.json").read_text()) == {"hits": [[[], [1.0]]]}
+    assert registry.collect()["hits"] == {(): [1.0]}
+
+
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+def test_collect_reports_every_worker(registry):
+    """Test that one scrape reports the counts of every worker writing to the directory."""
+    counter = Counter("hits", "Hits.", labelnames=("path",), registry=registry)
+
+    for hits in (2, 3):
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child process
+            counter.inc(hits, path="/")
+            registry.flush()
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+    assert registry.collect()["hits"] == {("/",): [5.0]}
+
+
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+def test_exited_workers_are_folded_into_one_snapshot(registry, tmp_path):
+    """Test that each exiting worker adds its values to the snapshot of the exited workers, and
+    removes its own, so their counts are kept in one file.
+    """
+    counter = Counter("hits", "Hits.", labelnames=("path",), registry=registry)
+    counter.inc(path="/")
+
+    for hits in (2, 3):
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - runs in the child process
+            counter.inc(hits, path="/")
+            counter.inc(path=f"/{hits}")
+            registry.flush()
+            registry.retire()
+            registry.flush()
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["dead.json"]
+    assert registry.collect()["hits"] == {("/",): [6.0], ("/2",): [1.0], ("/3",): [1.0]}
+
+
+def test_unreadable_snapshot_is_skipped(registry, tmp_path, caplog):
+    """Test that a snapshot which cannot be read is logged and left out, even when a worker retires."""
+    counter = Counter("hits", "Hits.", registry=registry)
+    counter.inc()
+    (tmp_path / "dead.json").write_text("{")
+
+    with caplog.at_level("WARNING"):
+        assert registry.collect()["hits"] == {(): [1.0]}
+        registry.retire()
+
+    assert "Unable to read metrics snapshot dead.json" in caplog.text
+    assert json.loads((tmp_path / "dead.json").read_text()) == {"hits": [[[], [1.0]]]}
+    assert registry.directory is None
+    registry.retire()
+
+
+def test_flush_without_directory_is_a_no_op():
+    """Test that a single process registry does not write snapshots."""
+    registry = Registry()
+    registry.flush()
+
+    assert registry.snapshot_path is None
+
+
+@pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+def test_forked_worker_starts_with_empty_metrics(registry, tmp_path):
+    """Test that a worker forked from a preloaded master does not inherit the master's values."""
+    counter = Counter("hits", "Hits.", registry=registry)
+    counter.inc()
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover - runs in the child process
+        counter.inc(5)
+        registry.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert json.loads((tmp_path / f"worker-{pid}.json").read_text()) == {"hits": [[[], [5.0]]]}
+    assert registry.collect()["hits"] == {(): [6.0]}
+
+
+def test_reset_after_fork_discards_values(registry):
+    """Test that the values inherited from a parent process are discarded."""
+    counter = Counter("hits", "Hits.", registry=registry)
+    counter.inc()
+
+    registry.reset_after_fork()
+
+    assert not counter.samples()
+
+
+def test_snapshots_are_flushed_periodically(tmp_path):
+    """Test that the background thread writes this process's snapshot."""
+    registry = Registry()
+    Counter("hits", "Hits.", registry=registry).inc()
+    registry.configure(str(tmp_path), flush_interval=0.01)
+
+    deadline = time.monotonic() + 5
+    while not registry.snapshot_path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    registry.configure(None)
+
+    assert (tmp_path / f"worker-{os.getpid()}.json").exists()
+
+
+def test_failed_flush_is_logged(tmp_path, monkeypatch, caplog):
+    """Test that the background thread survives being unable to write a snapshot."""
+    registry = Registry()
+
+    def fail_flush():
+        registry.directory = None
+        raise OSError
+
+    monkeypatch.setattr(registry, "flush", fail_flush)
+    with caplog.at_level("ERROR"):
+        registry.configure(str(tmp_path), flush_interval=0.01)
+        deadline = time.monotonic() + 5
+        while "Unable to write metrics snapshot" not in caplog.text and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert "Unable to write metrics snapshot" in caplog.text
@@ -0,0 +1,127 @@
+"""Unit tests for the rendered page cache."""
+
+import re
+
+from flask import template_rendered
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.templating.page_cache import PageCache
+
+
+def rendered_templates(app):
+    """Record the names of the templates rendered by the application."""
+    names = []
+    template_rendered.connect(lambda _, template, **__: names.append(template.name), app, weak=False)
+    return names
+
+
+def nonce_from_csp(response):
+    """Extract the script-src nonce from the Content-Security-Policy header."""
+    return re.search(r"'nonce-([^']+)'", response.headers["Content-Security-Policy"]).group(1)
+
+
+def test_page_is_rendered_once_and_served_from_cache(app, client):
+    """Test that repeated requests for a static page only render the template once."""
+    rendered = rendered_templates(app)
+
+    first = client.get("/")
+    second = client.get("/")
+
+    assert rendered == ["index.html"]
+    assert first.status_code == second.status_code == 200
+    assert "CI migration process" in second.get_data(as_text=True)
+
+
+def test_page_is_cached_for_each_root_url(app, client):
+    """Test that a page requested under another script root, or host, is rendered with its own links."""
+    rendered = rendered_templates(app)
+
+    pages = [
+        client.get("/", base_url=base_url).get_data(as_text=True)
+        for base_url in ("http://localhost/", "http://localhost/ui/", "https://example.com/", "http://localhost/")
+    ]
+
+    assert rendered == ["index.html"] * 3
+    assert '"/collection-instruments/search?q="' in pages[0]
+    assert '"/ui/collection-instruments/search?q="' in pages[1]
+
+
+def test_cached_page_contains_the_request_nonce(client):
+    """Test that each response carries the nonce from its own Content-Security-Policy header."""
+    first = client.get("/")
+    second = client.get("/")
+
+    assert nonce_from_csp(first) != nonce_from_csp(second)
+    for response in (first, second):
+        assert f'nonce="{nonce_from_csp(response)}"' in response.get_data(as_text=True)
+        assert "csp-nonce-" not in response.get_data(as_text=True)
+
+
+def test_pages_are_cached_per_context(app):
+    """Test that pages rendered with different content are cached separately."""
+    page_cache = app.extensions["page_cache"]
+
+    with app.test_request_context("/"):
+        page_cache.render("error.html", error_content={"title": "Page not found"})
+        page_cache.render("error.html", error_content={"title": "Page not found"})
+        page = page_cache.render("error.html", error_content={"title": "Forbidden"})
+
+    assert len(page_cache) == 2
+    assert b"Forbidden" in page
+
+
+def test_invalidate_removes_pages(app, client):
+    """Test that invalidation forces pages to be rendered again."""
+    rendered = rendered_templates(app)
+    page_cache = app.extensions["page_cache"]
+    client.get("/")
+    with app.test_request_context("/"):
+        page_cache.render("error.html", error_content={"title": "Forbidden"})
+
+    assert page_cache.invalidate("index.html") == 1
+    assert page_cache.invalidate() == 1
+
+    client.get("/")
+    assert rendered == ["index.html", "error.html", "index.html"]
+
+
+def test_cache_key_includes_design_system_version():
+    """Test that pages rendered with different design system versions do not share entries."""
+    context = {"error_content": {"title": "Forbidden"}}
+
+    assert PageCache("72.10.0").cache_key("error.html", context) != PageCache("73.0.0").cache_key("error.html", context)
+
+
+def test_oldest_page_is_evicted_when_full(app):
+    """Test that the cache is bounded."""
+    page_cache = PageCache("72.10.0", max_entries=2)
+    rendered = rendered_templates(app)
+
+    with app.test_request_context("/"):
+        for title in ("one", "two", "three", "three", "one"):
+            page_cache.render("error.html", error_content={"title": title})
+
+    assert len(page_cache) == 2
+    assert len(rendered) == 4
+
+
+def test_pages_are_rendered_per_request_when_disabled():
+    """Test that every request renders the template when the page cache is disabled."""
+
+    class NoPageCacheConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration with the page cache disabled."""
+
+        PAGE_CACHE_ENABLED = False
+
+    app = create_app(NoPageCacheConfig)
+    rendered = rendered_templates(app)
+    client = app.test_client()
+
+    response = client.get("/")
+    client.get("/")
+    client.get("/page-not-found")
+    client.get("/page-not-found")
+
+    assert rendered == ["index.html", "index.html", "error.html", "error.html"]
+    assert f'nonce="{nonce_from_csp(response)}"' in response.get_data(as_text=True)
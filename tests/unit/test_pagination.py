@@ -0,0 +1,82 @@
+"""Unit tests for keyset pagination."""
+
+import pytest
+
+from eq_cir_management_ui.utils.pagination import KeysetPage, decode_cursor, encode_cursor
+
+
+def number_source(count, fetches=None):
+    """A source of the numbers below ``count``, keyed on themselves, recording each fetch."""
+
+    def fetch(after, limit):
+        if fetches is not None:
+            fetches.append((after, limit))
+        start = 0 if after is None else after[0] + 1
+        return ({"n": n} for n in range(start, min(start + limit, count)))
+
+    return fetch
+
+
+def key(row):
+    """The key of a row from the number source."""
+    return (row["n"],)
+
+
+def test_cursor_round_trip():
+    """Test that a cursor decodes to the key it was encoded from."""
+    cursor = encode_cursor(("1000", "0001", "en"))
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("1000", "0001", "en")
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bm90IGpzb24", "eyJrZXkiOjF9", "_w"])
+def test_invalid_cursor(cursor):
+    """Test that a cursor which was not produced by encode_cursor is rejected."""
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("values", [(1, 2, 3), ("1000", "0001"), ("1000", "0001", "en", "x"), ("1000", None, "en")])
+def test_cursor_of_a_key_of_other_types_is_invalid(values):
+    """Test that a cursor whose key does not have the source's types of values is rejected."""
+    cursor = encode_cursor(values)
+
+    assert decode_cursor(cursor) == values
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor, (str, str, str))
+
+
+def test_pages_follow_on_from_the_cursor():
+    """Test that following next_cursor visits every row once."""
+    rows, after = [], None
+    while True:
+        page = KeysetPage(number_source(25), key, after=after, size=10, batch_size=4)
+        rows.extend(row["n"] for row in page)
+        if page.next_cursor is None:
+            break
+        after = decode_cursor(page.next_cursor)
+
+    assert rows == list(range(25))
+
+
+@pytest.mark.parametrize(("count", "has_next"), [(10, False), (11, True)])
+def test_last_page_has_no_next_cursor(count, has_next):
+    """Test that a page which ends with the source has no next cursor."""
+    page = KeysetPage(number_source(count), key, size=10, batch_size=10)
+
+    assert len(list(page)) == 10
+    assert (page.next_cursor is not None) is has_next
+
+
+def test_rows_are_fetched_in_batches():
+    """Test that the page is fetched a batch at a time, each with one row to look ahead."""
+    fetches = []
+    page = KeysetPage(number_source(100, fetches), key, size=10, batch_size=4).prefetch()
+
+    assert fetches == [(None, 5)]
+    assert [row["n"] for row in page] == list(range(10))
+    assert fetches == [(None, 5), ((3,), 5), ((7,), 3)]
+    assert page.next_cursor == encode_cursor((9,))
@@ -0,0 +1,127 @@
+"""Unit tests for the Jinja bytecode cache and start-up template pre-compilation."""
+
+from flask import Flask
+from jinja2 import DictLoader
+from jinja2.parser import Parser
+
+from eq_cir_management_ui import create_app, design_system_config
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.templating.precompile import find_reachable_templates, precompile_templates
+
+
+def test_find_reachable_templates_follows_extends_and_imports(app):
+    """Test that templates extended and imported by a page are discovered."""
+    reachable = find_reachable_templates(app.jinja_env, ["error.html"])
+
+    assert reachable[0] == "error.html"
+    assert "base.html" in reachable
+    assert "layout/_template.njk" in reachable
+    assert "components/breadcrumbs/_macro.njk" in reachable
+    assert "components/header/_macro.njk" in reachable
+    assert "components/footer/_macro.njk" in reachable
+
+
+def test_create_app_precompiles_templates(app):
+    """Test that the page templates are in the Jinja template cache once the app is created."""
+    cached = {name for _, name in app.jinja_env.cache}  # type: ignore[union-attr]
+
+    assert {"base.html", "error.html", "index.html", "layout/_template.njk"} <= cached
+
+
+def test_precompile_templates_logs_timing(app, caplog):
+    """Test that the pre-compilation step logs how long it took."""
+    with caplog.at_level("INFO"):
+        compiled = precompile_templates(app)
+
+    assert len(compiled) == len(set(compiled))
+    assert f"Precompiled {len(compiled)} templates in" in caplog.text
+
+
+def test_precompile_templates_skips_missing_root(app, caplog):
+    """Test that a missing root template is logged rather than failing start-up."""
+    with caplog.at_level("WARNING"):
+        compiled = precompile_templates(app, ["missing.html", "index.html"])
+
+    assert "index.html" in compiled
+    assert "missing.html not found" in caplog.text
+
+
+def test_precompile_templates_skips_only_a_missing_include(caplog):
+    """Test that a template including a missing template is still compiled."""
+    app = Flask(__name__)
+    app.jinja_loader = DictLoader(  # type: ignore[assignment]
+        {"page.html": "{% extends 'base.html' %}", "base.html": "{% include 'missing.html' ignore missing %}"},
+    )
+
+    with caplog.at_level("WARNING"):
+        compiled = precompile_templates(app, ["page.html"])
+
+    assert compiled == ["page.html", "base.html"]
+    assert "missing.html not found" in caplog.text
+    assert app.jinja_env.get_template("page.html").render() == ""
+
+
+def test_precompile_templates_parses_each_template_once(monkeypatch):
+    """Test that templates are compiled from the syntax trees parsed to find their references,
+    and served from the template cache afterwards.
+    """
+    parsed = []
+
+    class CountingParser(Parser):
+        """A parser recording the names of the templates it parses."""
+
+        def parse(self):
+            parsed.append(self.name)
+            return super().parse()
+
+    monkeypatch.setattr("jinja2.environment.Parser", CountingParser)
+    app = Flask(__name__)
+    app.jinja_loader = DictLoader(  # type: ignore[assignment]
+        {"page.html": "{% extends 'base.html' %}", "base.html": "{{ 1 + 1 }}"},
+    )
+
+    precompile_templates(app, ["page.html"])
+
+    assert app.jinja_env.get_template("page.html").render() == "2"
+    assert parsed == ["page.html", "base.html"]
+
+
+def test_warmup_can_be_disabled():
+    """Test that templates are compiled lazily when warm-up is disabled."""
+
+    class NoWarmupConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration with template warm-up, and the middleware which renders its pages, disabled."""
+
+        TEMPLATE_WARMUP = False
+        ADMISSION_CONTROL_ENABLED = False
+        SCANNER_PATH_PREFIXES = ()
+        SCANNER_PATH_SUFFIXES = ()
+
+    app = create_app(NoWarmupConfig)
+
+    assert len(app.jinja_env.cache) == 0  # type: ignore[arg-type]
+
+
+def test_bytecode_cache_is_keyed_on_design_system_version(tmp_path):
+    """Test that compiled bytecode is written to a directory per design system version."""
+
+    class BytecodeCacheConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration with the bytecode cache enabled."""
+
+        JINJA_BYTECODE_CACHE_DIR = str(tmp_path)
+
+    create_app(BytecodeCacheConfig)
+
+    version_directories = list(tmp_path.iterdir())
+    assert [directory.name for directory in version_directories] == [design_system_config()]
+    assert list(version_directories[0].glob("__jinja2_*.cache"))
+
+
+def test_find_reachable_templates_skips_known_templates(app):
+    """Test that templates already walked are neither walked again nor returned."""
+    known = find_reachable_templates(app.jinja_env, ["base.html"])
+
+    reachable = find_reachable_templates(app.jinja_env, ["error.html", "base.html"], known=known)
+
+    assert reachable[0] == "error.html"
+    assert not set(reachable) & set(known)
@@ -0,0 +1,130 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for on-demand request profiling."""
+
+import time
+
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.middleware.profiling import ProfileStore, ProfilingMiddleware, sign_profile_request
+
+SECRET = "test-profiling-secret"  # noqa: S105
+ADMIN_HEADERS = {"Authorization": "Bearer test-admin-token"}
+
+
+def wsgi_chain(app):
+    """The WSGI middleware wrapping the Flask application, outermost first."""
+    chain = []
+    wsgi_app = app.wsgi_app
+    while hasattr(wsgi_app, "wsgi_app"):
+        chain.append(type(wsgi_app))
+        wsgi_app = wsgi_app.wsgi_app
+    return chain
+
+
+@pytest.fixture
+def profiling_app(tmp_path):
+    """An application profiling signed requests, with the admin routes enabled."""
+
+    class ProfilingConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration with profiling enabled."""
+
+        ADMIN_TOKEN = "test-admin-token"  # noqa: S105
+        PROFILING_SECRET = SECRET
+        PROFILING_DIR = str(tmp_path)
+        PROFILING_MAX_PROFILES = 2
+
+    return create_app(ProfilingConfig)
+
+
+def test_profiling_is_not_installed_when_disabled(app):
+    """Test that a request passes through no profiling code when profiling is disabled."""
+    assert ProfilingMiddleware not in wsgi_chain(app)
+    assert "profile_store" not in app.extensions
+
+
+def test_unsigned_request_is_not_profiled(profiling_app, monkeypatch):
+    """Test that a request without a valid signature is not profiled."""
+    monkeypatch.setattr("cProfile.Profile", None)
+    expired = sign_profile_request(SECRET, "/", int(time.time()) - 1)
+
+    for headers in ({}, {"X-Profile": expired}, {"X-Profile": "abc.def"}):
+        response = profiling_app.test_client().get("/", headers=headers)
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+
+
+def test_signed_request_is_profiled(profiling_app):
+    """Test that a signed request is profiled, including template rendering, and the profile
+    is served by the admin routes.
+    """
+    client = profiling_app.test_client()
+    signed = sign_profile_request(SECRET, "/", int(time.time()) + 60)
+
+    response = client.get("/", headers={"X-Profile": signed})
+    name = response.headers["X-Profile-Id"]
+
+    assert "CI migration process" in response.get_data(as_text=True)
+    assert client.get("/admin/profiles", headers=ADMIN_HEADERS).json == {"profiles": [name]}
+    report = client.get(f"/admin/profiles/{name}?limit=200", headers=ADMIN_HEADERS).get_data(as_text=True)
+    assert "render_cached_template" in report
+    assert "secure_headers.py" in report
+    raw = client.get(f"/admin/profiles/{name}?format=pstats", headers=ADMIN_HEADERS)
+    assert raw.mimetype == "application/octet-stream"
+
+
+def test_signature_in_query_parameter(profiling_app):
+    """Test that the signature may be passed as a query parameter."""
+    signed = sign_profile_request(SECRET, "/page-not-found", int(time.time()) + 60)
+
+    response = profiling_app.test_client().get(f"/page-not-found?profile={signed}")
+
+    assert response.status_code == 404
+    assert "X-Profile-Id" in response.headers
+
+
+def test_only_the_latest_profiles_are_kept(profiling_app):
+    """Test that the profile directory is bounded."""
+    client = profiling_app.test_client()
+    signed = sign_profile_request(SECRET, "/", int(time.time()) + 60)
+
+    names = [client.get("/", headers={"X-Profile": signed}).headers["X-Profile-Id"] for _ in range(3)]
+
+    assert profiling_app.extensions["profile_store"].names() == names[:0:-1]
+    assert client.get(f"/admin/profiles/{names[0]}", headers=ADMIN_HEADERS).status_code == 404
+
+
+def test_sampled_requests_are_profiled(tmp_path):
+    """Test that every request is profiled at a sample rate of 1."""
+
+    class SampledConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Configuration profiling every request."""
+
+        PROFILING_SAMPLE_RATE = 1.0
+        PROFILING_DIR = str(tmp_path)
+
+    response = create_app(SampledConfig).test_client().get("/")
+
+    assert (tmp_path / response.headers["X-Profile-Id"]).exists()
+
+
+def test_profile_routes_are_not_found_when_disabled():
+    """Test that the profile routes are not found when profiling is disabled."""
+    client = create_app(type("AdminConfig", (DefaultConfig,), {"ADMIN_TOKEN": "test-admin-token"})).test_client()
+
+    assert client.get("/admin/profiles", headers=ADMIN_HEADERS).status_code == 404
+    assert client.get("/admin/profiles/missing.prof", headers=ADMIN_HEADERS).status_code == 404
+
+
+def test_store_names_sort_by_time(tmp_path):
+    """Test that profile names are safe file names which sort by the time they were taken."""
+    store = ProfileStore(tmp_path, 10)
+
+    first = store.new_name("GET", "/../etc/passwd")
+    second = store.new_name("GET", "/")
+
+    assert "/" not in first
+    assert second.endswith("-GET-root.prof")
+    assert sorted([second, first]) == [first, second]
@@ -0,0 +1,299 @@
+"""Unit tests for the backend response cache."""
+
+import threading
+import time
+
+import pytest
+
+from eq_cir_management_ui.cache.response_cache import CACHE_EVENTS, ResponseCache, parse_ttls
+
+
+class Loader:  # pylint: disable=too-few-public-methods
+    """A loader returning successive numbers, counting its calls."""
+
+    def __init__(self, release=None):
+        self.calls = 0
+        self.release = release
+
+    def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        return self.calls
+
+
+def events(endpoint, event):
+    """The number of cache events of a kind recorded for an endpoint."""
+    return CACHE_EVENTS.samples().get((endpoint, event), [0.0])[0]
+
+
+def wait_for(condition, timeout=5.0):
+    """Poll until the condition is true or the timeout passes."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_fresh_entries_are_served_from_the_cache():
+    """Test that a value is loaded once and then served while fresh."""
+    cache = ResponseCache(10, default_ttl=60, stale_ttl=60)
+    loader = Loader()
+    hits = events("fresh", "hit")
+
+    assert [cache.get("fresh", "key", loader) for _ in range(3)] == [1, 1, 1]
+    assert loader.calls == 1
+    assert events("fresh", "hit") == hits + 2
+
+
+def test_stale_entries_are_served_while_refreshed():
+    """Test that an expired entry is returned at once and refreshed in the background."""
+    cache = ResponseCache(10, default_ttl=0.05, stale_ttl=60)
+    loader = Loader()
+    cache.get("stale", "key", loader)
+    time.sleep(0.06)
+
+    assert cache.get("stale", "key", loader) == 1
+    assert wait_for(lambda: cache.get("stale", "key", loader) == 2)
+    assert loader.calls == 2
+
+
+def test_stale_entries_are_refreshed_once():
+    """Test that requests for a stale entry during its refresh do not start another."""
+    release = threading.Event()
+    cache = ResponseCache(10, default_ttl=0.05, stale_ttl=60)
+    cache.get("stale-once", "key", lambda: 0)
+    time.sleep(0.06)
+    loader = Loader(release)
+
+    assert [cache.get("stale-once", "key", loader) for _ in range(5)] == [0] * 5
+    release.set()
+    assert wait_for(lambda: cache.get("stale-once", "key", loader) == 1)
+    assert loader.calls == 1
+
+
+def test_failed_refresh_keeps_the_stale_value():
+    """Test that a failed background refresh is counted and the stale value kept."""
+    cache = ResponseCache(10, default_ttl=0.05, stale_ttl=60)
+    cache.get("refresh-error", "key", lambda: "stale")
+    time.sleep(0.06)
+    errors = events("refresh-error", "refresh_error")
+
+    def failing_loader():
+        raise ConnectionError
+
+    assert cache.get("refresh-error", "key", failing_loader) == "stale"
+    assert wait_for(lambda: events("refresh-error", "refresh_error") == errors + 1)
+    assert wait_for(lambda: cache.get("refresh-error", "key", lambda: "fresh") == "fresh")
+
+
+def test_expired_entries_are_loaded_again():
+    """Test that an entry past its stale period is loaded in the foreground."""
+    cache = ResponseCache(10, default_ttl=0.02, stale_ttl=0.02)
+    loader = Loader()
+    cache.get("expired", "key", loader)
+    time.sleep(0.05)
+
+    assert cache.get("expired", "key", loader) == 2
+
+
+def test_endpoint_ttls():
+    """Test that endpoints with their own TTL expire after it."""
+    cache = ResponseCache(10, default_ttl=0.02, stale_ttl=0, ttls=parse_ttls(["/v1/documents=60"]))
+    loader = Loader()
+    cache.get("/v1/documents", "key", loader)
+    cache.get("/v2/list", "key", loader)
+    time.sleep(0.05)
+
+    assert cache.get("/v1/documents", "key", loader) == 1
+    assert cache.get("/v2/list", "key", loader) == 3
+
+
+def test_parse_ttls():
+    """Test parsing endpoint=seconds pairs."""
+    assert parse_ttls(["/a=1", "/b?c=d=2.5"]) == {"/a": 1.0, "/b?c=d": 2.5}
+    assert not parse_ttls([])
+
+
+def test_least_recently_used_entries_are_evicted():
+    """Test that the least recently used entry is evicted once the cache is full."""
+    cache = ResponseCache(2, default_ttl=60, stale_ttl=60)
+    evictions = events("lru", "eviction")
+    cache.get("lru", "a", lambda: "a")
+    cache.get("lru", "b", lambda: "b")
+    cache.get("lru", "a", lambda: "reloaded")
+    cache.get("lru", "c", lambda: "c")
+
+    assert len(cache) == 2
+    assert events("lru", "eviction") == evictions + 1
+    assert cache.get("lru", "a", lambda: "reloaded") == "a"
+    assert cache.get("lru", "b", lambda: "reloaded") == "reloaded"
+
+
+def test_concurrent_misses_share_one_load():
+    """Test that threads asking for the same missing entry trigger a single upstream call."""
+    release = threading.Event()
+    cache = ResponseCache(10, default_ttl=60, stale_ttl=60)
+    loader = Loader(release)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get("coalesce", "key", loader))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    assert wait_for(lambda: events("coalesce", "miss") >= 10 or loader.calls)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 1
+    assert results == [1] * 10
+
+
+def test_load_errors_are_raised_to_every_waiter_and_not_cached():
+    """Test that a failed load is raised to each thread waiting on it, and retried next time."""
+    release = threading.Event()
+    cache = ResponseCache(10, default_ttl=60, stale_ttl=60)
+    errors = []
+
+    def failing_loader():
+        release.wait(5)
+        raise ConnectionError
+
+    def get():
+        try:
+            cache.get("errors", "key", failing_loader)
+        except ConnectionError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3
+    assert cache.get("errors", "key", lambda: "loaded") == "loaded"
+
+
+class Cancelled(BaseException):
+    """Ends a load as a gevent timeout or SystemExit would, outside the Exception hierarchy."""
+
+
+def test_load_ended_by_a_base_exception_is_not_waited_for():
+    """Test that a load ended by an exception not derived from Exception is raised to the threads
+    waiting on it, and the next miss loads again.
+    """
+    release = threading.Event()
+    cache = ResponseCache(10, default_ttl=60, stale_ttl=60)
+    errors = []
+
+    def cancelled_loader():
+        release.wait(5)
+        raise Cancelled
+
+    def get(loader):
+        try:
+            cache.get("cancelled", "key", loader)
+        except Cancelled as error:
+            errors.append(error)
+
+    leader = threading.Thread(target=get, args=(cancelled_loader,))
+    leader.start()
+    assert wait_for(lambda: events("cancelled", "miss") >= 1)
+    follower = threading.Thread(target=get, args=(Loader(),))
+    follower.start()
+    assert wait_for(lambda: events("cancelled", "miss") >= 2)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 2
+    assert cache.get("cancelled", "key", lambda: "loaded") == "loaded"
+
+
+# The refresh thread raises the exception again once it has ended the refresh.
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_failed_refresh_ended_by_a_base_exception_is_retried():
+    """Test that a background refresh ended by an exception not derived from Exception lets a
+    later request refresh the entry.
+    """
+    cache = ResponseCache(10, default_ttl=0.05, stale_ttl=60)
+    cache.get("refresh-cancelled", "key", lambda: "old")
+    time.sleep(0.06)
+
+    def cancelled_loader():
+        raise Cancelled
+
+    assert cache.get("refresh-cancelled", "key", cancelled_loader) == "old"
+    assert wait_for(lambda: cache.get("refresh-cancelled", "key", lambda: "new") == "new")
+
+
+def test_waiting_for_another_load_is_bounded():
+    """Test that a thread loads the value itself after waiting too long for another thread."""
+    release = threading.Event()
+    cache = ResponseCache(10, default_ttl=60, stale_ttl=60, load_wait=0.01)
+    leader = threading.Thread(target=cache.get, args=("slow", "key", Loader(release)))
+    leader.start()
+    assert wait_for(lambda: events("slow", "miss") >= 1)
+
+    assert cache.get("slow", "key", lambda: "loaded again") == "loaded again"
+    release.set()
+    leader.join()
+
+
+@pytest.mark.parametrize("endpoint", [None, "invalidated"])
+def test_value_loaded_before_an_invalidation_is_not_stored(endpoint):
+    """Test that a load started before the endpoint's entries were invalidated does not store
+    the value it loaded, and later misses do not wait for it.
+    """
+    release = threading.Event()
+    cache = ResponseCache(10, default_ttl=60, stale_ttl=60)
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get("invalidated", "key", Loader(release))))
+    leader.start()
+    assert wait_for(lambda: events("invalidated", "miss") >= 1)
+
+    cache.invalidate(endpoint)
+    assert cache.get("invalidated", "key", lambda: "after") == "after"
+    release.set()
+    leader.join()
+
+    assert results == [1]
+    assert cache.get("invalidated", "key", lambda: "later") == "after"
+
+
+def test_invalidate():
+    """Test removing the entries of one endpoint, then every entry."""
+    cache = ResponseCache(10, default_ttl=60, stale_ttl=60)
+    for endpoint in ("/a", "/b"):
+        for key in range(3):
+            cache.get(endpoint, key, lambda: "value")
+
+    assert cache.invalidate("/a") == 3
+    assert len(cache) == 3
+    assert cache.invalidate() == 3
+    assert not cache
+
+
+def test_loads_in_progress_are_forgotten_after_a_fork(monkeypatch):
+    """Test that a forked process does not wait on loads started by its parent."""
+    release = threading.Event()
+    cache = ResponseCache(10, default_ttl=60, stale_ttl=60)
+    thread = threading.Thread(target=cache.get, args=("fork", "key", Loader(release)))
+    thread.start()
+    assert wait_for(lambda: events("fork", "miss") >= 1)
+
+    monkeypatch.setattr("eq_cir_management_ui.cache.response_cache.os.getpid", lambda: -1)
+
+    assert cache.get("fork", "key", lambda: "child") == "child"
+    release.set()
+    thread.join()
+
+
+@pytest.mark.parametrize("endpoint", [None, "/v2/ci_metadata"])
+def test_invalidate_accepts_missing_endpoint(endpoint):
+    """Test invalidating an empty cache."""
+    assert ResponseCache(10, default_ttl=60, stale_ttl=60).invalidate(endpoint) == 0
@@ -0,0 +1,94 @@
+"""Unit tests for answering scanner requests before Flask."""
+
+import re
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+from eq_cir_management_ui.middleware.scanners import SCANNER_REQUESTS, ScannerMiddleware, scanner_matcher
+
+
+def scanner_requests() -> float:
+    """The number of scanner requests answered."""
+    return SCANNER_REQUESTS.samples().get((), [0.0])[0]
+
+
+def hello(_environ, start_response):
+    """A WSGI application answering every request."""
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"hello"]
+
+
+@pytest.mark.parametrize(
+    "path, matches",
+    [
+        ("/wp-login.php", True),
+        ("/WP-ADMIN/setup", True),
+        ("/.env", True),
+        ("/config/.env", True),
+        ("/index.aspx", True),
+        ("/", False),
+        ("/status", False),
+        ("/admin/cache/invalidate", False),
+        ("/static/css/main.css", False),
+        ("/console", True),
+        ("/Console/login", True),
+        ("/consoles", False),
+        ("/owner", False),
+        ("/pmas/list", False),
+    ],
+)
+def test_scanner_matcher(path, matches):
+    """Test that paths are matched on their prefix, by whole path segments unless the prefix ends
+    in punctuation, and on their suffix, ignoring case.
+    """
+    matcher = scanner_matcher(["/wp-", "/.env", "/console", "/owa", "/pma"], [".php", ".aspx", ".env"])
+
+    assert matcher(path) is matches
+
+
+def test_scanner_matcher_is_none_without_paths():
+    """Test that there is no matcher when no paths are configured."""
+    assert scanner_matcher([], []) is None
+
+
+def test_scanner_paths_are_answered_before_the_application():
+    """Test that a scanner path gets the 404 page, with the nonce, and is recorded."""
+    recorded = []
+    middleware = ScannerMiddleware(
+        hello,
+        matches=scanner_matcher(["/wp-"], []),
+        page=(b"not found ", b""),
+        record=lambda *event: recorded.append(event),
+    )
+    before = scanner_requests()
+    statuses = []
+
+    def start_response(status, _headers, _exc_info=None):
+        statuses.append(status)
+
+    environ = EnvironBuilder(path="/wp-login.php").get_environ()
+    environ["eq_cir_management_ui.csp_nonce"] = "abc"
+    assert middleware(environ, start_response) == [b"not found abc"]
+    assert middleware(EnvironBuilder(path="/wp-login.php", method="HEAD").get_environ(), start_response) == []
+    assert middleware(EnvironBuilder(path="/").get_environ(), start_response) == [b"hello"]
+
+    assert statuses == ["404 Not Found", "404 Not Found", "200 OK"]
+    assert recorded == [(404, "GET", "/wp-login.php"), (404, "HEAD", "/wp-login.php")]
+    assert scanner_requests() == before + 2
+
+
+def test_scanner_paths_skip_flask(app, client):
+    """Test that a scanner request is answered with the application's 404 page and security
+    headers, without reaching Flask.
+    """
+    dispatched = []
+    app.before_request(lambda: dispatched.append(True))
+
+    response = client.get("/wp-admin/install.php")
+    nonce = re.search(r"'nonce-([^']*)'", response.headers["Content-Security-Policy"]).group(1)
+
+    assert response.status_code == 404
+    assert "Page not found" in response.get_data(as_text=True)
+    assert f'nonce="{nonce}"' in response.get_data(as_text=True)
+    assert not dispatched
@@ -0,0 +1,254 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the search index of collection instruments."""
+
+import time
+
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.cir_api.client import CirApiError
+from eq_cir_management_ui.cir_api.stub_server import StubCirServer, synthetic_metadata
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.search.index import PREFIX_CACHE_SIZE, RESORT_WORDS, Postings, SearchIndex, words
+from eq_cir_management_ui.search.refresh import IndexRefresher
+
+
+@pytest.fixture
+def rows():
+    """The metadata of 40 collection instruments, with a version of each."""
+    return synthetic_metadata(40, versions=1)
+
+
+@pytest.fixture
+def index(rows):
+    """A search index of the 40 collection instruments."""
+    search_index = SearchIndex()
+    search_index.update(rows)
+    return search_index
+
+
+@pytest.fixture
+def stub():
+    """A stub CIR API serving 40 collection instruments."""
+    with StubCirServer(instruments=40) as server:
+        yield server
+
+
+@pytest.fixture
+def search_app(stub, tmp_path):
+    """An application using the stub CIR API, reading the metadata feed on every search."""
+    config = type(
+        "SearchConfig",
+        (DefaultConfig,),
+        {
+            "CIR_API_URL": stub.url,
+            "JOBS_DB_PATH": str(tmp_path / "jobs.sqlite3"),
+            "SEARCH_REFRESH_INTERVAL": 0,
+            "SEARCH_MAX_RESULTS": 5,
+        },
+    )
+    app = create_app(config)
+    yield app
+    app.extensions["job_runner"].store.close()
+
+
+def titles(result):
+    """The titles of the matches of a search."""
+    return [row["title"] for row in result[1]]
+
+
+def test_words_are_folded_to_lower_case():
+    """Test that text is split into words, in lower case."""
+    assert words("Monthly Business Survey 1000, (Wales)") == ["monthly", "business", "survey", "1000", "wales"]
+
+
+def test_postings_become_a_bitset_when_dense():
+    """Test that a set of slots becomes a bitset once it would take more memory, and stays one."""
+    postings = Postings()
+
+    assert postings.apply([1, 2], [], 512)
+    assert postings.members == {1, 2}
+
+    assert postings.apply([3, 4, 5], [1], 512)
+    assert postings.members is None
+    assert postings.bits == 0b111100
+
+    assert not postings.apply([], [2, 3, 4, 5], 512)
+    assert postings.bits == 0
+
+
+@pytest.mark.parametrize(
+    ("text", "facets", "total", "first"),
+    [
+        ("", {}, 40, "Monthly Business Survey 1000"),
+        ("month", {}, 10, "Monthly Business Survey 1000"),
+        ("BUS 1001", {}, 2, "Monthly Business Survey 1001"),
+        ("10", {"form_type": "0002"}, 10, "Quarterly Stocks Survey 1000"),
+        ("", {"language": "cy"}, 5, "Annual Business Survey 1001"),
+        ("", {"survey_id": "1009", "form_type": "0004"}, 1, "Retail Sales 1009"),
+        ("retail", {"form_type": "0001"}, 0, None),
+        ("", {"language": "fr"}, 0, None),
+        ("survey 1000 monthly quarterly", {}, 0, None),
+    ],
+)
+def test_search_by_prefix_and_facets(index, text, facets, total, first):
+    """Test that a search matches each word of its text by prefix, and each facet exactly."""
+    result = index.search(text, **facets)
+
+    assert result[0] == total
+    assert titles(result)[:1] == ([first] if first else [])
+
+
+def test_search_returns_the_first_matches_in_key_order(index):
+    """Test that a search returns at most its limit of matches, ordered as the listing is."""
+    total, matches = index.search("survey", limit=3)
+
+    assert total == 30
+    assert [(row["survey_id"], row["form_type"]) for row in matches] == [
+        ("1000", "0001"),
+        ("1000", "0002"),
+        ("1000", "0003"),
+    ]
+
+
+def test_update_applies_only_the_differences(index, rows):
+    """Test that an update adds, changes and removes only the collection instruments which differ,
+    and that searches after it see the changes.
+    """
+    assert index.search("ren")[0] == 0
+
+    changed = [*rows[1:], rows[0] | {"title": "Renamed Survey", "ci_version": 2}]
+    changed[5] = changed[5] | {"ci_version": 2}
+    changed.append({"survey_id": "2000", "form_type": "0001", "language": "en", "title": "New Survey"})
+    del changed[9]
+
+    assert index.update(changed) == (1, 2, 1)
+    assert len(index) == 40
+    assert titles(index.search("ren")) == ["Renamed Survey"]
+    assert index.search("monthly 1000")[0] == 0
+    assert titles(index.search("2000")) == ["New Survey"]
+    assert index.search("", survey_id="1002", form_type="0003")[0] == 0
+    assert index.update(changed) == (0, 0, 0)
+
+    assert index.update(changed[:-1]) == (0, 0, 1)
+    assert index.search("new")[0] == 0
+    assert (len(index), index.capacity) == (39, 40)
+
+
+def test_sparse_and_dense_words_are_searched_together():
+    """Test that a prefix of both words in few collection instruments, kept as sets of slots, and
+    words in many, kept as bitsets, matches each, however often it is searched.
+    """
+    index = SearchIndex()
+    index.update(synthetic_metadata(2000, versions=1))
+
+    assert index.search("10")[0] == 400
+    for number in range(PREFIX_CACHE_SIZE):
+        index.search(f"x{number}")
+    assert index.search("10")[0] == 400
+    assert index.search("10")[0] == 400
+
+
+def test_many_new_words_are_added_at_once(index, rows):
+    """Test that an update adding more words than are added one at a time keeps them searchable."""
+    added = [
+        {"survey_id": f"{number}", "form_type": "0001", "language": "en", "title": f"Survey word{number}"}
+        for number in range(3000, 3000 + RESORT_WORDS)
+    ]
+
+    assert index.update(rows + added) == (RESORT_WORDS, 0, 0)
+    assert index.search("word")[0] == RESORT_WORDS
+    assert index.search("3001")[0] == 1
+
+    assert index.update(rows) == (0, 0, RESORT_WORDS)
+    assert index.search("word")[0] == 0
+
+
+def test_refresher_reads_the_feed_at_most_once_an_interval(stub):
+    """Test that the index is built from the feed, and only compared with it again after the interval."""
+    refresher = IndexRefresher(SearchIndex(), create_client(stub), interval=60)
+
+    assert len(refresher.current()) == 40
+    requests = stub.requests
+    refresher.current()
+    refresher.refresh()
+
+    assert stub.requests == requests
+
+
+def create_client(stub):
+    """A CIR API client of the stub, without a cache or retries."""
+    config = {"CIR_API_URL": stub.url, "RESPONSE_CACHE_ENABLED": False, "CIR_API_MAX_RETRIES": 0}
+    return create_app(type("ClientConfig", (DefaultConfig,), config)).extensions["cir_api_client"]
+
+
+def test_refresher_serves_the_index_while_the_feed_fails(stub, caplog):
+    """Test that the index is searched as it is while the feed cannot be read, but that a search
+    fails when the index has never been built.
+    """
+    refresher = IndexRefresher(SearchIndex(), create_client(stub), interval=0)
+
+    stub.fail_next(1, status=500)
+    with pytest.raises(CirApiError):
+        refresher.current()
+    assert len(refresher.current()) == 40
+
+    stub.fail_next(1, status=500)
+    with caplog.at_level("ERROR"):
+        assert len(refresher.current()) == 40
+
+    assert "Unable to bring the search index up to date" in caplog.text
+
+
+def test_warm_builds_the_index_in_the_background(stub, caplog):
+    """Test that warming the index builds it on another thread, and logs a failing feed."""
+    refresher = IndexRefresher(SearchIndex(), create_client(stub), interval=60)
+    failing = IndexRefresher(SearchIndex(), create_client(stub), interval=60)
+
+    refresher.warm()
+    deadline = time.monotonic() + 5
+    while refresher.refreshed_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stub.fail_next(1, status=500)
+    with caplog.at_level("ERROR"):
+        failing.warm()
+        while "Unable to build the search index" not in caplog.text and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert len(refresher.index) == 40
+    assert "Unable to build the search index" in caplog.text
+
+
+def test_search_route(search_app, stub):
+    """Test that the search route answers with the matches, capped at the maximum, and sees
+    new versions once the feed is read again.
+    """
+    client = search_app.test_client()
+
+    response = client.get("/collection-instruments/search?q=mon&language=en&limit=50")
+    assert response.status_code == 200
+    assert response.json["total"] == 9
+    assert len(response.json["results"]) == 5
+
+    stub.publish({"survey_id": "1000", "form_type": "0001", "language": "en", "title": "Monthly Sales 1000"})
+    search_app.extensions["cir_api_client"].invalidate_cache()
+
+    response = client.get("/collection-instruments/search?q=monthly+sales&survey_id=1000")
+    assert [(row["title"], row["ci_version"]) for row in response.json["results"]] == [("Monthly Sales 1000", 4)]
+
+
+def test_search_route_before_the_index_is_built(search_app, stub):
+    """Test that a search is answered with a 503 when the index cannot be built."""
+    stub.fail_next(10, status=500)
+
+    assert search_app.test_client().get("/collection-instruments/search?q=survey").status_code == 503
+
+
+def test_index_page_has_the_typeahead(search_app):
+    """Test that the index page searches as the user types."""
+    html = search_app.test_client().get("/").get_data(as_text=True)
+
+    assert '<input type="search" id="search"' in html
+    assert '"/collection-instruments/search?q="' in html
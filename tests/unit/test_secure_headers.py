@@ -0,0 +1,155 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the security headers, compared with the Flask-Talisman configuration they replaced."""
+
+import re
+
+import pytest
+from flask import Flask
+from flask_talisman import Talisman
+
+import eq_cir_management_ui
+from eq_cir_management_ui import content_security_policy, create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.middleware.secure_headers import SecureHeadersMiddleware, split_policy
+
+SECURITY_HEADERS = (
+    "Permissions-Policy",
+    "X-Frame-Options",
+    "X-Content-Type-Options",
+    "Content-Security-Policy",
+    "Strict-Transport-Security",
+    "Referrer-Policy",
+)
+
+PATHS = ("/", "/missing", "/favicon.ico", "/400", "/401", "/403", "/405", "/500", "/framed")
+
+REQUESTS = {
+    "http": {},
+    "https": {"base_url": "https://localhost"},
+    "forwarded https": {"headers": {"X-Forwarded-Proto": "https"}},
+    "forwarded http": {"headers": {"X-Forwarded-Proto": "http"}},
+}
+
+
+class SecureSessionConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+    """Configuration with secure session cookies."""
+
+    SESSION_COOKIE_SECURE = True
+
+
+def talisman_secure_headers(app: Flask) -> None:
+    """The Flask-Talisman configuration the middleware replaced."""
+    Talisman().init_app(
+        app,
+        force_https=False,
+        content_security_policy=content_security_policy(app.config["CDN_URL"]),
+        content_security_policy_nonce_in=["script-src"],
+        frame_options="DENY",
+        strict_transport_security=True,
+        strict_transport_security_max_age=31536000,
+        session_cookie_secure=app.config["SESSION_COOKIE_SECURE"],
+    )
+
+
+def framed() -> tuple[str, int, dict[str, str]]:
+    """A view setting security headers of its own."""
+    return "framed", 200, {"X-Frame-Options": "SAMEORIGIN", "Referrer-Policy": "no-referrer"}
+
+
+def build_app(config: type[DefaultConfig]) -> Flask:
+    """An application with a view setting its own security headers."""
+    app = create_app(config)
+    app.add_url_rule("/framed", view_func=framed)
+    app.testing = True
+    return app
+
+
+@pytest.fixture(scope="module", params=[DefaultConfig, SecureSessionConfig])
+def apps(request):
+    """The application with its security headers, and with those of Flask-Talisman."""
+    app = build_app(request.param)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(eq_cir_management_ui, "configure_secure_headers", talisman_secure_headers)
+        return app, build_app(request.param)
+
+
+def security_headers(response) -> dict[str, str | None]:
+    """The security headers of a response, with the nonce masked."""
+    return {
+        name: re.sub(r"'nonce-[^']*'", "'nonce-'", value) if (value := response.headers.get(name)) else value
+        for name in SECURITY_HEADERS
+    }
+
+
+def nonce_from_csp(response) -> str:
+    """The nonce in the content security policy of a response."""
+    return re.search(r"'nonce-([^']*)'", response.headers["Content-Security-Policy"]).group(1)
+
+
+@pytest.mark.parametrize("path", PATHS)
+@pytest.mark.parametrize("request_options", REQUESTS.values(), ids=REQUESTS.keys())
+def test_headers_match_talisman(apps, path, request_options):
+    """Test that every response has the same security headers as with Flask-Talisman."""
+    app, talisman_app = apps
+
+    response = app.test_client().get(path, buffered=True, **request_options)
+    talisman_response = talisman_app.test_client().get(path, buffered=True, **request_options)
+
+    assert response.status_code == talisman_response.status_code
+    assert security_headers(response) == security_headers(talisman_response)
+    assert sorted(response.headers.keys()) == sorted(talisman_response.headers.keys())
+
+
+def test_session_cookie_settings_match_talisman(apps):
+    """Test that the session cookie settings are those Flask-Talisman applied."""
+    app, talisman_app = apps
+    names = ("SESSION_COOKIE_SECURE", "SESSION_COOKIE_HTTPONLY", "SESSION_COOKIE_SAMESITE")
+
+    # Talisman applied the secure setting on each request.
+    talisman_app.test_client().get("/")
+
+    assert {name: app.config[name] for name in names} == {name: talisman_app.config[name] for name in names}
+
+
+def test_page_nonce_matches_header(apps):
+    """Test that the nonce in a page is the one its policy allows, and is new for each response."""
+    app, _ = apps
+    client = app.test_client()
+
+    first, second = client.get("/"), client.get("/")
+
+    assert len(nonce_from_csp(first)) == 32
+    assert nonce_from_csp(first) != nonce_from_csp(second)
+    assert f'nonce="{nonce_from_csp(first)}"' in first.get_data(as_text=True)
+
+
+def test_split_policy_places_nonce_in_each_directive():
+    """Test that the policy is split where each directive's nonce goes."""
+    policy = {"default-src": ["'self'"], "script-src": ["'self'"], "style-src": [], "img-src": ["data:"]}
+
+    pieces = split_policy(policy, ["script-src", "style-src"])
+
+    assert "'nonce-abc'".join(pieces) == (
+        "default-src 'self'; script-src 'self' 'nonce-abc'; style-src  'nonce-abc'; img-src data:"
+    )
+
+
+@pytest.mark.parametrize("app_headers", [[], [("Strict-Transport-Security", "max-age=1")]])
+def test_middleware_without_hsts_adds_none(app_headers):
+    """Test that the middleware adds no Strict-Transport-Security header when HSTS is disabled,
+    and passes through one set by the application unchanged.
+    """
+    captured = []
+
+    def wsgi_app(_environ, start_response):
+        start_response("200 OK", list(app_headers))
+        return [b""]
+
+    def start_response(_status, headers, _exc_info=None):
+        captured.extend(headers)
+
+    middleware = SecureHeadersMiddleware(wsgi_app, content_security_policy={}, hsts_max_age=None)
+    middleware({"wsgi.url_scheme": "https"}, start_response)
+
+    assert [header for header in captured if header[0] == "Strict-Transport-Security"] == app_headers
@@ -0,0 +1,301 @@
+"""Unit tests for the gunicorn deployment profiles."""
+
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from server_profiles import (
+    MASTER_MEMORY,
+    WORKER_MEMORY,
+    available_cpus,
+    build_profile,
+    clear_snapshots,
+    init_worker,
+    limit_worker,
+    memory_limit,
+    server_settings,
+    worker_concurrency,
+)
+
+# Runs a server's start and exit hooks, printing its metrics directory and whether it exists after each.
+METRICS_DIRECTORY_LIFECYCLE = """
+import os, gunicorn_config
+directory = os.environ["METRICS_MULTIPROCESS_DIR"]
+gunicorn_config.on_starting(None)
+print(directory, os.path.isdir(directory))
+gunicorn_config.on_exit(None)
+print(os.path.exists(directory))
+"""
+
+
+def write(path, text):
+    """Write a cgroup file, creating its directory."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture
+def cpus(monkeypatch):
+    """Four CPUs in the process's affinity mask."""
+    monkeypatch.setattr("server_profiles.os.sched_getaffinity", lambda _pid: {0, 1, 2, 3})
+
+
+@pytest.mark.usefixtures("cpus")
+@pytest.mark.parametrize(
+    ("files", "expected"),
+    [
+        ({}, 4),
+        ({"cpu.max": "max 100000\n"}, 4),
+        ({"cpu.max": "150000 100000\n"}, 2),
+        ({"cpu.max": "8000 100000\n"}, 1),
+        ({"cpu/cpu.cfs_quota_us": "-1\n", "cpu/cpu.cfs_period_us": "100000\n"}, 4),
+        ({"cpu/cpu.cfs_quota_us": "300000\n", "cpu/cpu.cfs_period_us": "100000\n"}, 3),
+    ],
+)
+def test_available_cpus(tmp_path, files, expected):
+    """Test that a cgroup CPU quota lowers the CPU count, rounded up."""
+    for name, text in files.items():
+        write(tmp_path / name, text)
+
+    assert available_cpus(tmp_path) == expected
+
+
+@pytest.mark.parametrize("cpu_count", [6, None])
+def test_available_cpus_without_affinity(monkeypatch, tmp_path, cpu_count):
+    """Test that the CPU count is used where CPU affinity is not available, as on macOS."""
+    monkeypatch.delattr("server_profiles.os.sched_getaffinity", raising=False)
+    monkeypatch.setattr("server_profiles.os.cpu_count", lambda: cpu_count)
+
+    assert available_cpus(tmp_path) == (cpu_count or 1)
+
+
+@pytest.mark.parametrize(
+    ("files", "expected"),
+    [
+        ({}, None),
+        ({"memory.max": "max\n"}, None),
+        ({"memory.max": "536870912\n"}, 536870912),
+        ({"memory/memory.limit_in_bytes": "9223372036854771712\n"}, None),
+        ({"memory/memory.limit_in_bytes": "1073741824\n"}, 1073741824),
+    ],
+)
+def test_memory_limit(tmp_path, files, expected):
+    """Test reading the cgroup v2 and v1 memory limits."""
+    for name, text in files.items():
+        write(tmp_path / name, text)
+
+    assert memory_limit(tmp_path) == expected
+
+
+@pytest.mark.parametrize(
+    ("name", "workers", "threads"),
+    [("cpu", 5, 2), ("io", 4, 16), ("low-memory", 1, 8)],
+)
+def test_profiles_are_sized_from_the_cpus(name, workers, threads):
+    """Test the worker and thread counts of each profile on four CPUs."""
+    profile = build_profile(name, cpus=4, memory=None)
+
+    assert (profile.workers, profile.threads) == (workers, threads)
+    assert profile.preload_app
+
+
+def test_async_profile_is_not_preloaded():
+    """Test that the gevent profile runs a worker per CPU, loading the application in each worker."""
+    profile = build_profile("async", cpus=4, memory=None)
+
+    assert (profile.worker_class, profile.workers, profile.preload_app) == ("gevent", 4, False)
+
+
+def test_worker_concurrency():
+    """Test that a worker's concurrency is its threads, or its connections under gevent."""
+    assert worker_concurrency(build_profile("io", cpus=4, memory=None).settings()) == 16
+    assert worker_concurrency(build_profile("async", cpus=4, memory=None).settings()) == 1000
+
+
+def test_workers_fit_the_memory_limit():
+    """Test that the workers are capped to the number whose memory fits the limit, but at least one."""
+    assert build_profile("cpu", cpus=8, memory=MASTER_MEMORY + 2 * WORKER_MEMORY).workers == 2
+    assert build_profile("cpu", cpus=8, memory=MASTER_MEMORY).workers == 1
+
+
+def test_unknown_profile():
+    """Test that an unknown profile name is rejected."""
+    with pytest.raises(ValueError, match="Unknown web server profile 'fast'"):
+        build_profile("fast", cpus=4, memory=None)
+
+
+@pytest.mark.usefixtures("cpus")
+def test_server_settings(monkeypatch):
+    """Test that the profile is chosen and overridden from the environment."""
+    monkeypatch.setattr("server_profiles.memory_limit", lambda: None)
+    monkeypatch.delenv("WEB_SERVER_PROFILE", raising=False)
+
+    assert server_settings()["threads"] == 16
+    assert server_settings({"WEB_SERVER_PROFILE": "cpu"}) == {
+        "worker_class": "gthread",
+        "workers": 5,
+        "threads": 2,
+        "keepalive": 2,
+        "timeout": 30,
+        "max_requests": 10000,
+        "max_requests_jitter": 1000,
+        "preload_app": True,
+        "worker_connections": 1000,
+    }
+
+    settings = server_settings(
+        {
+            "WEB_SERVER_WORKERS": "3",
+            "WEB_SERVER_THREADS": "10",
+            "HTTP_KEEP_ALIVE": "7",
+            "WEB_SERVER_PRELOAD_APP": "false",
+        },
+    )
+    assert (settings["workers"], settings["threads"], settings["keepalive"], settings["preload_app"]) == (
+        3,
+        10,
+        7,
+        False,
+    )
+
+
+def test_init_worker_resets_per_process_state(app):
+    """Test that a worker gets its own CIR API connection pool and readiness refresh."""
+    pool = app.extensions["cir_api_client"].pool
+    readiness = app.extensions["readiness"]
+    readiness.report()
+
+    init_worker(app)
+
+    assert app.extensions["cir_api_client"].pool is not pool
+    assert readiness.report() == {"ready": True, "checks": {"templates": True}}
+
+
+def test_limit_worker_admits_one_less_than_the_worker_handles(app):
+    """Test that a worker admits one request less than its threads, or its gevent connections."""
+    admission = app.extensions["admission"]
+    assert admission.max_in_flight == 0
+
+    limit_worker(app, build_profile("io", cpus=4, memory=None).settings())
+    assert admission.max_in_flight == 15
+
+    limit_worker(app, {"worker_class": "gevent", "threads": 1, "worker_connections": 100})
+    assert admission.max_in_flight == 99
+
+
+def test_limit_worker_caps_event_streams_of_gthread_workers(app):
+    """Test that a gthread worker serves event streams on a quarter of its threads, and a gevent
+    worker is not capped.
+    """
+    broker = app.extensions["event_broker"]
+    assert broker.max_subscribers == 0
+
+    limit_worker(app, {"worker_class": "gevent", "threads": 1, "worker_connections": 100})
+    assert broker.max_subscribers == 0
+
+    limit_worker(app, build_profile("io", cpus=4, memory=None).settings())
+    assert broker.max_subscribers == 4
+
+
+def test_limit_worker_keeps_configured_limits(app):
+    """Test that limits set in the application's configuration are not replaced."""
+    app.config.update(ADMISSION_MAX_IN_FLIGHT=3, EVENTS_MAX_SUBSCRIBERS=2)
+    app.extensions["admission"].max_in_flight = 3
+    app.extensions["event_broker"].max_subscribers = 2
+
+    limit_worker(app, build_profile("io", cpus=4, memory=None).settings())
+
+    assert app.extensions["admission"].max_in_flight == 3
+    assert app.extensions["event_broker"].max_subscribers == 2
+
+
+def test_clear_snapshots(tmp_path):
+    """Test that metrics snapshots from a previous server are removed."""
+    (tmp_path / "worker-1.json").write_text("{}")
+    (tmp_path / "dead.json").write_text("{}")
+
+    clear_snapshots(str(tmp_path))
+
+    assert not list(tmp_path.iterdir())
+
+
+def test_gunicorn_config_does_not_import_the_application():
+    """Test that reading the gunicorn configuration, as the master does, leaves the application unimported."""
+    imported = subprocess.run(
+        [sys.executable, "-c", "import sys, gunicorn_config; print(sorted(sys.modules))"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+
+    assert "'server_profiles'" in imported
+    assert "eq_cir_management_ui" not in imported
+
+
+def test_gunicorn_config_shares_metrics_through_a_directory_of_its_own():
+    """Test that without METRICS_MULTIPROCESS_DIR the server creates a metrics directory of its
+    own when it starts, and removes it when it exits.
+    """
+    environ = {name: value for name, value in os.environ.items() if name != "METRICS_MULTIPROCESS_DIR"}
+    lifecycle = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", METRICS_DIRECTORY_LIFECYCLE],
+        env=environ,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout.split()
+
+    assert os.path.basename(lifecycle[0]).startswith("eq-cir-metrics-")
+    assert lifecycle[1:] == ["True", "False"]
+
+
+def test_async_profile_boots(tmp_path):
+    """Test that gunicorn starts gevent workers under the async profile, serves a page, and stops cleanly."""
+    pytest.importorskip("gevent")
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+    environ = {
+        **os.environ,
+        "WEB_SERVER_PROFILE": "async",
+        "WEB_SERVER_WORKERS": "1",
+        "JOBS_DB_PATH": str(tmp_path / "jobs.sqlite3"),
+        "METRICS_MULTIPROCESS_DIR": str(tmp_path / "metrics"),
+    }
+    with (tmp_path / "gunicorn.log").open("wb") as log:
+        # Stopped below.
+        # pylint: disable-next=consider-using-with
+        server = subprocess.Popen(  # noqa: S603
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "--bind", f"127.0.0.1:{port}", "app:app"],
+            env=environ,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                connection.request("GET", "/")
+                status = connection.getresponse().status
+                break
+            except OSError:
+                assert server.poll() is None, (tmp_path / "gunicorn.log").read_text()
+                assert time.monotonic() < deadline
+                time.sleep(0.1)
+    finally:
+        server.terminate()
+        server.wait(30)
+
+    log_text = (tmp_path / "gunicorn.log").read_text()
+    assert status == 200
+    assert "Using worker: gevent" in log_text
+    assert "Traceback" not in log_text
+    assert server.returncode == 0
+    assert (tmp_path / "metrics" / "dead.json").exists()
+    assert not list((tmp_path / "metrics").glob("worker-*.json"))
@@ -0,0 +1,289 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the cache shared by worker processes."""
+
+import mmap
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from eq_cir_management_ui.cache.shared_memory import (
+    HEADER_SIZE,
+    SEQUENCE,
+    SHARED_CACHE_EVENTS,
+    SLOT_HEADER_SIZE,
+    SharedMemoryCache,
+)
+
+FORK = multiprocessing.get_context("fork")
+
+# Gunicorn forks its workers the same way. The threads running in the test process are not
+# used by the children.
+pytestmark = pytest.mark.filterwarnings("ignore:This process .* is multi-threaded:DeprecationWarning")
+
+
+@pytest.fixture
+def path(tmp_path):
+    """The path of a shared cache file."""
+    return str(tmp_path / "shared.cache")
+
+
+def events(event):
+    """The number of shared cache events of a kind."""
+    return SHARED_CACHE_EVENTS.samples().get((event,), [0.0])[0]
+
+
+def test_values_are_shared_between_mappings(path):
+    """Test that a value stored through one mapping of the file is read through another."""
+    writer = SharedMemoryCache(path, slots=16, slot_size=256)
+    reader = SharedMemoryCache(path, slots=16, slot_size=256)
+
+    assert writer.set(b"key", b"value", ttl=60)
+
+    assert reader.get(b"key") == b"value"
+    assert reader.get(b"missing") is None
+    writer.close()
+    reader.close()
+
+
+def test_values_are_shared_with_forked_processes(path):
+    """Test that a worker forked after the file was mapped shares it."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+    child = FORK.Process(target=cache.set, args=(b"key", b"from the child", 60))
+    child.start()
+    child.join()
+
+    assert cache.get(b"key") == b"from the child"
+
+
+def test_values_expire(path):
+    """Test that a value is not returned after its TTL."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+    cache.set(b"key", b"value", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get(b"key") is None
+
+
+def test_values_are_replaced(path):
+    """Test that storing a key again replaces its value in the same slot."""
+    cache = SharedMemoryCache(path, slots=4, slot_size=256)
+    cache.set(b"key", b"first", ttl=60)
+    cache.set(b"key", b"second", ttl=60)
+    cache.set(b"other", b"value", ttl=60)
+
+    assert cache.get(b"key") == b"second"
+    assert cache.get(b"other") == b"value"
+
+
+def test_oldest_entry_in_a_full_set_is_evicted(path):
+    """Test that the entry written longest ago is evicted when a set is full."""
+    cache = SharedMemoryCache(path, slots=4, slot_size=256, ways=4)
+    evictions = events("eviction")
+    for number in range(5):
+        cache.set(f"key-{number}".encode(), b"value", ttl=60)
+
+    assert cache.get(b"key-0") is None
+    assert all(cache.get(f"key-{number}".encode()) for number in range(1, 5))
+    assert events("eviction") == evictions + 1
+
+
+def test_expired_entries_are_replaced_first(path):
+    """Test that an expired entry is reused before a live one is evicted."""
+    cache = SharedMemoryCache(path, slots=2, slot_size=256, ways=2)
+    cache.set(b"live", b"value", ttl=60)
+    cache.set(b"expired", b"value", ttl=0)
+    cache.set(b"new", b"value", ttl=60)
+
+    assert cache.get(b"live") == b"value"
+    assert cache.get(b"new") == b"value"
+
+
+def test_values_too_large_for_a_slot_are_not_stored(path):
+    """Test that oversized values are counted and skipped."""
+    cache = SharedMemoryCache(path, slots=4, slot_size=SLOT_HEADER_SIZE + 8)
+    too_large = events("too_large")
+
+    assert not cache.set(b"key", b"too large", ttl=60)
+    assert cache.get(b"key") is None
+    assert events("too_large") == too_large + 1
+
+
+@pytest.mark.parametrize(("slots", "slot_size"), [(6, 256), (4, SLOT_HEADER_SIZE)])
+def test_invalid_layout(path, slots, slot_size):
+    """Test that the slots must divide into sets and fit the slot header."""
+    with pytest.raises(ValueError, match="slots"):
+        SharedMemoryCache(path, slots=slots, slot_size=slot_size)
+
+
+def test_file_with_another_layout_is_recreated(path):
+    """Test that a file created with another layout is emptied rather than misread."""
+    SharedMemoryCache(path, slots=16, slot_size=256).set(b"key", b"value", ttl=60)
+
+    cache = SharedMemoryCache(path, slots=16, slot_size=512)
+
+    assert cache.get(b"key") is None
+
+
+def test_file_with_another_layout_is_replaced_under_processes_using_it(path):
+    """Test that a process still using a file with another layout keeps reading it, as the file
+    is replaced rather than resized under its mapping, and new processes share the new file.
+    """
+    old = SharedMemoryCache(path, slots=16, slot_size=256)
+    old.set(b"key", b"old", ttl=60)
+
+    SharedMemoryCache(path, slots=32, slot_size=256).set(b"key", b"new", ttl=60)
+
+    assert old.get(b"key") == b"old"
+    assert SharedMemoryCache(path, slots=32, slot_size=256).get(b"key") == b"new"
+
+
+def test_reads_during_a_write_miss(path):
+    """Test that a slot being written, or with a bad checksum, is not returned."""
+    cache = SharedMemoryCache(path, slots=1, slot_size=256, ways=1)
+    cache.set(b"key", b"value", ttl=60)
+
+    with open(path, "r+b") as file, mmap.mmap(file.fileno(), 0) as raw:
+        sequence = SEQUENCE.unpack_from(raw, HEADER_SIZE)[0]
+        SEQUENCE.pack_into(raw, HEADER_SIZE, sequence + 1)
+        assert cache.get(b"key") is None
+
+        SEQUENCE.pack_into(raw, HEADER_SIZE, sequence)
+        raw[HEADER_SIZE + SLOT_HEADER_SIZE + 4] = ord("X")
+        assert cache.get(b"key") is None
+
+
+def test_get_or_load_loads_missing_values_once(path):
+    """Test that a missing value is loaded and stored, then read."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return b"loaded"
+
+    assert cache.get_or_load(b"key", loader, ttl=60) == b"loaded"
+    assert cache.get_or_load(b"key", loader, ttl=60) == b"loaded"
+    assert len(calls) == 1
+
+
+def load_slowly(path, calls):
+    """Load a value through the shared cache, counting loads."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+
+    def loader():
+        with calls.get_lock():
+            calls.value += 1
+        time.sleep(0.2)
+        return b"loaded"
+
+    assert cache.get_or_load(b"key", loader, ttl=60) == b"loaded"
+
+
+def test_concurrent_misses_in_several_processes_load_once(path):
+    """Test that workers missing on the same key wait for the first one to load it."""
+    calls = FORK.Value("i", 0)
+    SharedMemoryCache(path, slots=16, slot_size=256)
+    processes = [FORK.Process(target=load_slowly, args=(path, calls)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert calls.value == 1
+    assert all(process.exitcode == 0 for process in processes)
+
+
+def test_concurrent_misses_in_several_threads_load_once(path):
+    """Test that threads of one worker missing on the same key wait for the first one to load it."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+    calls = []
+    values = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.2)
+        return b"loaded"
+
+    threads = [
+        threading.Thread(target=lambda: values.append(cache.get_or_load(b"key", loader, ttl=60))) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert values == [b"loaded"] * 4
+
+
+def test_fill_lock_held_by_another_thread_is_waited_for_with_a_bound(path):
+    """Test that a thread loads the value itself after waiting too long for another thread."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+    loading = threading.Event()
+    release = threading.Event()
+
+    def loader():
+        loading.set()
+        release.wait(5)
+        return b"loaded"
+
+    thread = threading.Thread(target=cache.get_or_load, args=(b"key", loader, 60))
+    thread.start()
+    loading.wait(5)
+
+    assert cache.get_or_load(b"key", lambda: b"loaded again", ttl=60, wait=0.01) == b"loaded again"
+    release.set()
+    thread.join()
+
+
+def test_value_stored_while_waiting_for_the_fill_lock_is_read(path):
+    """Test that a worker which waited for the fill lock reads the value stored meanwhile."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+    calls = FORK.Value("i", 0)
+    loading = FORK.Process(target=load_slowly, args=(path, calls))
+    loading.start()
+    while not calls.value:
+        time.sleep(0.005)
+
+    assert cache.get_or_load(b"key", lambda: b"loaded again", ttl=60) == b"loaded"
+    loading.join()
+
+
+def test_fill_lock_wait_is_bounded(path):
+    """Test that a worker loads the value itself after waiting too long for another."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+    calls = FORK.Value("i", 0)
+    loading = FORK.Process(target=load_slowly, args=(path, calls))
+    loading.start()
+    while not calls.value:
+        time.sleep(0.005)
+
+    assert cache.get_or_load(b"key", lambda: b"loaded again", ttl=60, wait=0.01) == b"loaded again"
+    loading.join()
+
+
+def test_invalidate(path):
+    """Test removing entries by key prefix, and that each invalidation increments the generation."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+    for key in (b"/v1/a", b"/v1/b", b"/v2/a"):
+        cache.set(key, b"value", ttl=60)
+    generation = cache.generation
+
+    assert cache.invalidate(b"/v1/") == 2
+    assert cache.get(b"/v1/a") is None
+    assert cache.get(b"/v2/a") == b"value"
+    assert cache.invalidate() == 1
+    assert cache.generation == generation + 2
+
+
+def test_thread_lock_is_replaced_after_a_fork(path, monkeypatch):
+    """Test that a forked worker does not use a thread lock inherited from its parent."""
+    cache = SharedMemoryCache(path, slots=16, slot_size=256)
+
+    monkeypatch.setattr("eq_cir_management_ui.cache.shared_memory.os.getpid", lambda: -1)
+
+    assert cache.set(b"key", b"value", ttl=60)
+    assert cache.get(b"key") == b"value"
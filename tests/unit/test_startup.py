@@ -0,0 +1,51 @@
+"""Unit tests for the start-up path, which a cold start of the application takes.
+
+The cold start budgets are timed by ``make benchmark-startup`` rather than here, as the time
+taken depends on the machine running the tests.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.startup_benchmark import ROOT
+
+# Prints the modules loaded by importing the application, and by creating it and serving "/".
+LOADED_MODULES = """
+import json, sys
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.config.config import DefaultConfig
+imported = set(sys.modules)
+app = create_app(DefaultConfig)
+assert app.test_client().get("/").status_code == 200
+print(json.dumps({"import": sorted(imported), "first_request": sorted(sys.modules)}))
+"""
+
+
+def loaded_modules():
+    """The modules loaded at each point of a cold start in a new interpreter."""
+    environ = {name: value for name, value in os.environ.items() if name != "SHARED_CACHE_PATH"}
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", LOADED_MODULES],
+        cwd=ROOT,
+        env={**environ, "LOG_LEVEL": "WARNING"},
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_cold_start_leaves_unused_modules_unimported():
+    """Test that modules only needed when configured, or once the application is created, are not
+    imported on the way to serving the first request.
+    """
+    modules = loaded_modules()
+
+    assert "semver" not in modules["import"]
+    assert "semver" in modules["first_request"]
+    assert "dotenv" not in modules["first_request"]
+    assert "eq_cir_management_ui.cache.shared_memory" not in modules["first_request"]
+    # The gunicorn side of the deployment, which the application does not depend on.
+    assert "server_profiles" not in modules["first_request"]
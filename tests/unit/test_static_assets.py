@@ -0,0 +1,96 @@
+"""Unit tests for the in-memory static asset store."""
+
+import gzip
+import os
+
+import pytest
+
+from eq_cir_management_ui.compression import ENCODERS
+from eq_cir_management_ui.utils.static_assets import IMMUTABLE_CACHE_CONTROL, StaticAssetStore
+
+
+@pytest.fixture(name="store")
+def create_store(tmp_path):
+    """A store loaded from a temporary directory."""
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "main.css").write_text("body { margin: 0; }\n" * 50)
+    (tmp_path / "random.bin").write_bytes(os.urandom(256))
+    store = StaticAssetStore()
+    store.load_directory(tmp_path, prefix="assets/")
+    return store
+
+
+def test_load_directory_keeps_compressed_variants_that_are_smaller(store):
+    """Test that assets are loaded with a compressed variant only where it saves bytes."""
+    css = store.assets["assets/css/main.css"]
+
+    assert len(store) == 2
+    assert css.mimetype == "text/css"
+    assert set(css.variants) == set(ENCODERS)
+    assert gzip.decompress(css.variants["gzip"]) == css.content
+    assert not store.assets["assets/random.bin"].variants
+    assert store.assets["assets/random.bin"].mimetype == "application/octet-stream"
+    assert store.size > len(css.content) + 256
+
+
+def test_fingerprinted_name_changes_with_content():
+    """Test that the fingerprinted name is derived from the content."""
+    store = StaticAssetStore()
+    first = store.add("css/main.css", b"a")
+    second = store.add("css/other.css", b"b")
+
+    assert first.fingerprinted_name == f"css/main.{first.digest[:12]}.css"
+    assert first.digest != second.digest
+
+
+def test_favicon_is_served_with_etag_and_cache_headers(client):
+    """Test that the favicon is served from memory with validators and a max age."""
+    response = client.get("/favicon.ico")
+
+    assert response.status_code == 200
+    assert response.mimetype == "image/vnd.microsoft.icon"
+    assert response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "public, max-age=3600"
+    assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.parametrize("encoding", list(ENCODERS))
+def test_precompressed_variant_is_negotiated(client, encoding):
+    """Test that a client accepting an encoding is sent the precompressed variant."""
+    response = client.get("/favicon.ico", headers={"Accept-Encoding": encoding})
+
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"].endswith(f'-{encoding}"')
+
+
+def test_conditional_request_is_not_modified(client):
+    """Test that a matching If-None-Match is answered with 304 and no body."""
+    etag = client.get("/favicon.ico").headers["ETag"]
+
+    response = client.get("/favicon.ico", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_fingerprinted_url_is_immutable(app, client):
+    """Test that asset_url_for emits fingerprinted URLs, which are cached forever."""
+    with app.test_request_context("/"):
+        url = app.jinja_env.globals["asset_url_for"]("static", filename="favicon.ico")
+        index_url = app.jinja_env.globals["asset_url_for"]("main.index")
+        missing_url = app.jinja_env.globals["asset_url_for"]("static", filename="missing.css")
+
+    response = client.get(url)
+
+    assert url.startswith("/static/favicon.") and url != "/static/favicon.ico"
+    assert index_url == "/"
+    assert missing_url == "/static/missing.css"
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_unknown_static_asset_is_not_found(client):
+    """Test that assets which were not loaded are not found."""
+    assert client.get("/static/missing.css").status_code == 404
@@ -0,0 +1,109 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for precompiled template bundles."""
+
+import json
+import re
+import zipfile
+from pathlib import Path
+
+import jinja2
+import pytest
+from jinja2 import TemplateNotFound
+
+from eq_cir_management_ui import create_app, design_system_config
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.templating.build import main
+from eq_cir_management_ui.templating.bundle import (
+    MANIFEST_NAME,
+    BundleLoader,
+    TemplateBundleError,
+    build_bundle,
+    page_templates,
+)
+from eq_cir_management_ui.templating.precompile import WARMUP_TEMPLATES, find_reachable_templates
+
+
+@pytest.fixture
+def bundle_path(app, tmp_path):
+    """A bundle of the templates reachable from the page templates."""
+    path = tmp_path / "templates.zip"
+    build_bundle(app.jinja_env, path, WARMUP_TEMPLATES, design_system_config())
+    return path
+
+
+@pytest.fixture
+def bundled_app(bundle_path):
+    """An application loading its templates from the bundle."""
+
+    class BundleConfig(DefaultConfig):  # pylint: disable=too-few-public-methods
+        """Load templates from the bundle."""
+
+        TEMPLATE_BUNDLE_PATH = str(bundle_path)
+
+    return create_app(BundleConfig)
+
+
+def without_nonce(page: bytes) -> bytes:
+    """Mask the CSP nonce, which differs between responses."""
+    return re.sub(rb'nonce="[^"]*"', b'nonce=""', page)
+
+
+def test_page_templates_are_the_html_templates():
+    """Test that the page templates are found in the template directory."""
+    assert page_templates(Path("templates")) == sorted(WARMUP_TEMPLATES)
+
+
+def test_build_bundle_writes_manifest_of_reachable_templates(app, bundle_path):
+    """Test that the manifest lists every reachable template, with the versions it was built for."""
+    with zipfile.ZipFile(bundle_path) as archive:
+        manifest = json.loads(archive.read(MANIFEST_NAME))
+
+    assert sorted(manifest["templates"]) == sorted(find_reachable_templates(app.jinja_env, WARMUP_TEMPLATES))
+    assert manifest["design_system_version"] == design_system_config()
+    assert manifest["jinja_version"] == jinja2.__version__
+
+
+def test_build_bundle_is_deterministic(app, bundle_path, tmp_path):
+    """Test that building the same templates twice gives the same bundle."""
+    rebuilt = tmp_path / "rebuilt" / "templates.zip"
+    build_bundle(app.jinja_env, rebuilt, reversed(WARMUP_TEMPLATES), design_system_config())
+
+    assert rebuilt.read_bytes() == bundle_path.read_bytes()
+
+
+def test_bundled_app_renders_the_same_pages(client, bundled_app):
+    """Test that pages rendered from the bundle match those rendered from the template source."""
+    bundled_client = bundled_app.test_client()
+
+    for path in ("/", "/missing"):
+        assert without_nonce(bundled_client.get(path).data) == without_nonce(client.get(path).data)
+
+
+def test_bundled_app_precompiles_every_bundled_template(bundled_app):
+    """Test that start-up compiles the bundled templates without walking their source."""
+    loader = bundled_app.jinja_env.loader
+
+    assert isinstance(loader, BundleLoader)
+    assert bundled_app.extensions["precompiled_templates"] == loader.list_templates()
+
+
+def test_bundle_loader_raises_for_missing_template(bundled_app):
+    """Test that a template missing from the bundle is not found."""
+    with pytest.raises(TemplateNotFound):
+        bundled_app.jinja_env.get_template("missing.html")
+
+
+def test_bundle_loader_rejects_other_design_system_version(bundle_path):
+    """Test that a bundle built for another version of the design system is refused."""
+    with pytest.raises(TemplateBundleError, match="built for design system"):
+        BundleLoader(bundle_path, "0.0.1")
+
+
+def test_main_builds_bundle(tmp_path):
+    """Test that the command line builds a bundle the application can load."""
+    path = tmp_path / "build" / "templates.zip"
+
+    main([str(path)])
+
+    assert BundleLoader(path, design_system_config()).list_templates()
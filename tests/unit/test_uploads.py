@@ -0,0 +1,222 @@
+# pylint: disable=redefined-outer-name
+
+"""Unit tests for the streaming upload and validation of collection instrument documents."""
+
+import hashlib
+import io
+import json
+
+import ijson
+import pytest
+
+from eq_cir_management_ui import create_app
+from eq_cir_management_ui.cir_api.stub_server import synthetic_instrument, synthetic_metadata
+from eq_cir_management_ui.config.config import DefaultConfig
+from eq_cir_management_ui.uploads.spool import HashingSpool
+from eq_cir_management_ui.uploads.validation import MAX_DEPTH, document_events, validate_document
+
+ADMIN_TOKEN = "test-admin-token"  # noqa: S105
+HEADERS = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+
+@pytest.fixture
+def document():
+    """A valid collection instrument document of 3 sections of 4 questions."""
+    return synthetic_instrument(synthetic_metadata(1)[0], sections=3, questions=4)
+
+
+@pytest.fixture
+def uploads_app(tmp_path):
+    """An application with the admin routes, accepting bodies of up to 64KB."""
+    config = type(
+        "UploadsConfig",
+        (DefaultConfig,),
+        {
+            "ADMIN_TOKEN": ADMIN_TOKEN,
+            "JOBS_DB_PATH": str(tmp_path / "jobs.sqlite3"),
+            "MAX_CONTENT_LENGTH": 65536,
+            "UPLOAD_SPOOL_MEMORY": 1024,
+        },
+    )
+    app = create_app(config)
+    yield app
+    app.extensions["job_runner"].store.close()
+
+
+def validate(document):
+    """Validate a document, serialised to JSON."""
+    return validate_document(io.BytesIO(json.dumps(document).encode()))
+
+
+def test_valid_document_is_summarised(document):
+    """Test that a valid document's report has its metadata and the number of each part."""
+    assert validate(document) == {
+        "valid": True,
+        "errors": [],
+        "summary": {
+            "survey_id": "1000",
+            "form_type": "0001",
+            "language": "en",
+            "title": "Monthly Business Survey 1000",
+            "data_version": "0.0.3",
+            "sections": 3,
+            "questions": 12,
+            "answers": 12,
+        },
+    }
+
+
+def deeply_nested(document):
+    """Add an array nested deeper than the maximum to a document."""
+    value: list = []
+    for _ in range(MAX_DEPTH):
+        value = [value]
+    document["extra"] = value
+
+
+@pytest.mark.parametrize(
+    ("change", "path", "message"),
+    [
+        (lambda document: document.pop("survey_id"), "", "is missing 'survey_id'"),
+        (lambda document: document.update(language="fr"), "language", "'fr' is not valid"),
+        (lambda document: document.update(sections=[]), "sections", "must not be empty"),
+        (lambda document: document.update(sections={}), "sections", "must be an array, not an object"),
+        (
+            lambda document: document["sections"][1].update(id="section-0"),
+            "sections[1].id",
+            "the id 'section-0' is not unique",
+        ),
+        (
+            lambda document: document["sections"][2]["groups"][0]["blocks"][3]["question"].pop("answers"),
+            "sections[2].groups[0].blocks[3].question",
+            "is missing 'answers'",
+        ),
+        (
+            lambda document: document["sections"][0]["groups"][0]["blocks"][1]["question"]["answers"][0].update(
+                mandatory="yes",
+            ),
+            "sections[0].groups[0].blocks[1].question.answers[0].mandatory",
+            "must be a boolean, not a string",
+        ),
+        (deeply_nested, "extra" + "[0]" * (MAX_DEPTH - 1), f"nested more than {MAX_DEPTH} deep"),
+    ],
+)
+def test_first_broken_rule_is_reported(document, change, path, message):
+    """Test that an invalid document is reported with the path of its first broken rule."""
+    change(document)
+
+    assert validate(document) == {"valid": False, "errors": [{"path": path, "message": message}]}
+
+
+def test_top_level_must_be_an_object():
+    """Test that a document which is not an object is rejected."""
+    assert validate([])["errors"] == [{"path": "", "message": "must be an object, not an array"}]
+
+
+@pytest.mark.parametrize("text", [b"", b'{"survey_id": "10', b"{,}"])
+def test_malformed_json_is_reported(text):
+    """Test that a document which is not JSON is reported as such."""
+    assert validate_document(io.BytesIO(text))["errors"] == [{"path": "", "message": "is not valid JSON"}]
+
+
+def test_duplicate_keys_are_reported():
+    """Test that an object with a key twice is rejected, at the repeated key."""
+    report = validate_document(io.BytesIO(b'{"survey_id": "1000", "survey_id": "1001"}'))
+
+    assert report["errors"] == [{"path": "survey_id", "message": "is a duplicate key"}]
+
+
+def test_validation_stops_at_the_first_broken_rule():
+    """Test that the parse stops at a broken rule, before the malformed rest of the document."""
+    text = b'{"survey_id": 1000, "sections": [' + b"not JSON " * 100_000
+    file = io.BytesIO(text)
+
+    report = validate_document(file)
+
+    assert report["errors"] == [{"path": "survey_id", "message": "must be a string, not a number"}]
+    assert file.tell() < len(text) // 10
+
+
+def test_loaded_document_events_match_the_parser(document):
+    """Test that the events replayed from a loaded document are those parsed from its text."""
+    document["extra"] = {"none": None, "number": 1, "list": [True, "a"]}
+    text = json.dumps(document).encode()
+
+    assert list(document_events(json.loads(text))) == list(ijson.parse(io.BytesIO(text)))
+
+
+def test_spool_hashes_what_is_written():
+    """Test that the spool keeps the hash and size of its content, in memory or on disk."""
+    with HashingSpool(max_memory=10) as spool:
+        spool.write(b"0123456789")
+        spool.write(b"abcdef")
+        spool.seek(0)
+
+        assert spool.read() == b"0123456789abcdef"
+        assert spool.digest.hexdigest() == hashlib.sha256(b"0123456789abcdef").hexdigest()
+        assert spool.size == 16
+
+
+def test_uploaded_document_is_validated_once(uploads_app, document):
+    """Test that a document is validated when first uploaded, and its report reused when it is
+    uploaded again, as a body or as a form's file.
+    """
+    client = uploads_app.test_client()
+    text = json.dumps(document).encode()
+
+    first = client.post("/admin/uploads", data=text, content_type="application/json", headers=HEADERS)
+    again = client.post(
+        "/admin/uploads",
+        data={"document": (io.BytesIO(text), "instrument.json"), "comment": "again"},
+        headers=HEADERS,
+    )
+
+    assert first.status_code == 200
+    assert first.json["valid"]
+    assert first.json["sha256"] == hashlib.sha256(text).hexdigest()
+    assert first.json["size"] == len(text)
+    assert not first.json["cached"]
+    assert again.status_code == 200
+    assert again.json["cached"]
+    assert again.json["summary"] == first.json["summary"]
+
+
+def test_invalid_upload_is_unprocessable(uploads_app):
+    """Test that an invalid document is answered with a 422 and its error."""
+    response = uploads_app.test_client().post("/admin/uploads", json={"survey_id": "1000"}, headers=HEADERS)
+
+    assert response.status_code == 422
+    assert response.json["errors"] == [{"path": "", "message": "is missing 'form_type'"}]
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"data": "{}", "content_type": "text/plain"},
+        {"data": {"other": (io.BytesIO(b"{}"), "other.json")}},
+    ],
+)
+def test_upload_without_a_document(uploads_app, kwargs):
+    """Test that a request without a document is rejected."""
+    assert uploads_app.test_client().post("/admin/uploads", headers=HEADERS, **kwargs).status_code == 400
+
+
+@pytest.mark.parametrize("declared", [True, False])
+def test_upload_over_the_maximum_length(uploads_app, declared):
+    """Test that a body longer than MAX_CONTENT_LENGTH is refused, whether its length is declared
+    or it is sent chunked.
+    """
+    body = io.BytesIO(b" " * 70_000)
+    environ = {} if declared else {"wsgi.input_terminated": True}
+
+    response = uploads_app.test_client().post(
+        "/admin/uploads",
+        input_stream=body,
+        content_length=70_000 if declared else None,
+        content_type="application/json",
+        headers=HEADERS,
+        environ_overrides=environ,
+    )
+
+    assert response.status_code == 413
+    assert response.json["error"] == "The document must be at most 65536 bytes"